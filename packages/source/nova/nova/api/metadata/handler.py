@@ -17,9 +17,13 @@
 #    under the License.
 
 """Metadata request handler."""
+import collections
+import copy
 import hashlib
 import hmac
+import itertools
 import os
+import posixpath
 
 from oslo.config import cfg
 import webob.dec
@@ -28,14 +32,17 @@ import webob.exc
 from nova.api.metadata import base
 from nova import conductor
 from nova import exception
+from nova.openstack.common import lockutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import memorycache
+from nova.openstack.common import rpc
+from nova.openstack.common import timeutils
 from nova import wsgi
 
-CACHE_EXPIRATION = 15  # in seconds
-
 CONF = cfg.CONF
 CONF.import_opt('use_forwarded_for', 'nova.api.auth')
+CONF.import_opt('notification_topics',
+                'nova.openstack.common.notifier.rpc_notifier')
 
 metadata_proxy_opts = [
     cfg.BoolOpt(
@@ -49,85 +56,259 @@ metadata_proxy_opts = [
          help='Shared secret to validate proxies Quantum metadata requests')
 ]
 
+metadata_cache_opts = [
+    cfg.IntOpt('metadata_cache_expiration',
+               default=15,
+               help='Time in seconds to cache the metadata of an instance '
+                    'and the responses rendered from it'),
+    cfg.IntOpt('metadata_cache_size',
+               default=5000,
+               help='Maximum number of instance metadata and rendered '
+                    'responses cached by each worker.  Not used when '
+                    'memcached_servers is set, which shares the cache '
+                    'between the workers instead'),
+    cfg.BoolOpt('metadata_cache_warm',
+                default=False,
+                help='Cache the metadata of new instances when the '
+                     'compute.instance.create.end notification for them is '
+                     'received.  Needs the rpc notification driver'),
+]
+
 CONF.register_opts(metadata_proxy_opts)
+CONF.register_opts(metadata_cache_opts)
 
 LOG = logging.getLogger(__name__)
 
+# Responses rendered into the cache when an instance is created, the ones
+# cloud-init asks for first.
+WARM_PATHS = [
+    '/openstack/latest/meta_data.json',
+    '/openstack/latest/user_data',
+    '/latest/meta-data/',
+    '/latest/user-data',
+]
+
+
+class LRUCache(object):
+    """A process local cache of a bounded number of items, dropping the
+    least recently used one to make room.  Has the get and set methods of
+    the memcache client.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        # { key: (use, timeout, value) }
+        self.cache = {}
+        # (use, key) of every get or set of a key, oldest first.  Only the
+        # latest use of a key is still in the cache.  collections has no
+        # OrderedDict in python 2.6.
+        self.uses = collections.deque()
+        self.counter = itertools.count()
+
+    def _use(self, key, timeout, value):
+        use = self.counter.next()
+        self.cache[key] = (use, timeout, value)
+        self.uses.append((use, key))
+        if len(self.uses) > 2 * max(self.size, len(self.cache)):
+            self.uses = collections.deque(sorted(
+                (use, key) for key, (use, _timeout, _value)
+                in self.cache.iteritems()))
+
+    def get(self, key):
+        try:
+            use, timeout, value = self.cache[key]
+        except KeyError:
+            return None
+        if timeout and timeutils.utcnow_ts() >= timeout:
+            del self.cache[key]
+            return None
+        self._use(key, timeout, value)
+        return value
+
+    def set(self, key, value, time=0):
+        timeout = 0
+        if time:
+            timeout = timeutils.utcnow_ts() + time
+        self._use(key, timeout, value)
+        while len(self.cache) > self.size:
+            use, key = self.uses.popleft()
+            if key in self.cache and self.cache[key][0] == use:
+                del self.cache[key]
+        return True
+
 
 class MetadataRequestHandler(wsgi.Application):
     """Serve metadata."""
 
     def __init__(self):
-        self._cache = memorycache.get_client()
+        if CONF.memcached_servers:
+            self._cache = memorycache.get_client()
+        else:
+            self._cache = LRUCache(CONF.metadata_cache_size)
         self.conductor_api = conductor.API()
+        self._warmer = None
 
-    def get_metadata_by_remote_address(self, address):
-        if not address:
-            raise exception.FixedIpNotFoundForAddress(address=address)
-
-        cache_key = 'metadata-%s' % address
+    def _get_cached(self, cache_key, load):
+        """Return the metadata cached under cache_key, calling load() to
+        get it on a miss.  Concurrent misses for the same key wait for the
+        first one to load it rather than all going to conductor.
+        """
         data = self._cache.get(cache_key)
         if data:
             return data
 
-        try:
-            data = base.get_metadata_by_address(self.conductor_api, address)
-        except exception.NotFound:
-            return None
+        @lockutils.synchronized(cache_key, 'nova-metadata-')
+        def _load():
+            data = self._cache.get(cache_key)
+            if data:
+                return data
+            try:
+                data = load()
+            except exception.NotFound:
+                return None
+            self._cache.set(cache_key, data, CONF.metadata_cache_expiration)
+            return data
 
-        self._cache.set(cache_key, data, CACHE_EXPIRATION)
+        return _load()
 
-        return data
+    def get_metadata_by_remote_address(self, address):
+        if not address:
+            raise exception.FixedIpNotFoundForAddress(address=address)
+
+        return self._get_cached(
+            'metadata-%s' % address,
+            lambda: base.get_metadata_by_address(self.conductor_api,
+                                                 address))
 
     def get_metadata_by_instance_id(self, instance_id, address):
-        cache_key = 'metadata-%s' % instance_id
-        data = self._cache.get(cache_key)
-        if data:
+        return self._get_cached(
+            'metadata-%s' % instance_id,
+            lambda: base.get_metadata_by_instance_id(self.conductor_api,
+                                                     instance_id, address))
+
+    def _response_key(self, cache_key, path):
+        path = posixpath.normpath("/" + path.lstrip("/"))
+        # Hashed as memcached keys may not contain spaces.
+        return '%s-%s' % (cache_key, hashlib.md5(path).hexdigest())
+
+    def _render(self, cache_key, meta_data, path):
+        """Render the response to a path, caching it unless it is made by a
+        handler of its own.
+        """
+        data = meta_data.lookup(path)
+        if callable(data):
             return data
 
+        response = base.ec2_md_print(data)
+        self._cache.set(self._response_key(cache_key, path), response,
+                        CONF.metadata_cache_expiration)
+        return response
+
+    def _start_cache_warmer(self):
+        # Started on the first request, so that each worker has its own
+        # connection.  The workers share a queue to split the
+        # notifications between them.  Left unset until consuming, so a
+        # failure is tried again on the next request.
+        warmer = rpc.create_connection(new=True)
+        warmer.join_consumer_pool(
+            self._warm_cache, 'nova-metadata-cache',
+            '%s.info' % CONF.notification_topics[0],
+            CONF.control_exchange)
+        warmer.consume_in_thread()
+        self._warmer = warmer
+
+    def _warm_cache(self, message):
+        """Cache the metadata and the first responses asked for by a new
+        instance.
+        """
+        if message.get('event_type') != 'compute.instance.create.end':
+            return
+        payload = message.get('payload', {})
+        instance_id = payload.get('instance_id')
+
         try:
-            data = base.get_metadata_by_instance_id(self.conductor_api,
-                                                    instance_id, address)
+            meta_data = base.get_metadata_by_instance_id(self.conductor_api,
+                                                         instance_id, None)
         except exception.NotFound:
-            return None
-
-        self._cache.set(cache_key, data, CACHE_EXPIRATION)
-
-        return data
+            return
+
+        # Metadata is cached under the key requests look it up by, and
+        # with the address of the instance, which local-ipv4 reports.
+        # With the quantum proxy that is the instance id, which is only
+        # warmed when the instance has a single fixed ip to tell.
+        addresses = [fixed_ip['address']
+                     for fixed_ip in payload.get('fixed_ips', [])]
+        if not CONF.service_quantum_metadata_proxy:
+            cache_keys = [('metadata-%s' % address, address)
+                          for address in addresses]
+        elif len(addresses) == 1:
+            cache_keys = [('metadata-%s' % instance_id, addresses[0])]
+        else:
+            cache_keys = []
+
+        for cache_key, address in cache_keys:
+            data = copy.copy(meta_data)
+            data.address = address
+            self._cache.set(cache_key, data, CONF.metadata_cache_expiration)
+            for path in WARM_PATHS:
+                try:
+                    self._render(cache_key, data, path)
+                except base.InvalidMetadataPath:
+                    pass
 
     @webob.dec.wsgify(RequestClass=wsgi.Request)
     def __call__(self, req):
         if os.path.normpath("/" + req.path_info) == "/":
             return(base.ec2_md_print(base.VERSIONS + ["latest"]))
 
+        if CONF.metadata_cache_warm and self._warmer is None:
+            self._start_cache_warmer()
+
         if CONF.service_quantum_metadata_proxy:
-            meta_data = self._handle_instance_id_request(req)
+            instance_id, remote_address = self._get_instance_id(req)
+            cache_key = 'metadata-%s' % instance_id
+
+            def load():
+                return self._handle_instance_id_request(instance_id,
+                                                        remote_address)
         else:
             if req.headers.get('X-Instance-ID'):
                 LOG.warn(
                     _("X-Instance-ID present in request headers. The "
                       "'service_quantum_metadata_proxy' option must be enabled"
                       " to process this header."))
-            meta_data = self._handle_remote_ip_request(req)
+            remote_address = self._get_remote_address(req)
+            cache_key = 'metadata-%s' % remote_address
+
+            def load():
+                return self._handle_remote_ip_request(remote_address)
+
+        response = self._cache.get(self._response_key(cache_key,
+                                                      req.path_info))
+        if response is not None:
+            return response
 
+        meta_data = load()
         if meta_data is None:
             raise webob.exc.HTTPNotFound()
 
         try:
-            data = meta_data.lookup(req.path_info)
+            data = self._render(cache_key, meta_data, req.path_info)
         except base.InvalidMetadataPath:
             raise webob.exc.HTTPNotFound()
 
         if callable(data):
             return data(req, meta_data)
 
-        return base.ec2_md_print(data)
+        return data
 
-    def _handle_remote_ip_request(self, req):
+    def _get_remote_address(self, req):
         remote_address = req.remote_addr
         if CONF.use_forwarded_for:
             remote_address = req.headers.get('X-Forwarded-For', remote_address)
+        return remote_address
 
+    def _handle_remote_ip_request(self, remote_address):
         try:
             meta_data = self.get_metadata_by_remote_address(remote_address)
         except Exception:
@@ -142,7 +323,7 @@ class MetadataRequestHandler(wsgi.Application):
 
         return meta_data
 
-    def _handle_instance_id_request(self, req):
+    def _get_instance_id(self, req):
         instance_id = req.headers.get('X-Instance-ID')
         signature = req.headers.get('X-Instance-ID-Signature')
         remote_address = req.headers.get('X-Forwarded-For')
@@ -174,6 +355,9 @@ class MetadataRequestHandler(wsgi.Application):
             msg = _('Invalid proxy request signature.')
             raise webob.exc.HTTPForbidden(explanation=msg)
 
+        return instance_id, remote_address
+
+    def _handle_instance_id_request(self, instance_id, remote_address):
         try:
             meta_data = self.get_metadata_by_instance_id(instance_id,
                                                          remote_address)
@@ -20,6 +20,7 @@ import webob.exc
 from nova.api.openstack import extensions
 from nova.api.openstack import wsgi
 from nova.api.openstack import xmlutil
+from nova.conductor import rpcapi as conductor_rpcapi
 from nova import db
 from nova import exception
 from nova.openstack.common import log as logging
@@ -67,6 +68,9 @@ class AgentController(object):
     http://wiki.openstack.org/GuestAgent
     http://wiki.openstack.org/GuestAgentXenStoreCommunication
     """
+    def __init__(self):
+        self.conductor_rpcapi = conductor_rpcapi.ConductorAPI()
+
     @wsgi.serializers(xml=AgentsIndexTemplate)
     def index(self, req):
         """
@@ -110,6 +114,7 @@ class AgentController(object):
                                  'md5hash': md5hash})
         except exception.AgentBuildNotFound as ex:
             raise webob.exc.HTTPNotFound(explanation=ex.format_message())
+        self.conductor_rpcapi.cache_invalidate(context, 'agent_builds')
 
         return {"agent": {'agent_id': id, 'version': version,
                 'url': url, 'md5hash': md5hash}}
@@ -123,6 +128,7 @@ class AgentController(object):
             db.agent_build_destroy(context, id)
         except exception.AgentBuildNotFound as ex:
             raise webob.exc.HTTPNotFound(explanation=ex.format_message())
+        self.conductor_rpcapi.cache_invalidate(context, 'agent_builds')
 
     def create(self, req, body):
         """Creates a new agent build."""
@@ -151,6 +157,7 @@ class AgentController(object):
             agent['agent_id'] = agent_build_ref.id
         except Exception as ex:
             raise webob.exc.HTTPServerError(str(ex))
+        self.conductor_rpcapi.cache_invalidate(context, 'agent_builds')
         return {'agent': agent}
 
 
@@ -22,6 +22,7 @@ from webob import exc
 from nova.api.openstack import extensions
 from nova.api.openstack import wsgi
 from nova.api.openstack import xmlutil
+from nova.conductor import rpcapi as conductor_rpcapi
 from nova import db
 from nova import exception
 
@@ -46,6 +47,13 @@ class ExtraSpecTemplate(xmlutil.TemplateBuilder):
 class FlavorExtraSpecsController(object):
     """The flavor extra specs API controller for the OpenStack API."""
 
+    def __init__(self):
+        self.conductor_rpcapi = conductor_rpcapi.ConductorAPI()
+
+    def _invalidate_cache(self, context):
+        # Cached by the id of the flavor, not the flavorid given here.
+        self.conductor_rpcapi.cache_invalidate(context, 'instance_types')
+
     def _get_extra_specs(self, context, flavor_id):
         extra_specs = db.instance_type_extra_specs_get(context, flavor_id)
         specs_dict = {}
@@ -77,6 +85,7 @@ class FlavorExtraSpecsController(object):
                                                               specs)
         except exception.MetadataLimitExceeded as error:
             raise exc.HTTPBadRequest(explanation=error.format_message())
+        self._invalidate_cache(context)
         return body
 
     @wsgi.serializers(xml=ExtraSpecTemplate)
@@ -96,6 +105,7 @@ class FlavorExtraSpecsController(object):
                                                                body)
         except exception.MetadataLimitExceeded as error:
             raise exc.HTTPBadRequest(explanation=error.format_message())
+        self._invalidate_cache(context)
         return body
 
     @wsgi.serializers(xml=ExtraSpecTemplate)
@@ -114,6 +124,7 @@ class FlavorExtraSpecsController(object):
         context = req.environ['nova.context']
         authorize(context, action='delete')
         db.instance_type_extra_specs_delete(context, flavor_id, id)
+        self._invalidate_cache(context)
 
 
 class Flavorextraspecs(extensions.ExtensionDescriptor):
@@ -19,6 +19,7 @@ from nova.api.openstack.compute.views import flavors as flavors_view
 from nova.api.openstack import extensions
 from nova.api.openstack import wsgi
 from nova.compute import instance_types
+from nova.conductor import rpcapi as conductor_rpcapi
 from nova import exception
 from nova.openstack.common import log as logging
 
@@ -35,6 +36,7 @@ class FlavorManageController(wsgi.Controller):
 
     def __init__(self):
         super(FlavorManageController, self).__init__()
+        self.conductor_rpcapi = conductor_rpcapi.ConductorAPI()
 
     @wsgi.action("delete")
     def _delete(self, req, id):
@@ -48,6 +50,8 @@ class FlavorManageController(wsgi.Controller):
             raise webob.exc.HTTPNotFound(explanation=e.format_message())
 
         instance_types.destroy(flavor['name'])
+        self.conductor_rpcapi.cache_invalidate(context, 'instance_types',
+                                               [flavor['id']])
 
         return webob.Response(status_int=202)
 
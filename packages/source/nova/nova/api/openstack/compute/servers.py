@@ -43,6 +43,17 @@ server_opts = [
                 default=True,
                 help='Allows use of instance password during '
                      'server creation'),
+    cfg.BoolOpt('osapi_compute_lightweight_list',
+                default=False,
+                help='When listing servers, only load the instance columns '
+                     'used by the server views and extensions, and load '
+                     'info caches and security groups in batched queries '
+                     'instead of joining them to the instance query'),
+    cfg.IntOpt('osapi_compute_list_stream_threshold',
+               default=1000,
+               help='Number of servers from which server lists are '
+                    'serialized while they are sent, with chunked transfer '
+                    'encoding, rather than as a whole. 0 means never'),
 ]
 CONF = cfg.CONF
 CONF.register_opts(server_opts)
@@ -51,6 +62,19 @@ CONF.import_opt('reclaim_instance_interval', 'nova.compute.manager')
 
 LOG = logging.getLogger(__name__)
 
+# Instance columns read when building server lists, by the views and by
+# the extensions extending them.  Large or unused columns such as
+# user_data are left out.
+SERVER_LIST_COLUMNS = [
+    'id', 'uuid', 'display_name', 'hostname', 'user_id', 'project_id',
+    'image_ref', 'instance_type_id', 'memory_mb', 'vcpus', 'root_gb',
+    'ephemeral_gb', 'host', 'node', 'availability_zone', 'cell_name',
+    'vm_state', 'task_state', 'power_state', 'progress', 'key_name',
+    'config_drive', 'auto_disk_config', 'access_ip_v4', 'access_ip_v6',
+    'created_at', 'updated_at', 'deleted_at', 'deleted', 'launched_at',
+    'terminated_at',
+]
+
 
 def make_fault(elem):
     fault = xmlutil.SubTemplateElement(elem, 'fault', selector='fault')
@@ -545,11 +569,15 @@ class Controller(wsgi.Controller):
                 search_opts['user_id'] = context.user_id
 
         limit, marker = common.get_limit_and_marker(req)
+        kwargs = {}
+        if CONF.osapi_compute_lightweight_list:
+            kwargs['columns'] = SERVER_LIST_COLUMNS
         try:
             instance_list = self.compute_api.get_all(context,
                                                      search_opts=search_opts,
                                                      limit=limit,
-                                                     marker=marker)
+                                                     marker=marker,
+                                                     **kwargs)
         except exception.MarkerNotFound as e:
             msg = _('marker [%s] not found') % marker
             raise exc.HTTPBadRequest(explanation=msg)
@@ -564,6 +592,9 @@ class Controller(wsgi.Controller):
         else:
             response = self._view_builder.index(req, instance_list)
         req.cache_db_instances(instance_list)
+        threshold = CONF.osapi_compute_list_stream_threshold
+        if threshold and len(instance_list) >= threshold:
+            response = wsgi.ResponseObject(response, stream_key='servers')
         return response
 
     def _get_server(self, context, req, instance_uuid):
@@ -321,6 +321,31 @@ class JSONDictSerializer(DictSerializer):
     def default(self, data):
         return jsonutils.dumps(data)
 
+    def serialize_chunks(self, data, key, chunk_size=100):
+        """Serialize data incrementally.
+
+        Returns a generator of strings which together are what
+        serialize() returns for data, a dictionary.  The list under key
+        is serialized chunk_size items at a time, so the JSON of the
+        whole list never exists at once.
+        """
+
+        yield '{'
+        for index, (name, value) in enumerate(data.iteritems()):
+            separator = ', ' if index else ''
+            if name != key:
+                yield '%s%s: %s' % (separator, jsonutils.dumps(name),
+                                    jsonutils.dumps(value))
+                continue
+
+            yield '%s%s: [' % (separator, jsonutils.dumps(name))
+            for start in xrange(0, len(value), chunk_size):
+                chunk = ', '.join(jsonutils.dumps(item) for item in
+                                  value[start:start + chunk_size])
+                yield ', ' + chunk if start else chunk
+            yield ']'
+        yield '}'
+
 
 class XMLDictSerializer(DictSerializer):
 
@@ -482,16 +507,22 @@ class ResponseObject(object):
     optional.
     """
 
-    def __init__(self, obj, code=None, headers=None, **serializers):
+    def __init__(self, obj, code=None, headers=None, stream_key=None,
+                 **serializers):
         """Binds serializers with an object.
 
         Takes keyword arguments akin to the @serializer() decorator
         for specifying serializers.  Serializers specified will be
         given preference over default serializers or method-specific
         serializers on return.
+
+        If stream_key is given, the list under that key in the object
+        is serialized incrementally while the response is sent, with
+        chunked transfer encoding, by serializers which can do it.
         """
 
         self.obj = obj
+        self.stream_key = stream_key
         self.serializers = serializers
         self._default_code = 200
         self._code = code
@@ -591,7 +622,12 @@ class ResponseObject(object):
             response.headers[hdr] = str(value)
         response.headers['Content-Type'] = content_type
         if self.obj is not None:
-            response.body = serializer.serialize(self.obj)
+            if (self.stream_key is not None and
+                hasattr(serializer, 'serialize_chunks')):
+                response.app_iter = serializer.serialize_chunks(
+                        self.obj, self.stream_key)
+            else:
+                response.body = serializer.serialize(self.obj)
 
         return response
 
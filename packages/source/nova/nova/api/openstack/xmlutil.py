@@ -597,6 +597,58 @@ class Template(object):
         # Serialize it into XML
         return etree.tostring(elem, *args, **kwargs)
 
+    def serialize_chunks(self, obj, key, chunk_size=100):
+        """Serialize an object incrementally.
+
+        Returns a generator of strings which together are what
+        serialize() returns for the object.  The list of items under
+        key in the object is rendered and serialized chunk_size items at
+        a time, so the tree of the whole list never exists at once.  The
+        elements rendered for the items must come first among the
+        children of the root element, as they do in the templates of
+        list responses.
+
+        :param obj: The object to serialize.
+        :param key: The key of the list to serialize incrementally.
+        :param chunk_size: The number of items serialized at a time.
+        """
+
+        items = obj.get(key)
+        if self.root is None or not items:
+            yield self.serialize(obj)
+            return
+
+        options = self.serialize_options.copy()
+        if options.pop('xml_declaration', False):
+            # Whatever comes before the root element of a document
+            document = etree.tostring(etree.Element('root'),
+                                      xml_declaration=True, **options)
+            yield document[:document.index('<root')]
+
+        def split(obj):
+            document = etree.tostring(self.make_tree(obj), **options)
+            if document.endswith('/>') and '</' not in document:
+                # The root element has no children
+                return document[:-2] + '>', '', None
+            start = document.index('>') + 1
+            end = document.rindex('</')
+            return document[:start], document[start:end], document[end:]
+
+        # The start and end tags of the root element, which can depend
+        # on anything in the object
+        rest = dict(obj)
+        rest[key] = items[:1]
+        start_tag, _children, end_tag = split(rest)
+        yield start_tag
+
+        for start in xrange(0, len(items), chunk_size):
+            yield split({key: items[start:start + chunk_size]})[1]
+
+        # Then the children rendered for the rest of the object
+        rest[key] = []
+        yield split(rest)[1]
+        yield end_tag
+
     def make_tree(self, obj):
         """Create a tree.
 
@@ -22,8 +22,10 @@ reached.
 
 The interface into this module is the MessageRunner class.
 """
+import itertools
 import sys
 
+from eventlet import greenthread
 from eventlet import queue
 from oslo.config import cfg
 
@@ -52,7 +54,20 @@ cell_messaging_opts = [
             help='Maximum number of hops for cells routing.'),
     cfg.StrOpt('scheduler',
             default='nova.cells.scheduler.CellsScheduler',
-            help='Cells scheduler to use')]
+            help='Cells scheduler to use'),
+    cfg.IntOpt('instance_update_batch_interval',
+            default=0,
+            help='Seconds to collect instance updates and destroys for the '
+                 'top level cells before sending them up in one message, '
+                 'with the updates of each instance merged.  0 sends each '
+                 'one right away.'),
+    cfg.IntOpt('parent_update_delay',
+            default=0,
+            help='Seconds to wait after a child cell reported its '
+                 'capabilities or capacities before passing ours on to '
+                 'the parent cells, so that the reports of the children '
+                 'arriving meanwhile are passed on together.  0 passes '
+                 'each one on right away.')]
 
 CONF = cfg.CONF
 CONF.import_opt('name', 'nova.cells.opts', group='cells')
@@ -676,7 +691,7 @@ class _TargetedMessageMethods(_BaseMessageMethods):
         self.state_manager.update_cell_capabilities(cell_name,
                 capabilities)
         # Go ahead and update our parents now that a child updated us
-        self.msg_runner.tell_parents_our_capabilities(message.ctxt)
+        self.msg_runner.update_parents(message.ctxt, 'capabilities')
 
     def update_capacities(self, message, cell_name, capacities):
         """A child cell told us about their capacity."""
@@ -685,7 +700,7 @@ class _TargetedMessageMethods(_BaseMessageMethods):
         self.state_manager.update_cell_capacities(cell_name,
                 capacities)
         # Go ahead and update our parents now that a child updated us
-        self.msg_runner.tell_parents_our_capacities(message.ctxt)
+        self.msg_runner.update_parents(message.ctxt, 'capacities')
 
     def announce_capabilities(self, message):
         """A parent cell has told us to send our capabilities, so let's
@@ -828,6 +843,26 @@ class _BroadcastMessageMethods(_BaseMessageMethods):
         except exception.InstanceNotFound:
             pass
 
+    def instance_updates_at_top(self, message, updates, **kwargs):
+        """Apply a batch of instance updates and destroys, as a list of
+        (method_name, instance) pairs, if we're a top level cell.
+        """
+        if not self._at_the_top():
+            return
+        for method_name, instance in updates:
+            if method_name not in ('instance_update_at_top',
+                                   'instance_destroy_at_top'):
+                LOG.error(_("Unknown method '%(method_name)s' in instance "
+                            "updates"), locals())
+                continue
+            try:
+                getattr(self, method_name)(message, instance)
+            except Exception:
+                LOG.exception(_("Error applying %(method_name)s for "
+                                "instance %(uuid)s"),
+                              {'method_name': method_name,
+                               'uuid': instance.get('uuid')})
+
     def instance_delete_everywhere(self, message, instance, delete_type,
                                    **kwargs):
         """Call compute API delete() or soft_delete() in every cell.
@@ -960,6 +995,14 @@ class MessageRunner(object):
         self.our_name = CONF.cells.name
         for msg_type, cls in _CELL_MESSAGE_TYPE_TO_METHODS_CLS.iteritems():
             self.methods_by_type[msg_type] = cls(self)
+        # Instance updates and destroys waiting to be sent to the top,
+        # { instance uuid: (queued order, method name, instance) }, and
+        # parent updates waiting to be sent.
+        self.pending_instance_updates = {}
+        self.instance_update_counter = itertools.count()
+        self.instance_updates_timer = None
+        self.pending_parent_updates = set()
+        self.parent_updates_timer = None
 
     def _process_message_locally(self, message):
         """Message processing will call this when its determined that
@@ -1047,6 +1090,27 @@ class MessageRunner(object):
                                         dict(), 'down', child_cell)
             message.process()
 
+    def update_parents(self, ctxt, what):
+        """Send our 'capabilities' or 'capacities' to parent cells, after
+        waiting parent_update_delay for the other child cells' reports.
+        """
+        if CONF.cells.parent_update_delay <= 0:
+            getattr(self, 'tell_parents_our_%s' % what)(ctxt)
+            return
+        self.pending_parent_updates.add(what)
+        if self.parent_updates_timer is None:
+            self.parent_updates_timer = greenthread.spawn_after(
+                    CONF.cells.parent_update_delay,
+                    self._send_parent_updates, ctxt)
+
+    def _send_parent_updates(self, ctxt):
+        """Send the parent updates waiting since update_parents()."""
+        self.parent_updates_timer = None
+        pending = self.pending_parent_updates
+        self.pending_parent_updates = set()
+        for what in sorted(pending):
+            getattr(self, 'tell_parents_our_%s' % what)(ctxt)
+
     def tell_parents_our_capabilities(self, ctxt):
         """Send our capabilities to parent cells."""
         parent_cells = self.state_manager.get_parent_cells()
@@ -1102,6 +1166,9 @@ class MessageRunner(object):
 
     def instance_update_at_top(self, ctxt, instance):
         """Update an instance at the top level cell."""
+        if CONF.cells.instance_update_batch_interval > 0:
+            self._queue_instance_update('instance_update_at_top', instance)
+            return
         message = _BroadcastMessage(self, ctxt, 'instance_update_at_top',
                                     dict(instance=instance), 'up',
                                     run_locally=False)
@@ -1109,11 +1176,49 @@ class MessageRunner(object):
 
     def instance_destroy_at_top(self, ctxt, instance):
         """Destroy an instance at the top level cell."""
+        if CONF.cells.instance_update_batch_interval > 0:
+            self._queue_instance_update('instance_destroy_at_top', instance)
+            return
         message = _BroadcastMessage(self, ctxt, 'instance_destroy_at_top',
                                     dict(instance=instance), 'up',
                                     run_locally=False)
         message.process()
 
+    def _queue_instance_update(self, method_name, instance):
+        """Queue an instance update or destroy for the next batch sent
+        to the top level cells.  Updates of the same instance are merged
+        and a destroy replaces them.
+        """
+        instance_uuid = instance['uuid']
+        pending = self.pending_instance_updates.pop(instance_uuid, None)
+        if (pending is not None and pending[1] == method_name and
+                method_name == 'instance_update_at_top'):
+            merged = dict(pending[2])
+            merged.update(instance)
+            instance = merged
+        self.pending_instance_updates[instance_uuid] = (
+                self.instance_update_counter.next(), method_name, instance)
+        if self.instance_updates_timer is None:
+            self.instance_updates_timer = greenthread.spawn_after(
+                    CONF.cells.instance_update_batch_interval,
+                    self.send_instance_updates)
+
+    def send_instance_updates(self):
+        """Send the queued instance updates and destroys to the top level
+        cells in one message.
+        """
+        self.instance_updates_timer = None
+        updates = [(method_name, instance) for _order, method_name, instance
+                   in sorted(self.pending_instance_updates.values())]
+        self.pending_instance_updates = {}
+        if not updates:
+            return
+        ctxt = context.get_admin_context()
+        message = _BroadcastMessage(self, ctxt, 'instance_updates_at_top',
+                                    dict(updates=updates), 'up',
+                                    run_locally=False)
+        message.process()
+
     def instance_delete_everywhere(self, ctxt, instance, delete_type):
         """This is used by API cell when it didn't know what cell
         an instance was in, but the instance was requested to be
@@ -86,6 +86,54 @@ class CellsScheduler(base.Base):
             cells.add(our_cell)
         return cells
 
+    def _units_free(self, cell, instance_type):
+        """Return how many instances of instance_type fit in a cell going
+        by the capacities it last reported, or None if they don't tell.
+        """
+        capacities = cell.capacities
+        ram_units = capacities.get('ram_free', {}).get('units_by_mb', {})
+        disk_units = capacities.get('disk_free', {}).get('units_by_mb', {})
+        memory_mb = str(instance_type['memory_mb'])
+        disk_mb = str((instance_type['root_gb'] +
+                       instance_type['ephemeral_gb']) * 1024)
+        if memory_mb not in ram_units or disk_mb not in disk_units:
+            return None
+        return min(ram_units[memory_mb], disk_units[disk_mb])
+
+    def _select_cell(self, cells, request_spec):
+        """Pick a cell, using the capacity summaries pushed up by the
+        cells instead of aggregating their hosts per request.
+
+        Cells with room for all of the instances are chosen with a
+        probability proportional to the room they have.  Cells which
+        haven't reported room for this instance type are tried next and
+        if every cell is full, any one of them is chosen.
+        """
+        random.shuffle(cells)
+        instance_type = request_spec.get('instance_type')
+        if not instance_type:
+            return cells[0]
+        num_instances = len(request_spec['instance_uuids'])
+        with_room = []
+        unknown = []
+        for cell in cells:
+            units = self._units_free(cell, instance_type)
+            if units is None:
+                unknown.append(cell)
+            elif units >= num_instances:
+                with_room.append((units, cell))
+        if with_room:
+            chosen = random.uniform(0, sum(units for units, cell
+                                           in with_room))
+            for units, cell in with_room:
+                chosen -= units
+                if chosen <= 0:
+                    return cell
+            return with_room[-1][1]
+        if unknown:
+            return unknown[0]
+        return cells[0]
+
     def _run_instance(self, message, host_sched_kwargs):
         """Attempt to schedule instance(s).  If we have no cells
         to try, raise exception.NoCellsAvailable
@@ -97,11 +145,7 @@ class CellsScheduler(base.Base):
         cells = self._get_possible_cells()
         if not cells:
             raise exception.NoCellsAvailable()
-        cells = list(cells)
-
-        # Random selection for now
-        random.shuffle(cells)
-        target_cell = cells[0]
+        target_cell = self._select_cell(list(cells), request_spec)
 
         LOG.debug(_("Scheduling with routing_path=%(routing_path)s"),
                 locals())
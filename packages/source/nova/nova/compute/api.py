@@ -50,6 +50,7 @@ from nova.network.security_group import openstack_driver
 from nova.network.security_group import security_group_base
 from nova import notifications
 from nova.openstack.common import excutils
+from nova.openstack.common import importutils
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import timeutils
@@ -103,6 +104,14 @@ QUOTAS = quota.QUOTAS
 RO_SECURITY_GROUPS = ['default']
 
 
+def _conductor_rpcapi():
+    """Return the conductor RPC API, used to tell the conductors to drop
+    the lookups they cached.  Imported when needed since nova.conductor
+    imports this module.
+    """
+    return importutils.import_module('nova.conductor.rpcapi').ConductorAPI()
+
+
 def check_instance_state(vm_state=None, task_state=(None,)):
     """Decorator to check VM and/or task state before entry to API functions.
 
@@ -436,7 +445,7 @@ class API(base.Base):
         options_from_image['auto_disk_config'] = auto_disk_config
         return options_from_image
 
-    def _apply_instance_name_template(self, context, instance, index):
+    def _instance_name_template_updates(self, instance, index):
         params = {
             'uuid': instance['uuid'],
             'name': instance['display_name'],
@@ -452,6 +461,10 @@ class API(base.Base):
         updates = {'display_name': new_name}
         if not instance.get('hostname'):
             updates['hostname'] = utils.sanitize_hostname(new_name)
+        return updates
+
+    def _apply_instance_name_template(self, context, instance, index):
+        updates = self._instance_name_template_updates(instance, index)
         instance = self.db.instance_update(context,
                 instance['uuid'], updates)
         return instance
@@ -607,12 +620,22 @@ class API(base.Base):
                 check_policy(context, 'create:forced_host', {})
                 filter_properties['force_hosts'] = [forced_host]
 
-            for i in xrange(num_instances):
+            if num_instances > 1:
+                instances = self._create_db_entries_for_new_instances(
+                        context, instance_type, image, base_options,
+                        security_groups, block_device_mapping,
+                        num_instances)
+                instance_uuids = [instance['uuid'] for instance in instances]
+                # send state update notifications for the initial create to
+                # show them going from non-existent to BUILDING
+                notifications.send_updates_with_states(context, instances,
+                        None, vm_states.BUILDING, None, None, service="api")
+            else:
                 options = base_options.copy()
                 instance = self.create_db_entry_for_new_instance(
                         context, instance_type, image, options,
                         security_groups, block_device_mapping,
-                        num_instances, i)
+                        num_instances, 0)
 
                 instances.append(instance)
                 instance_uuids.append(instance['uuid'])
@@ -706,12 +729,12 @@ class API(base.Base):
 
         return size
 
-    def _update_image_block_device_mapping(self, elevated_context,
-                                           instance_type, instance_uuid,
-                                           mappings):
-        """tell vm driver to create ephemeral/swap device at boot time by
-        updating BlockDeviceMapping
+    def _image_block_device_mapping_values(self, instance_type, mappings,
+                                           instance_uuid=None):
+        """Build the BlockDeviceMapping values which tell the vm driver to
+        create ephemeral/swap devices at boot time for image mappings.
         """
+        values_list = []
         for bdm in block_device.mappings_prepend_dev(mappings):
             LOG.debug(_("bdm %s"), bdm, instance_uuid=instance_uuid)
 
@@ -726,26 +749,37 @@ class API(base.Base):
             if size == 0:
                 continue
 
-            values = {
-                'instance_uuid': instance_uuid,
+            values_list.append({
                 'device_name': bdm['device'],
                 'virtual_name': virtual_name,
-                'volume_size': size}
+                'volume_size': size})
+        return values_list
+
+    def _update_image_block_device_mapping(self, elevated_context,
+                                           instance_type, instance_uuid,
+                                           mappings):
+        """tell vm driver to create ephemeral/swap device at boot time by
+        updating BlockDeviceMapping
+        """
+        for values in self._image_block_device_mapping_values(
+                instance_type, mappings, instance_uuid):
+            values['instance_uuid'] = instance_uuid
             self.db.block_device_mapping_update_or_create(elevated_context,
                                                           values)
 
-    def _update_block_device_mapping(self, elevated_context,
-                                     instance_type, instance_uuid,
-                                     block_device_mapping):
-        """tell vm driver to attach volume at boot time by updating
-        BlockDeviceMapping
+    def _block_device_mapping_values(self, instance_type,
+                                     block_device_mapping,
+                                     instance_uuid=None):
+        """Build the BlockDeviceMapping values which tell the vm driver to
+        attach volumes at boot time.
         """
         LOG.debug(_("block_device_mapping %s"), block_device_mapping,
                   instance_uuid=instance_uuid)
+        values_list = []
         for bdm in block_device_mapping:
             assert 'device_name' in bdm
 
-            values = {'instance_uuid': instance_uuid}
+            values = {}
             for key in ('device_name', 'delete_on_termination', 'virtual_name',
                         'snapshot_id', 'volume_id', 'volume_size',
                         'no_device'):
@@ -768,12 +802,64 @@ class API(base.Base):
                           'snapshot_id', 'volume_id', 'volume_size'):
                     values[k] = None
 
+            values_list.append(values)
+        return values_list
+
+    def _update_block_device_mapping(self, elevated_context,
+                                     instance_type, instance_uuid,
+                                     block_device_mapping):
+        """tell vm driver to attach volume at boot time by updating
+        BlockDeviceMapping
+        """
+        for values in self._block_device_mapping_values(
+                instance_type, block_device_mapping, instance_uuid):
+            values['instance_uuid'] = instance_uuid
             self.db.block_device_mapping_update_or_create(elevated_context,
                                                           values)
 
+    def _block_device_mapping_values_for_create(self, instance_type, image,
+                                                block_device_mapping):
+        """Build the BlockDeviceMapping values _populate_instance_for_bdm
+        leaves in the database for a new instance, without instance_uuid.
+        """
+        image_properties = image.get('properties', {})
+        values_list = self._image_block_device_mapping_values(instance_type,
+                image_properties.get('mappings', []))
+        image_bdm = image_properties.get('block_device_mapping', [])
+        for mapping in (image_bdm, block_device_mapping):
+            if not mapping:
+                continue
+            values_list.extend(self._block_device_mapping_values(
+                    instance_type, mapping))
+
+        # NOTE: Merged like block_device_mapping_update_or_create does: a
+        # device mapped again is updated, and a swap or ephemeral device
+        # replaces the others with the same virtual name.
+        result = []
+        for values in values_list:
+            for existing in result:
+                if existing['device_name'] == values['device_name']:
+                    existing.update(values)
+                    break
+            else:
+                existing = values.copy()
+                result.append(existing)
+
+            virtual_name = values['virtual_name']
+            if (virtual_name is not None and
+                block_device.is_swap_or_ephemeral(virtual_name)):
+                result = [other for other in result
+                          if other is existing or
+                          other['virtual_name'] != virtual_name]
+        return result
+
     def _validate_bdm(self, context, instance):
-        for bdm in self.db.block_device_mapping_get_all_by_instance(
-                context, instance['uuid']):
+        self._validate_bdm_values(context,
+                self.db.block_device_mapping_get_all_by_instance(
+                        context, instance['uuid']))
+
+    def _validate_bdm_values(self, context, bdms):
+        for bdm in bdms:
             # NOTE(vish): For now, just make sure the volumes are accessible.
             snapshot_id = bdm.get('snapshot_id')
             volume_id = bdm.get('volume_id')
@@ -911,6 +997,34 @@ class API(base.Base):
 
         return instance
 
+    def _create_db_entries_for_new_instances(self, context, instance_type,
+            image, base_options, security_group, block_device_mapping,
+            num_instances):
+        """Create the entries in the DB for a number of new instances, like
+        create_db_entry_for_new_instance does for each of them, but with
+        one bulk insert in one transaction.
+        """
+        bdms = self._block_device_mapping_values_for_create(instance_type,
+                image, block_device_mapping)
+        self._validate_bdm_values(context, bdms)
+
+        instances = []
+        for i in xrange(num_instances):
+            instance = self._populate_instance_for_create(
+                    base_options.copy(), image, security_group)
+            self._populate_instance_names(instance, num_instances)
+            self._populate_instance_shutdown_terminate(instance, image,
+                                                       block_device_mapping)
+            instance.update(self._instance_name_template_updates(instance,
+                                                                 i))
+            instances.append(instance)
+
+        # ensure_default security group is called before the instances
+        # are created so the creation of the default security group is
+        # proxied to the sgh.
+        self.security_group_api.ensure_default(context)
+        return self.db.instance_create_bulk(context, instances, bdms)
+
     def _check_create_policies(self, context, availability_zone,
             requested_networks, block_device_mapping):
         """Check policies for create()."""
@@ -1341,7 +1455,7 @@ class API(base.Base):
         return inst
 
     def get_all(self, context, search_opts=None, sort_key='created_at',
-                sort_dir='desc', limit=None, marker=None):
+                sort_dir='desc', limit=None, marker=None, columns=None):
         """Get all instances filtered by one of the given parameters.
 
         If there is no filter and the context is an admin, it will retrieve
@@ -1353,6 +1467,8 @@ class API(base.Base):
         The results will be returned sorted in the order specified by the
         'sort_dir' parameter using the key specified in the 'sort_key'
         parameter.
+
+        If 'columns' is given, only those instance columns are loaded.
         """
 
         #TODO(bcwaldon): determine the best argument for target here
@@ -1420,7 +1536,8 @@ class API(base.Base):
         inst_models = self._get_instances_by_filters(context, filters,
                                                      sort_key, sort_dir,
                                                      limit=limit,
-                                                     marker=marker)
+                                                     marker=marker,
+                                                     columns=columns)
 
         # Convert the models to dictionaries
         instances = []
@@ -1435,7 +1552,8 @@ class API(base.Base):
     def _get_instances_by_filters(self, context, filters,
                                   sort_key, sort_dir,
                                   limit=None,
-                                  marker=None):
+                                  marker=None,
+                                  columns=None):
         if 'ip6' in filters or 'ip' in filters:
             res = self.network_api.get_instance_uuids_by_ip_filter(context,
                                                                    filters)
@@ -1444,9 +1562,13 @@ class API(base.Base):
             uuids = set([r['instance_uuid'] for r in res])
             filters['uuid'] = uuids
 
+        kwargs = {}
+        if columns is not None:
+            kwargs['columns'] = columns
         return self.db.instance_get_all_by_filters(context, filters,
                                                    sort_key, sort_dir,
-                                                   limit=limit, marker=marker)
+                                                   limit=limit, marker=marker,
+                                                   **kwargs)
 
     @wrap_check_policy
     @check_instance_state(vm_state=[vm_states.ACTIVE, vm_states.STOPPED])
@@ -2609,6 +2731,8 @@ class AggregateAPI(base.Base):
     """Sub-set of the Compute Manager API for managing host aggregates."""
     def __init__(self, **kwargs):
         self.compute_rpcapi = compute_rpcapi.ComputeAPI()
+        self.scheduler_rpcapi = scheduler_rpcapi.SchedulerAPI()
+        self.conductor_rpcapi = _conductor_rpcapi()
         super(AggregateAPI, self).__init__(**kwargs)
 
     def create_aggregate(self, context, aggregate_name, availability_zone):
@@ -2620,6 +2744,7 @@ class AggregateAPI(base.Base):
             metadata = {'availability_zone': availability_zone}
         aggregate = self.db.aggregate_create(context, values,
                 metadata=metadata)
+        self.scheduler_rpcapi.update_aggregates(context)
         aggregate = self._get_aggregate_info(context, aggregate)
         # To maintain the same API result as before.
         del aggregate['hosts']
@@ -2639,6 +2764,8 @@ class AggregateAPI(base.Base):
     def update_aggregate(self, context, aggregate_id, values):
         """Update the properties of an aggregate."""
         aggregate = self.db.aggregate_update(context, aggregate_id, values)
+        self.scheduler_rpcapi.update_aggregates(context)
+        self.conductor_rpcapi.cache_invalidate(context, 'aggregate_metadata')
         return self._get_aggregate_info(context, aggregate)
 
     def update_aggregate_metadata(self, context, aggregate_id, metadata):
@@ -2655,6 +2782,8 @@ class AggregateAPI(base.Base):
                 except exception.AggregateMetadataNotFound, e:
                     LOG.warn(e.message)
         self.db.aggregate_metadata_add(context, aggregate_id, metadata)
+        self.scheduler_rpcapi.update_aggregates(context)
+        self.conductor_rpcapi.cache_invalidate(context, 'aggregate_metadata')
         return self.get_aggregate(context, aggregate_id)
 
     def delete_aggregate(self, context, aggregate_id):
@@ -2665,6 +2794,7 @@ class AggregateAPI(base.Base):
                                                    aggregate_id=aggregate_id,
                                                    reason='not empty')
         self.db.aggregate_delete(context, aggregate_id)
+        self.scheduler_rpcapi.update_aggregates(context)
 
     def add_host_to_aggregate(self, context, aggregate_id, host_name):
         """Adds the host to an aggregate."""
@@ -2672,6 +2802,8 @@ class AggregateAPI(base.Base):
         self.db.service_get_by_compute_host(context, host_name)
         aggregate = self.db.aggregate_get(context, aggregate_id)
         self.db.aggregate_host_add(context, aggregate_id, host_name)
+        self.scheduler_rpcapi.update_aggregates(context)
+        self.conductor_rpcapi.cache_invalidate(context, 'aggregate_metadata')
         #NOTE(jogo): Send message to host to support resource pools
         self.compute_rpcapi.add_aggregate_host(context,
                 aggregate=aggregate, host_param=host_name, host=host_name)
@@ -2683,6 +2815,8 @@ class AggregateAPI(base.Base):
         self.db.service_get_by_compute_host(context, host_name)
         aggregate = self.db.aggregate_get(context, aggregate_id)
         self.db.aggregate_host_delete(context, aggregate_id, host_name)
+        self.scheduler_rpcapi.update_aggregates(context)
+        self.conductor_rpcapi.cache_invalidate(context, 'aggregate_metadata')
         self.compute_rpcapi.remove_aggregate_host(context,
                 aggregate=aggregate, host_param=host_name, host=host_name)
         return self.get_aggregate(context, aggregate_id)
@@ -2804,6 +2938,7 @@ class SecurityGroupAPI(base.Base, security_group_base.SecurityGroupBase):
     def __init__(self, **kwargs):
         super(SecurityGroupAPI, self).__init__(**kwargs)
         self.security_group_rpcapi = compute_rpcapi.SecurityGroupAPI()
+        self.conductor_rpcapi = _conductor_rpcapi()
         self.sgh = openstack_driver.get_security_group_handler()
 
     def validate_property(self, value, property, allowed):
@@ -3134,6 +3269,8 @@ class SecurityGroupAPI(base.Base, security_group_base.SecurityGroupBase):
     def trigger_rules_refresh(self, context, id):
         """Called when a rule is added to or removed from a security_group."""
 
+        self.conductor_rpcapi.cache_invalidate(context,
+                                               'security_group_rules', [id])
         security_group = self.db.security_group_get(context, id)
 
         for instance in security_group['instances']:
@@ -3164,6 +3301,13 @@ class SecurityGroupAPI(base.Base, security_group_base.SecurityGroupBase):
                                                     rule['parent_group_id'])
             security_groups.add(security_group)
 
+        # ..whose cached rules list the members..
+        if security_group_rules:
+            self.conductor_rpcapi.cache_invalidate(context,
+                    'security_group_rules',
+                    list(set(rule['parent_group_id']
+                             for rule in security_group_rules)))
+
         # ..then we find the instances that are members of these groups..
         instances = {}
         for security_group in security_groups:
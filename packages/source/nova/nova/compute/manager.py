@@ -3441,16 +3441,25 @@ class ComputeManager(manager.SchedulerDependentManager):
                 self.conductor_api.migration_update(context, migration,
                                                     'error')
 
+            instances = {}
+            if migrations:
+                # Fetch the instances of all the migrations at once
+                # instead of one round trip per migration.
+                filters = {'uuid': [migration['instance_uuid']
+                                    for migration in migrations],
+                           'deleted': False}
+                for instance in capi.instance_get_all_by_filters(context,
+                                                                 filters):
+                    instances[instance['uuid']] = instance
+
             for migration in migrations:
                 migration_id = migration['id']
                 instance_uuid = migration['instance_uuid']
                 LOG.info(_("Automatically confirming migration "
                            "%(migration_id)s for instance %(instance_uuid)s"),
                            locals())
-                try:
-                    instance = self.conductor_api.instance_get_by_uuid(
-                        context, instance_uuid)
-                except exception.InstanceNotFound:
+                instance = instances.get(instance_uuid)
+                if instance is None:
                     reason = _("Instance %(instance_uuid)s not found")
                     _set_migration_to_error(migration, reason % locals())
                     continue
@@ -3544,26 +3553,34 @@ class ComputeManager(manager.SchedulerDependentManager):
                 return
 
             refreshed = timeutils.utcnow()
+            # Read this period's and the previous period's usage of all
+            # the instances in two calls and write the new usage in one.
+            uuids = list(set(bw_ctr['uuid'] for bw_ctr in bw_counters))
+            usages = {}
+            prev_usages = {}
+            if uuids:
+                for usage in self.conductor_api.bw_usage_get_by_uuids(
+                        context, uuids, start_time):
+                    usages[(usage['uuid'], usage['mac'])] = usage
+                for usage in self.conductor_api.bw_usage_get_by_uuids(
+                        context, uuids, prev_time):
+                    prev_usages[(usage['uuid'], usage['mac'])] = usage
+
+            updates = []
             for bw_ctr in bw_counters:
-                # Allow switching of greenthreads between queries.
-                greenthread.sleep(0)
                 bw_in = 0
                 bw_out = 0
                 last_ctr_in = None
                 last_ctr_out = None
-                usage = self.conductor_api.bw_usage_get(context,
-                                                        bw_ctr['uuid'],
-                                                        start_time,
-                                                        bw_ctr['mac_address'])
+                key = (bw_ctr['uuid'], bw_ctr['mac_address'])
+                usage = usages.get(key)
                 if usage:
                     bw_in = usage['bw_in']
                     bw_out = usage['bw_out']
                     last_ctr_in = usage['last_ctr_in']
                     last_ctr_out = usage['last_ctr_out']
                 else:
-                    usage = self.conductor_api.bw_usage_get(
-                        context, bw_ctr['uuid'], prev_time,
-                        bw_ctr['mac_address'])
+                    usage = prev_usages.get(key)
                     if usage:
                         last_ctr_in = usage['last_ctr_in']
                         last_ctr_out = usage['last_ctr_out']
@@ -3582,15 +3599,17 @@ class ComputeManager(manager.SchedulerDependentManager):
                     else:
                         bw_out += (bw_ctr['bw_out'] - last_ctr_out)
 
-                self.conductor_api.bw_usage_update(context,
-                                                   bw_ctr['uuid'],
-                                                   bw_ctr['mac_address'],
-                                                   start_time,
-                                                   bw_in,
-                                                   bw_out,
-                                                   bw_ctr['bw_in'],
-                                                   bw_ctr['bw_out'],
-                                                   last_refreshed=refreshed)
+                updates.append({'uuid': bw_ctr['uuid'],
+                                'mac': bw_ctr['mac_address'],
+                                'start_period': start_time,
+                                'bw_in': bw_in,
+                                'bw_out': bw_out,
+                                'last_ctr_in': bw_ctr['bw_in'],
+                                'last_ctr_out': bw_ctr['bw_out']})
+
+            if updates:
+                self.conductor_api.bw_usage_update_many(
+                        context, updates, last_refreshed=refreshed)
 
     def _get_host_volume_bdms(self, context, host):
         """Return all block device mappings on a compute host."""
@@ -3675,6 +3694,21 @@ class ComputeManager(manager.SchedulerDependentManager):
                                else [capabilities]):
                 capability['host_ip'] = CONF.my_ip
             self.update_service_capabilities(capabilities)
+            self._update_capabilities_resource_views()
+
+    def _update_capabilities_resource_views(self):
+        """Attach each node's current resource view to the capabilities
+        that are published to the schedulers, so that schedulers caching
+        host states do not need to read the compute node from the DB.
+        """
+        for capability in self.last_capabilities or []:
+            nodename = capability.get('hypervisor_hostname')
+            rt = self._resource_tracker_dict.get(nodename)
+            if rt is None:
+                continue
+            view = rt.get_resource_view()
+            if view is not None:
+                capability['compute_node'] = view
 
     @manager.periodic_task(spacing=600.0, run_immediately=True)
     def _sync_power_states(self, context):
@@ -3683,8 +3717,9 @@ class ComputeManager(manager.SchedulerDependentManager):
         To sync power state data we make a DB call to get the number of
         virtual machines known by the hypervisor and if the number matches the
         number of virtual machines known by the database, we proceed in a lazy
-        loop, one database record at a time, checking if the hypervisor has the
-        same power state as is in the database.
+        loop, checking if the hypervisor has the same power state as is in the
+        database.  The power states that changed are saved in one batched
+        update.
         """
         db_instances = self.conductor_api.instance_get_all_by_host(context,
                                                                    self.host)
@@ -3696,6 +3731,7 @@ class ComputeManager(manager.SchedulerDependentManager):
             LOG.warn(_("Found %(num_db_instances)s in the database and "
                        "%(num_vm_instances)s on the hypervisor.") % locals())
 
+        vm_power_states = {}
         for db_instance in db_instances:
             if db_instance['task_state'] is not None:
                 LOG.info(_("During sync_power_state the instance has a "
@@ -3709,9 +3745,57 @@ class ComputeManager(manager.SchedulerDependentManager):
                 vm_power_state = power_state.NOSTATE
             # Note(maoy): the above get_info call might take a long time,
             # for example, because of a broken libvirt driver.
-            self._sync_instance_power_state(context,
-                                            db_instance,
-                                            vm_power_state)
+            vm_power_states[db_instance['uuid']] = vm_power_state
+
+        if not vm_power_states:
+            return
+
+        # We re-query the DB to get the latest instance info to minimize
+        # (not eliminate) race condition.
+        current = dict((u['uuid'], u) for u in
+                       self.conductor_api.instance_get_all_by_host(context,
+                                                                   self.host))
+        to_sync = []
+        updates = {}
+        for db_instance in db_instances:
+            vm_power_state = vm_power_states.get(db_instance['uuid'])
+            if vm_power_state is None:
+                continue
+            u = current.get(db_instance['uuid'])
+            if u is None:
+                # The instance has moved to another host or was deleted
+                # while we were talking to the hypervisor.
+                LOG.info(_("During the sync_power process the instance "
+                           "has left host %s") % self.host,
+                         instance=db_instance)
+                continue
+            if u['task_state'] is not None:
+                LOG.info(_("During sync_power_state the instance has a "
+                           "pending task. Skip."), instance=db_instance)
+                continue
+            if vm_power_state != u['power_state']:
+                # power_state is always updated from hypervisor to db
+                updates[u['uuid']] = {'power_state': vm_power_state,
+                                      'expected_task_state': None}
+            to_sync.append((u, vm_power_state))
+
+        skipped = set()
+        if updates:
+            updated = self.conductor_api.instance_update_many(context,
+                                                              updates)
+            # The instances a task started for since they were looked up
+            # were not updated, and are left alone.
+            skipped = set(updates) - set(instance['uuid']
+                                         for instance in updated)
+
+        for u, vm_power_state in to_sync:
+            if u['uuid'] in skipped:
+                LOG.info(_("During sync_power_state the instance has a "
+                           "pending task. Skip."), instance=u)
+                continue
+            self._handle_power_state_discrepancy(context, u,
+                                                 u['vm_state'],
+                                                 vm_power_state)
 
     def _sync_instance_power_state(self, context, db_instance, vm_power_state):
         """Align instance power state between the database and hypervisor.
@@ -3756,8 +3840,15 @@ class ComputeManager(manager.SchedulerDependentManager):
             self._instance_update(context,
                                   db_instance['uuid'],
                                   power_state=vm_power_state)
-            db_power_state = vm_power_state
 
+        self._handle_power_state_discrepancy(context, db_instance, vm_state,
+                                             vm_power_state)
+
+    def _handle_power_state_discrepancy(self, context, db_instance, vm_state,
+                                        vm_power_state):
+        """Stop the instance if its vm_state and the power state on the
+        hypervisor disagree.
+        """
         # Note(maoy): Now resolve the discrepancy between vm_state and
         # vm_power_state. We go through all possible vm_states.
         if vm_state in (vm_states.BUILDING,
@@ -3874,7 +3965,7 @@ class ComputeManager(manager.SchedulerDependentManager):
         nodenames = set(self.driver.get_available_nodes())
         for nodename in nodenames:
             rt = self._get_resource_tracker(nodename)
-            rt.update_available_resource(context)
+            rt.periodic_update_available_resource(context)
             new_resource_tracker_dict[nodename] = rt
 
         # Delete orphan compute node not reported by driver but still in db
@@ -3886,6 +3977,7 @@ class ComputeManager(manager.SchedulerDependentManager):
                 self.conductor_api.compute_node_delete(context, cn)
 
         self._resource_tracker_dict = new_resource_tracker_dict
+        self._update_capabilities_resource_views()
 
     def _get_compute_nodes_in_db(self, context):
         service_ref = self.conductor_api.service_get_by_compute_host(
@@ -4044,3 +4136,6 @@ class ComputeManager(manager.SchedulerDependentManager):
                 filtered_instances.append(instance)
 
         self.driver.manage_image_cache(context, filtered_instances)
+        # The images popular elsewhere are the ones worth prefetching, the
+        # ones used here are in the cache already.
+        self.driver.prefetch_images(context, all_instances)
@@ -19,6 +19,7 @@ scheduler with useful information about availability through the ComputeNode
 model.
 """
 
+import eventlet
 from oslo.config import cfg
 
 from nova.compute import claims
@@ -32,6 +33,7 @@ from nova.openstack.common import importutils
 from nova.openstack.common import jsonutils
 from nova.openstack.common import lockutils
 from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
 
 resource_tracker_opts = [
     cfg.IntOpt('reserved_host_disk_mb', default=0,
@@ -40,7 +42,17 @@ resource_tracker_opts = [
                help='Amount of memory in MB to reserve for the host'),
     cfg.StrOpt('compute_stats_class',
                default='nova.compute.stats.Stats',
-               help='Class that will manage stats for the local compute host')
+               help='Class that will manage stats for the local compute host'),
+    cfg.IntOpt('resource_tracker_update_delay', default=0,
+               help='Seconds to wait before writing out the compute node '
+                    'usage changed by a claim, so that the changes made by '
+                    'the claims meanwhile are written together.  0 writes '
+                    'them out immediately'),
+    cfg.IntOpt('resource_tracker_audit_interval', default=0,
+               help='Seconds between the audits of the resources used on '
+                    'the host by the periodic task, which writes out the '
+                    'pending usage changes in between.  0 audits on every '
+                    'run'),
 ]
 
 CONF = cfg.CONF
@@ -49,6 +61,11 @@ CONF.register_opts(resource_tracker_opts)
 LOG = logging.getLogger(__name__)
 COMPUTE_RESOURCE_SEMAPHORE = claims.COMPUTE_RESOURCE_SEMAPHORE
 
+# Compute node fields changed by claims and usage updates
+USAGE_FIELDS = ['memory_mb_used', 'free_ram_mb', 'local_gb_used',
+                'free_disk_gb', 'vcpus_used', 'running_vms',
+                'current_workload']
+
 
 class ResourceTracker(object):
     """Compute helper class for keeping track of resource usage as instances
@@ -64,6 +81,11 @@ class ResourceTracker(object):
         self.tracked_instances = {}
         self.tracked_migrations = {}
         self.conductor_api = conductor.API()
+        self.last_audit = None
+        # Usage and stats as last written to the compute node record
+        self.written_usage = {}
+        self.written_stats = {}
+        self.pending_update = None
 
     @lockutils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, 'nova-')
     def instance_claim(self, context, instance_ref, limits=None):
@@ -108,7 +130,7 @@ class ResourceTracker(object):
             self._update_usage_from_instance(self.compute_node, instance_ref)
 
             # persist changes to the compute node:
-            self._update(context, self.compute_node)
+            self._update_changes(context)
 
             return claim
 
@@ -147,8 +169,7 @@ class ResourceTracker(object):
             # compute host:
             self._update_usage_from_migration(context, instance_ref,
                                               self.compute_node, migration_ref)
-            elevated = context.elevated()
-            self._update(elevated, self.compute_node)
+            self._update_changes(context.elevated())
 
             return claim
 
@@ -191,7 +212,7 @@ class ResourceTracker(object):
         self._update_usage_from_instance(self.compute_node, instance)
 
         ctxt = context.get_admin_context()
-        self._update(ctxt, self.compute_node)
+        self._update_changes(ctxt)
 
     def abort_resize_claim(self, instance_uuid, instance_type):
         """Remove usage for an incoming migration."""
@@ -203,7 +224,7 @@ class ResourceTracker(object):
                 self._update_usage(self.compute_node, itype, sign=-1)
 
                 ctxt = context.get_admin_context()
-                self._update(ctxt, self.compute_node)
+                self._update_changes(ctxt)
 
     @lockutils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, 'nova-')
     def update_usage(self, context, instance):
@@ -219,12 +240,80 @@ class ResourceTracker(object):
         # claim first:
         if uuid in self.tracked_instances:
             self._update_usage_from_instance(self.compute_node, instance)
-            self._update(context.elevated(), self.compute_node)
+            self._update_changes(context.elevated())
 
     @property
     def disabled(self):
         return self.compute_node is None
 
+    def get_resource_view(self):
+        """Return the compute node resources and stats as last written to
+        the DB, in the form the scheduler HostState consumes, or None if
+        resource tracking is disabled.
+        """
+        if self.disabled:
+            return None
+        keys = ['memory_mb', 'free_ram_mb', 'local_gb', 'local_gb_used',
+                'free_disk_gb', 'disk_available_least', 'vcpus',
+                'vcpus_used', 'updated_at']
+        view = dict((key, self.compute_node.get(key)) for key in keys)
+        view['stats'] = [dict(key=key, value=value)
+                         for key, value in self.stats.iteritems()]
+        return jsonutils.to_primitive(view)
+
+    def periodic_update_available_resource(self, context):
+        """Audit the resource usage once resource_tracker_audit_interval
+        passed since the last audit, otherwise just write out the pending
+        usage changes.
+        """
+        if (self.disabled or not CONF.resource_tracker_audit_interval or
+            timeutils.is_older_than(self.last_audit,
+                                    CONF.resource_tracker_audit_interval)):
+            self.update_available_resource(context)
+        else:
+            self.flush()
+
+    @lockutils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, 'nova-')
+    def flush(self):
+        """Write out the usage changes waiting for
+        resource_tracker_update_delay.
+        """
+        if self.pending_update is not None:
+            # No effect if this is the pending update running.
+            self.pending_update.cancel()
+            self.pending_update = None
+        if not self.disabled:
+            self._write_changes(context.get_admin_context())
+
+    def _update_changes(self, context):
+        """Persist the usage changed since the last write, now or, with
+        resource_tracker_update_delay, together with the further changes
+        made until then.
+        """
+        if CONF.resource_tracker_update_delay <= 0:
+            self._write_changes(context)
+        elif self.pending_update is None:
+            self.pending_update = eventlet.spawn_after(
+                CONF.resource_tracker_update_delay, self.flush)
+
+    def _write_changes(self, context):
+        """Send the usage fields and stats which changed since the last
+        write to the compute node record, if any did.
+        """
+        values = {}
+        for key in USAGE_FIELDS:
+            if (key in self.compute_node and
+                self.compute_node[key] != self.written_usage.get(key)):
+                values[key] = self.compute_node[key]
+
+        stats = dict((key, value) for key, value in self.stats.iteritems()
+                     if self.written_stats.get(key) != value)
+        if stats:
+            values['stats'] = stats
+
+        if values:
+            self._update(context, values)
+
     @lockutils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, 'nova-')
     def update_available_resource(self, context):
         """Override in-memory calculations of compute node resource usage based
@@ -235,6 +324,7 @@ class ResourceTracker(object):
         the hypervisor layer yet.
         """
         LOG.audit(_("Auditing locally available compute resources"))
+        self.last_audit = timeutils.utcnow()
         resources = self.driver.get_available_resource(self.nodename)
 
         if not resources:
@@ -305,6 +395,7 @@ class ResourceTracker(object):
         # initialize load stats from existing instances:
         self.compute_node = self.conductor_api.compute_node_create(context,
                                                                    values)
+        self._record_written()
 
     def _get_service(self, context):
         try:
@@ -352,6 +443,12 @@ class ResourceTracker(object):
             del self.compute_node['service']
         self.compute_node = self.conductor_api.compute_node_update(
             context, self.compute_node, values, prune_stats)
+        self._record_written()
+
+    def _record_written(self):
+        self.written_usage = dict((key, self.compute_node.get(key))
+                                  for key in USAGE_FIELDS)
+        self.written_stats = dict(self.stats)
 
     def confirm_resize(self, context, migration, status='confirmed'):
         """Cleanup usage for a confirmed resize."""
@@ -33,6 +33,10 @@ conductor_opts = [
     cfg.StrOpt('manager',
                default='nova.conductor.manager.ConductorManager',
                help='full class name for the Manager for conductor'),
+    cfg.IntOpt('workers',
+               default=None,
+               help='Number of worker processes for the conductor service, '
+                    'all consuming from the conductor topic'),
 ]
 conductor_group = cfg.OptGroup(name='conductor',
                                title='Conductor Options')
@@ -64,6 +68,14 @@ class LocalAPI(object):
         return self._manager.instance_update(context, instance_uuid,
                                              updates, 'compute')
 
+    def instance_update_many(self, context, updates):
+        """Perform updates of many instances in the database.
+
+        :param updates: dict of instance uuid to dict of updates
+        """
+        return self._manager.instance_update_many(context, updates,
+                                                  'compute')
+
     def instance_get(self, context, instance_id):
         return self._manager.instance_get(context, instance_id)
 
@@ -175,6 +187,14 @@ class LocalAPI(object):
                                              last_ctr_in, last_ctr_out,
                                              last_refreshed)
 
+    def bw_usage_get_by_uuids(self, context, uuids, start_period):
+        return self._manager.bw_usage_get_by_uuids(context, uuids,
+                                                   start_period)
+
+    def bw_usage_update_many(self, context, usages, last_refreshed=None):
+        return self._manager.bw_usage_update_many(context, usages,
+                                                  last_refreshed)
+
     def get_backdoor_port(self, context, host):
         raise exc.InvalidRequest
 
@@ -347,6 +367,9 @@ class LocalAPI(object):
     def compute_unrescue(self, context, instance):
         return self._manager.compute_unrescue(context, instance)
 
+    def cache_invalidate(self, context, region, ids=None):
+        return self._manager.cache_invalidate(context, region, ids)
+
 
 class API(object):
     """Conductor API that does updates via RPC to the ConductorManager."""
@@ -391,6 +414,14 @@ class API(object):
         return self.conductor_rpcapi.instance_update(context, instance_uuid,
                                                      updates, 'conductor')
 
+    def instance_update_many(self, context, updates):
+        """Perform updates of many instances in the database.
+
+        :param updates: dict of instance uuid to dict of updates
+        """
+        return self.conductor_rpcapi.instance_update_many(context, updates,
+                                                          'conductor')
+
     def instance_destroy(self, context, instance):
         return self.conductor_rpcapi.instance_destroy(context, instance)
 
@@ -509,6 +540,14 @@ class API(object):
             bw_in, bw_out, last_ctr_in, last_ctr_out,
             last_refreshed)
 
+    def bw_usage_get_by_uuids(self, context, uuids, start_period):
+        return self.conductor_rpcapi.bw_usage_get_by_uuids(context, uuids,
+                                                           start_period)
+
+    def bw_usage_update_many(self, context, usages, last_refreshed=None):
+        return self.conductor_rpcapi.bw_usage_update_many(context, usages,
+                                                          last_refreshed)
+
     #NOTE(mtreinish): This doesn't work on multiple conductors without any
     # topic calculation in conductor_rpcapi. So the host param isn't used
     # currently.
@@ -689,3 +728,6 @@ class API(object):
 
     def compute_unrescue(self, context, instance):
         return self.conductor_rpcapi.compute_unrescue(context, instance)
+
+    def cache_invalidate(self, context, region, ids=None):
+        return self.conductor_rpcapi.cache_invalidate(context, region, ids)
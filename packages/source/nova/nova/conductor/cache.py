@@ -0,0 +1,105 @@
+#    Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Read-through cache of the lookups nova-conductor answers for every compute
+node each periodic interval: flavors, security group rules, provider
+firewall rules, aggregate metadata, agent builds and services.
+
+Cached values are grouped in regions, one per kind of lookup.  Writes that
+go through the conductor drop the entries they change, writes made
+elsewhere (by nova-api for instance) are announced with a cache_invalidate
+cast to all conductors, and conductor/cache_ttl bounds the age of what is
+left for writes nobody announces.
+
+Writes of aggregates through a conductor are announced to all conductors
+too.  Those of services and compute nodes, made every report interval by
+every host, only drop the entries of the conductor worker making them.
+"""
+
+import copy
+
+from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
+
+LOG = logging.getLogger(__name__)
+
+REGIONS = ('instance_types', 'security_group_rules', 'provider_fw_rules',
+           'aggregate_metadata', 'agent_builds', 'services')
+
+
+class LookupCache(object):
+    """Results of read-only lookups by region and key, each kept for ttl
+    seconds.  A ttl of 0 disables the cache.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        # { region : { key : (expires at, value) } }
+        self._entries = dict((region, {}) for region in REGIONS)
+        # Size of each region when its expired entries were last purged
+        self._purged_size = dict((region, 0) for region in REGIONS)
+        self.hits = dict((region, 0) for region in REGIONS)
+        self.misses = dict((region, 0) for region in REGIONS)
+
+    def get(self, region, key, load):
+        """Return the value cached for key in region, or call load() to
+        get it and cache it.  Exceptions raised by load() are not cached.
+        """
+        if self.ttl <= 0:
+            return load()
+        entries = self._entries[region]
+        now = timeutils.utcnow_ts()
+        entry = entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.hits[region] += 1
+            # Callers of a local conductor may change what they get back
+            return copy.deepcopy(entry[1])
+        self.misses[region] += 1
+        value = load()
+        entries[key] = (now + self.ttl, value)
+        if len(entries) > 2 * max(self._purged_size[region], 16):
+            self._purge(region, now)
+        return copy.deepcopy(value)
+
+    def _purge(self, region, now):
+        entries = self._entries[region]
+        for key, (expires, value) in entries.items():
+            if expires <= now:
+                del entries[key]
+        self._purged_size[region] = len(entries)
+
+    def invalidate(self, region, match=None):
+        """Drop the entries of a region, or only those for which
+        match(key, value) is true.
+        """
+        entries = self._entries[region]
+        if match is None:
+            entries.clear()
+            return
+        for key, (expires, value) in entries.items():
+            if match(key, value):
+                del entries[key]
+
+    def invalidate_all(self):
+        """Drop every cached entry."""
+        for region in REGIONS:
+            self._entries[region].clear()
+
+    def stats(self):
+        """Return the number of entries, hits and misses of each region."""
+        return dict((region, {'entries': len(self._entries[region]),
+                              'hits': self.hits[region],
+                              'misses': self.misses[region]})
+                    for region in REGIONS)
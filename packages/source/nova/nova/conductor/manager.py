@@ -14,9 +14,13 @@
 
 """Handles database requests from other nova services."""
 
+from oslo.config import cfg
+
 from nova.api.ec2 import ec2utils
 from nova.compute import api as compute_api
 from nova.compute import utils as compute_utils
+from nova.conductor import cache
+from nova.conductor import rpcapi as conductor_rpcapi
 from nova import exception
 from nova import manager
 from nova import network
@@ -28,6 +32,26 @@ from nova.openstack.common.rpc import common as rpc_common
 from nova.openstack.common import timeutils
 from nova import quota
 
+conductor_cache_opts = [
+    cfg.IntOpt('cache_ttl',
+               default=0,
+               help='Seconds to cache the results of the read-only lookups '
+                    'compute nodes make every periodic interval (flavors, '
+                    'security group rules, provider firewall rules, '
+                    'aggregate metadata, agent builds and services).  0 '
+                    'disables the cache.  Writes of services and compute '
+                    'nodes only drop what the conductor worker making them '
+                    'cached; the other workers and hosts serve what they '
+                    'cached until it expires'),
+    cfg.IntOpt('cache_stats_interval',
+               default=600,
+               help='Seconds between logging the hits and misses of the '
+                    'lookup cache'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(conductor_cache_opts, group='conductor')
+
 LOG = logging.getLogger(__name__)
 
 # Instead of having a huge list of arguments to instance_update(), we just
@@ -49,7 +73,7 @@ datetime_fields = ['launched_at', 'terminated_at', 'updated_at']
 class ConductorManager(manager.Manager):
     """Mission: TBD."""
 
-    RPC_API_VERSION = '1.48'
+    RPC_API_VERSION = '1.50'
 
     def __init__(self, *args, **kwargs):
         super(ConductorManager, self).__init__(*args, **kwargs)
@@ -58,6 +82,8 @@ class ConductorManager(manager.Manager):
         self._network_api = None
         self._compute_api = None
         self.quotas = quota.QUOTAS
+        self.cache = cache.LookupCache(CONF.conductor.cache_ttl)
+        self.conductor_rpcapi = conductor_rpcapi.ConductorAPI()
 
     @property
     def network_api(self):
@@ -77,12 +103,70 @@ class ConductorManager(manager.Manager):
     def ping(self, context, arg):
         return jsonutils.to_primitive({'service': 'conductor', 'arg': arg})
 
+    def cache_invalidate(self, context, region, ids=None):
+        """Drop the cached lookups of a region, or only those about the
+        given ids (the first part of the keys), after a write made outside
+        of the conductor.
+        """
+        if region not in cache.REGIONS:
+            LOG.warn(_("Unknown conductor cache region %s"), region)
+            return
+        if ids is None:
+            self.cache.invalidate(region)
+        else:
+            ids = set(ids)
+            self.cache.invalidate(region, lambda key, value: key[0] in ids)
+
+    def _invalidate_everywhere(self, context, region):
+        """Drop the cached lookups of a region after a write made through
+        this conductor, and tell the other conductor workers and hosts to
+        drop theirs.
+        """
+        self.cache.invalidate(region)
+        if self.cache.ttl > 0:
+            self.conductor_rpcapi.cache_invalidate(context, region)
+
+    def _invalidate_services(self, host=None, service_id=None):
+        """Drop the cached service lookups a write to the service of host
+        or service_id may change, including every listing.
+        """
+        def match(key, services):
+            topic, key_host, binary, read_deleted = key
+            if key_host is None or key_host == host:
+                return True
+            if not isinstance(services, list):
+                services = [services]
+            for service in services:
+                if (service.get('host') == host or
+                        service.get('id') == service_id):
+                    return True
+            return False
+
+        self.cache.invalidate('services', match)
+
+    @manager.periodic_task(spacing=CONF.conductor.cache_stats_interval)
+    def _log_cache_stats(self, context):
+        if CONF.conductor.cache_ttl <= 0:
+            return
+        for region, stats in sorted(self.cache.stats().iteritems()):
+            LOG.debug(_("Lookup cache %(region)s: %(entries)d entries, "
+                        "%(hits)d hits, %(misses)d misses"),
+                      dict(stats, region=region))
+
     @rpc_common.client_exceptions(KeyError, ValueError,
                                   exception.InvalidUUID,
                                   exception.InstanceNotFound,
                                   exception.UnexpectedTaskStateError)
     def instance_update(self, context, instance_uuid,
                         updates, service=None):
+        self._check_instance_updates(instance_uuid, updates)
+        old_ref, instance_ref = self.db.instance_update_and_get_original(
+            context, instance_uuid, updates)
+        notifications.send_update(context, old_ref, instance_ref, service)
+        return jsonutils.to_primitive(instance_ref)
+
+    @staticmethod
+    def _check_instance_updates(instance_uuid, updates):
         for key, value in updates.iteritems():
             if key not in allowed_updates:
                 LOG.error(_("Instance update attempted for "
@@ -91,10 +175,17 @@ class ConductorManager(manager.Manager):
             if key in datetime_fields and isinstance(value, basestring):
                 updates[key] = timeutils.parse_strtime(value)
 
-        old_ref, instance_ref = self.db.instance_update_and_get_original(
-            context, instance_uuid, updates)
-        notifications.send_update(context, old_ref, instance_ref, service)
-        return jsonutils.to_primitive(instance_ref)
+    @rpc_common.client_exceptions(KeyError, ValueError,
+                                  exception.InvalidUUID)
+    def instance_update_many(self, context, updates, service=None):
+        for instance_uuid, instance_updates in updates.iteritems():
+            self._check_instance_updates(instance_uuid, instance_updates)
+        result = self.db.instance_update_many(context, updates)
+        for old_ref, instance_ref in result:
+            notifications.send_update(context, old_ref, instance_ref,
+                                      service)
+        return jsonutils.to_primitive([instance_ref
+                                       for old_ref, instance_ref in result])
 
     @rpc_common.client_exceptions(exception.InstanceNotFound)
     def instance_get(self, context, instance_id):
@@ -156,6 +247,7 @@ class ConductorManager(manager.Manager):
     def aggregate_host_add(self, context, aggregate, host):
         host_ref = self.db.aggregate_host_add(context.elevated(),
                 aggregate['id'], host)
+        self._invalidate_everywhere(context, 'aggregate_metadata')
 
         return jsonutils.to_primitive(host_ref)
 
@@ -163,6 +255,7 @@ class ConductorManager(manager.Manager):
     def aggregate_host_delete(self, context, aggregate, host):
         self.db.aggregate_host_delete(context.elevated(),
                 aggregate['id'], host)
+        self._invalidate_everywhere(context, 'aggregate_metadata')
 
     @rpc_common.client_exceptions(exception.AggregateNotFound)
     def aggregate_get(self, context, aggregate_id):
@@ -179,17 +272,24 @@ class ConductorManager(manager.Manager):
         new_metadata = self.db.aggregate_metadata_add(context.elevated(),
                                                       aggregate['id'],
                                                       metadata, set_delete)
+        self._invalidate_everywhere(context, 'aggregate_metadata')
         return jsonutils.to_primitive(new_metadata)
 
     @rpc_common.client_exceptions(exception.AggregateMetadataNotFound)
     def aggregate_metadata_delete(self, context, aggregate, key):
         self.db.aggregate_metadata_delete(context.elevated(),
                                           aggregate['id'], key)
+        self._invalidate_everywhere(context, 'aggregate_metadata')
 
     def aggregate_metadata_get_by_host(self, context, host,
                                        key='availability_zone'):
-        result = self.db.aggregate_metadata_get_by_host(context, host, key)
-        return jsonutils.to_primitive(result)
+        def _load():
+            result = self.db.aggregate_metadata_get_by_host(context, host,
+                                                            key)
+            return jsonutils.to_primitive(result)
+
+        return self.cache.get('aggregate_metadata',
+                              (host, key, context.read_deleted), _load)
 
     def bw_usage_update(self, context, uuid, mac, start_period,
                         bw_in=None, bw_out=None,
@@ -202,6 +302,21 @@ class ConductorManager(manager.Manager):
         usage = self.db.bw_usage_get(context, uuid, start_period, mac)
         return jsonutils.to_primitive(usage)
 
+    def bw_usage_get_by_uuids(self, context, uuids, start_period):
+        if isinstance(start_period, basestring):
+            start_period = timeutils.parse_strtime(start_period)
+        usages = self.db.bw_usage_get_by_uuids(context, uuids, start_period)
+        return jsonutils.to_primitive(usages)
+
+    def bw_usage_update_many(self, context, usages, last_refreshed=None):
+        for usage in usages:
+            if isinstance(usage['start_period'], basestring):
+                usage['start_period'] = timeutils.parse_strtime(
+                        usage['start_period'])
+        if isinstance(last_refreshed, basestring):
+            last_refreshed = timeutils.parse_strtime(last_refreshed)
+        self.db.bw_usage_update_many(context, usages, last_refreshed)
+
     def get_backdoor_port(self, context):
         return self.backdoor_port
 
@@ -211,18 +326,30 @@ class ConductorManager(manager.Manager):
         return jsonutils.to_primitive(group)
 
     def security_group_rule_get_by_security_group(self, context, secgroup):
-        rules = self.db.security_group_rule_get_by_security_group(
-            context, secgroup['id'])
-        return jsonutils.to_primitive(rules, max_depth=4)
+        def _load():
+            rules = self.db.security_group_rule_get_by_security_group(
+                context, secgroup['id'])
+            return jsonutils.to_primitive(rules, max_depth=4)
+
+        return self.cache.get('security_group_rules',
+                              (secgroup['id'], context.read_deleted), _load)
 
     def provider_fw_rule_get_all(self, context):
-        rules = self.db.provider_fw_rule_get_all(context)
-        return jsonutils.to_primitive(rules)
+        def _load():
+            rules = self.db.provider_fw_rule_get_all(context)
+            return jsonutils.to_primitive(rules)
+
+        return self.cache.get('provider_fw_rules',
+                              (context.read_deleted,), _load)
 
     def agent_build_get_by_triple(self, context, hypervisor, os, architecture):
-        info = self.db.agent_build_get_by_triple(context, hypervisor, os,
-                                                 architecture)
-        return jsonutils.to_primitive(info)
+        def _load():
+            info = self.db.agent_build_get_by_triple(context, hypervisor, os,
+                                                     architecture)
+            return jsonutils.to_primitive(info)
+
+        return self.cache.get('agent_builds',
+                              (hypervisor, os, architecture), _load)
 
     def block_device_mapping_update_or_create(self, context, values,
                                               create=None):
@@ -290,8 +417,18 @@ class ConductorManager(manager.Manager):
                                            values)
 
     def instance_type_get(self, context, instance_type_id):
-        result = self.db.instance_type_get(context, instance_type_id)
-        return jsonutils.to_primitive(result)
+        def _load():
+            result = self.db.instance_type_get(context, instance_type_id)
+            return jsonutils.to_primitive(result)
+
+        # Keyed by the access scope of the context too, since flavors may
+        # be limited to projects.
+        scope = None
+        if not context.is_admin:
+            scope = context.project_id
+        return self.cache.get('instance_types',
+                              (instance_type_id, context.read_deleted,
+                               scope), _load)
 
     def instance_fault_create(self, context, values):
         result = self.db.instance_fault_create(context, values)
@@ -311,6 +448,12 @@ class ConductorManager(manager.Manager):
     @rpc_common.client_exceptions(exception.ComputeHostNotFound,
                                   exception.HostBinaryNotFound)
     def service_get_all_by(self, context, topic=None, host=None, binary=None):
+        return self.cache.get('services',
+                              (topic, host, binary, context.read_deleted),
+                              lambda: self._service_get_all_by(context, topic,
+                                                               host, binary))
+
+    def _service_get_all_by(self, context, topic, host, binary):
         if not any((topic, host, binary)):
             result = self.db.service_get_all(context)
         elif all((topic, host)):
@@ -340,28 +483,35 @@ class ConductorManager(manager.Manager):
 
     def service_create(self, context, values):
         svc = self.db.service_create(context, values)
+        self._invalidate_services(host=values.get('host'))
         return jsonutils.to_primitive(svc)
 
     @rpc_common.client_exceptions(exception.ServiceNotFound)
     def service_destroy(self, context, service_id):
         self.db.service_destroy(context, service_id)
+        self._invalidate_services(service_id=service_id)
 
     def compute_node_create(self, context, values):
         result = self.db.compute_node_create(context, values)
+        self._invalidate_services(service_id=values.get('service_id'))
         return jsonutils.to_primitive(result)
 
     def compute_node_update(self, context, node, values, prune_stats=False):
         result = self.db.compute_node_update(context, node['id'], values,
                                              prune_stats)
+        self._invalidate_services(service_id=node.get('service_id'))
         return jsonutils.to_primitive(result)
 
     def compute_node_delete(self, context, node):
         result = self.db.compute_node_delete(context, node['id'])
+        self._invalidate_services(service_id=node.get('service_id'))
         return jsonutils.to_primitive(result)
 
     @rpc_common.client_exceptions(exception.ServiceNotFound)
     def service_update(self, context, service, values):
         svc = self.db.service_update(context, service['id'], values)
+        self._invalidate_services(host=service.get('host'),
+                                  service_id=service['id'])
         return jsonutils.to_primitive(svc)
 
     def task_log_get(self, context, task_name, begin, end, host, state=None):
@@ -87,6 +87,9 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
     1.47 - Added columns_to_join to instance_get_all_by_host and
                  instance_get_all_by_filters
     1.48 - Added compute_unrescue
+    1.49 - Added instance_update_many, bw_usage_get_by_uuids and
+           bw_usage_update_many
+    1.50 - Added cache_invalidate
     """
 
     BASE_RPC_API_VERSION = '1.0'
@@ -111,6 +114,14 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                                        service=service),
                          version='1.38')
 
+    def instance_update_many(self, context, updates, service=None):
+        updates_p = jsonutils.to_primitive(updates)
+        return self.call(context,
+                         self.make_msg('instance_update_many',
+                                       updates=updates_p,
+                                       service=service),
+                         version='1.49')
+
     def instance_get(self, context, instance_id):
         msg = self.make_msg('instance_get',
                             instance_id=instance_id)
@@ -201,6 +212,17 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                             last_refreshed=last_refreshed)
         return self.call(context, msg, version='1.5')
 
+    def bw_usage_get_by_uuids(self, context, uuids, start_period):
+        msg = self.make_msg('bw_usage_get_by_uuids', uuids=uuids,
+                            start_period=start_period)
+        return self.call(context, msg, version='1.49')
+
+    def bw_usage_update_many(self, context, usages, last_refreshed=None):
+        usages_p = jsonutils.to_primitive(usages)
+        msg = self.make_msg('bw_usage_update_many', usages=usages_p,
+                            last_refreshed=last_refreshed)
+        return self.call(context, msg, version='1.49')
+
     def get_backdoor_port(self, context):
         msg = self.make_msg('get_backdoor_port')
         return self.call(context, msg, version='1.6')
@@ -455,3 +477,7 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
         instance_p = jsonutils.to_primitive(instance)
         msg = self.make_msg('compute_unrescue', instance=instance_p)
         return self.call(context, msg, version='1.48')
+
+    def cache_invalidate(self, context, region, ids=None):
+        msg = self.make_msg('cache_invalidate', region=region, ids=ids)
+        self.fanout_cast(context, msg, version='1.50')
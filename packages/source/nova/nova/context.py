@@ -25,6 +25,7 @@ import uuid
 from nova import exception
 from nova.openstack.common import local
 from nova.openstack.common import log as logging
+from nova.openstack.common import policy as common_policy
 from nova.openstack.common import timeutils
 from nova import policy
 
@@ -94,6 +95,8 @@ class RequestContext(object):
         self.quota_class = quota_class
         self.user_name = user_name
         self.project_name = project_name
+        # Results of the policy checks made for this context
+        self.policy_cache = common_policy.ResultCache()
         self.is_admin = is_admin
         if self.is_admin is None:
             self.is_admin = policy.check_is_admin(self)
@@ -143,6 +146,7 @@ class RequestContext(object):
     def elevated(self, read_deleted=None, overwrite=False):
         """Return a version of this context with admin flag set."""
         context = copy.copy(self)
+        context.policy_cache = common_policy.ResultCache()
         context.is_admin = True
 
         if 'admin' not in context.roles:
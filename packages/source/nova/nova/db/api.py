@@ -433,14 +433,15 @@ def fixed_ip_associate(context, address, instance_uuid, network_id=None,
 
 
 def fixed_ip_associate_pool(context, network_id, instance_uuid=None,
-                            host=None):
+                            host=None, address=None):
     """Find free ip in network and associate it to instance or host.
 
+    If address is given, only that ip is considered.
     Raises if one is not available.
 
     """
     return IMPL.fixed_ip_associate_pool(context, network_id,
-                                        instance_uuid, host)
+                                        instance_uuid, host, address)
 
 
 def fixed_ip_create(context, values):
@@ -506,6 +507,11 @@ def fixed_ip_get_by_network_host(context, network_uuid, host):
     return IMPL.fixed_ip_get_by_network_host(context, network_uuid, host)
 
 
+def fixed_ip_get_free_by_network(context, network_id, limit):
+    """Get the addresses of up to limit free ips of a network."""
+    return IMPL.fixed_ip_get_free_by_network(context, network_id, limit)
+
+
 def fixed_ips_by_virtual_interface(context, vif_id):
     """Get fixed ips by virtual interface or raise if none exist."""
     return IMPL.fixed_ips_by_virtual_interface(context, vif_id)
@@ -575,6 +581,14 @@ def instance_create(context, values):
     return IMPL.instance_create(context, values)
 
 
+def instance_create_bulk(context, values_list, block_device_mapping=None):
+    """Create instances from a list of values dictionaries, each with the
+    block device mappings in block_device_mapping, in one transaction.
+    """
+    return IMPL.instance_create_bulk(context, values_list,
+                                     block_device_mapping)
+
+
 def instance_data_get_for_project(context, project_id, session=None):
     """Get (instance_count, total_cores, total_ram) for project."""
     return IMPL.instance_data_get_for_project(context, project_id,
@@ -610,12 +624,16 @@ def instance_get_all(context, columns_to_join=None):
 
 def instance_get_all_by_filters(context, filters, sort_key='created_at',
                                 sort_dir='desc', limit=None, marker=None,
-                                columns_to_join=None):
-    """Get all instances that match all filters."""
+                                columns_to_join=None, columns=None):
+    """Get all instances that match all filters.
+
+    If columns is given, only those instance columns are loaded.
+    """
     return IMPL.instance_get_all_by_filters(context, filters, sort_key,
                                             sort_dir, limit=limit,
                                             marker=marker,
-                                            columns_to_join=columns_to_join)
+                                            columns_to_join=columns_to_join,
+                                            columns=columns)
 
 
 def instance_get_active_by_window_joined(context, begin, end=None,
@@ -683,6 +701,28 @@ def instance_update(context, instance_uuid, values, update_cells=True):
     return rv
 
 
+def instance_update_many(context, updates, update_cells=True):
+    """Set the given properties on many instances and update them.
+
+    :param updates: = dict of instance uuid to dict of column values
+
+    Instances that do not exist, or whose task state does not match an
+    "expected_task_state" in their values, are skipped.
+
+    :returns: a list of (old_instance_ref, new_instance_ref) tuples for
+              the instances that were updated
+    """
+    rv = IMPL.instance_update_many(context, updates)
+    if update_cells:
+        try:
+            cells_api = cells_rpcapi.CellsAPI()
+            for old_ref, instance_ref in rv:
+                cells_api.instance_update_at_top(context, instance_ref)
+        except Exception:
+            LOG.exception(_("Failed to notify cells of instance update"))
+    return rv
+
+
 def instance_update_and_get_original(context, instance_uuid, values):
     """Set the given properties on an instance and update it. Return
     a shallow copy of the original instance reference, as well as the
@@ -845,9 +885,14 @@ def network_in_use_on_host(context, network_id, host=None):
     return IMPL.network_in_use_on_host(context, network_id, host)
 
 
-def network_get_associated_fixed_ips(context, network_id, host=None):
-    """Get all network's ips that have been associated."""
-    return IMPL.network_get_associated_fixed_ips(context, network_id, host)
+def network_get_associated_fixed_ips(context, network_id, host=None,
+                                     address=None):
+    """Get all network's ips that have been associated.
+
+    If address is given, only that ip is returned, if associated.
+    """
+    return IMPL.network_get_associated_fixed_ips(context, network_id, host,
+                                                 address)
 
 
 def network_get_by_uuid(context, uuid):
@@ -1438,6 +1483,29 @@ def bw_usage_update(context, uuid, mac, start_period, bw_in, bw_out,
     return rv
 
 
+def bw_usage_update_many(context, usages, last_refreshed=None,
+                         update_cells=True):
+    """Update cached bandwidth usage for many instance networks at once.
+
+    :param usages: = list of dicts with the uuid, mac, start_period, bw_in,
+                     bw_out, last_ctr_in and last_ctr_out of each network
+    """
+    rv = IMPL.bw_usage_update_many(context, usages,
+                                   last_refreshed=last_refreshed)
+    if update_cells:
+        try:
+            cells_api = cells_rpcapi.CellsAPI()
+            for usage in usages:
+                cells_api.bw_usage_update_at_top(context,
+                        usage['uuid'], usage['mac'], usage['start_period'],
+                        usage['bw_in'], usage['bw_out'],
+                        usage['last_ctr_in'], usage['last_ctr_out'],
+                        last_refreshed)
+        except Exception:
+            LOG.exception(_("Failed to notify cells of bw_usage update"))
+    return rv
+
+
 ####################
 
 
@@ -1027,7 +1027,7 @@ def fixed_ip_associate(context, address, instance_uuid, network_id=None,
 
 @require_admin_context
 def fixed_ip_associate_pool(context, network_id, instance_uuid=None,
-                            host=None):
+                            host=None, address=None):
     if instance_uuid and not uuidutils.is_uuid_like(instance_uuid):
         raise exception.InvalidUUID(uuid=instance_uuid)
 
@@ -1035,14 +1035,15 @@ def fixed_ip_associate_pool(context, network_id, instance_uuid=None,
     with session.begin():
         network_or_none = or_(models.FixedIp.network_id == network_id,
                               models.FixedIp.network_id == None)
-        fixed_ip_ref = model_query(context, models.FixedIp, session=session,
-                                   read_deleted="no").\
-                               filter(network_or_none).\
-                               filter_by(reserved=False).\
-                               filter_by(instance_uuid=None).\
-                               filter_by(host=None).\
-                               with_lockmode('update').\
-                               first()
+        query = model_query(context, models.FixedIp, session=session,
+                            read_deleted="no").\
+                        filter(network_or_none).\
+                        filter_by(reserved=False).\
+                        filter_by(instance_uuid=None).\
+                        filter_by(host=None)
+        if address:
+            query = query.filter_by(address=address)
+        fixed_ip_ref = query.with_lockmode('update').first()
         # NOTE(vish): if with_lockmode isn't supported, as in sqlite,
         #             then this has concurrency issues
         if not fixed_ip_ref:
@@ -1252,6 +1253,19 @@ def fixed_ip_get_by_network_host(context, network_id, host):
     return result
 
 
+@require_admin_context
+def fixed_ip_get_free_by_network(context, network_id, limit):
+    result = model_query(context, models.FixedIp.address,
+                         base_model=models.FixedIp, read_deleted="no").\
+                 filter_by(network_id=network_id).\
+                 filter_by(reserved=False).\
+                 filter_by(instance_uuid=None).\
+                 filter_by(host=None).\
+                 limit(limit).\
+                 all()
+    return [row[0] for row in result]
+
+
 @require_context
 def fixed_ips_by_virtual_interface(context, vif_id):
     result = model_query(context, models.FixedIp, read_deleted="no").\
@@ -1481,6 +1495,114 @@ def instance_create(context, values):
     return instance_ref
 
 
+def _bulk_insert(session, model, rows):
+    """Insert rows in the table of model with one multi-row INSERT for each
+    set of columns the rows have values for.  Rows are not turned into
+    models, so the defaults of the columns apply but nothing else does.
+    """
+    rows_by_columns = {}
+    for row in rows:
+        rows_by_columns.setdefault(tuple(sorted(row)), []).append(row)
+    for same_columns in rows_by_columns.values():
+        session.execute(model.__table__.insert(), same_columns)
+
+
+@require_context
+def instance_create_bulk(context, values_list, block_device_mapping=None):
+    """Create Instance records for a list of values dictionaries in one
+    transaction, like instance_create does for one of them.
+
+    The instances, their metadata, system metadata, info caches, security
+    group associations and ec2 id mappings are each inserted with a
+    multi-row INSERT rather than one model at a time.  Each instance also
+    gets the block device mappings of block_device_mapping, a list of
+    values dictionaries without instance_uuid.
+
+    Returns the new instances, in the order of values_list.
+    """
+    instance_columns = set(column.name
+                           for column in models.Instance.__table__.columns)
+    instances = []
+    metadata = []
+    system_metadata = []
+    info_caches = []
+    group_names = set()
+    for values in values_list:
+        values = values.copy()
+        if not values.get('uuid'):
+            values['uuid'] = str(uuid.uuid4())
+        instance_uuid = values['uuid']
+        for key, value in (values.get('metadata') or {}).iteritems():
+            metadata.append({'instance_uuid': instance_uuid,
+                             'key': key, 'value': value})
+        for key, value in (values.get('system_metadata') or {}).iteritems():
+            system_metadata.append({'instance_uuid': instance_uuid,
+                                    'key': key, 'value': value})
+        info_cache = dict(values.get('info_cache') or {})
+        info_cache['instance_uuid'] = instance_uuid
+        info_caches.append(info_cache)
+        values['security_groups'] = values.get('security_groups') or []
+        group_names.update(values['security_groups'])
+        instances.append(values)
+
+    security_group_ensure_default(context)
+    session = get_session()
+    with session.begin():
+        groups = {}
+        if group_names:
+            for group in _security_group_get_by_names(context, session,
+                    context.project_id, list(group_names)):
+                groups[group.name] = group
+
+        associations = []
+        bdms = []
+        hostnames = set()
+        for values in instances:
+            if 'hostname' in values:
+                _validate_unique_server_name(context, session,
+                                             values['hostname'])
+                # NOTE: None of the batch is in the database yet, so its
+                # hostnames must also be unique among themselves.
+                if CONF.osapi_compute_unique_server_name_scope in (
+                        'project', 'global'):
+                    lowername = values['hostname'].lower()
+                    if lowername in hostnames:
+                        raise exception.InstanceExists(name=lowername)
+                    hostnames.add(lowername)
+            for name in set(values['security_groups']):
+                associations.append({'instance_uuid': values['uuid'],
+                                     'security_group_id': groups[name].id})
+            for bdm in block_device_mapping or []:
+                bdm = bdm.copy()
+                bdm['instance_uuid'] = values['uuid']
+                bdms.append(bdm)
+
+        _bulk_insert(session, models.Instance,
+                     [dict((key, value) for key, value in values.iteritems()
+                           if key in instance_columns)
+                      for values in instances])
+        _bulk_insert(session, models.InstanceMetadata, metadata)
+        _bulk_insert(session, models.InstanceSystemMetadata, system_metadata)
+        _bulk_insert(session, models.InstanceInfoCache, info_caches)
+        _bulk_insert(session, models.SecurityGroupInstanceAssociation,
+                     associations)
+        _bulk_insert(session, models.BlockDeviceMapping, bdms)
+        # create the instance uuid to ec2_id mapping entries
+        _bulk_insert(session, models.InstanceIdMapping,
+                     [{'uuid': values['uuid']} for values in instances])
+
+    uuids = [values['uuid'] for values in instances]
+    instance_refs = model_query(context, models.Instance).\
+            options(joinedload('info_cache')).\
+            options(joinedload('security_groups')).\
+            filter(models.Instance.uuid.in_(uuids)).\
+            all()
+    instance_refs = dict((instance_ref['uuid'], instance_ref)
+                         for instance_ref in
+                         _instances_fill_metadata(context, instance_refs))
+    return [instance_refs[instance_uuid] for instance_uuid in uuids]
+
+
 @require_admin_context
 def instance_data_get_for_project(context, project_id, session=None):
     result = model_query(context,
@@ -1603,6 +1725,74 @@ def _instances_fill_metadata(context, instances, manual_joins=None):
     return filled_instances
 
 
+def _instances_fill_joins(context, instances, columns_to_join,
+                          session=None):
+    """Fill instance dicts with their info_cache and security_groups,
+    loaded in one query per relation for all the instances rather than
+    joined to the instance query.  Gives the same results as the
+    joinedload()s on Instance: deleted instances have no security groups.
+    """
+    uuids = [inst['uuid'] for inst in instances]
+    if not uuids:
+        return instances
+
+    if 'info_cache' in columns_to_join:
+        info_caches = {}
+        for info_cache in model_query(context, models.InstanceInfoCache,
+                                      session=session, read_deleted='yes').\
+                filter(models.InstanceInfoCache.instance_uuid.in_(uuids)):
+            info_caches[info_cache['instance_uuid']] = info_cache
+        for inst in instances:
+            inst['info_cache'] = info_caches.get(inst['uuid'])
+
+    if 'security_groups' in columns_to_join:
+        groups = collections.defaultdict(list)
+        assoc = models.SecurityGroupInstanceAssociation
+        query = model_query(context, assoc.instance_uuid,
+                            models.SecurityGroup, base_model=assoc,
+                            session=session, read_deleted='no').\
+                filter(models.SecurityGroup.id == assoc.security_group_id).\
+                filter(models.SecurityGroup.deleted == 0).\
+                filter(assoc.instance_uuid.in_(uuids))
+        for instance_uuid, group in query:
+            groups[instance_uuid].append(group)
+        for inst in instances:
+            if inst['deleted']:
+                inst['security_groups'] = []
+            else:
+                inst['security_groups'] = groups[inst['uuid']]
+
+    return instances
+
+
+class _InstanceMarker(object):
+    """Stands in for the marker instance in paginate_query().
+
+    Each sort key value is a scalar subquery selecting it from the marker
+    row, so the marker is found by the page query itself instead of being
+    loaded, with all its joins, in a separate round trip first.
+    """
+
+    def __init__(self, context, uuid, session):
+        self.context = context
+        self.uuid = uuid
+        self.session = session
+
+    def __getattr__(self, key):
+        return model_query(self.context, getattr(models.Instance, key),
+                           base_model=models.Instance, session=self.session,
+                           project_only=True).\
+                filter(models.Instance.uuid == self.uuid).\
+                as_scalar()
+
+    def exists(self):
+        return model_query(self.context, models.Instance.id,
+                           base_model=models.Instance, session=self.session,
+                           project_only=True).\
+                filter(models.Instance.uuid == self.uuid).\
+                first() is not None
+
+
 def _manual_join_columns(columns_to_join):
     manual_joins = []
     for column in ('metadata', 'system_metadata'):
@@ -1635,10 +1825,15 @@ def instance_get_all(context, columns_to_join=None):
 @require_context
 def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
                                 limit=None, marker=None, columns_to_join=None,
-                                session=None):
+                                session=None, columns=None):
     """Return instances that match all filters.  Deleted instances
     will be returned by default, unless there's a filter that says
-    otherwise"""
+    otherwise.
+
+    If columns is given, only those columns of the instances are loaded
+    (the others are None) and any info_cache and security_groups in
+    columns_to_join are loaded in batched queries instead of joins.
+    """
 
     sort_fn = {'desc': desc, 'asc': asc}
 
@@ -1651,9 +1846,14 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
     else:
         manual_joins, columns_to_join = _manual_join_columns(columns_to_join)
 
-    query_prefix = session.query(models.Instance)
-    for column in columns_to_join:
-        query_prefix = query_prefix.options(joinedload(column))
+    if columns is None:
+        query_prefix = session.query(models.Instance)
+        for column in columns_to_join:
+            query_prefix = query_prefix.options(joinedload(column))
+    else:
+        columns = set(columns) | set(['id', 'uuid', 'deleted'])
+        query_prefix = session.query(*[getattr(models.Instance, column)
+                                       for column in columns])
 
     query_prefix = query_prefix.order_by(sort_fn[sort_dir](
             getattr(models.Instance, sort_key)))
@@ -1700,17 +1900,28 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
 
     # paginate query
     if marker is not None:
-        try:
-            marker = _instance_get_by_uuid(context, marker, session=session)
-        except exception.InstanceNotFound:
-            raise exception.MarkerNotFound(marker)
+        marker = _InstanceMarker(context, marker, session)
     query_prefix = sqlalchemyutils.paginate_query(query_prefix,
                            models.Instance, limit,
                            [sort_key, 'created_at', 'id'],
                            marker=marker,
                            sort_dir=sort_dir)
 
-    return _instances_fill_metadata(context, query_prefix.all(), manual_joins)
+    instances = query_prefix.all()
+    # NOTE: an unknown marker matches no rows, so only an empty page needs
+    # to check whether the marker exists.
+    if not instances and marker is not None and not marker.exists():
+        raise exception.MarkerNotFound(marker.uuid)
+
+    if columns is not None:
+        instances = [models.Instance(**dict(zip(row.keys(), row)))
+                     for row in instances]
+        instances = _instances_fill_metadata(context, instances,
+                                             manual_joins)
+        return _instances_fill_joins(context, instances, columns_to_join,
+                                     session=session)
+
+    return _instances_fill_metadata(context, instances, manual_joins)
 
 
 def regex_filter(query, model, filters):
@@ -1920,48 +2131,95 @@ def _instance_update(context, instance_uuid, values, copy_old_instance=False):
     with session.begin():
         instance_ref = _instance_get_by_uuid(context, instance_uuid,
                                              session=session)
-        if "expected_task_state" in values:
-            # it is not a db column so always pop out
-            expected = values.pop("expected_task_state")
-            if not isinstance(expected, (tuple, list, set)):
-                expected = (expected,)
-            actual_state = instance_ref["task_state"]
-            if actual_state not in expected:
-                raise exception.UnexpectedTaskStateError(actual=actual_state,
-                                                         expected=expected)
-
-        instance_hostname = instance_ref['hostname'] or ''
-        if ("hostname" in values and
-                values["hostname"].lower() != instance_hostname.lower()):
-                _validate_unique_server_name(context,
-                                             session,
-                                             values['hostname'])
+        old_instance_ref = _instance_update_ref(context, instance_ref, values,
+                                                session, copy_old_instance)
 
-        if copy_old_instance:
-            old_instance_ref = copy.copy(instance_ref)
-        else:
-            old_instance_ref = None
+    return (old_instance_ref, instance_ref)
 
-        metadata = values.get('metadata')
-        if metadata is not None:
-            _instance_metadata_update_in_place(context, instance_ref,
-                                               'metadata',
-                                               models.InstanceMetadata,
-                                               values.pop('metadata'),
-                                               session)
-
-        system_metadata = values.get('system_metadata')
-        if system_metadata is not None:
-            _instance_metadata_update_in_place(context, instance_ref,
-                                               'system_metadata',
-                                               models.InstanceSystemMetadata,
-                                               values.pop('system_metadata'),
-                                               session)
-
-        instance_ref.update(values)
-        instance_ref.save(session=session)
 
-    return (old_instance_ref, instance_ref)
+def _instance_update_ref(context, instance_ref, values, session,
+                         copy_old_instance=False):
+    """Apply values to an instance already loaded in session, returning a
+    copy of the original instance if copy_old_instance is set.
+    """
+    if "expected_task_state" in values:
+        # it is not a db column so always pop out
+        expected = values.pop("expected_task_state")
+        if not isinstance(expected, (tuple, list, set)):
+            expected = (expected,)
+        actual_state = instance_ref["task_state"]
+        if actual_state not in expected:
+            raise exception.UnexpectedTaskStateError(actual=actual_state,
+                                                     expected=expected)
+
+    instance_hostname = instance_ref['hostname'] or ''
+    if ("hostname" in values and
+            values["hostname"].lower() != instance_hostname.lower()):
+            _validate_unique_server_name(context,
+                                         session,
+                                         values['hostname'])
+
+    if copy_old_instance:
+        old_instance_ref = copy.copy(instance_ref)
+    else:
+        old_instance_ref = None
+
+    metadata = values.get('metadata')
+    if metadata is not None:
+        _instance_metadata_update_in_place(context, instance_ref,
+                                           'metadata',
+                                           models.InstanceMetadata,
+                                           values.pop('metadata'),
+                                           session)
+
+    system_metadata = values.get('system_metadata')
+    if system_metadata is not None:
+        _instance_metadata_update_in_place(context, instance_ref,
+                                           'system_metadata',
+                                           models.InstanceSystemMetadata,
+                                           values.pop('system_metadata'),
+                                           session)
+
+    instance_ref.update(values)
+    instance_ref.save(session=session)
+    return old_instance_ref
+
+
+@require_context
+def instance_update_many(context, updates):
+    """Set the given properties on many instances in one transaction.
+
+    :param updates: = dict of instance uuid to dict of column values
+
+    Instances that do not exist, or whose task state does not match an
+    "expected_task_state" in their values, are skipped.
+
+    :returns: a list of (old_instance_ref, new_instance_ref) tuples for
+              the instances that were updated
+    """
+    for instance_uuid in updates:
+        if not uuidutils.is_uuid_like(instance_uuid):
+            raise exception.InvalidUUID(instance_uuid)
+    if not updates:
+        return []
+
+    session = get_session()
+    results = []
+    with session.begin():
+        instance_refs = _build_instance_get(context, session=session).\
+                filter(models.Instance.uuid.in_(updates.keys())).\
+                all()
+        for instance_ref in instance_refs:
+            values = dict(updates[instance_ref['uuid']])
+            try:
+                old_instance_ref = _instance_update_ref(context,
+                        instance_ref, values, session, copy_old_instance=True)
+            except exception.UnexpectedTaskStateError as e:
+                LOG.debug(_("Skipping update of instance %(uuid)s: %(e)s"),
+                          {'uuid': instance_ref['uuid'], 'e': e})
+                continue
+            results.append((old_instance_ref, instance_ref))
+    return results
 
 
 def instance_add_security_group(context, instance_uuid, security_group_id):
@@ -2254,7 +2512,8 @@ def network_get_all_by_uuids(context, network_uuids,
 
 
 @require_admin_context
-def network_get_associated_fixed_ips(context, network_id, host=None):
+def network_get_associated_fixed_ips(context, network_id, host=None,
+                                     address=None):
     # FIXME(sirp): since this returns fixed_ips, this would be better named
     # fixed_ip_get_all_by_network.
     # NOTE(vish): The ugly joins here are to solve a performance issue and
@@ -2285,6 +2544,8 @@ def network_get_associated_fixed_ips(context, network_id, host=None):
                           filter(models.FixedIp.virtual_interface_id != None)
     if host:
         query = query.filter(models.Instance.host == host)
+    if address:
+        query = query.filter(models.FixedIp.address == address)
     result = query.all()
     data = []
     for datum in result:
@@ -4057,6 +4318,48 @@ def bw_usage_update(context, uuid, mac, start_period, bw_in, bw_out,
         bwusage.save(session=session)
 
 
+@require_context
+@_retry_on_deadlock
+def bw_usage_update_many(context, usages, last_refreshed=None):
+    if last_refreshed is None:
+        last_refreshed = timeutils.utcnow()
+    if not usages:
+        return
+
+    session = get_session()
+    with session.begin():
+        uuids = list(set(usage['uuid'] for usage in usages))
+        start_periods = list(set(usage['start_period']
+                                 for usage in usages))
+        existing = {}
+        for bwusage in model_query(context, models.BandwidthUsage,
+                                   session=session, read_deleted="yes").\
+                filter(models.BandwidthUsage.uuid.in_(uuids)).\
+                filter(models.BandwidthUsage.start_period.in_(
+                        start_periods)).\
+                all():
+            key = (bwusage.uuid, bwusage.mac,
+                   timeutils.normalize_time(bwusage.start_period))
+            existing[key] = bwusage
+
+        for usage in usages:
+            key = (usage['uuid'], usage['mac'],
+                   timeutils.normalize_time(usage['start_period']))
+            bwusage = existing.get(key)
+            if bwusage is None:
+                bwusage = models.BandwidthUsage()
+                bwusage.start_period = usage['start_period']
+                bwusage.uuid = usage['uuid']
+                bwusage.mac = usage['mac']
+                existing[key] = bwusage
+            bwusage.last_refreshed = last_refreshed
+            bwusage.bw_in = usage['bw_in']
+            bwusage.bw_out = usage['bw_out']
+            bwusage.last_ctr_in = usage['last_ctr_in']
+            bwusage.last_ctr_out = usage['last_ctr_out']
+            bwusage.save(session=session)
+
+
 ####################
 
 
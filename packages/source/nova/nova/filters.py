@@ -17,6 +17,8 @@
 Filter support
 """
 
+import time
+
 from nova import loadables
 
 
@@ -46,8 +48,22 @@ class BaseFilterHandler(loadables.BaseLoader):
     This class should be subclassed where one needs to use filters.
     """
 
+    # Set to an object with an add_filter(name, elapsed, objs_in, objs_out)
+    # method to record the time taken and objects passed by each filter.
+    stats = None
+
     def get_filtered_objects(self, filter_classes, objs,
             filter_properties):
+        if self.stats is None:
+            for filter_cls in filter_classes:
+                objs = filter_cls().filter_all(objs, filter_properties)
+            return list(objs)
+
+        objs = list(objs)
         for filter_cls in filter_classes:
-            objs = filter_cls().filter_all(objs, filter_properties)
-        return list(objs)
+            start = time.time()
+            passed = list(filter_cls().filter_all(objs, filter_properties))
+            self.stats.add_filter(filter_cls.__name__, time.time() - start,
+                                  len(objs), len(passed))
+            objs = passed
+        return objs
@@ -20,7 +20,9 @@
 """Implements vlans, bridges, and iptables rules using linux utilities."""
 
 import calendar
+import hashlib
 import inspect
+import itertools
 import netaddr
 import os
 import re
@@ -64,6 +66,12 @@ linux_net_opts = [
     cfg.IntOpt('dhcp_lease_time',
                default=120,
                help='Lifetime of a DHCP lease in seconds'),
+    cfg.IntOpt('dhcp_lease_listener_interval',
+               default=0,
+               help='Seconds between the checks nova-network makes of the '
+                    'lease files dnsmasq keeps, to handle the leases given '
+                    'out and released since. 0 means dnsmasq runs '
+                    'nova-dhcpbridge for every lease event instead'),
     cfg.MultiStrOpt('dns_server',
                     default=[],
                     help='if set, uses specific dns server for dnsmasq. Can'
@@ -118,6 +126,14 @@ linux_net_opts = [
                default='',
                help='Regular expression to match iptables rule that should'
                     'always be on the bottom.'),
+    cfg.BoolOpt('iptables_differential_apply',
+                default=False,
+                help='Only rewrite the chains owned by this service whose '
+                     'rules changed since the last apply, with '
+                     'iptables-restore --noflush, instead of saving and '
+                     'restoring the whole ruleset on every change. Any '
+                     'change to the chains shared between services still '
+                     'causes a full apply.'),
     ]
 
 CONF = cfg.CONF
@@ -127,6 +143,18 @@ CONF.import_opt('use_ipv6', 'nova.netconf')
 CONF.import_opt('my_ip', 'nova.netconf')
 
 
+# NOTE: The dhcp-host entries of the networks dnsmasq serves, by device,
+#       so a fixed ip allocated or deallocated only changes its own entry
+#       rather than all of them being queried again.  Entries are
+#       numbered in the order they were added, which the hosts file keeps.
+_dhcp_hosts = {}
+_dhcp_host_counter = itertools.count()
+
+# NOTE: The leases dnsmasq held at the last get_dhcp_lease_changes(), by
+#       device, when dhcp_lease_listener_interval is set.
+_dhcp_leases = {}
+
+
 # NOTE(vish): Iptables supports chain names of up to 28 characters,  and we
 #             add up to 12 characters to binary_name which is used as a prefix,
 #             so we limit it to 16 characters.
@@ -179,6 +207,24 @@ class IptablesTable(object):
         self.chains = set()
         self.unwrapped_chains = set()
         self.remove_chains = set()
+        # Wrapped chains changed since the last apply, and whether any
+        # unwrapped chain or rule changed.
+        self.dirty_chains = set()
+        self.unwrapped_dirty = False
+
+    def _mark_dirty(self, chain, wrap):
+        if wrap:
+            self.dirty_chains.add(chain)
+        else:
+            self.unwrapped_dirty = True
+
+    def _mark_rules_dirty(self, rules):
+        for rule in rules:
+            self._mark_dirty(rule.chain, rule.wrap)
+
+    def clear_dirty(self):
+        self.dirty_chains.clear()
+        self.unwrapped_dirty = False
 
     def add_chain(self, name, wrap=True):
         """Adds a named chain to the table.
@@ -196,6 +242,7 @@ class IptablesTable(object):
             self.chains.add(name)
         else:
             self.unwrapped_chains.add(name)
+        self._mark_dirty(name, wrap)
 
     def remove_chain(self, name, wrap=True):
         """Remove named chain.
@@ -221,6 +268,7 @@ class IptablesTable(object):
         if not wrap:
             self.remove_chains.add(name)
         chain_set.remove(name)
+        self._mark_dirty(name, wrap)
         if not wrap:
             self.remove_rules += filter(lambda r: r.chain == name, self.rules)
         self.rules = filter(lambda r: r.chain != name, self.rules)
@@ -230,9 +278,10 @@ class IptablesTable(object):
         else:
             jump_snippet = '-j %s' % (name,)
 
+        jump_rules = filter(lambda r: jump_snippet in r.rule, self.rules)
         if not wrap:
-            self.remove_rules += filter(lambda r: jump_snippet in r.rule,
-                                        self.rules)
+            self.remove_rules += jump_rules
+        self._mark_rules_dirty(jump_rules)
         self.rules = filter(lambda r: jump_snippet not in r.rule, self.rules)
 
     def add_rule(self, chain, rule, wrap=True, top=False):
@@ -253,6 +302,7 @@ class IptablesTable(object):
             rule = ' '.join(map(self._wrap_target_chain, rule.split(' ')))
 
         self.rules.append(IptablesRule(chain, rule, wrap, top))
+        self._mark_dirty(chain, wrap)
 
     def _wrap_target_chain(self, s):
         if s.startswith('$'):
@@ -271,6 +321,7 @@ class IptablesTable(object):
             self.rules.remove(IptablesRule(chain, rule, wrap, top))
             if not wrap:
                 self.remove_rules.append(IptablesRule(chain, rule, wrap, top))
+            self._mark_dirty(chain, wrap)
         except ValueError:
             LOG.warn(_('Tried to remove rule that was not there:'
                        ' %(chain)r %(rule)r %(wrap)r %(top)r'),
@@ -282,15 +333,16 @@ class IptablesTable(object):
         if isinstance(regex, basestring):
             regex = re.compile(regex)
         num_rules = len(self.rules)
+        self._mark_rules_dirty(filter(lambda r: regex.match(str(r)),
+                                      self.rules))
         self.rules = filter(lambda r: not regex.match(str(r)), self.rules)
         return num_rules - len(self.rules)
 
     def empty_chain(self, chain, wrap=True):
         """Remove all rules from a chain."""
-        chained_rules = [rule for rule in self.rules
-                              if rule.chain == chain and rule.wrap == wrap]
-        for rule in chained_rules:
-            self.rules.remove(rule)
+        self.rules = [rule for rule in self.rules
+                      if rule.chain != chain or rule.wrap != wrap]
+        self._mark_dirty(chain, wrap)
 
 
 class IptablesManager(object):
@@ -329,6 +381,10 @@ class IptablesManager(object):
 
         self.iptables_apply_deferred = False
 
+        # { (command, table name): { wrapped chain: digest of its rules } }
+        # as of the last apply, for iptables_differential_apply.
+        self.applied_digests = {}
+
         # Add a nova-filter-top chain. It's intended to be shared
         # among the various nova components. It sits at the very top
         # of FORWARD and OUTPUT.
@@ -406,6 +462,14 @@ class IptablesManager(object):
             s += [('ip6tables', self.ipv6)]
 
         for cmd, tables in s:
+            if (CONF.iptables_differential_apply and
+                    self._apply_differential(cmd, tables)):
+                continue
+
+            # Forget what was applied, in case the restore fails.
+            for table_name in tables:
+                self.applied_digests.pop((cmd, table_name), None)
+
             all_tables, _err = self.execute('%s-save' % (cmd,), '-c',
                                                 run_as_root=True,
                                                 attempts=5)
@@ -417,8 +481,98 @@ class IptablesManager(object):
             self.execute('%s-restore' % (cmd,), '-c', run_as_root=True,
                          process_input='\n'.join(all_lines),
                          attempts=5)
+
+            for table_name, table in tables.iteritems():
+                if CONF.iptables_differential_apply:
+                    self.applied_digests[(cmd, table_name)] = dict(
+                        (name, self._digest(rules)) for name, rules in
+                        self._wrapped_chain_rules(table,
+                                                  table.chains).iteritems())
+                table.clear_dirty()
         LOG.debug(_("IPTablesManager.apply completed with success"))
 
+    def _wrapped_chain_rules(self, table, chains):
+        """Return the rules of the given wrapped chains of a table, as
+        they end up in iptables after _modify_rules().
+        """
+        top = dict((name, []) for name in chains)
+        bottom = dict((name, []) for name in chains)
+        for rule in table.rules:
+            if rule.wrap and rule.chain in top:
+                (top if rule.top else bottom)[rule.chain].append(str(rule))
+
+        chain_rules = {}
+        for name in chains:
+            # Duplicates are weeded out letting the *last* occurrence
+            # take precedence, like _modify_rules() does.
+            seen = set()
+            rules = []
+            for rule_str in reversed(top[name] + bottom[name]):
+                if rule_str not in seen:
+                    seen.add(rule_str)
+                    rules.append(rule_str)
+            rules.reverse()
+            chain_rules[name] = rules
+        return chain_rules
+
+    def _digest(self, rules):
+        return hashlib.sha1('\n'.join(rules)).hexdigest()
+
+    def _apply_differential(self, cmd, tables):
+        """Rewrite only the wrapped chains whose rules changed since the
+        last apply.  Returns False if a full apply is needed instead: on
+        the first apply, or if any unwrapped chain or rule changed.
+        """
+        lines = []
+        digests = {}
+        for table_name, table in tables.iteritems():
+            applied = self.applied_digests.get((cmd, table_name))
+            if (applied is None or table.unwrapped_dirty or
+                    table.remove_rules or table.remove_chains):
+                return False
+
+            digests[table_name] = new_digests = dict(applied)
+            changed = []
+            chain_rules = self._wrapped_chain_rules(
+                table, table.dirty_chains & table.chains)
+            for name, rules in chain_rules.iteritems():
+                digest = self._digest(rules)
+                if applied.get(name) != digest:
+                    changed.append(name)
+                    new_digests[name] = digest
+            removed = [name for name in table.dirty_chains
+                       if name not in table.chains and name in applied]
+            for name in removed:
+                del new_digests[name]
+            if not changed and not removed:
+                continue
+
+            lines.append('*%s' % table_name)
+            # With --noflush, declaring an existing chain flushes it.
+            lines.extend(':%s-%s - [0:0]' % (binary_name, name)
+                         for name in sorted(changed + removed))
+            for name in sorted(changed):
+                lines.extend(chain_rules[name])
+            lines.extend('-X %s-%s' % (binary_name, name)
+                         for name in sorted(removed))
+            lines.append('COMMIT')
+
+        if lines:
+            try:
+                self.execute('%s-restore' % (cmd,), '-c', '--noflush',
+                             run_as_root=True,
+                             process_input='\n'.join(lines + ['']),
+                             attempts=5)
+            except exception.ProcessExecutionError:
+                LOG.exception(_("Differential %s-restore failed, "
+                                "applying all rules"), cmd)
+                return False
+
+        for table_name, table in tables.iteritems():
+            self.applied_digests[(cmd, table_name)] = digests[table_name]
+            table.clear_dirty()
+        return True
+
     def _find_table(self, lines, table_name):
         if len(lines) < 3:
             # length only <2 when fake iptables
@@ -832,22 +986,39 @@ def get_dhcp_leases(context, network_ref):
     return '\n'.join(hosts)
 
 
-def get_dhcp_hosts(context, network_ref):
-    """Get network's hosts config in dhcp-host format."""
-    hosts = []
+def _get_dhcp_host_entries(context, network_ref, address=None):
+    """Get network's dhcp-host entries, numbered, and their macs, by
+    address.
+    """
+    entries = {}
     host = None
     if network_ref['multi_host']:
         host = CONF.host
-    macs = set()
     for data in db.network_get_associated_fixed_ips(context,
                                                     network_ref['id'],
-                                                    host=host):
-        if data['vif_address'] not in macs:
-            hosts.append(_host_dhcp(data))
-            macs.add(data['vif_address'])
+                                                    host=host,
+                                                    address=address):
+        entries[data['address']] = (_dhcp_host_counter.next(),
+                                    data['vif_address'], _host_dhcp(data))
+    return entries
+
+
+def _format_dhcp_hosts(entries):
+    """Return dhcp-host entries as a hosts file, one entry per mac."""
+    hosts = []
+    macs = set()
+    for _number, mac, host in sorted(entries.itervalues()):
+        if mac not in macs:
+            hosts.append(host)
+            macs.add(mac)
     return '\n'.join(hosts)
 
 
+def get_dhcp_hosts(context, network_ref):
+    """Get network's hosts config in dhcp-host format."""
+    return _format_dhcp_hosts(_get_dhcp_host_entries(context, network_ref))
+
+
 def get_dns_hosts(context, network_ref):
     """Get network's DNS hosts in hosts format."""
     hosts = []
@@ -933,8 +1104,41 @@ def release_dhcp(dev, address, mac_address):
 
 
 def update_dhcp(context, dev, network_ref):
+    _dhcp_hosts[dev] = _get_dhcp_host_entries(context, network_ref)
+    conffile = _dhcp_file(dev, 'conf')
+    write_to_file(conffile, _format_dhcp_hosts(_dhcp_hosts[dev]))
+    restart_dhcp(context, dev, network_ref)
+
+
+def add_dhcp_host(context, dev, network_ref, address):
+    """Add the dhcp-host entry of a newly allocated fixed ip.
+
+    Only the fixed ip at address is looked up and added to the entries
+    of the network; if they are not known yet, this is update_dhcp().
+
+    """
+    entries = _dhcp_hosts.get(dev)
+    if entries is None:
+        return update_dhcp(context, dev, network_ref)
+    entries.update(_get_dhcp_host_entries(context, network_ref, address))
     conffile = _dhcp_file(dev, 'conf')
-    write_to_file(conffile, get_dhcp_hosts(context, network_ref))
+    write_to_file(conffile, _format_dhcp_hosts(entries))
+    restart_dhcp(context, dev, network_ref)
+
+
+def remove_dhcp_host(context, dev, network_ref, address):
+    """Remove the dhcp-host entry of a deallocated fixed ip.
+
+    If the entries of the network are not known yet, this is
+    update_dhcp().
+
+    """
+    entries = _dhcp_hosts.get(dev)
+    if entries is None:
+        return update_dhcp(context, dev, network_ref)
+    entries.pop(address, None)
+    conffile = _dhcp_file(dev, 'conf')
+    write_to_file(conffile, _format_dhcp_hosts(entries))
     restart_dhcp(context, dev, network_ref)
 
 
@@ -945,6 +1149,7 @@ def update_dns(context, dev, network_ref):
 
 
 def update_dhcp_hostfile_with_text(dev, hosts_text):
+    _dhcp_hosts.pop(dev, None)
     conffile = _dhcp_file(dev, 'conf')
     write_to_file(conffile, hosts_text)
 
@@ -960,6 +1165,8 @@ def kill_dhcp(dev):
             _execute('kill', '-9', pid, run_as_root=True)
         else:
             LOG.debug(_('Pid %d is stale, skip killing dnsmasq'), pid)
+    _dhcp_hosts.pop(dev, None)
+    _dhcp_leases.pop(dev, None)
     _remove_dnsmasq_accept_rules(dev)
     _remove_dhcp_mangle_rule(dev)
 
@@ -990,6 +1197,10 @@ def restart_dhcp(context, dev, network_ref):
     # Make sure dnsmasq can actually read it (it setuid()s to "nobody")
     os.chmod(conffile, 0644)
 
+    if CONF.dhcp_lease_listener_interval > 0 and dev not in _dhcp_leases:
+        _dhcp_leases[dev] = _parse_dhcp_leases(get_dhcp_leases(context,
+                                                                network_ref))
+
     pid = _dnsmasq_pid_for(dev)
 
     # if dnsmasq is already running, then tell it to reload
@@ -1024,9 +1235,22 @@ def restart_dhcp(context, dev, network_ref):
                           network_ref['netmask'],
                           CONF.dhcp_lease_time),
            '--dhcp-lease-max=%s' % len(netaddr.IPNetwork(network_ref['cidr'])),
-           '--dhcp-hostsfile=%s' % _dhcp_file(dev, 'conf'),
-           '--dhcp-script=%s' % CONF.dhcpbridge,
-           '--leasefile-ro']
+           '--dhcp-hostsfile=%s' % _dhcp_file(dev, 'conf')]
+
+    if CONF.dhcp_lease_listener_interval > 0:
+        # NOTE: dnsmasq keeps the leases in a file of its own, which
+        #       get_dhcp_lease_changes() reads, instead of running
+        #       nova-dhcpbridge for every lease given out or released.
+        #       The file dnsmasq starts with is what the database knows.
+        leasefile = _dhcp_file(dev, 'leases')
+        leases = get_dhcp_leases(context, network_ref)
+        utils.delete_if_exists(leasefile)
+        write_to_file(leasefile, leases)
+        _dhcp_leases[dev] = _parse_dhcp_leases(leases)
+        cmd.append('--dhcp-leasefile=%s' % leasefile)
+    else:
+        cmd += ['--dhcp-script=%s' % CONF.dhcpbridge,
+                '--leasefile-ro']
 
     # dnsmasq currently gives an error for an empty domain,
     # rather than ignoring.  So only specify it if defined.
@@ -1107,6 +1331,44 @@ def _host_lease(data):
                               data['instance_hostname'] or '*')
 
 
+def _parse_dhcp_leases(leases):
+    """Return the macs of the leases in a leasefile, by address."""
+    parsed = {}
+    for line in leases.splitlines():
+        fields = line.split()
+        # NOTE: dnsmasq also writes a duid line when it serves DHCPv6
+        if len(fields) >= 3:
+            parsed[fields[2]] = fields[1]
+    return parsed
+
+
+def get_dhcp_lease_changes():
+    """Return the addresses leased and released since the last call.
+
+    Compares the leasefile dnsmasq keeps for every device it was started
+    for with dhcp_lease_listener_interval set to the leases it held last
+    time, and returns a tuple of the list of addresses leased and the
+    list of addresses released meanwhile.
+
+    """
+    leased = []
+    released = []
+    for dev, old_leases in _dhcp_leases.items():
+        try:
+            with open(_dhcp_file(dev, 'leases')) as f:
+                leases = _parse_dhcp_leases(f.read())
+        except IOError:
+            continue
+        for address, mac in leases.iteritems():
+            if old_leases.get(address) != mac:
+                leased.append(address)
+        for address in old_leases:
+            if address not in leases:
+                released.append(address)
+        _dhcp_leases[dev] = leases
+    return leased, released
+
+
 def _host_dhcp_network(data):
     return 'NW-%s' % data['vif_id']
 
@@ -45,6 +45,7 @@ topologies.  All of the network commands are issued to a subclass of
 import datetime
 import itertools
 import math
+import random
 import re
 import uuid
 
@@ -127,6 +128,12 @@ network_opts = [
     cfg.IntOpt('cnt_vpn_clients',
                default=0,
                help='Number of addresses reserved for vpn clients'),
+    cfg.IntOpt('fixed_ip_prefetch',
+               default=0,
+               help='Number of free fixed ips of a network a network host '
+                    'looks up at once and hands out in turn, rather than '
+                    'searching the network for a free one for every '
+                    'allocation. 0 means every allocation searches'),
     cfg.IntOpt('fixed_ip_disassociate_timeout',
                default=600,
                help='Seconds after which a deallocated ip is disassociated'),
@@ -173,6 +180,7 @@ CONF.register_opts(network_opts)
 CONF.import_opt('use_ipv6', 'nova.netconf')
 CONF.import_opt('my_ip', 'nova.netconf')
 CONF.import_opt('network_topic', 'nova.network.rpcapi')
+CONF.import_opt('dhcp_lease_listener_interval', 'nova.network.linux_net')
 
 
 class RPCAllocateFixedIP(object):
@@ -297,6 +305,9 @@ class NetworkManager(manager.Manager):
 
         self.servicegroup_api = servicegroup.API()
 
+        # NOTE: free fixed ips of networks looked up ahead, by network id
+        self._free_fixed_ips = {}
+
         # NOTE(tr3buchet: unless manager subclassing NetworkManager has
         #                 already imported ipam, import nova ipam here
         if not hasattr(self, 'ipam'):
@@ -346,6 +357,22 @@ class NetworkManager(manager.Manager):
             if CONF.update_dns_entries:
                 dev = self.driver.get_dev(network)
                 self.driver.update_dns(ctxt, dev, network)
+        if self.DHCP and CONF.dhcp_lease_listener_interval > 0:
+            lease_listener = utils.FixedIntervalLoopingCall(
+                    self._handle_dhcp_lease_changes, ctxt)
+            lease_listener.start(CONF.dhcp_lease_listener_interval)
+
+    def _handle_dhcp_lease_changes(self, context):
+        """Handles the leases dnsmasq gave out and released lately."""
+        leased, released = self.driver.get_dhcp_lease_changes()
+        for handle, addresses in ((self.lease_fixed_ip, leased),
+                                  (self.release_fixed_ip, released)):
+            for address in addresses:
+                try:
+                    handle(context, address)
+                except Exception:
+                    LOG.exception(_('Failed to handle a dhcp lease change '
+                                    'of %s'), address, context=context)
 
     @manager.periodic_task
     def _disassociate_stale_fixed_ips(self, context):
@@ -818,6 +845,33 @@ class NetworkManager(manager.Manager):
         else:
             return True
 
+    def _associate_pool_fixed_ip(self, context, network_id, instance_id):
+        """Associates a free fixed ip of a network with an instance.
+
+        With fixed_ip_prefetch set, free ips are looked up that many at a
+        time and tried in random order, so network hosts allocating from
+        the same network rarely go for the same one.  An ip another host
+        took meanwhile is skipped.
+
+        """
+        elevated = context.elevated()
+        if CONF.fixed_ip_prefetch > 0:
+            free = self._free_fixed_ips.setdefault(network_id, [])
+            for lookup in (False, True):
+                if lookup:
+                    free.extend(self.db.fixed_ip_get_free_by_network(
+                            elevated, network_id, CONF.fixed_ip_prefetch))
+                    random.shuffle(free)
+                while free:
+                    try:
+                        return self.db.fixed_ip_associate_pool(
+                                elevated, network_id, instance_id,
+                                address=free.pop())
+                    except exception.NoMoreFixedIps:
+                        pass
+        return self.db.fixed_ip_associate_pool(elevated, network_id,
+                                               instance_id)
+
     def allocate_fixed_ip(self, context, instance_id, network, **kwargs):
         """Gets a fixed ip from the pool."""
         # TODO(vish): when this is called by compute, we can associate compute
@@ -845,8 +899,8 @@ class NetworkManager(manager.Manager):
                                                          instance_id,
                                                          network['id'])
                 else:
-                    address = self.db.fixed_ip_associate_pool(
-                        context.elevated(), network['id'], instance_id)
+                    address = self._associate_pool_fixed_ip(
+                        context, network['id'], instance_id)
                 self._do_trigger_security_group_members_refresh_for_instance(
                     instance_id)
                 self._do_trigger_security_group_handler(
@@ -867,7 +921,8 @@ class NetworkManager(manager.Manager):
                     name, address, "A", self.instance_dns_domain)
                 self.instance_dns_manager.create_entry(
                     instance_id, address, "A", self.instance_dns_domain)
-            self._setup_network_on_host(context, network)
+            self._setup_network_on_host(context, network,
+                                        fixed_address=address)
 
             QUOTAS.commit(context, reservations)
             return address
@@ -935,7 +990,8 @@ class NetworkManager(manager.Manager):
                 #             callback will get called by nova-dhcpbridge.
                 self.driver.release_dhcp(dev, address, vif['address'])
 
-            self._teardown_network_on_host(context, network)
+            self._teardown_network_on_host(context, network,
+                                           fixed_address=address)
 
         # Commit the reservations
         if reservations:
@@ -1288,12 +1344,19 @@ class NetworkManager(manager.Manager):
         network = self.db.network_get(context, network_id)
         call_func(context, network)
 
-    def _setup_network_on_host(self, context, network):
-        """Sets up network on this host."""
+    def _setup_network_on_host(self, context, network, fixed_address=None):
+        """Sets up network on this host.
+
+        fixed_address is the fixed ip just allocated, if only that changed.
+        """
         raise NotImplementedError()
 
-    def _teardown_network_on_host(self, context, network):
-        """Sets up network on this host."""
+    def _teardown_network_on_host(self, context, network, fixed_address=None):
+        """Sets up network on this host.
+
+        fixed_address is the fixed ip just deallocated, if only that
+        changed.
+        """
         raise NotImplementedError()
 
     def validate_networks(self, context, networks):
@@ -1474,7 +1537,7 @@ class FlatManager(NetworkManager):
                                                      teardown)
         self.db.fixed_ip_disassociate(context, address)
 
-    def _setup_network_on_host(self, context, network):
+    def _setup_network_on_host(self, context, network, fixed_address=None):
         """Setup Network on this host."""
         # NOTE(tr3buchet): this does not need to happen on every ip
         # allocation, this functionality makes more sense in create_network
@@ -1483,7 +1546,7 @@ class FlatManager(NetworkManager):
         net['injected'] = CONF.flat_injected
         self.db.network_update(context, network['id'], net)
 
-    def _teardown_network_on_host(self, context, network):
+    def _teardown_network_on_host(self, context, network, fixed_address=None):
         """Tear down network on this host."""
         pass
 
@@ -1602,7 +1665,7 @@ class FlatDHCPManager(RPCAllocateFixedIP, floating_ips.FloatingIP,
         super(FlatDHCPManager, self).init_host()
         self.init_host_floating_ips()
 
-    def _setup_network_on_host(self, context, network):
+    def _setup_network_on_host(self, context, network, fixed_address=None):
         """Sets up network on this host."""
         network['dhcp_server'] = self._get_dhcp_ip(context, network)
 
@@ -1614,20 +1677,28 @@ class FlatDHCPManager(RPCAllocateFixedIP, floating_ips.FloatingIP,
             dev = self.driver.get_dev(network)
             # NOTE(dprince): dhcp DB queries require elevated context
             elevated = context.elevated()
-            self.driver.update_dhcp(elevated, dev, network)
+            if fixed_address:
+                self.driver.add_dhcp_host(elevated, dev, network,
+                                          fixed_address)
+            else:
+                self.driver.update_dhcp(elevated, dev, network)
             if(CONF.use_ipv6):
                 self.driver.update_ra(context, dev, network)
                 gateway = utils.get_my_linklocal(dev)
                 self.db.network_update(context, network['id'],
                                        {'gateway_v6': gateway})
 
-    def _teardown_network_on_host(self, context, network):
+    def _teardown_network_on_host(self, context, network, fixed_address=None):
         if not CONF.fake_network:
             network['dhcp_server'] = self._get_dhcp_ip(context, network)
             dev = self.driver.get_dev(network)
             # NOTE(dprince): dhcp DB queries require elevated context
             elevated = context.elevated()
-            self.driver.update_dhcp(elevated, dev, network)
+            if fixed_address:
+                self.driver.remove_dhcp_host(elevated, dev, network,
+                                             fixed_address)
+            else:
+                self.driver.update_dhcp(elevated, dev, network)
 
     def _get_network_dict(self, network):
         """Returns the dict representing necessary and meta network fields."""
@@ -1697,9 +1768,9 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
                                                      instance_id,
                                                      network['id'])
             else:
-                address = self.db.fixed_ip_associate_pool(context,
-                                                          network['id'],
-                                                          instance_id)
+                address = self._associate_pool_fixed_ip(context,
+                                                        network['id'],
+                                                        instance_id)
             self._do_trigger_security_group_members_refresh_for_instance(
                                                                    instance_id)
 
@@ -1723,7 +1794,7 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
                                                    "A",
                                                    self.instance_dns_domain)
 
-        self._setup_network_on_host(context, network)
+        self._setup_network_on_host(context, network, fixed_address=address)
         return address
 
     def add_network_to_project(self, context, project_id, network_uuid=None):
@@ -1808,7 +1879,7 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
             self, context, vpn=True, **kwargs)
 
     @lockutils.synchronized('setup_network', 'nova-', external=True)
-    def _setup_network_on_host(self, context, network):
+    def _setup_network_on_host(self, context, network, fixed_address=None):
         """Sets up network on this host."""
         if not network['vpn_public_address']:
             net = {}
@@ -1834,7 +1905,11 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
             dev = self.driver.get_dev(network)
             # NOTE(dprince): dhcp DB queries require elevated context
             elevated = context.elevated()
-            self.driver.update_dhcp(elevated, dev, network)
+            if fixed_address:
+                self.driver.add_dhcp_host(elevated, dev, network,
+                                          fixed_address)
+            else:
+                self.driver.update_dhcp(elevated, dev, network)
             if(CONF.use_ipv6):
                 self.driver.update_ra(context, dev, network)
                 gateway = utils.get_my_linklocal(dev)
@@ -1842,13 +1917,17 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
                                        {'gateway_v6': gateway})
 
     @lockutils.synchronized('setup_network', 'nova-', external=True)
-    def _teardown_network_on_host(self, context, network):
+    def _teardown_network_on_host(self, context, network, fixed_address=None):
         if not CONF.fake_network:
             network['dhcp_server'] = self._get_dhcp_ip(context, network)
             dev = self.driver.get_dev(network)
             # NOTE(dprince): dhcp DB queries require elevated context
             elevated = context.elevated()
-            self.driver.update_dhcp(elevated, dev, network)
+            if fixed_address:
+                self.driver.remove_dhcp_host(elevated, dev, network,
+                                             fixed_address)
+            else:
+                self.driver.update_dhcp(elevated, dev, network)
 
             # NOTE(ethuleau): For multi hosted networks, if the network is no
             # more used on this host and if VPN forwarding rule aren't handed
@@ -1866,7 +1945,7 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
                               'host': None}
                     self.db.fixed_ip_update(context, network['dhcp_server'],
                                             values)
-            else:
+            elif not fixed_address:
                 self.driver.update_dhcp(context, dev, network)
 
     def _get_network_dict(self, network):
@@ -19,6 +19,8 @@
 the system.
 """
 
+import collections
+
 from oslo.config import cfg
 
 from nova.compute import instance_types
@@ -153,11 +155,43 @@ def send_update_with_states(context, instance, old_vm_state, new_vm_state,
                     instance=instance)
 
 
+def send_updates_with_states(context, instances, old_vm_state, new_vm_state,
+        old_task_state, new_task_state, service="compute", host=None):
+    """Send the compute.instance.update notification of
+    send_update_with_states for each of a batch of instances going through
+    the same state change.  The audit period and the bandwidth usage of the
+    instances are looked up once for the whole batch.
+    """
+
+    if not CONF.notify_on_state_change:
+        # skip all this if updates are disabled
+        return
+
+    audit_period = audit_period_bounds(current_period=True)
+    try:
+        bandwidth = bandwidth_usages(instances, audit_period[0])
+    except Exception:
+        LOG.exception(_("Failed to get bandwidth usage of instances"))
+        bandwidth = dict((instance['uuid'], None) for instance in instances)
+
+    for instance in instances:
+        try:
+            _send_instance_update_notification(context, instance,
+                    old_vm_state=old_vm_state, old_task_state=old_task_state,
+                    new_vm_state=new_vm_state, new_task_state=new_task_state,
+                    service=service, host=host, audit_period=audit_period,
+                    bandwidth=bandwidth)
+        except Exception:
+            LOG.exception(_("Failed to send state update notification"),
+                    instance=instance)
+
+
 def _send_instance_update_notification(context, instance, old_vm_state=None,
             old_task_state=None, new_vm_state=None, new_task_state=None,
-            service="compute", host=None):
+            service="compute", host=None, audit_period=None, bandwidth=None):
     """Send 'compute.instance.update' notification to inform observers
-    about instance state changes"""
+    about instance state changes.  audit_period and bandwidth, a dictionary
+    of bandwidth usage by instance uuid, are looked up if not given."""
 
     payload = info_from_instance(context, instance, None, None)
 
@@ -176,12 +210,17 @@ def _send_instance_update_notification(context, instance, old_vm_state=None,
     payload.update(states_payload)
 
     # add audit fields:
-    (audit_start, audit_end) = audit_period_bounds(current_period=True)
+    if audit_period is None:
+        audit_period = audit_period_bounds(current_period=True)
+    (audit_start, audit_end) = audit_period
     payload["audit_period_beginning"] = audit_start
     payload["audit_period_ending"] = audit_end
 
     # add bw usage info:
-    bw = bandwidth_usage(instance, audit_start)
+    if bandwidth is not None:
+        bw = bandwidth[instance['uuid']]
+    else:
+        bw = bandwidth_usage(instance, audit_start)
     payload["bandwidth"] = bw
 
     publisher_id = notifier_api.publisher_id(service, host)
@@ -214,46 +253,71 @@ def bandwidth_usage(instance_ref, audit_start,
     """Get bandwidth usage information for the instance for the
     specified audit period.
     """
+    return bandwidth_usages([instance_ref], audit_start,
+            ignore_missing_network_data)[instance_ref['uuid']]
+
+
+def bandwidth_usages(instance_refs, audit_start,
+        ignore_missing_network_data=True):
+    """Get bandwidth usage information for each of a list of instances for
+    the specified audit period, with one query for all of them.  Returns a
+    dictionary of what bandwidth_usage returns by instance uuid.
+    """
 
     admin_context = nova.context.get_admin_context(read_deleted='yes')
 
-    if (instance_ref.get('info_cache') and
-        instance_ref['info_cache'].get('network_info') is not None):
+    nw_infos = {}
+    for instance_ref in instance_refs:
+        if (instance_ref.get('info_cache') and
+            instance_ref['info_cache'].get('network_info') is not None):
 
-        cached_info = instance_ref['info_cache']['network_info']
-        nw_info = network_model.NetworkInfo.hydrate(cached_info)
-    else:
-        try:
-            nw_info = network.API().get_instance_nw_info(admin_context,
-                    instance_ref)
-        except Exception:
+            cached_info = instance_ref['info_cache']['network_info']
+            nw_info = network_model.NetworkInfo.hydrate(cached_info)
+        else:
             try:
-                with excutils.save_and_reraise_exception():
-                    LOG.exception(_('Failed to get nw_info'),
-                                  instance=instance_ref)
+                nw_info = network.API().get_instance_nw_info(admin_context,
+                        instance_ref)
             except Exception:
-                if ignore_missing_network_data:
-                    return
-                raise
-
-    macs = [vif['address'] for vif in nw_info]
-    uuids = [instance_ref["uuid"]]
-
-    bw_usages = db.bw_usage_get_by_uuids(admin_context, uuids, audit_start)
-    bw_usages = [b for b in bw_usages if b.mac in macs]
-
-    bw = {}
-
-    for b in bw_usages:
-        label = 'net-name-not-found-%s' % b['mac']
-        for vif in nw_info:
-            if vif['address'] == b['mac']:
-                label = vif['network']['label']
-                break
-
-        bw[label] = dict(bw_in=b.bw_in, bw_out=b.bw_out)
-
-    return bw
+                try:
+                    with excutils.save_and_reraise_exception():
+                        LOG.exception(_('Failed to get nw_info'),
+                                      instance=instance_ref)
+                except Exception:
+                    if ignore_missing_network_data:
+                        nw_info = None
+                    else:
+                        raise
+        nw_infos[instance_ref['uuid']] = nw_info
+
+    uuids = [key for key, info in nw_infos.iteritems() if info is not None]
+    bw_usages = collections.defaultdict(list)
+    if uuids:
+        for b in db.bw_usage_get_by_uuids(admin_context, uuids, audit_start):
+            bw_usages[b.uuid].append(b)
+
+    usages = {}
+    for uuid, nw_info in nw_infos.iteritems():
+        if nw_info is None:
+            usages[uuid] = None
+            continue
+
+        macs = [vif['address'] for vif in nw_info]
+        bw = {}
+
+        for b in bw_usages[uuid]:
+            if b.mac not in macs:
+                continue
+            label = 'net-name-not-found-%s' % b['mac']
+            for vif in nw_info:
+                if vif['address'] == b['mac']:
+                    label = vif['network']['label']
+                    break
+
+            bw[label] = dict(bw_in=b.bw_in, bw_out=b.bw_out)
+
+        usages[uuid] = bw
+
+    return usages
 
 
 def image_meta(system_metadata):
@@ -90,6 +90,15 @@ class Client(object):
         self.cache[key] = (self.cache[key][0], str(new_value))
         return new_value
 
+    def decr(self, key, delta=1):
+        """Decrements the value for a key, stopping at 0 like memcached."""
+        value = self.get(key)
+        if value is None:
+            return None
+        new_value = max(0, int(value) - delta)
+        self.cache[key] = (self.cache[key][0], str(new_value))
+        return new_value
+
     def delete(self, key, time=0):
         """Deletes the value associated with a key."""
         if key in self.cache:
@@ -57,6 +57,8 @@ as it allows particular rules to be explicitly disabled.
 """
 
 import abc
+import copy
+import datetime
 import logging
 import re
 import urllib
@@ -71,8 +73,13 @@ LOG = logging.getLogger(__name__)
 
 
 _rules = None
+_compiled_rules = None
 _checks = {}
 
+# Values that can be part of the key of a remembered result
+_FROZEN_TYPES = frozenset([str, unicode, bool, int, long, float,
+                           type(None), datetime.datetime])
+
 
 class Rules(dict):
     """
@@ -128,8 +135,10 @@ def set_rules(rules):
     """Set the rules in use for policy checks."""
 
     global _rules
+    global _compiled_rules
 
     _rules = rules
+    _compiled_rules = compile_rules(rules) if rules else None
 
 
 # Ditto
@@ -137,8 +146,10 @@ def reset():
     """Clear the rules used for policy checks."""
 
     global _rules
+    global _compiled_rules
 
     _rules = None
+    _compiled_rules = None
 
 
 def check(rule, target, creds, exc=None, *args, **kwargs):
@@ -164,15 +175,15 @@ def check(rule, target, creds, exc=None, *args, **kwargs):
     """
 
     # Allow the rule to be a Check tree
-    if isinstance(rule, BaseCheck):
+    if not isinstance(rule, basestring) and isinstance(rule, BaseCheck):
         result = rule(target, creds)
     elif not _rules:
         # No rules to reference means we're going to fail closed
         result = False
     else:
         try:
-            # Evaluate the rule
-            result = _rules[rule](target, creds)
+            # Evaluate the compiled rule
+            result = _compiled_rules[rule](target, creds)
         except KeyError:
             # If the rule doesn't exist, fail closed
             result = False
@@ -184,6 +195,72 @@ def check(rule, target, creds, exc=None, *args, **kwargs):
     return result
 
 
+class ResultCache(object):
+    """
+    Remembers the results of policy checks for one set of credentials,
+    e.g. for the duration of a request, which often checks the same
+    rules against the same target many times.  The results are
+    forgotten when the rules or the credentials change.
+    """
+
+    max_results = 256
+
+    def __init__(self):
+        """Initialize the ResultCache."""
+
+        self.rules = None
+        self.creds = None
+        self.results = {}
+
+    def check(self, rule, target, creds, exc=None, *args, **kwargs):
+        """
+        Like check(), but returns the remembered result if the rule was
+        already checked against an equal target.
+        """
+
+        if self.rules is not _rules or self.creds != creds:
+            self.rules = _rules
+            # Credentials can be changed in place, e.g. their roles
+            self.creds = copy.deepcopy(creds)
+            self.results = {}
+
+        try:
+            key = (rule, _freeze(target))
+        except TypeError:
+            # Can't tell whether we've seen it before
+            return check(rule, target, creds, exc, *args, **kwargs)
+
+        try:
+            result = self.results[key]
+        except KeyError:
+            result = check(rule, target, creds)
+            if len(self.results) >= self.max_results:
+                self.results.clear()
+            self.results[key] = result
+
+        if exc and result is False:
+            raise exc(*args, **kwargs)
+
+        return result
+
+
+def _freeze(value):
+    """
+    Make a hashable copy of a target.  Raises TypeError for values which
+    might change without comparing unequal, such as database models.
+    """
+
+    value_type = type(value)
+    if value_type in _FROZEN_TYPES:
+        # True == 1, but they are substituted into checks differently
+        return value_type, value
+    elif isinstance(value, dict):
+        return frozenset([(k, _freeze(v)) for k, v in value.iteritems()])
+    elif isinstance(value, (list, tuple)):
+        return tuple([_freeze(v) for v in value])
+    raise TypeError(value)
+
+
 class BaseCheck(object):
     """
     Abstract base class for Check classes.
@@ -777,3 +854,146 @@ class GenericCheck(Check):
         if self.kind in creds:
             return match == unicode(creds[self.kind])
         return False
+
+
+def _accept(target, creds):
+    """Compiled form of TrueCheck."""
+
+    return True
+
+
+def _reject(target, creds):
+    """Compiled form of FalseCheck."""
+
+    return False
+
+
+def compile_rules(rules):
+    """
+    Compiles a Rules store into a Rules store of functions taking the
+    target and credentials, which give the same results as the Check
+    trees but are cheaper to evaluate: rule references are resolved
+    once, nested "and" and "or" checks are flattened and constant
+    checks are folded away.
+    """
+
+    compiled = Rules(default_rule=getattr(rules, 'default_rule', None))
+    for name in rules:
+        _compile_rule(name, rules, compiled)
+
+    return compiled
+
+
+def _compile_rule(name, rules, compiled):
+    """Compile the rule called name, unless it already was."""
+
+    if name in compiled:
+        return compiled[name]
+
+    try:
+        check = rules[name]
+    except KeyError:
+        # We don't have any matching rule; fail closed
+        return _reject
+
+    if name not in rules:
+        # Resolved to the default rule
+        return _compile_rule(rules.default_rule, rules, compiled)
+
+    # Rules referring back to this one get it once it is compiled
+    compiled[name] = lambda target, creds: compiled[name](target, creds)
+    compiled[name] = _compile_check(check, rules, compiled)
+
+    return compiled[name]
+
+
+def _flatten_checks(check_class, checks):
+    """Merge checks of the same "and" or "or" kind into their parent."""
+
+    for check in checks:
+        if isinstance(check, check_class):
+            for subcheck in _flatten_checks(check_class, check.rules):
+                yield subcheck
+        else:
+            yield check
+
+
+def _compile_check(check, rules, compiled):
+    """Translate a Check tree into a function."""
+
+    if isinstance(check, TrueCheck):
+        return _accept
+    elif isinstance(check, FalseCheck):
+        return _reject
+    elif isinstance(check, NotCheck):
+        func = _compile_check(check.rule, rules, compiled)
+        if func is _accept:
+            return _reject
+        elif func is _reject:
+            return _accept
+        return lambda target, creds: not func(target, creds)
+    elif isinstance(check, AndCheck):
+        funcs = []
+        for subcheck in _flatten_checks(AndCheck, check.rules):
+            func = _compile_check(subcheck, rules, compiled)
+            if func is _reject:
+                return _reject
+            elif func is not _accept:
+                funcs.append(func)
+        if not funcs:
+            return _accept
+
+        def and_check(target, creds):
+            for func in funcs:
+                if not func(target, creds):
+                    return False
+            return True
+
+        return and_check
+    elif isinstance(check, OrCheck):
+        funcs = []
+        for subcheck in _flatten_checks(OrCheck, check.rules):
+            func = _compile_check(subcheck, rules, compiled)
+            if func is _accept:
+                return _accept
+            elif func is not _reject:
+                funcs.append(func)
+        if not funcs:
+            return _reject
+
+        def or_check(target, creds):
+            for func in funcs:
+                if func(target, creds):
+                    return True
+            return False
+
+        return or_check
+    elif type(check) is RuleCheck:
+        func = _compile_rule(check.match, rules, compiled)
+        if func in (_accept, _reject):
+            return func
+
+        def rule_check(target, creds):
+            try:
+                return func(target, creds)
+            except KeyError:
+                # Same as RuleCheck: fail closed
+                return False
+
+        return rule_check
+    elif type(check) is RoleCheck:
+        role = check.match.lower()
+        return lambda target, creds: role in [x.lower()
+                                              for x in creds['roles']]
+    elif type(check) is GenericCheck:
+        kind = check.kind
+        match = check.match
+        if '%' in match:
+            return lambda target, creds: (kind in creds and
+                                          match % target ==
+                                          unicode(creds[kind]))
+        return lambda target, creds: (kind in creds and
+                                      match == unicode(creds[kind]))
+
+    # Registered checks are evaluated as they are
+    return check
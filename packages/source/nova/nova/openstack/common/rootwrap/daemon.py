@@ -0,0 +1,306 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Rootwrap daemon: runs the commands allowed by the rootwrap filters for a
+client over a UNIX socket, so that each command doesn't need to start sudo
+and a Python interpreter which loads the filters again.
+
+The daemon is started by the client (with sudo), writes the address of its
+socket and a random key to stdout, and exits when its stdin is closed, i.e.
+when the client exits.  The socket is only accessible to the user who
+started the daemon, and clients also have to prove they know the key
+before they can send commands.
+
+Messages are JSON documents preceded by their length.  The client sends
+{"cmd": [...], "stdin": ...} and the daemon replies with
+{"returncode": ..., "stdout": ..., "stderr": ...}, the streams being base64
+encoded.  The return codes and messages of the rootwrap errors are the
+same as nova-rootwrap's.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import shutil
+import signal
+import socket
+import SocketServer
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+
+from nova.openstack.common.rootwrap import wrapper
+
+
+RC_UNAUTHORIZED = 99
+RC_NOEXECFOUND = 96
+
+_LENGTH = struct.Struct('!I')
+
+
+class DaemonError(Exception):
+    """Raised when the daemon can't be started or talked to."""
+    pass
+
+
+def send_message(sock, message):
+    """Send a JSON message on a socket."""
+    data = json.dumps(message)
+    sock.sendall(_LENGTH.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, length):
+    chunks = []
+    while length:
+        chunk = sock.recv(length)
+        if not chunk:
+            raise DaemonError('Connection closed')
+        chunks.append(chunk)
+        length -= len(chunk)
+    return ''.join(chunks)
+
+
+def recv_message(sock):
+    """Receive a JSON message from a socket."""
+    length, = _LENGTH.unpack(_recv_exactly(sock, _LENGTH.size))
+    return json.loads(_recv_exactly(sock, length))
+
+
+def _digest(authkey, challenge):
+    return hmac.new(authkey, challenge, hashlib.sha256).hexdigest()
+
+
+def _equal(a, b):
+    """Compare strings in time independent of where they differ."""
+    if len(a) != len(b):
+        return False
+    result = 0
+    for x, y in zip(a, b):
+        result |= ord(x) ^ ord(y)
+    return result == 0
+
+
+def _subprocess_setup():
+    # Python installs a SIGPIPE handler by default. This is usually not what
+    # non-Python subprocesses expect.
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+
+def run_command(config, filters, userargs, stdin=None):
+    """
+    Run userargs if it matches any of the filters, like nova-rootwrap
+    does.  Returns a (returncode, stdout, stderr) tuple.
+    """
+    try:
+        filtermatch = wrapper.match_filter(filters, userargs,
+                                           exec_dirs=config.exec_dirs)
+        command = filtermatch.get_command(userargs,
+                                          exec_dirs=config.exec_dirs)
+        if config.use_syslog:
+            logging.info("(daemon) Executing %s (filter match = %s)" % (
+                command, filtermatch.name))
+
+        obj = subprocess.Popen(command,
+                               stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               close_fds=True,
+                               preexec_fn=_subprocess_setup,
+                               env=filtermatch.get_environment(userargs))
+        stdout, stderr = obj.communicate(stdin)
+        return obj.returncode, stdout, stderr
+
+    except wrapper.FilterMatchNotExecutable as exc:
+        msg = ("Executable not found: %s (filter match = %s)"
+               % (exc.match.exec_path, exc.match.name))
+        returncode = RC_NOEXECFOUND
+
+    except wrapper.NoFilterMatched:
+        msg = ("Unauthorized command: %s (no filter matched)"
+               % ' '.join(userargs))
+        returncode = RC_UNAUTHORIZED
+
+    if config.use_syslog:
+        logging.error(msg)
+    return returncode, '', "nova-rootwrap: %s\n" % msg
+
+
+class _RequestHandler(SocketServer.BaseRequestHandler):
+    """Authenticates a client, then runs its commands until it leaves."""
+
+    def handle(self):
+        challenge = os.urandom(32).encode('hex')
+        try:
+            send_message(self.request, challenge)
+            if not _equal(recv_message(self.request),
+                          _digest(self.server.authkey, challenge)):
+                logging.error("Rootwrap daemon client failed to "
+                              "authenticate")
+                return
+
+            while True:
+                request = recv_message(self.request)
+                stdin = request.get('stdin')
+                if stdin is not None:
+                    stdin = base64.b64decode(stdin)
+                returncode, stdout, stderr = run_command(
+                    self.server.config, self.server.filters,
+                    [arg.encode('utf-8') for arg in request['cmd']], stdin)
+                send_message(self.request,
+                             {'returncode': returncode,
+                              'stdout': base64.b64encode(stdout),
+                              'stderr': base64.b64encode(stderr)})
+        except (DaemonError, socket.error, ValueError, KeyError):
+            # Client went away or sent garbage
+            pass
+
+
+class _Server(SocketServer.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def daemon_start(config, filters):
+    """
+    Serve commands on a new UNIX socket until stdin is closed.  The
+    socket's address and key are written as a JSON line to stdout.
+    """
+    tempdir = tempfile.mkdtemp(prefix='nova-rootwrap-')
+    try:
+        address = os.path.join(tempdir, 'rootwrap.sock')
+        server = _Server(address, _RequestHandler)
+        server.config = config
+        server.filters = filters
+        server.authkey = os.urandom(32).encode('hex')
+
+        # Only the user who started the daemon with sudo can connect.
+        os.chmod(address, 0600)
+        if 'SUDO_UID' in os.environ:
+            uid = int(os.environ['SUDO_UID'])
+            gid = int(os.environ.get('SUDO_GID', -1))
+            os.chown(tempdir, uid, gid)
+            os.chown(address, uid, gid)
+
+        def wait_for_client_exit():
+            sys.stdin.read()
+            server.shutdown()
+
+        watcher = threading.Thread(target=wait_for_client_exit)
+        watcher.daemon = True
+        watcher.start()
+
+        sys.stdout.write(json.dumps({'address': address,
+                                     'authkey': server.authkey}) + '\n')
+        sys.stdout.flush()
+        server.serve_forever()
+        server.server_close()
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+
+class Client(object):
+    """
+    Runs commands through a rootwrap daemon, which is started with the
+    given command on first use and again if it exits.
+    """
+
+    def __init__(self, command):
+        self.command = command
+        self.process = None
+        self.address = None
+        self.authkey = None
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def _start(self):
+        self.stop()
+        process = subprocess.Popen(self.command,
+                                   stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE,
+                                   close_fds=True,
+                                   preexec_fn=_subprocess_setup)
+        line = process.stdout.readline()
+        try:
+            info = json.loads(line)
+            self.address = info['address']
+            self.authkey = str(info['authkey'])
+        except (ValueError, KeyError):
+            process.stdin.close()
+            process.wait()
+            raise DaemonError('Failed to start %s: %r' %
+                              (' '.join(self.command), line))
+        self.process = process
+
+    def stop(self):
+        """Stop the daemon, if it runs."""
+        for sock in self.idle:
+            sock.close()
+        self.idle = []
+        if self.process is not None:
+            # The daemon exits when its stdin is closed
+            self.process.stdin.close()
+            self.process.wait()
+            self.process = None
+
+    def _connect(self):
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self._start()
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.address)
+                challenge = recv_message(sock)
+                send_message(sock, _digest(self.authkey, str(challenge)))
+            except (DaemonError, socket.error, ValueError) as exc:
+                sock.close()
+                raise DaemonError('Failed to connect to %s: %s' %
+                                  (self.address, exc))
+            return sock
+
+    def execute(self, cmd, stdin=None):
+        """
+        Run cmd through the daemon.  Returns a (returncode, stdout, stderr)
+        tuple.
+        """
+        if self.process is not None and self.process.poll() is not None:
+            # The daemon exited, and its connections are gone with it
+            self.stop()
+
+        if self.idle:
+            sock = self.idle.pop()
+        else:
+            sock = self._connect()
+
+        request = {'cmd': cmd}
+        if stdin is not None:
+            request['stdin'] = base64.b64encode(stdin)
+        try:
+            send_message(sock, request)
+            reply = recv_message(sock)
+        except (DaemonError, socket.error, ValueError) as exc:
+            sock.close()
+            raise DaemonError('Lost connection to %s: %s' %
+                              (self.address, exc))
+
+        self.idle.append(sock)
+        return (reply['returncode'], base64.b64decode(reply['stdout']),
+                base64.b64decode(reply['stderr']))
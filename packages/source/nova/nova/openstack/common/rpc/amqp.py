@@ -220,12 +220,15 @@ class ReplyProxy(ConnectionContext):
 
 
 def msg_reply(conf, msg_id, reply_q, connection_pool, reply=None,
-              failure=None, ending=False, log_failure=True):
+              failure=None, ending=False, log_failure=True, serializer=None):
     """Sends a reply or an error on the channel signified by msg_id.
 
-    Failure should be a sys.exc_info() tuple.
+    Failure should be a sys.exc_info() tuple.  The reply is encoded with
+    the named serializer, by default JSON, which every caller understands.
 
     """
+    if serializer is None:
+        serializer = 'json'
     with ConnectionContext(conf, connection_pool) as conn:
         if failure:
             failure = rpc_common.serialize_remote_exception(failure,
@@ -245,9 +248,11 @@ def msg_reply(conf, msg_id, reply_q, connection_pool, reply=None,
         # Otherwise use the msg_id for backward compatibilty.
         if reply_q:
             msg['_msg_id'] = msg_id
-            conn.direct_send(reply_q, rpc_common.serialize_msg(msg))
+            conn.direct_send(reply_q, rpc_common.serialize_msg(
+                    msg, serializer=serializer))
         else:
-            conn.direct_send(msg_id, rpc_common.serialize_msg(msg))
+            conn.direct_send(msg_id, rpc_common.serialize_msg(
+                    msg, serializer=serializer))
 
 
 class RpcContext(rpc_common.CommonRpcContext):
@@ -255,6 +260,7 @@ class RpcContext(rpc_common.CommonRpcContext):
     def __init__(self, **kwargs):
         self.msg_id = kwargs.pop('msg_id', None)
         self.reply_q = kwargs.pop('reply_q', None)
+        self.serializer = kwargs.pop('serializer', None)
         self.conf = kwargs.pop('conf')
         super(RpcContext, self).__init__(**kwargs)
 
@@ -263,13 +269,14 @@ class RpcContext(rpc_common.CommonRpcContext):
         values['conf'] = self.conf
         values['msg_id'] = self.msg_id
         values['reply_q'] = self.reply_q
+        values['serializer'] = self.serializer
         return self.__class__(**values)
 
     def reply(self, reply=None, failure=None, ending=False,
               connection_pool=None, log_failure=True):
         if self.msg_id:
             msg_reply(self.conf, self.msg_id, self.reply_q, connection_pool,
-                      reply, failure, ending, log_failure)
+                      reply, failure, ending, log_failure, self.serializer)
             if ending:
                 self.msg_id = None
 
@@ -286,6 +293,8 @@ def unpack_context(conf, msg):
             context_dict[key[9:]] = value
     context_dict['msg_id'] = msg.pop('_msg_id', None)
     context_dict['reply_q'] = msg.pop('_reply_q', None)
+    context_dict['serializer'] = msg.pop(rpc_common._REPLY_SERIALIZER_KEY,
+                                         None)
     context_dict['conf'] = conf
     ctx = RpcContext.from_dict(context_dict)
     rpc_common._safe_log(LOG.debug, _('unpacked context: %s'), ctx.to_dict())
@@ -661,7 +670,9 @@ def notify(conf, context, topic, msg, connection_pool, envelope):
     pack_context(msg, context)
     with ConnectionContext(conf, connection_pool) as conn:
         if envelope:
-            msg = rpc_common.serialize_msg(msg, force_envelope=True)
+            # Notifications are read by other projects, keep them JSON.
+            msg = rpc_common.serialize_msg(msg, force_envelope=True,
+                                           serializer='json')
         conn.notify_send(topic, msg)
 
 
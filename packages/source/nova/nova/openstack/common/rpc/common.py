@@ -28,6 +28,7 @@ from nova.openstack.common import importutils
 from nova.openstack.common import jsonutils
 from nova.openstack.common import local
 from nova.openstack.common import log as logging
+from nova.openstack.common.rpc import serializer as rpc_serializer
 
 
 CONF = cfg.CONF
@@ -63,11 +64,29 @@ payload.
 We will JSON encode the application message payload.  The message envelope,
 which includes the JSON encoded application message body, will be passed down
 to the messaging libraries as a dict.
+
+Version 2.1 adds an optional key naming another encoding of the payload (see
+rpc.serializer):
+
+    {
+        'oslo.version': '2.1',
+        'oslo.serializer': <Serializer Name, such as 'msgpack'>,
+        'oslo.message': <Application Message Payload, so encoded>
+    }
+
+JSON encoded messages are still sent as version 2.0, so they can be read by
+endpoints which only know version 2.0.
 '''
-_RPC_ENVELOPE_VERSION = '2.0'
+_RPC_ENVELOPE_VERSION = '2.1'
+_JSON_ENVELOPE_VERSION = '2.0'
 
 _VERSION_KEY = 'oslo.version'
 _MESSAGE_KEY = 'oslo.message'
+_SERIALIZER_KEY = 'oslo.serializer'
+
+# Key under which deserialize_msg() records the serializer of a message that
+# did not use JSON, so that the reply can use it too.
+_REPLY_SERIALIZER_KEY = '_serializer'
 
 
 # TODO(russellb) Turn this on after Grizzly.
@@ -143,6 +162,11 @@ class UnsupportedRpcEnvelopeVersion(RPCException):
                 "not supported by this endpoint.")
 
 
+class UnsupportedRpcSerializer(RPCException):
+    message = _("Specified RPC serializer, %(serializer)s, "
+                "not supported by this endpoint.")
+
+
 class Connection(object):
     """A connection, returned by rpc.create_connection().
 
@@ -441,16 +465,31 @@ def version_is_compatible(imp_version, version):
     return True
 
 
-def serialize_msg(raw_msg, force_envelope=False):
-    if not _SEND_RPC_ENVELOPE and not force_envelope:
-        return raw_msg
+def serialize_msg(raw_msg, force_envelope=False, serializer=None):
+    """Wrap a message in an envelope, if one is needed.
+
+    :param serializer: name of the payload encoding, by default the one set
+                       by the rpc_serializer option.  Replies pass the
+                       encoding of the request.
+    """
+    serializer = rpc_serializer.get_serializer(serializer)
+    if serializer is None:
+        # The request came in an encoding we are unable to produce; that
+        # cannot happen as deserialize_msg() would have failed first.
+        serializer = rpc_serializer.get_serializer('json')
+
+    if serializer.name == 'json':
+        if not _SEND_RPC_ENVELOPE and not force_envelope:
+            return raw_msg
 
-    # NOTE(russellb) See the docstring for _RPC_ENVELOPE_VERSION for more
-    # information about this format.
-    msg = {_VERSION_KEY: _RPC_ENVELOPE_VERSION,
-           _MESSAGE_KEY: jsonutils.dumps(raw_msg)}
+        # NOTE(russellb) See the docstring for _RPC_ENVELOPE_VERSION for more
+        # information about this format.
+        return {_VERSION_KEY: _JSON_ENVELOPE_VERSION,
+                _MESSAGE_KEY: jsonutils.dumps(raw_msg)}
 
-    return msg
+    return {_VERSION_KEY: _RPC_ENVELOPE_VERSION,
+            _SERIALIZER_KEY: serializer.name,
+            _MESSAGE_KEY: serializer.dumps(raw_msg)}
 
 
 def deserialize_msg(msg):
@@ -492,6 +531,13 @@ def deserialize_msg(msg):
     if not version_is_compatible(_RPC_ENVELOPE_VERSION, msg[_VERSION_KEY]):
         raise UnsupportedRpcEnvelopeVersion(version=msg[_VERSION_KEY])
 
-    raw_msg = jsonutils.loads(msg[_MESSAGE_KEY])
+    serializer_name = msg.get(_SERIALIZER_KEY, 'json')
+    serializer = rpc_serializer.get_serializer(serializer_name)
+    if serializer is None:
+        raise UnsupportedRpcSerializer(serializer=serializer_name)
+
+    raw_msg = serializer.loads(msg[_MESSAGE_KEY])
+    if serializer_name != 'json' and isinstance(raw_msg, dict):
+        raw_msg[_REPLY_SERIALIZER_KEY] = serializer_name
 
     return raw_msg
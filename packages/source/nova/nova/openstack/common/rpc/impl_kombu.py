@@ -90,6 +90,14 @@ kombu_opts = [
                 help='use H/A queues in RabbitMQ (x-ha-policy: all).'
                      'You need to wipe RabbitMQ database when '
                      'changing this option.'),
+    cfg.BoolOpt('rabbit_reuse_channels',
+                default=False,
+                help='Keep the channel and topic publishers of pooled '
+                     'connections that only send messages, instead of '
+                     'reopening the channel and redeclaring the exchange '
+                     'for every message.  Best combined with '
+                     'amqp_rpc_single_reply_queue, so calls do not need '
+                     'a consumer of their own.'),
 
 ]
 
@@ -408,6 +416,9 @@ class Connection(object):
         # max retry-interval = 30 seconds
         self.interval_max = 30
         self.memory_transport = False
+        # { (topic, publisher options) : TopicPublisher } of the current
+        # channel, only used with rabbit_reuse_channels.
+        self.publishers = {}
 
         if server_params is None:
             server_params = {}
@@ -494,6 +505,7 @@ class Connection(object):
         self.consumer_num = itertools.count(1)
         self.connection.connect()
         self.channel = self.connection.channel()
+        self.publishers = {}
         # work around 'memory' transport bug in 1.1.3
         if self.memory_transport:
             self.channel._new_queue('ae.undeliver')
@@ -590,10 +602,16 @@ class Connection(object):
 
     def reset(self):
         """Reset a connection so it can be used again"""
+        if (self.conf.rabbit_reuse_channels and not self.consumers and
+                not self.proxy_callbacks and self.consumer_thread is None):
+            # Nothing but publishers used the channel, keep it for the
+            # next user of the connection.
+            return
         self.cancel_consumer_thread()
         self.wait_on_proxy_callbacks()
         self.channel.close()
         self.channel = self.connection.channel()
+        self.publishers = {}
         # work around 'memory' transport bug in 1.1.3
         if self.memory_transport:
             self.channel._new_queue('ae.undeliver')
@@ -671,7 +689,16 @@ class Connection(object):
                           "'%(topic)s': %(err_str)s") % log_info)
 
         def _publish():
-            publisher = cls(self.conf, self.channel, topic, **kwargs)
+            if cls is TopicPublisher and self.conf.rabbit_reuse_channels:
+                # The topic exchange is durable, so declaring it once per
+                # channel is enough.
+                key = (topic, tuple(sorted(kwargs.items())))
+                publisher = self.publishers.get(key)
+                if publisher is None:
+                    publisher = cls(self.conf, self.channel, topic, **kwargs)
+                    self.publishers[key] = publisher
+            else:
+                publisher = cls(self.conf, self.channel, topic, **kwargs)
             publisher.send(msg, timeout)
 
         self.ensure(_error_callback, _publish)
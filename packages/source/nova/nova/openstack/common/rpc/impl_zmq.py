@@ -14,6 +14,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import logging
 import os
 import pprint
 import socket
@@ -67,6 +68,13 @@ zmq_opts = [
                help='Maximum number of ingress messages to locally buffer '
                     'per topic. Default is unlimited.'),
 
+    cfg.IntOpt('rpc_zmq_batch_size', default=1,
+               help='Maximum number of messages a consumer takes from its '
+                    'socket per wakeup. The messages of a batch are '
+                    'dispatched one after the other by a single '
+                    'greenthread, so a slow method delays the rest of '
+                    'its batch.'),
+
     cfg.StrOpt('rpc_zmq_ipc_dir', default='/var/run/openstack',
                help='Directory for holding IPC sockets'),
 
@@ -198,10 +206,24 @@ class ZmqSocket(object):
             LOG.error("ZeroMQ socket could not be closed.")
         self.sock = None
 
-    def recv(self):
+    def recv(self, copy=True):
         if not self.can_recv:
             raise RPCException(_("You cannot recv on this socket."))
-        return self.sock.recv_multipart()
+        return self.sock.recv_multipart(copy=copy)
+
+    def recv_batch(self, size, copy=True):
+        """Wait for a message, then take up to size - 1 more which are
+        already queued on the socket.
+        """
+        batch = [self.recv(copy=copy)]
+        while len(batch) < size:
+            try:
+                batch.append(self.sock.recv_multipart(zmq.NOBLOCK, copy=copy))
+            except zmq.ZMQError, e:
+                if e.errno != zmq.EAGAIN:
+                    raise
+                break
+        return batch
 
     def send(self, data):
         if not self.can_send:
@@ -225,7 +247,8 @@ class ZmqClient(object):
                            (msg_id, topic, 'cast', _serialize(data))))
             return
 
-        rpc_envelope = rpc_common.serialize_msg(data[1], envelope)
+        rpc_envelope = rpc_common.serialize_msg(data[1], envelope,
+                                                serializer='json')
         zmq_msg = reduce(lambda x, y: x + y, rpc_envelope.items())
         self.outq.send(map(bytes,
                        (msg_id, topic, 'impl_zmq_v2', data[0]) + zmq_msg))
@@ -365,6 +388,7 @@ class ZmqBaseReactor(ConsumerBase):
         self.subscribe = {}
 
         self.pool = eventlet.greenpool.GreenPool(conf.rpc_thread_pool_size)
+        self.batch_size = max(1, conf.rpc_zmq_batch_size)
 
     def register(self, proxy, in_addr, zmq_type_in, out_addr=None,
                  zmq_type_out=None, in_bind=True, out_bind=True,
@@ -435,13 +459,18 @@ class ZmqProxy(ZmqBaseReactor):
         self.topic_proxy = {}
 
     def consume(self, sock):
-        ipc_dir = CONF.rpc_zmq_ipc_dir
+        # The frames are relayed as they are, without copying them into
+        # strings; only the topic frame is read.
+        for data in sock.recv_batch(self.batch_size, copy=False):
+            self._relay(data)
 
-        #TODO(ewindisch): use zero-copy (i.e. references, not copying)
-        data = sock.recv()
-        topic = data[1]
+    def _relay(self, data):
+        ipc_dir = CONF.rpc_zmq_ipc_dir
+        topic = data[1].bytes
 
-        LOG.debug(_("CONSUMER GOT %s"), ' '.join(map(pformat, data)))
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug(_("CONSUMER GOT %s"),
+                      ' '.join(pformat(frame.bytes) for frame in data))
 
         if topic.startswith('fanout~'):
             sock_type = zmq.PUB
@@ -477,8 +506,7 @@ class ZmqProxy(ZmqBaseReactor):
                 while(True):
                     data = self.topic_proxy[topic].get()
                     out_sock.send(data)
-                    LOG.debug(_("ROUTER RELAY-OUT SUCCEEDED %(data)s") %
-                              {'data': data})
+                    LOG.debug(_("ROUTER RELAY-OUT SUCCEEDED %s"), topic)
 
             wait_sock_creation = eventlet.event.Event()
             eventlet.spawn(publisher, wait_sock_creation)
@@ -491,8 +519,7 @@ class ZmqProxy(ZmqBaseReactor):
 
         try:
             self.topic_proxy[topic].put_nowait(data)
-            LOG.debug(_("ROUTER RELAY-OUT QUEUED %(data)s") %
-                      {'data': data})
+            LOG.debug(_("ROUTER RELAY-OUT QUEUED %s"), topic)
         except eventlet.queue.Full:
             LOG.error(_("Local per-topic backlog buffer full for topic "
                         "%(topic)s. Dropping message.") % {'topic': topic})
@@ -555,17 +582,21 @@ class ZmqReactor(ZmqBaseReactor):
         super(ZmqReactor, self).__init__(conf)
 
     def consume(self, sock):
-        #TODO(ewindisch): use zero-copy (i.e. references, not copying)
-        data = sock.recv()
-        LOG.debug(_("CONSUMER RECEIVED DATA: %s"), data)
         if sock in self.mapping:
-            LOG.debug(_("ROUTER RELAY-OUT %(data)s") % {
-                'data': data})
-            self.mapping[sock].send(data)
+            for data in sock.recv_batch(self.batch_size, copy=False):
+                LOG.debug(_("ROUTER RELAY-OUT %s"), data[1].bytes)
+                self.mapping[sock].send(data)
             return
 
-        proxy = self.proxies[sock]
+        batch = sock.recv_batch(self.batch_size)
+        LOG.debug(_("CONSUMER RECEIVED %d MESSAGE(S)"), len(batch))
 
+        # Messages are only decoded by the greenthread dispatching them,
+        # so this greenthread gets straight back to the socket.
+        self.pool.spawn_n(self._process_batch, self.proxies[sock], batch)
+
+    def _unpack(self, data):
+        """Return the context and request of a received message."""
         if data[2] == 'cast':  # Legacy protocol
             packenv = data[3]
 
@@ -582,9 +613,18 @@ class ZmqReactor(ZmqBaseReactor):
             ctx = RpcContext.unmarshal(data[3])
         else:
             LOG.error(_("ZMQ Envelope version unsupported or unknown."))
-            return
+            return None, None
+        return ctx, request
 
-        self.pool.spawn_n(self.process, proxy, ctx, request)
+    def _process_batch(self, proxy, batch):
+        for data in batch:
+            try:
+                ctx, request = self._unpack(data)
+                if request is not None:
+                    self.process(proxy, ctx, request)
+            except Exception:
+                # Do not let one message take the rest of the batch down.
+                LOG.exception(_("Exception during message handling"))
 
 
 class Connection(rpc_common.Connection):
@@ -741,7 +781,8 @@ def _multi_send(method, context, topic, msg, timeout=None,
     message to all relevant hosts.
     """
     conf = CONF
-    LOG.debug(_("%(msg)s") % {'msg': ' '.join(map(pformat, (topic, msg)))})
+    if LOG.isEnabledFor(logging.DEBUG):
+        LOG.debug(' '.join(map(pformat, (topic, msg))))
 
     queues = _get_matchmaker().queues(topic)
     LOG.debug(_("Sending message(s) to: %s"), queues)
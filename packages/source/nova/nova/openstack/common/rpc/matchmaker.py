@@ -21,6 +21,7 @@ return keys for direct exchanges, per (approximate) AMQP parlance.
 import contextlib
 import itertools
 import json
+import time
 
 import eventlet
 from oslo.config import cfg
@@ -40,6 +41,12 @@ matchmaker_opts = [
     cfg.IntOpt('matchmaker_heartbeat_ttl',
                default=600,
                help='Heartbeat time-to-live.'),
+    cfg.IntOpt('matchmaker_cache_ttl',
+               default=30,
+               help='Seconds to cache the hosts a topic resolves to, '
+                    'instead of looking them up for every message. '
+                    'Round-robin lookups are never cached. 0 disables '
+                    'the cache.'),
 ]
 
 CONF = cfg.CONF
@@ -58,6 +65,10 @@ class Exchange(object):
     Implements lookups.
     Subclass this to support hashtables, dns, etc.
     """
+    # Whether run() returns the same result for a key until the
+    # registrations change, so MatchMakerBase may cache it.
+    cacheable = True
+
     def __init__(self):
         pass
 
@@ -85,6 +96,8 @@ class MatchMakerBase(object):
     def __init__(self):
         # Array of tuples. Index [2] toggles negation, [3] is last-if-true
         self.bindings = []
+        # { key: (expiry time, workers) }
+        self._cache = {}
 
         self.no_heartbeat_msg = _('Matchmaker does not implement '
                                   'registration or heartbeat.')
@@ -153,19 +166,34 @@ class MatchMakerBase(object):
     #    self.bindings.append((binding, rule, True, last))
 
     def queues(self, key):
+        ttl = CONF.matchmaker_cache_ttl
+        if ttl > 0:
+            cached = self._cache.get(key)
+            if cached and cached[0] > time.time():
+                return list(cached[1])
+
         workers = []
+        cacheable = True
 
         # bit is for negate bindings - if we choose to implement it.
         # last stops processing rules if this matches.
         for (binding, exchange, bit, last) in self.bindings:
             if binding.test(key):
                 workers.extend(exchange.run(key))
+                cacheable = cacheable and exchange.cacheable
 
                 # Support last.
                 if last:
-                    return workers
+                    break
+
+        if ttl > 0 and cacheable:
+            self._cache[key] = (time.time() + ttl, list(workers))
         return workers
 
+    def flush_cache(self):
+        """Forget all cached lookups."""
+        self._cache = {}
+
 
 class HeartbeatMatchMakerBase(MatchMakerBase):
     """
@@ -223,6 +251,7 @@ class HeartbeatMatchMakerBase(MatchMakerBase):
         key_host = '.'.join((key, host))
 
         self.backend_register(key, key_host)
+        self.flush_cache()
 
         self.ack_alive(key, host)
 
@@ -235,6 +264,7 @@ class HeartbeatMatchMakerBase(MatchMakerBase):
 
         self.hosts.discard(host)
         self.backend_unregister(key, '.'.join((key, host)))
+        self.flush_cache()
 
         LOG.info(_("Matchmaker unregistered: %s, %s" % (key, host)))
 
@@ -334,6 +364,8 @@ class RingExchange(Exchange):
 
 class RoundRobinRingExchange(RingExchange):
     """A Topic Exchange based on a hashmap."""
+    cacheable = False
+
     def __init__(self, ring=None):
         super(RoundRobinRingExchange, self).__init__(ring)
 
@@ -0,0 +1,138 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Encodings of the application message payload inside an rpc envelope.
+
+The serializer used for messages sent by the AMQP drivers (impl_kombu and
+impl_qpid) is chosen with the rpc_serializer option.  Anything but 'json' is
+only understood by endpoints that speak envelope version 2.1, so only switch
+once every service has been upgraded; replies always use the encoding of the
+request they answer, so a caller never receives an encoding it did not send.
+See serialize_msg() and deserialize_msg() in rpc.common.
+"""
+
+import base64
+import datetime
+
+from oslo.config import cfg
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import netaddr
+except ImportError:
+    netaddr = None
+
+from nova.openstack.common import jsonutils
+from nova.openstack.common import timeutils
+
+
+serializer_opts = [
+    cfg.StrOpt('rpc_serializer',
+               default='json',
+               help='Encoding of rpc message payloads sent over AMQP: json '
+                    'or msgpack.  msgpack needs the msgpack-python library '
+                    'on every endpoint and is ignored if it is not '
+                    'installed'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(serializer_opts)
+
+
+class JSONSerializer(object):
+    """The default encoding, readable by any envelope version."""
+
+    name = 'json'
+
+    def dumps(self, msg):
+        return jsonutils.dumps(msg)
+
+    def loads(self, data):
+        return jsonutils.loads(data)
+
+
+class MsgpackSerializer(object):
+    """A binary encoding which keeps datetimes, sets and netaddr objects.
+
+    The packed bytes are base64 encoded, as the envelope itself may be
+    encoded as JSON by the messaging library.
+    """
+
+    name = 'msgpack'
+
+    DATETIME = 1
+    SET = 2
+    IP_ADDRESS = 3
+    IP_NETWORK = 4
+
+    def _default(self, obj):
+        if isinstance(obj, datetime.datetime):
+            return msgpack.ExtType(self.DATETIME, timeutils.strtime(obj))
+        if isinstance(obj, (set, frozenset)):
+            return msgpack.ExtType(self.SET, self._pack(list(obj)))
+        if netaddr is not None:
+            if isinstance(obj, netaddr.IPAddress):
+                return msgpack.ExtType(self.IP_ADDRESS, str(obj))
+            if isinstance(obj, netaddr.IPNetwork):
+                return msgpack.ExtType(self.IP_NETWORK, str(obj))
+        # Models and other objects are converted like jsonutils does.
+        return jsonutils.to_primitive(obj)
+
+    def _ext_hook(self, code, data):
+        if code == self.DATETIME:
+            return timeutils.parse_strtime(data)
+        if code == self.SET:
+            return set(self._unpack(data))
+        if code == self.IP_ADDRESS and netaddr is not None:
+            return netaddr.IPAddress(data)
+        if code == self.IP_NETWORK and netaddr is not None:
+            return netaddr.IPNetwork(data)
+        return msgpack.ExtType(code, data)
+
+    def _pack(self, msg):
+        return msgpack.packb(msg, default=self._default)
+
+    def _unpack(self, data):
+        return msgpack.unpackb(data, ext_hook=self._ext_hook,
+                               encoding='utf-8')
+
+    def dumps(self, msg):
+        return base64.b64encode(self._pack(msg))
+
+    def loads(self, data):
+        return self._unpack(base64.b64decode(data))
+
+
+_SERIALIZERS = {'json': JSONSerializer()}
+if msgpack is not None:
+    _SERIALIZERS['msgpack'] = MsgpackSerializer()
+
+
+def get_serializer(name=None):
+    """Return the serializer called name, by default the one set by the
+    rpc_serializer option, or None if it is not available here.
+    """
+    if name is None:
+        name = CONF.rpc_serializer
+        if name not in _SERIALIZERS:
+            name = 'json'
+    return _SERIALIZERS.get(name)
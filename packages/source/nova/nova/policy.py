@@ -33,6 +33,11 @@ policy_opts = [
     cfg.StrOpt('policy_default_rule',
                default='default',
                help=_('Rule checked when requested rule is not found')),
+    cfg.BoolOpt('policy_cache_results',
+                default=False,
+                help=_('Remember the results of the policy checks made for '
+                       'each request context.  Worthwhile when policies use '
+                       'http: checks or other costly checks')),
     ]
 
 CONF = cfg.CONF
@@ -99,6 +104,12 @@ def enforce(context, action, target, do_raise=True):
     if do_raise:
         extra.update(exc=exception.PolicyNotAuthorized, action=action)
 
+    # Requests check the same actions repeatedly, e.g. once per instance
+    # listed, so remember the results for the context if it allows.
+    cache = getattr(context, 'policy_cache', None)
+    if CONF.policy_cache_results and cache is not None:
+        return cache.check(action, target, credentials, **extra)
+
     return policy.check(action, target, credentials, **extra)
 
 
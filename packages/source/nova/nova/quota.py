@@ -19,14 +19,18 @@
 """Quotas for instances, and floating ips."""
 
 import datetime
+import uuid
 
 from oslo.config import cfg
 
+from nova import context as nova_context
 from nova import db
 from nova import exception
 from nova.openstack.common import importutils
 from nova.openstack.common import log as logging
+from nova.openstack.common import memorycache
 from nova.openstack.common import timeutils
+from nova import utils
 
 LOG = logging.getLogger(__name__)
 
@@ -80,6 +84,11 @@ quota_opts = [
     cfg.StrOpt('quota_driver',
                default='nova.quota.DbQuotaDriver',
                help='default driver to use for quota checks'),
+    cfg.IntOpt('quota_usage_reconcile_interval',
+               default=60,
+               help='number of seconds between resynchronizations of the '
+                    'usage counters of CachedQuotaDriver with the '
+                    'database, 0 to disable'),
     ]
 
 CONF = cfg.CONF
@@ -287,6 +296,20 @@ class DbQuotaDriver(object):
             raise exception.OverQuota(overs=sorted(overs), quotas=quotas,
                                       usages={})
 
+    def _get_expire(self, expire):
+        """Return the expiration time of a reservation as a datetime,
+        given the expire argument of reserve().
+        """
+        if expire is None:
+            expire = CONF.reservation_expire
+        if isinstance(expire, (int, long)):
+            expire = datetime.timedelta(seconds=expire)
+        if isinstance(expire, datetime.timedelta):
+            expire = timeutils.utcnow() + expire
+        if not isinstance(expire, datetime.datetime):
+            raise exception.InvalidReservationExpiration(expire=expire)
+        return expire
+
     def reserve(self, context, resources, deltas, expire=None,
                 project_id=None):
         """Check quotas and reserve resources.
@@ -324,14 +347,7 @@ class DbQuotaDriver(object):
         """
 
         # Set up the reservation expiration
-        if expire is None:
-            expire = CONF.reservation_expire
-        if isinstance(expire, (int, long)):
-            expire = datetime.timedelta(seconds=expire)
-        if isinstance(expire, datetime.timedelta):
-            expire = timeutils.utcnow() + expire
-        if not isinstance(expire, datetime.datetime):
-            raise exception.InvalidReservationExpiration(expire=expire)
+        expire = self._get_expire(expire)
 
         # If project_id is None, then we use the project_id in context
         if project_id is None:
@@ -437,6 +453,225 @@ class DbQuotaDriver(object):
         db.reservation_expire(context)
 
 
+class CachedQuotaDriver(DbQuotaDriver):
+    """
+    Driver which keeps the usage of reservable resources in counters in
+    memcached (or, without memcached_servers, in process) instead of the
+    quota_usages and reservations tables, so reserving a resource does
+    not lock rows in the database.
+
+    A counter holds the in_use plus the reserved count of a resource for
+    a project.  reserve() increments the counters atomically by the
+    positive deltas and undoes the increments if that puts a resource
+    over its limit, commit() applies the negative deltas and rollback()
+    removes the positive ones.  Counters are loaded with the resource's
+    usage synchronization function when they are missing, and the
+    counters of the projects a process made reservations for are reset
+    to the database usage every quota_usage_reconcile_interval seconds.
+    Reservations which are in flight during a resynchronization, or
+    which expire without being committed or rolled back, make a counter
+    wrong until the next one.
+
+    Limits are still read from the database.  Use memcached_servers when
+    more than one process makes reservations, otherwise each process
+    enforces the quotas on its own.
+    """
+
+    def __init__(self):
+        self.mc = memorycache.get_client()
+        # Projects reserved for since the last resynchronization.
+        self._projects = set()
+        self._resources = {}
+        self._reconciler = None
+
+    def _usage_key(self, project_id, resource):
+        return str('quota_usage-%s-%s' % (project_id, resource))
+
+    def _reservation_key(self, reservation):
+        return str('quota_reservation-%s' % reservation)
+
+    def _load_usage(self, context, resource, project_id):
+        """Initialize the counters set by the resource's synchronization
+        function, unless another process got there first.
+        """
+        updates = resource.sync(context.elevated(), project_id, None)
+        for res_name, in_use in updates.items():
+            self.mc.add(self._usage_key(project_id, res_name), str(in_use))
+
+    def _incr(self, context, resource, project_id, delta):
+        """Add delta to a counter, and return its new value or None if
+        the counter could not be loaded.
+        """
+        key = self._usage_key(project_id, resource.name)
+        value = self.mc.incr(key, delta)
+        if value is None:
+            self._load_usage(context, resource, project_id)
+            value = self.mc.incr(key, delta)
+        return value
+
+    def _decr(self, project_id, resource, delta):
+        # A missing counter is loaded from the database when it is next
+        # needed, which accounts for the change.
+        self.mc.decr(self._usage_key(project_id, resource), delta)
+
+    def _watch(self, resources, project_id):
+        self._resources = resources
+        self._projects.add(project_id)
+        interval = CONF.quota_usage_reconcile_interval
+        if self._reconciler is None and interval > 0:
+            self._reconciler = utils.FixedIntervalLoopingCall(
+                self.reconcile, nova_context.get_admin_context())
+            self._reconciler.start(interval, initial_delay=interval)
+
+    def get_project_quotas(self, context, resources, project_id,
+                           quota_class=None, defaults=True,
+                           usages=True):
+        quotas = super(CachedQuotaDriver, self).get_project_quotas(
+            context, resources, project_id, quota_class=quota_class,
+            defaults=defaults, usages=usages)
+        if not usages:
+            return quotas
+
+        # The counters include the reservations.
+        for res_name, quota in quotas.items():
+            if hasattr(resources[res_name], 'sync'):
+                value = self.mc.get(self._usage_key(project_id, res_name))
+                if value is not None:
+                    quota.update(in_use=int(value), reserved=0)
+        return quotas
+
+    def reserve(self, context, resources, deltas, expire=None,
+                project_id=None):
+        expire = self._get_expire(expire)
+
+        # If project_id is None, then we use the project_id in context
+        if project_id is None:
+            project_id = context.project_id
+
+        quotas = self._get_quotas(context, resources, deltas.keys(),
+                                  has_sync=True, project_id=project_id)
+        self._watch(resources, project_id)
+
+        applied = []
+        usages = {}
+        overs = []
+        for res_name, delta in sorted(deltas.items()):
+            if delta > 0:
+                value = self._incr(context, resources[res_name], project_id,
+                                   delta)
+                if value is None:
+                    break
+                applied.append((res_name, delta))
+                in_use = int(value) - delta
+                if quotas[res_name] >= 0 and quotas[res_name] < int(value):
+                    overs.append(res_name)
+            else:
+                # Negative deltas are only applied on commit, see
+                # quota_reserve() in the database API.
+                value = self._incr(context, resources[res_name], project_id,
+                                   0)
+                if value is None:
+                    break
+                in_use = int(value)
+            usages[res_name] = dict(in_use=in_use, reserved=0)
+        else:
+            if overs:
+                for res_name, delta in applied:
+                    self._decr(project_id, res_name, delta)
+                raise exception.OverQuota(overs=sorted(overs), quotas=quotas,
+                                          usages=usages)
+
+            reservation = str(uuid.uuid4())
+            timeout = max(1, int(timeutils.delta_seconds(timeutils.utcnow(),
+                                                          expire)))
+            self.mc.set(self._reservation_key(reservation),
+                        dict(project_id=project_id, deltas=deltas),
+                        time=timeout)
+            return [reservation]
+
+        # The cache did not answer; undo what was done and use the
+        # database.
+        LOG.warn(_("Quota usage cache unavailable, reserving in the "
+                   "database"))
+        for res_name, delta in applied:
+            self._decr(project_id, res_name, delta)
+        return super(CachedQuotaDriver, self).reserve(
+            context, resources, deltas, expire=expire, project_id=project_id)
+
+    def _pop_reservations(self, reservations):
+        """Remove reservations from the cache, returning those found
+        there and the uuids of those which were not.
+        """
+        found = []
+        missing = []
+        for reservation in reservations:
+            key = self._reservation_key(reservation)
+            value = self.mc.get(key)
+            if value is None:
+                missing.append(reservation)
+            else:
+                self.mc.delete(key)
+                found.append(value)
+        return found, missing
+
+    def commit(self, context, reservations, project_id=None):
+        found, missing = self._pop_reservations(reservations)
+        for reservation in found:
+            for res_name, delta in reservation['deltas'].items():
+                if delta < 0:
+                    self._decr(reservation['project_id'], res_name, -delta)
+        if missing:
+            # Made by reserve() in the database, or expired.
+            super(CachedQuotaDriver, self).commit(context, missing,
+                                                  project_id=project_id)
+
+    def rollback(self, context, reservations, project_id=None):
+        found, missing = self._pop_reservations(reservations)
+        for reservation in found:
+            for res_name, delta in reservation['deltas'].items():
+                if delta > 0:
+                    self._decr(reservation['project_id'], res_name, delta)
+        if missing:
+            super(CachedQuotaDriver, self).rollback(context, missing,
+                                                    project_id=project_id)
+
+    def usage_reset(self, context, resources):
+        super(CachedQuotaDriver, self).usage_reset(context, resources)
+        for resource in resources:
+            self.mc.delete(self._usage_key(context.project_id, resource))
+
+    def destroy_all_by_project(self, context, project_id):
+        super(CachedQuotaDriver, self).destroy_all_by_project(context,
+                                                              project_id)
+        for res_name in self._resources:
+            self.mc.delete(self._usage_key(project_id, res_name))
+
+    def reconcile(self, context):
+        """Reset the usage counters of the projects reserved for since
+        the last call to the usage counted in the database.
+
+        :param context: An admin context.
+        """
+        projects, self._projects = self._projects, set()
+        syncs = set(resource.sync for resource in self._resources.values()
+                    if hasattr(resource, 'sync'))
+        interval = CONF.quota_usage_reconcile_interval
+        for project_id in projects:
+            # Skip the projects another process just resynchronized.
+            lock = str('quota_reconcile-%s' % project_id)
+            if not self.mc.add(lock, '1', time=interval):
+                continue
+            try:
+                for sync in syncs:
+                    for res_name, in_use in sync(context, project_id,
+                                                 None).items():
+                        self.mc.set(self._usage_key(project_id, res_name),
+                                    str(in_use))
+            except Exception:
+                LOG.exception(_("Failed to resynchronize the quota usage "
+                                "of project %s"), project_id)
+
+
 class NoopQuotaDriver(object):
     """Driver that turns quotas calls into no-ops and pretends that quotas
     for all resources are unlimited.  This can be used if you do not
@@ -0,0 +1,103 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Columnar view of host states for vectorized filtering and weighing.
+
+Filters and weighers that only look at the numeric resource fields of a
+HostState can evaluate all hosts at once as NumPy array operations instead
+of one Python method call per host.  Filters that set 'vectorized = True'
+implement host_passes_columns() and weighers implement weigh_columns().
+Everything else still runs per host, on the hosts that survived the
+vectorized filters.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from oslo.config import cfg
+
+from nova.openstack.common import log as logging
+
+columnar_opts = [
+    cfg.BoolOpt('scheduler_use_columnar_engine',
+                default=False,
+                help='Evaluate the resource filters and weighers that '
+                     'support it as array operations over all hosts.  '
+                     'Requires NumPy; ignored if it is not installed'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(columnar_opts)
+
+LOG = logging.getLogger(__name__)
+
+_warned_missing_numpy = False
+
+
+def enabled():
+    """Return whether filters and weighers should use the columnar engine."""
+    global _warned_missing_numpy
+
+    if not CONF.scheduler_use_columnar_engine:
+        return False
+    if numpy is None:
+        if not _warned_missing_numpy:
+            LOG.warn(_("scheduler_use_columnar_engine is set but NumPy is "
+                       "not installed, falling back to per-host filtering"))
+            _warned_missing_numpy = True
+        return False
+    return True
+
+
+class HostColumns(object):
+    """The numeric fields of a list of HostStates, one array per field.
+
+    Row i of every array describes host_states[i].
+    """
+
+    fields = ('free_ram_mb', 'total_usable_ram_mb', 'free_disk_mb',
+              'total_usable_disk_gb', 'vcpus_total', 'vcpus_used',
+              'num_io_ops', 'num_instances')
+
+    def __init__(self, host_states):
+        self.host_states = list(host_states)
+        rows = [tuple(getattr(host_state, field, 0) or 0
+                      for field in self.fields)
+                for host_state in self.host_states]
+        data = numpy.array(rows, dtype=float).reshape(len(rows),
+                                                      len(self.fields))
+        for i, field in enumerate(self.fields):
+            setattr(self, field, data[:, i])
+
+    def __len__(self):
+        return len(self.host_states)
+
+    def all_hosts(self):
+        """Return a boolean mask selecting every host."""
+        return numpy.ones(len(self), dtype=bool)
+
+    def set_limits(self, key, values, mask):
+        """Record an oversubscription limit on the hosts selected by mask,
+        as the per-host filters do with host_state.limits[key].
+        """
+        for i in numpy.flatnonzero(mask):
+            self.host_states[i].limits[key] = float(values[i])
+
+    def select(self, mask):
+        """Return the host states selected by a boolean mask."""
+        return [self.host_states[i] for i in numpy.flatnonzero(mask)]
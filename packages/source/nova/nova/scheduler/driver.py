@@ -131,6 +131,14 @@ class Scheduler(object):
         self.host_manager.update_service_capabilities(service_name,
                 host, capabilities)
 
+    def update_aggregates(self):
+        """Process a change to host aggregates or their metadata."""
+        self.host_manager.update_aggregates()
+
+    def get_scheduler_stats(self, reset=False):
+        """Return the time spent in filters, weighers and the db."""
+        return self.host_manager.get_stats(reset=reset)
+
     def hosts_up(self, context, topic):
         """Return the list of hosts that have a running service for topic."""
 
@@ -0,0 +1,113 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Cache of the results of static scheduler filters.
+
+Filters that set 'static = True' only look at a host's capabilities and
+aggregates and at the request properties returned by their static_key(),
+so their result for a host can be reused by later requests with the same
+key.  The HostManager drops a host's results when its capabilities change
+or it is added or removed, and all results when aggregates change.
+"""
+
+import time
+
+from oslo.config import cfg
+
+from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
+
+filter_cache_opts = [
+    cfg.BoolOpt('scheduler_cache_static_filters',
+                default=False,
+                help='Remember which hosts passed the static filters '
+                     '(such as AvailabilityZoneFilter and '
+                     'ImagePropertiesFilter) for each flavor and image, '
+                     'so repeated requests skip running them'),
+    cfg.IntOpt('scheduler_static_filter_cache_ttl',
+               default=600,
+               help='Maximum age in seconds of the cached static filter '
+                    'results, as a bound for aggregate changes the '
+                    'scheduler is not told about.  0 means no limit'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(filter_cache_opts)
+
+LOG = logging.getLogger(__name__)
+
+
+class StaticFilterCache(object):
+    """Results of static filters per request key and host."""
+
+    # Set to a scheduler.stats.SchedulerStats to record the time taken
+    # and hosts passed by each filter, cached results included.
+    stats = None
+
+    def __init__(self):
+        # { (filter class name, static key) : { (host, node) : passes }}
+        self._results = {}
+        self._created_at = timeutils.utcnow()
+        self.hits = 0
+        self.misses = 0
+
+    def _expire(self):
+        ttl = CONF.scheduler_static_filter_cache_ttl
+        if ttl and timeutils.is_older_than(self._created_at, ttl):
+            self.invalidate_all()
+
+    def invalidate_all(self):
+        """Forget every cached result."""
+        self._results = {}
+        self._created_at = timeutils.utcnow()
+
+    def invalidate_host(self, state_key):
+        """Forget the cached results of one (host, node)."""
+        for results in self._results.itervalues():
+            results.pop(state_key, None)
+
+    def filter_hosts(self, filter_classes, hosts, filter_properties):
+        """Return the hosts passing all the static filters, running a
+        filter only for hosts without a cached result for the request.
+        """
+        self._expire()
+        hosts = list(hosts)
+        for filter_cls in filter_classes:
+            start = time.time()
+            filter_obj = filter_cls()
+            cache_key = (filter_cls.__name__,
+                         filter_obj.static_key(filter_properties))
+            results = self._results.setdefault(cache_key, {})
+            passed = []
+            for host_state in hosts:
+                state_key = (host_state.host, host_state.nodename)
+                passes = results.get(state_key)
+                if passes is None:
+                    passes = filter_obj.host_passes(host_state,
+                                                    filter_properties)
+                    results[state_key] = passes
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                if passes:
+                    passed.append(host_state)
+            if self.stats is not None:
+                self.stats.add_filter(filter_cls.__name__,
+                        time.time() - start, len(hosts), len(passed))
+            hosts = passed
+        LOG.debug(_("Static filter cache: %(hits)d hits, %(misses)d misses"),
+                  {'hits': self.hits, 'misses': self.misses})
+        return hosts
@@ -19,6 +19,7 @@ You can customize this scheduler by specifying your own Host Filters and
 Weighing Functions.
 """
 
+import heapq
 import random
 
 from oslo.config import cfg
@@ -43,7 +44,15 @@ filter_scheduler_opts = [
                     'chosen from. A value of 1 chooses the '
                     'first host returned by the weighing functions. '
                     'This value must be at least 1. Any value less than 1 '
-                    'will be ignored, and 1 will be used instead')
+                    'will be ignored, and 1 will be used instead'),
+    cfg.BoolOpt('scheduler_batch_placement',
+                default=False,
+                help='Place all instances of a multi-instance request in '
+                     'one pass over the filtered and weighed hosts, only '
+                     're-checking the chosen host after each placement, '
+                     'instead of filtering and weighing every host again '
+                     'for each instance.  Not used for requests with a '
+                     'group scheduler hint'),
 ]
 
 CONF.register_opts(filter_scheduler_opts)
@@ -330,6 +339,14 @@ class FilterScheduler(driver.Scheduler):
             num_instances = len(instance_uuids)
         else:
             num_instances = request_spec.get('num_instances', 1)
+
+        # NOTE: Group filters depend on the hosts chosen so far, which
+        # changes the result for every host, not just the chosen one.
+        if (CONF.scheduler_batch_placement and num_instances > 1 and
+                not update_group_hosts):
+            return self._schedule_batch(hosts, filter_properties,
+                                        instance_properties, num_instances)
+
         for num in xrange(num_instances):
             # Filter local hosts based on requirements ...
             hosts = self.host_manager.get_filtered_hosts(hosts,
@@ -343,12 +360,8 @@ class FilterScheduler(driver.Scheduler):
             weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
                     filter_properties)
 
-            scheduler_host_subset_size = CONF.scheduler_host_subset_size
-            if scheduler_host_subset_size > len(weighed_hosts):
-                scheduler_host_subset_size = len(weighed_hosts)
-            if scheduler_host_subset_size < 1:
-                scheduler_host_subset_size = 1
-
+            scheduler_host_subset_size = self._get_host_subset_size(
+                    len(weighed_hosts))
             chosen_host = random.choice(
                 weighed_hosts[0:scheduler_host_subset_size])
             LOG.debug(_("Choosing host %(chosen_host)s") % locals())
@@ -361,6 +374,66 @@ class FilterScheduler(driver.Scheduler):
                 filter_properties['group_hosts'].append(chosen_host.obj.host)
         return selected_hosts
 
+    def _get_host_subset_size(self, num_weighed_hosts):
+        scheduler_host_subset_size = CONF.scheduler_host_subset_size
+        if scheduler_host_subset_size > num_weighed_hosts:
+            scheduler_host_subset_size = num_weighed_hosts
+        if scheduler_host_subset_size < 1:
+            scheduler_host_subset_size = 1
+        return scheduler_host_subset_size
+
+    def _schedule_batch(self, hosts, filter_properties, instance_properties,
+                        num_instances):
+        """Choose hosts for num_instances instances in a single pass.
+
+        Consuming an instance only changes the state of the chosen host, so
+        instead of filtering and weighing every host again for the next
+        instance, only the chosen host is re-filtered and re-weighed and
+        then put back on a heap of the candidate hosts ordered by weight.
+        Ties are broken by host order, like the stable sort in
+        get_weighed_hosts(), so the hosts chosen are the same as with the
+        per-instance loop in _schedule().
+        """
+        hosts = self.host_manager.get_filtered_hosts(hosts,
+                filter_properties)
+        if not hosts:
+            return []
+        LOG.debug(_("Filtered %(hosts)s") % locals())
+
+        host_order = dict((id(host), index)
+                          for index, host in enumerate(hosts))
+        weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
+                filter_properties)
+        heap = [(-weighed_host.weight, host_order[id(weighed_host.obj)],
+                 weighed_host) for weighed_host in weighed_hosts]
+        heapq.heapify(heap)
+
+        selected_hosts = []
+        for num in xrange(num_instances):
+            if not heap:
+                # Can't get any more locally.
+                break
+
+            subset_size = self._get_host_subset_size(len(heap))
+            subset = [heapq.heappop(heap) for i in xrange(subset_size)]
+            chosen = random.choice(subset)
+            for entry in subset:
+                if entry is not chosen:
+                    heapq.heappush(heap, entry)
+
+            chosen_host = chosen[2]
+            LOG.debug(_("Choosing host %(chosen_host)s") % locals())
+            selected_hosts.append(chosen_host)
+
+            chosen_host.obj.consume_from_instance(instance_properties)
+            if self.host_manager.get_filtered_hosts([chosen_host.obj],
+                                                    filter_properties):
+                reweighed_host = self.host_manager.get_weighed_hosts(
+                        [chosen_host.obj], filter_properties)[0]
+                heapq.heappush(heap, (-reweighed_host.weight, chosen[1],
+                                      reweighed_host))
+        return selected_hosts
+
     def _assert_compute_node_has_enough_memory(self, context,
                                               instance_ref, dest):
         """Checks if destination host has enough memory for live migration.
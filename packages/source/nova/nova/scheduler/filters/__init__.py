@@ -17,14 +17,26 @@
 Scheduler host filters
 """
 
+import time
+
 from nova import filters
 from nova.openstack.common import log as logging
+from nova.scheduler import columnar
 
 LOG = logging.getLogger(__name__)
 
 
 class BaseHostFilter(filters.BaseFilter):
     """Base class for host filters."""
+
+    # Set to True in subclasses that implement host_passes_columns()
+    vectorized = False
+
+    # Set to True in subclasses whose result only depends on the host's
+    # capabilities and aggregates and on the request properties returned
+    # by static_key(), not on the host's current resource usage.
+    static = False
+
     def _filter_one(self, obj, filter_properties):
         """Return True if the object passes the filter, otherwise False."""
         return self.host_passes(obj, filter_properties)
@@ -35,11 +47,54 @@ class BaseHostFilter(filters.BaseFilter):
         """
         raise NotImplementedError()
 
+    def host_passes_columns(self, columns, filter_properties):
+        """Return a boolean array with an entry for each host in the
+        columnar.HostColumns, True where the host passes the filter.
+        Override this in a subclass that sets vectorized = True.
+        """
+        raise NotImplementedError()
+
+    def static_key(self, filter_properties):
+        """Return a hashable key of the request properties host_passes()
+        depends on.  Requests with the same key get the same result from
+        a host until its capabilities or aggregates change.
+        Override this in a subclass that sets static = True.
+        """
+        raise NotImplementedError()
+
 
 class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
         super(HostFilterHandler, self).__init__(BaseHostFilter)
 
+    def get_filtered_objects(self, filter_classes, objs,
+            filter_properties):
+        if not columnar.enabled():
+            return super(HostFilterHandler, self).get_filtered_objects(
+                    filter_classes, objs, filter_properties)
+
+        vector_classes = [cls for cls in filter_classes if cls.vectorized]
+        other_classes = [cls for cls in filter_classes
+                         if not cls.vectorized]
+        objs = list(objs)
+        if vector_classes and objs:
+            columns = columnar.HostColumns(objs)
+            mask = columns.all_hosts()
+            for filter_cls in vector_classes:
+                start = time.time()
+                hosts_in = int(mask.sum())
+                mask &= filter_cls().host_passes_columns(columns,
+                                                         filter_properties)
+                if self.stats is not None:
+                    self.stats.add_filter(filter_cls.__name__,
+                            time.time() - start, hosts_in, int(mask.sum()))
+            objs = columns.select(mask)
+            LOG.debug(_("%(passed)d of %(total)d hosts passed the "
+                        "vectorized filters"),
+                      {'passed': len(objs), 'total': len(columns)})
+        return super(HostFilterHandler, self).get_filtered_objects(
+                other_classes, objs, filter_properties)
+
 
 def all_filters():
     """Return a list of filter classes found in this directory.
@@ -15,6 +15,7 @@
 #    under the License.
 
 from nova import db
+from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.scheduler import filters
 from nova.scheduler.filters import extra_specs_ops
@@ -26,6 +27,13 @@ LOG = logging.getLogger(__name__)
 class AggregateInstanceExtraSpecsFilter(filters.BaseHostFilter):
     """AggregateInstanceExtraSpecsFilter works with InstanceType records."""
 
+    static = True
+
+    def static_key(self, filter_properties):
+        instance_type = filter_properties.get('instance_type') or {}
+        return jsonutils.dumps(instance_type.get('extra_specs'),
+                               sort_keys=True)
+
     def host_passes(self, host_state, filter_properties):
         """Return a list of hosts that can create instance_type
 
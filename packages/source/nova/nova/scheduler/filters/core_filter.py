@@ -33,6 +33,8 @@ CONF.register_opt(cpu_allocation_ratio_opt)
 class CoreFilter(filters.BaseHostFilter):
     """CoreFilter filters based on CPU core utilization."""
 
+    vectorized = True
+
     def host_passes(self, host_state, filter_properties):
         """Return True if host has sufficient CPU cores."""
         instance_type = filter_properties.get('instance_type')
@@ -53,3 +55,17 @@ class CoreFilter(filters.BaseHostFilter):
             host_state.limits['vcpu'] = vcpus_total
 
         return (vcpus_total - host_state.vcpus_used) >= instance_vcpus
+
+    def host_passes_columns(self, columns, filter_properties):
+        """Vectorized host_passes()."""
+        instance_type = filter_properties.get('instance_type')
+        if not instance_type:
+            return columns.all_hosts()
+
+        # Fail safe for hosts not reporting VCPUs, as in host_passes()
+        unknown = columns.vcpus_total == 0
+        instance_vcpus = instance_type['vcpus']
+        vcpus_total = columns.vcpus_total * CONF.cpu_allocation_ratio
+
+        columns.set_limits('vcpu', vcpus_total, ~unknown & (vcpus_total > 0))
+        return unknown | ((vcpus_total - columns.vcpus_used) >= instance_vcpus)
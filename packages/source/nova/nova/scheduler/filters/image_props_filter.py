@@ -31,6 +31,15 @@ class ImagePropertiesFilter(filters.BaseHostFilter):
     contained in the image dictionary in the request_spec.
     """
 
+    static = True
+
+    def static_key(self, filter_properties):
+        spec = filter_properties.get('request_spec', {})
+        image_props = spec.get('image', {}).get('properties', {})
+        return (image_props.get('architecture'),
+                image_props.get('hypervisor_type'),
+                image_props.get('vm_mode'))
+
     def _instance_supported(self, capabilities, image_props):
         img_arch = image_props.get('architecture', None)
         img_h_type = image_props.get('hypervisor_type', None)
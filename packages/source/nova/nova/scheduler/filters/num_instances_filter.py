@@ -31,6 +31,8 @@ CONF.register_opt(max_instances_per_host_opt)
 class NumInstancesFilter(filters.BaseHostFilter):
     """Filter out hosts with too many instances."""
 
+    vectorized = True
+
     def host_passes(self, host_state, filter_properties):
         num_instances = host_state.num_instances
         max_instances = CONF.max_instances_per_host
@@ -40,3 +42,7 @@ class NumInstancesFilter(filters.BaseHostFilter):
                         "instances per host is set to %(max_instances)s"),
                         locals())
         return passes
+
+    def host_passes_columns(self, columns, filter_properties):
+        """Vectorized host_passes()."""
+        return columns.num_instances < CONF.max_instances_per_host
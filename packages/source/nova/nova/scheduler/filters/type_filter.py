@@ -46,6 +46,12 @@ class AggregateTypeAffinityFilter(filters.BaseHostFilter):
     key 'instance_type' has the instance_type name as a value
     """
 
+    static = True
+
+    def static_key(self, filter_properties):
+        instance_type = filter_properties.get('instance_type') or {}
+        return instance_type.get('name')
+
     def host_passes(self, host_state, filter_properties):
         instance_type = filter_properties.get('instance_type')
         context = filter_properties['context'].elevated()
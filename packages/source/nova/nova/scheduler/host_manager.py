@@ -17,6 +17,7 @@
 Manage hosts in the current zone.
 """
 
+import time
 import UserDict
 
 from oslo.config import cfg
@@ -27,7 +28,9 @@ from nova import db
 from nova import exception
 from nova.openstack.common import log as logging
 from nova.openstack.common import timeutils
+from nova.scheduler import filter_cache
 from nova.scheduler import filters
+from nova.scheduler import stats as scheduler_stats
 from nova.scheduler import weights
 
 host_manager_opts = [
@@ -51,10 +54,23 @@ host_manager_opts = [
     cfg.ListOpt('scheduler_weight_classes',
                 default=['nova.scheduler.weights.all_weighers'],
                 help='Which weight class names to use for weighing hosts'),
+    cfg.BoolOpt('scheduler_cache_host_states',
+                default=False,
+                help='Keep host states in memory between scheduling '
+                     'requests and update them from the resource views '
+                     'reported by compute nodes, instead of reading every '
+                     'compute node from the database for each request'),
+    cfg.IntOpt('scheduler_host_state_resync_interval',
+               default=60,
+               help='Interval in seconds between full resyncs of the '
+                    'cached host states from the database.  Only used '
+                    'when scheduler_cache_host_states is enabled'),
     ]
 
 CONF = cfg.CONF
 CONF.register_opts(host_manager_opts)
+CONF.import_opt('scheduler_cache_static_filters',
+                'nova.scheduler.filter_cache')
 
 LOG = logging.getLogger(__name__)
 
@@ -129,6 +145,9 @@ class HostState(object):
 
         self.updated = None
 
+        # HostManager resync generation this state was last seen in:
+        self.generation = 0
+
     def update_capabilities(self, capabilities=None, service=None):
         # Read-only capability dicts
 
@@ -260,10 +279,19 @@ class HostManager(object):
         # { (host, hypervisor_hostname) : { <service> : { cap k : v }}}
         self.service_states = {}
         self.host_state_map = {}
+        # Bumped on every full resync from the database.  Host states that
+        # were not seen in the latest generation are stale and get dropped.
+        self.generation = 0
+        self.last_resync = None
+        self.stats = scheduler_stats.SchedulerStats()
         self.filter_handler = filters.HostFilterHandler()
+        self.filter_handler.stats = self.stats
+        self.static_filter_cache = filter_cache.StaticFilterCache()
+        self.static_filter_cache.stats = self.stats
         self.filter_classes = self.filter_handler.get_matching_classes(
                 CONF.scheduler_available_filters)
         self.weight_handler = weights.HostWeightHandler()
+        self.weight_handler.stats = self.stats
         self.weight_classes = self.weight_handler.get_matching_classes(
                 CONF.scheduler_weight_classes)
 
@@ -338,6 +366,13 @@ class HostManager(object):
                     return name_to_cls_map.values()
             hosts = name_to_cls_map.itervalues()
 
+        if CONF.scheduler_cache_static_filters:
+            static_classes = [cls for cls in filter_classes if cls.static]
+            filter_classes = [cls for cls in filter_classes
+                              if not cls.static]
+            hosts = self.static_filter_cache.filter_hosts(static_classes,
+                    hosts, filter_properties)
+
         return self.filter_handler.get_filtered_objects(filter_classes,
                 hosts, filter_properties)
 
@@ -360,17 +395,84 @@ class HostManager(object):
         # Copy the capabilities, so we don't modify the original dict
         capab_copy = dict(capabilities)
         capab_copy["timestamp"] = timeutils.utcnow()  # Reported time
+        compute = capab_copy.pop('compute_node', None)
+        old_capabilities = self.service_states.get(state_key)
         self.service_states[state_key] = capab_copy
 
+        if not self._same_capabilities(old_capabilities, capab_copy):
+            self.static_filter_cache.invalidate_host(state_key)
+
+        if CONF.scheduler_cache_host_states and compute:
+            self._update_cached_host_state(state_key, capab_copy, compute)
+
+    @staticmethod
+    def _same_capabilities(old, new):
+        """Return whether two capability reports only differ in the time
+        they were reported at.
+        """
+        if old is None:
+            return False
+        return (dict(old, timestamp=None) == dict(new, timestamp=None))
+
+    def get_stats(self, reset=False):
+        """Return the filter, weigher and db timings collected since
+        startup or the last reset, optionally starting over.
+        """
+        result = self.stats.to_dict()
+        if reset:
+            self.stats.reset()
+        return result
+
+    def update_aggregates(self):
+        """Host aggregates or their metadata have changed."""
+        self.static_filter_cache.invalidate_all()
+
+    def _update_cached_host_state(self, state_key, capabilities, compute):
+        """Apply a compute node resource view reported by a compute host
+        to the cached HostState, so the next request does not need the db.
+        """
+        host_state = self.host_state_map.get(state_key)
+        if host_state is None:
+            # A node we have not loaded from the db yet; pick it up (and
+            # its service record) on the next request.
+            LOG.debug(_("Unknown compute node %s reported resources, "
+                        "forcing a resync of host states"), state_key)
+            self.last_resync = None
+            return
+        compute = dict(compute)
+        updated_at = compute.get('updated_at')
+        if isinstance(updated_at, basestring):
+            compute['updated_at'] = timeutils.parse_strtime(updated_at)
+        host_state.update_capabilities(capabilities, host_state.service)
+        host_state.update_from_compute_node(compute)
+
+    def _host_states_need_resync(self):
+        if not CONF.scheduler_cache_host_states:
+            return True
+        if self.last_resync is None:
+            return True
+        return timeutils.is_older_than(self.last_resync,
+                CONF.scheduler_host_state_resync_interval)
+
     def get_all_host_states(self, context):
         """Returns a list of HostStates that represents all the hosts
         the HostManager knows about. Also, each of the consumable resources
         in HostState are pre-populated and adjusted based on data in the db.
+
+        When scheduler_cache_host_states is enabled the db is only read
+        every scheduler_host_state_resync_interval seconds; in between, the
+        cached host states are kept current by update_service_capabilities().
         """
+        if not self._host_states_need_resync():
+            return self.host_state_map.itervalues()
+
+        self.generation += 1
+        self.last_resync = timeutils.utcnow()
 
         # Get resource usage across the available compute nodes:
+        start = time.time()
         compute_nodes = db.compute_node_get_all(context)
-        seen_nodes = set()
+        self.stats.add_db('compute_node_get_all', time.time() - start)
         for compute in compute_nodes:
             service = compute['service']
             if not service:
@@ -389,15 +491,18 @@ class HostManager(object):
                         capabilities=capabilities,
                         service=dict(service.iteritems()))
                 self.host_state_map[state_key] = host_state
+                self.static_filter_cache.invalidate_host(state_key)
             host_state.update_from_compute_node(compute)
-            seen_nodes.add(state_key)
+            host_state.generation = self.generation
 
         # remove compute nodes from host_state_map if they are not active
-        dead_nodes = set(self.host_state_map.keys()) - seen_nodes
+        dead_nodes = [key for key, state in self.host_state_map.iteritems()
+                      if state.generation != self.generation]
         for state_key in dead_nodes:
             host, node = state_key
             LOG.info(_("Removing dead compute node %(host)s:%(node)s "
                        "from scheduler") % locals())
             del self.host_state_map[state_key]
+            self.static_filter_cache.invalidate_host(state_key)
 
         return self.host_state_map.itervalues()
@@ -57,7 +57,7 @@ QUOTAS = quota.QUOTAS
 class SchedulerManager(manager.Manager):
     """Chooses a host to run instances on."""
 
-    RPC_API_VERSION = '2.6'
+    RPC_API_VERSION = '2.8'
 
     def __init__(self, scheduler_driver=None, *args, **kwargs):
         if not scheduler_driver:
@@ -83,6 +83,14 @@ class SchedulerManager(manager.Manager):
             self.driver.update_service_capabilities(service_name, host,
                                                     capability)
 
+    def update_aggregates(self, context):
+        """Host aggregates or their metadata have changed."""
+        self.driver.update_aggregates()
+
+    def get_scheduler_stats(self, context, reset=False):
+        """Return the time spent in filters, weighers and the db."""
+        return self.driver.get_scheduler_stats(reset=reset)
+
     def create_volume(self, context, volume_id, snapshot_id,
                       reservations=None, image_id=None):
         #function removed in RPC API 2.3
@@ -76,3 +76,10 @@ class MultiScheduler(driver.Scheduler):
         # pass the capabilities to the schedulers that matter
         for d in self.drivers.values():
             d.update_service_capabilities(service_name, host, capabilities)
+
+    def update_aggregates(self):
+        for d in self.drivers.values():
+            d.update_aggregates()
+
+    def get_scheduler_stats(self, reset=False):
+        return self.drivers['compute'].get_scheduler_stats(reset=reset)
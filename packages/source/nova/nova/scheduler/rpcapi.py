@@ -58,6 +58,8 @@ class SchedulerAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                 - accepts a list of capabilities
         2.5 - Add get_backdoor_port()
         2.6 - Add select_hosts()
+        2.7 - Add update_aggregates()
+        2.8 - Add get_scheduler_stats()
     '''
 
     #
@@ -116,6 +118,14 @@ class SchedulerAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                 capabilities=capabilities),
                 version='2.4')
 
+    def update_aggregates(self, ctxt):
+        self.fanout_cast(ctxt, self.make_msg('update_aggregates'),
+                version='2.7')
+
+    def get_scheduler_stats(self, ctxt, reset=False):
+        return self.call(ctxt, self.make_msg('get_scheduler_stats',
+                reset=reset), version='2.8')
+
     def get_backdoor_port(self, context, host):
         return self.call(context, self.make_msg('get_backdoor_port'),
                          version='2.5')
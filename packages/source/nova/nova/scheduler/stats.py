@@ -0,0 +1,73 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Counters of where the scheduler spends its time.
+
+The HostManager hands a SchedulerStats to its filter and weight handlers,
+which record the wall time, call count and number of hosts going in and
+out of every filter and weigher class.  The time spent reading compute
+nodes from the database is recorded as well.  The totals can be fetched
+with the get_scheduler_stats() RPC call or 'nova-manage scheduler stats'.
+"""
+
+from nova.openstack.common import timeutils
+
+
+class SchedulerStats(object):
+    """Totals since the scheduler started or the last reset()."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.since = timeutils.utcnow()
+        # { filter class name : { counter : total }}
+        self.filters = {}
+        # { weigher class name : { counter : total }}
+        self.weighers = {}
+        # { db operation : { counter : total }}
+        self.db = {}
+
+    @staticmethod
+    def _add(counters, name, elapsed, **kwargs):
+        entry = counters.setdefault(name, dict(calls=0, time=0.0,
+                                               **dict.fromkeys(kwargs, 0)))
+        entry['calls'] += 1
+        entry['time'] += elapsed
+        for key, value in kwargs.iteritems():
+            entry[key] += value
+
+    def add_filter(self, name, elapsed, hosts_in, hosts_out):
+        """Record one run of a filter class over hosts_in hosts, of
+        which hosts_out passed.
+        """
+        self._add(self.filters, name, elapsed, hosts_in=hosts_in,
+                  hosts_out=hosts_out)
+
+    def add_weigher(self, name, elapsed, hosts):
+        """Record one run of a weigher class over a number of hosts."""
+        self._add(self.weighers, name, elapsed, hosts=hosts)
+
+    def add_db(self, name, elapsed):
+        """Record one database operation."""
+        self._add(self.db, name, elapsed)
+
+    def to_dict(self):
+        """Return the totals as primitives, for sending over RPC."""
+        return {'since': timeutils.strtime(self.since),
+                'filters': self.filters,
+                'weighers': self.weighers,
+                'db': self.db}
@@ -17,9 +17,12 @@
 Scheduler host weights
 """
 
+import time
+
 from oslo.config import cfg
 
 from nova.openstack.common import log as logging
+from nova.scheduler import columnar
 from nova.scheduler.weights import least_cost
 from nova import weights
 
@@ -40,7 +43,16 @@ class WeighedHost(weights.WeighedObject):
 
 class BaseHostWeigher(weights.BaseWeigher):
     """Base class for host weights."""
-    pass
+
+    # Set to True in subclasses that implement weigh_columns()
+    vectorized = False
+
+    def weigh_columns(self, columns, weight_properties):
+        """Return an array with the unmultiplied weight of each host in the
+        columnar.HostColumns.  Override this in a subclass that sets
+        vectorized = True.
+        """
+        raise NotImplementedError()
 
 
 class HostWeightHandler(weights.BaseWeightHandler):
@@ -49,6 +61,43 @@ class HostWeightHandler(weights.BaseWeightHandler):
     def __init__(self):
         super(HostWeightHandler, self).__init__(BaseHostWeigher)
 
+    def get_weighed_objects(self, weigher_classes, obj_list,
+            weighing_properties):
+        """Return a sorted (highest score first) list of WeighedHosts."""
+        vector_classes = [cls for cls in weigher_classes if cls.vectorized]
+        if not obj_list or not vector_classes or not columnar.enabled():
+            return super(HostWeightHandler, self).get_weighed_objects(
+                    weigher_classes, obj_list, weighing_properties)
+
+        numpy = columnar.numpy
+        columns = columnar.HostColumns(obj_list)
+        multipliers = []
+        raw_weights = []
+        for weigher_cls in vector_classes:
+            start = time.time()
+            weigher = weigher_cls()
+            multipliers.append(weigher._weight_multiplier())
+            raw_weights.append(weigher.weigh_columns(columns,
+                                                     weighing_properties))
+            if self.stats is not None:
+                self.stats.add_weigher(weigher_cls.__name__,
+                                       time.time() - start, len(columns))
+        host_weights = numpy.array(multipliers, dtype=float).dot(
+                numpy.array(raw_weights, dtype=float))
+
+        weighed_objs = [self.object_class(obj, float(weight))
+                        for obj, weight in zip(columns.host_states,
+                                               host_weights)]
+        for weigher_cls in weigher_classes:
+            if weigher_cls not in vector_classes:
+                start = time.time()
+                weigher_cls().weigh_objects(weighed_objs, weighing_properties)
+                if self.stats is not None:
+                    self.stats.add_weigher(weigher_cls.__name__,
+                            time.time() - start, len(weighed_objs))
+
+        return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+
 
 def all_weighers():
     """Return a list of weight plugin classes found in this directory."""
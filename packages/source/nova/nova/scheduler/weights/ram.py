@@ -36,6 +36,9 @@ CONF.register_opts(ram_weight_opts)
 
 
 class RAMWeigher(weights.BaseHostWeigher):
+
+    vectorized = True
+
     def _weight_multiplier(self):
         """Override the weight multiplier."""
         return CONF.ram_weight_multiplier
@@ -43,3 +46,7 @@ class RAMWeigher(weights.BaseHostWeigher):
     def _weigh_object(self, host_state, weight_properties):
         """Higher weights win.  We want spreading to be the default."""
         return host_state.free_ram_mb
+
+    def weigh_columns(self, columns, weight_properties):
+        """Vectorized _weigh_object()."""
+        return columns.free_ram_mb
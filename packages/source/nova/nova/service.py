@@ -34,6 +34,7 @@ from oslo.config import cfg
 from nova import conductor
 from nova import context
 from nova import exception
+from nova.openstack.common.db.sqlalchemy import session as db_session
 from nova.openstack.common import eventlet_backdoor
 from nova.openstack.common import importutils
 from nova.openstack.common import log as logging
@@ -418,6 +419,8 @@ class Service(object):
         self.saved_args, self.saved_kwargs = args, kwargs
         self.timers = []
         self.backdoor_port = None
+        self.db_allowed = db_allowed
+        self.service_ref = None
         self.conductor_api = conductor.API(use_local=db_allowed)
         self.conductor_api.wait_until_ready(context.get_admin_context())
 
@@ -428,13 +431,8 @@ class Service(object):
         self.basic_config_check()
         self.manager.init_host()
         self.model_disconnected = False
-        ctxt = context.get_admin_context()
-        try:
-            self.service_ref = self.conductor_api.service_get_by_args(ctxt,
-                    self.host, self.binary)
-            self.service_id = self.service_ref['id']
-        except exception.NotFound:
-            self.service_ref = self._create_service_ref(ctxt)
+        if self.service_ref is None:
+            self._get_service_ref()
 
         if self.backdoor_port is not None:
             self.manager.backdoor_port = self.backdoor_port
@@ -478,6 +476,25 @@ class Service(object):
                            periodic_interval_max=self.periodic_interval_max)
             self.timers.append(periodic)
 
+    def _get_service_ref(self):
+        ctxt = context.get_admin_context()
+        try:
+            self.service_ref = self.conductor_api.service_get_by_args(ctxt,
+                    self.host, self.binary)
+            self.service_id = self.service_ref['id']
+        except exception.NotFound:
+            self.service_ref = self._create_service_ref(ctxt)
+
+    def prepare_workers(self):
+        """Get the service record before forking the workers, so that they
+        don't race each other to create it.
+        """
+        self._get_service_ref()
+        if self.db_allowed:
+            # NOTE: The workers can't share the database connections
+            # opened for this, each opens its own.
+            db_session.get_engine().dispose()
+
     def _create_service_ref(self, context):
         svc_values = {
             'host': self.host,
@@ -678,6 +695,8 @@ def serve(server, workers=None):
         raise RuntimeError(_('serve() can only be called once'))
 
     if workers:
+        if isinstance(server, Service):
+            server.prepare_workers()
         _launcher = ProcessLauncher()
         _launcher.launch_server(server, workers=workers)
     else:
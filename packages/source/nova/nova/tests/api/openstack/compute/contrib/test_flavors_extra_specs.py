@@ -56,6 +56,10 @@ class FlavorsExtraSpecsTest(test.TestCase):
         super(FlavorsExtraSpecsTest, self).setUp()
         fakes.stub_out_key_pair_funcs(self.stubs)
         self.controller = flavorextraspecs.FlavorExtraSpecsController()
+        self.invalidated = []
+        self.stubs.Set(self.controller.conductor_rpcapi, 'cache_invalidate',
+                       lambda context, region: self.invalidated.append(
+                           region))
 
     def test_index(self):
         self.stubs.Set(nova.db, 'instance_type_extra_specs_get',
@@ -101,6 +105,7 @@ class FlavorsExtraSpecsTest(test.TestCase):
         req = fakes.HTTPRequest.blank('/v2/fake/flavors/1/os-extra_specs' +
                                       '/key5', use_admin_context=True)
         self.controller.delete(req, 1, 'key5')
+        self.assertEqual(['instance_types'], self.invalidated)
 
     def test_delete_no_admin(self):
         self.stubs.Set(nova.db, 'instance_type_extra_specs_delete',
@@ -122,6 +127,7 @@ class FlavorsExtraSpecsTest(test.TestCase):
         res_dict = self.controller.create(req, 1, body)
 
         self.assertEqual('value1', res_dict['extra_specs']['key1'])
+        self.assertEqual(['instance_types'], self.invalidated)
 
     def test_create_no_admin(self):
         self.stubs.Set(nova.db,
@@ -154,6 +160,7 @@ class FlavorsExtraSpecsTest(test.TestCase):
         res_dict = self.controller.update(req, 1, 'key1', body)
 
         self.assertEqual('value1', res_dict['key1'])
+        self.assertEqual(['instance_types'], self.invalidated)
 
     def test_update_item_no_admin(self):
         self.stubs.Set(nova.db,
@@ -698,6 +698,49 @@ class ServersControllerTest(test.TestCase):
         self.assertEqual(len(servers), 1)
         self.assertEqual(servers[0]['id'], server_uuid)
 
+    def test_get_servers_lightweight_list(self):
+        self.flags(osapi_compute_lightweight_list=True)
+        server_uuid = str(uuid.uuid4())
+
+        def fake_get_all(compute_self, context, search_opts=None,
+                         sort_key=None, sort_dir='desc',
+                         limit=None, marker=None, columns=None):
+            self.assertEqual(servers.SERVER_LIST_COLUMNS, columns)
+            return [fakes.stub_instance(100, uuid=server_uuid)]
+
+        self.stubs.Set(compute_api.API, 'get_all', fake_get_all)
+
+        req = fakes.HTTPRequest.blank('/v2/fake/servers/detail')
+        servers_list = self.controller.detail(req)['servers']
+
+        self.assertEqual(len(servers_list), 1)
+        self.assertEqual(servers_list[0]['id'], server_uuid)
+
+    def test_get_servers_streamed(self):
+        self.flags(osapi_compute_list_stream_threshold=5)
+        req = fakes.HTTPRequest.blank('/v2/fake/servers/detail')
+        resp_obj = self.controller.detail(req)
+
+        self.assertEqual('servers', resp_obj.stream_key)
+        self.assertEqual(5, len(resp_obj.obj['servers']))
+
+        req = fakes.HTTPRequest.blank('/v2/fake/servers/detail?limit=4')
+        self.assertEqual(4, len(self.controller.detail(req)['servers']))
+
+    def test_get_servers_streamed_body(self):
+        for accept in ('application/json', 'application/xml'):
+            bodies = []
+            for threshold in (0, 1):
+                self.flags(osapi_compute_list_stream_threshold=threshold)
+                req = fakes.HTTPRequest.blank('/v2/fake/servers/detail')
+                req.headers['Accept'] = accept
+                res = req.get_response(fakes.wsgi_app())
+                self.assertEqual(200, res.status_int)
+                streamed = res.content_length is None
+                self.assertEqual(bool(threshold), streamed)
+                bodies.append(res.body)
+            self.assertEqual(bodies[0], bodies[1])
+
     def test_get_servers_allows_image(self):
         server_uuid = str(uuid.uuid4())
 
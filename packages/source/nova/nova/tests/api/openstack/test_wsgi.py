@@ -142,6 +142,21 @@ class JSONDictSerializerTest(test.TestCase):
         result = result.replace('\n', '').replace(' ', '')
         self.assertEqual(result, expected_json)
 
+    def test_json_chunks(self):
+        input_dict = dict(servers=[dict(id=i, name=u'\xe9') for i in range(5)],
+                          servers_links=[dict(rel='next')])
+        serializer = wsgi.JSONDictSerializer()
+        chunks = list(serializer.serialize_chunks(input_dict, 'servers',
+                                                  chunk_size=2))
+        self.assertEqual(''.join(chunks), serializer.serialize(input_dict))
+        self.assertTrue(len(chunks) > 5)
+
+    def test_json_chunks_empty_list(self):
+        input_dict = dict(servers=[])
+        serializer = wsgi.JSONDictSerializer()
+        result = ''.join(serializer.serialize_chunks(input_dict, 'servers'))
+        self.assertEqual(result, serializer.serialize(input_dict))
+
 
 class TextDeserializerTest(test.TestCase):
     def test_dispatch_default(self):
@@ -880,6 +895,23 @@ class ResponseObjectTest(test.TestCase):
             self.assertEqual(response.status_int, 202)
             self.assertEqual(response.body, mtype)
 
+    def test_serialize_stream(self):
+        class JSONSerializer(object):
+            def serialize(self, obj):
+                return 'json'
+
+            def serialize_chunks(self, obj, key):
+                for item in obj[key]:
+                    yield item
+
+        robj = wsgi.ResponseObject({'items': ['a', 'b']}, stream_key='items',
+                                   json=JSONSerializer)
+        request = wsgi.Request.blank('/tests/123')
+        response = robj.serialize(request, 'application/json')
+
+        self.assertEqual(response.content_length, None)
+        self.assertEqual(list(response.app_iter), ['a', 'b'])
+
 
 class ValidBodyTest(test.TestCase):
 
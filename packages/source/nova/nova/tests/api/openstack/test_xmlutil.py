@@ -655,6 +655,37 @@ class TemplateTest(test.TestCase):
                          str(obj['test']['image']['id']))
         self.assertEqual(result[idx].text, obj['test']['image']['name'])
 
+    def _list_template(self):
+        root = xmlutil.TemplateElement('items', total='total')
+        item = xmlutil.SubTemplateElement(root, 'item', selector='items',
+                                          id='id')
+        item.text = xmlutil.Selector('name')
+        xmlutil.make_links(root, 'items_links')
+        return xmlutil.MasterTemplate(root, 1, nsmap={
+            None: xmlutil.XMLNS_V11, 'atom': xmlutil.XMLNS_ATOM})
+
+    def test_serialize_chunks(self):
+        obj = {'total': 5,
+               'items': [{'id': i, 'name': 'a < b'} for i in range(5)],
+               'items_links': [{'rel': 'next', 'href': 'http://next'}]}
+        template = self._list_template()
+        chunks = list(template.serialize_chunks(obj, 'items', chunk_size=2))
+
+        self.assertEqual(''.join(chunks), template.serialize(obj))
+        self.assertTrue(len(chunks) > 3)
+
+    def test_serialize_chunks_without_links(self):
+        obj = {'total': 1, 'items': [{'id': 1, 'name': 'foo'}]}
+        template = self._list_template()
+        result = ''.join(template.serialize_chunks(obj, 'items'))
+        self.assertEqual(result, template.serialize(obj))
+
+    def test_serialize_chunks_empty_list(self):
+        obj = {'total': 0, 'items': []}
+        template = self._list_template()
+        result = ''.join(template.serialize_chunks(obj, 'items'))
+        self.assertEqual(result, template.serialize(obj))
+
 
 class MasterTemplateBuilder(xmlutil.TemplateBuilder):
     def construct(self):
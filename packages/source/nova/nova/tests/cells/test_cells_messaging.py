@@ -15,6 +15,7 @@
 Tests For Cells Messaging module
 """
 
+import mox
 from oslo.config import cfg
 
 from nova.cells import messaging
@@ -700,6 +701,36 @@ class CellsTargetedMethodsTestCase(test.TestCase):
 
         self.src_msg_runner.tell_parents_our_capacities(self.ctxt)
 
+    def test_update_capacities_delayed(self):
+        self.flags(parent_update_delay=5, group='cells')
+        self._setup_attrs('child-cell2', 'child-cell2!api-cell')
+        timers = []
+
+        def fake_spawn_after(delay, func, *args):
+            timers.append((delay, func, args))
+            return 'fake_timer'
+
+        self.stubs.Set(messaging.greenthread, 'spawn_after',
+                       fake_spawn_after)
+        self.mox.StubOutWithMock(self.tgt_msg_runner,
+                                 'tell_parents_our_capabilities')
+        self.mox.StubOutWithMock(self.tgt_msg_runner,
+                                 'tell_parents_our_capacities')
+        self.tgt_msg_runner.tell_parents_our_capabilities(self.ctxt)
+        self.tgt_msg_runner.tell_parents_our_capacities(self.ctxt)
+        self.mox.ReplayAll()
+
+        self.src_msg_runner.tell_parents_our_capacities(self.ctxt)
+        self.src_msg_runner.tell_parents_our_capabilities(self.ctxt)
+        self.src_msg_runner.tell_parents_our_capacities(self.ctxt)
+
+        # One report of each kind after the delay
+        self.assertEqual(1, len(timers))
+        delay, func, args = timers[0]
+        self.assertEqual(5, delay)
+        func(*args)
+        self.assertEqual(None, self.tgt_msg_runner.parent_updates_timer)
+
     def test_announce_capabilities(self):
         self._setup_attrs('api-cell', 'api-cell!child-cell1')
         # To make this easier to test, make us only have 1 child cell.
@@ -1014,6 +1045,49 @@ class CellsBroadcastMethodsTestCase(test.TestCase):
 
         self.src_msg_runner.instance_destroy_at_top(self.ctxt, fake_instance)
 
+    def test_instance_updates_at_top_batched(self):
+        self.flags(instance_update_batch_interval=1, group='cells')
+        timers = []
+
+        def fake_spawn_after(delay, func, *args):
+            timers.append((delay, func, args))
+            return 'fake_timer'
+
+        self.stubs.Set(messaging.greenthread, 'spawn_after',
+                       fake_spawn_after)
+
+        self.mox.StubOutWithMock(self.src_db_inst, 'instance_update')
+        self.mox.StubOutWithMock(self.mid_db_inst, 'instance_update')
+        self.mox.StubOutWithMock(self.tgt_db_inst, 'instance_update')
+        self.mox.StubOutWithMock(self.tgt_db_inst, 'instance_destroy')
+        expected_cell_name = 'api-cell!child-cell2!grandchild-cell1'
+        self.tgt_db_inst.instance_update(mox.IgnoreArg(), 'uuid1',
+                                         {'uuid': 'uuid1',
+                                          'vm_state': 'active',
+                                          'task_state': None,
+                                          'cell_name': expected_cell_name},
+                                         update_cells=False)
+        self.tgt_db_inst.instance_destroy(mox.IgnoreArg(), 'uuid2',
+                                          update_cells=False)
+        self.mox.ReplayAll()
+
+        self.src_msg_runner.instance_update_at_top(self.ctxt,
+                {'uuid': 'uuid1', 'vm_state': 'building',
+                 'task_state': 'spawning'})
+        self.src_msg_runner.instance_update_at_top(self.ctxt,
+                {'uuid': 'uuid2', 'vm_state': 'active'})
+        self.src_msg_runner.instance_update_at_top(self.ctxt,
+                {'uuid': 'uuid1', 'vm_state': 'active',
+                 'task_state': None})
+        self.src_msg_runner.instance_destroy_at_top(self.ctxt,
+                {'uuid': 'uuid2'})
+
+        self.assertEqual(1, len(timers))
+        delay, func, args = timers[0]
+        self.assertEqual(1, delay)
+        func(*args)
+        self.assertEqual({}, self.src_msg_runner.pending_instance_updates)
+
     def test_instance_hard_delete_everywhere(self):
         # Reset this, as this is a broadcast down.
         self._setup_attrs(up=False)
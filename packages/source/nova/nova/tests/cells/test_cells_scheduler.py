@@ -146,6 +146,55 @@ class CellsSchedulerTestCase(test.TestCase):
         self.assertEqual(self.request_spec, call_info['request_spec'])
         self.assertEqual(host_sched_kwargs, call_info['host_sched_kwargs'])
 
+    def _set_capacities(self, cell, units):
+        cell.capacities = {'ram_free': {'total_mb': 0,
+                                        'units_by_mb': {'512': units}},
+                           'disk_free': {'total_mb': 0,
+                                         'units_by_mb': {'1024': units}}}
+
+    def test_select_cell_with_room(self):
+        instance_type = {'memory_mb': 512, 'root_gb': 1, 'ephemeral_gb': 0}
+        self.request_spec['instance_type'] = instance_type
+        self.my_cell_state.capacities = {}
+        child_cells = self.state_manager.get_child_cells()
+        for cell in child_cells:
+            self._set_capacities(cell, 2)
+        self._set_capacities(child_cells[0], 3)
+
+        for i in xrange(10):
+            cells = self.scheduler._get_possible_cells()
+            self.assertEqual(child_cells[0],
+                             self.scheduler._select_cell(list(cells),
+                                                         self.request_spec))
+
+    def test_select_cell_prefers_known_room(self):
+        instance_type = {'memory_mb': 512, 'root_gb': 1, 'ephemeral_gb': 0}
+        self.request_spec['instance_type'] = instance_type
+        child_cells = self.state_manager.get_child_cells()
+        for cell in child_cells:
+            cell.capacities = {}
+        self._set_capacities(child_cells[0], 0)
+        self._set_capacities(child_cells[1], 5)
+
+        for i in xrange(10):
+            self.assertEqual(child_cells[1],
+                             self.scheduler._select_cell(list(child_cells),
+                                                         self.request_spec))
+
+        # Without room anywhere, cells which didn't report are tried
+        self._set_capacities(child_cells[1], 0)
+        for i in xrange(10):
+            cell = self.scheduler._select_cell(list(child_cells),
+                                               self.request_spec)
+            self.assertIn(cell, child_cells[2:])
+
+        # And then any cell
+        for cell in child_cells:
+            self._set_capacities(cell, 0)
+        cell = self.scheduler._select_cell(list(child_cells),
+                                           self.request_spec)
+        self.assertIn(cell, child_cells)
+
     def test_run_instance_retries_when_no_cells_avail(self):
         self.flags(scheduler_retries=7, group='cells')
 
@@ -3331,6 +3331,121 @@ class ComputeTestCase(BaseTestCase):
         self.assertEqual(len(instances), 1)
         self.assertEqual(instances[0]['task_state'], None)
 
+    def test_sync_power_states_batched(self):
+        ctxt = context.get_admin_context()
+        running = self._create_fake_instance(
+                {'host': self.compute.host,
+                 'power_state': power_state.RUNNING})
+        shutdown = self._create_fake_instance(
+                {'host': self.compute.host,
+                 'power_state': power_state.RUNNING})
+        busy = self._create_fake_instance(
+                {'host': self.compute.host,
+                 'task_state': task_states.REBOOTING})
+        vm_power_states = {running['uuid']: power_state.RUNNING,
+                           shutdown['uuid']: power_state.SHUTDOWN}
+
+        def fake_get_info(instance):
+            return {'state': vm_power_states[instance['uuid']]}
+
+        def fail_instance_get_by_uuid(context, instance_uuid):
+            self.fail('instance %s fetched on its own' % instance_uuid)
+
+        updates_done = []
+
+        def fake_instance_update_many(context, updates):
+            updates_done.append(updates)
+            return [instance_ref for old_ref, instance_ref in
+                    db.instance_update_many(context, updates)]
+
+        stopped = []
+        self.stubs.Set(self.compute.driver, 'get_info', fake_get_info)
+        self.stubs.Set(self.compute.conductor_api, 'instance_get_by_uuid',
+                       fail_instance_get_by_uuid)
+        self.stubs.Set(self.compute.conductor_api, 'instance_update_many',
+                       fake_instance_update_many)
+        self.stubs.Set(self.compute.conductor_api, 'compute_stop',
+                       lambda context, instance: stopped.append(
+                               instance['uuid']))
+
+        self.compute._sync_power_states(ctxt)
+
+        self.assertEqual([{shutdown['uuid']: {
+                                'power_state': power_state.SHUTDOWN,
+                                'expected_task_state': None}}],
+                         updates_done)
+        self.assertEqual([shutdown['uuid']], stopped)
+        instance = db.instance_get_by_uuid(ctxt, shutdown['uuid'])
+        self.assertEqual(power_state.SHUTDOWN, instance['power_state'])
+        instance = db.instance_get_by_uuid(ctxt, busy['uuid'])
+        self.assertEqual(task_states.REBOOTING, instance['task_state'])
+
+    def test_sync_power_states_skips_instances_not_updated(self):
+        ctxt = context.get_admin_context()
+        instance = self._create_fake_instance(
+                {'host': self.compute.host,
+                 'power_state': power_state.RUNNING})
+
+        def fake_instance_update_many(context, updates):
+            # A task starts after the instance was looked up again.
+            db.instance_update(context, instance['uuid'],
+                               {'task_state': task_states.POWERING_ON})
+            return [instance_ref for old_ref, instance_ref in
+                    db.instance_update_many(context, updates)]
+
+        stopped = []
+        self.stubs.Set(self.compute.driver, 'get_info',
+                       lambda instance: {'state': power_state.SHUTDOWN})
+        self.stubs.Set(self.compute.conductor_api, 'instance_update_many',
+                       fake_instance_update_many)
+        self.stubs.Set(self.compute.conductor_api, 'compute_stop',
+                       lambda context, instance: stopped.append(
+                               instance['uuid']))
+
+        self.compute._sync_power_states(ctxt)
+
+        self.assertEqual([], stopped)
+        instance = db.instance_get_by_uuid(ctxt, instance['uuid'])
+        self.assertEqual(power_state.RUNNING, instance['power_state'])
+
+    def test_poll_bandwidth_usage(self):
+        ctxt = context.get_admin_context()
+        self.flags(bandwidth_poll_interval=1)
+        self.compute._last_bw_usage_poll = 0
+        prev_time, start_time = utils.last_completed_audit_period()
+        # One counter continues this period, one the previous period
+        # and one is new.
+        db.bw_usage_update(ctxt, 'uuid1', 'mac1', start_time,
+                           100, 200, 1000, 2000)
+        db.bw_usage_update(ctxt, 'uuid1', 'mac2', prev_time,
+                           5, 5, 500, 600)
+        bw_counters = [
+            {'uuid': 'uuid1', 'mac_address': 'mac1',
+             'bw_in': 1010, 'bw_out': 2020},
+            {'uuid': 'uuid1', 'mac_address': 'mac2',
+             'bw_in': 510, 'bw_out': 10},
+            {'uuid': 'uuid2', 'mac_address': 'mac3',
+             'bw_in': 30, 'bw_out': 40}]
+        self.stubs.Set(self.compute.driver, 'get_all_bw_counters',
+                       lambda instances: bw_counters)
+        self.mox.StubOutWithMock(self.compute.conductor_api,
+                                 'bw_usage_get')
+        self.mox.StubOutWithMock(self.compute.conductor_api,
+                                 'bw_usage_update')
+        self.mox.ReplayAll()
+
+        self.compute._poll_bandwidth_usage(ctxt)
+
+        usages = db.bw_usage_get_by_uuids(ctxt, ['uuid1', 'uuid2'],
+                                          start_time)
+        usages = dict(((usage['uuid'], usage['mac']),
+                       (usage['bw_in'], usage['bw_out'],
+                        usage['last_ctr_in'], usage['last_ctr_out']))
+                      for usage in usages)
+        self.assertEqual({('uuid1', 'mac1'): (110, 220, 1010, 2020),
+                          ('uuid1', 'mac2'): (10, 10, 510, 10),
+                          ('uuid2', 'mac3'): (0, 0, 30, 40)}, usages)
+
     def test_add_instance_fault(self):
         instance = self._create_fake_instance()
         exc_info = None
@@ -3654,13 +3769,13 @@ class ComputeTestCase(BaseTestCase):
                                'instance_uuid': instance['uuid'],
                                'status': None})
 
-        def fake_instance_get_by_uuid(context, instance_uuid):
-            # raise InstanceNotFound exception for uuid 'noexist'
-            if instance_uuid == 'noexist':
-                raise exception.InstanceNotFound(instance_id=instance_uuid)
-            for instance in instances:
-                if instance['uuid'] == instance_uuid:
-                    return instance
+        def fake_instance_get_all_by_filters(context, filters, *args,
+                                             **kwargs):
+            # all the instances are fetched at once, 'noexist' is missing
+            self.assertFalse(filters['deleted'])
+            return [instance for instance in instances
+                    if (instance['uuid'] in filters['uuid'] and
+                        instance['uuid'] != 'noexist')]
 
         def fake_migration_get_unconfirmed_by_dest_compute(context,
                 resize_confirm_window, dest_compute):
@@ -3683,8 +3798,8 @@ class ComputeTestCase(BaseTestCase):
                     migration_ref['instance_uuid']):
                     migration['status'] = 'confirmed'
 
-        self.stubs.Set(db, 'instance_get_by_uuid',
-                fake_instance_get_by_uuid)
+        self.stubs.Set(db, 'instance_get_all_by_filters',
+                fake_instance_get_all_by_filters)
         self.stubs.Set(db, 'migration_get_unconfirmed_by_dest_compute',
                 fake_migration_get_unconfirmed_by_dest_compute)
         self.stubs.Set(self.compute.conductor_api, 'migration_update',
@@ -4173,6 +4288,20 @@ class ComputeTestCase(BaseTestCase):
         self.mox.ReplayAll()
         self.compute._instance_usage_audit(self.context)
 
+    def test_update_capabilities_resource_views(self):
+        fake_view = {'free_ram_mb': 42}
+        rt = self.compute._get_resource_tracker(NODENAME)
+        self.stubs.Set(rt, 'get_resource_view', lambda: fake_view)
+
+        self.compute.update_service_capabilities(
+                [{'hypervisor_hostname': NODENAME},
+                 {'hypervisor_hostname': 'other-node'}])
+        self.compute._update_capabilities_resource_views()
+
+        capabilities = self.compute.last_capabilities
+        self.assertEqual(fake_view, capabilities[0]['compute_node'])
+        self.assertFalse('compute_node' in capabilities[1])
+
     def test_add_remove_fixed_ip_updates_instance_updated_at(self):
         def _noop(*args, **kwargs):
             pass
@@ -5842,6 +5971,21 @@ class ComputeAPITestCase(BaseTestCase):
         db.instance_destroy(c, instance2['uuid'])
         db.instance_destroy(c, instance3['uuid'])
 
+    def test_get_all_with_columns(self):
+        # Test loading only some columns of the instances.
+        c = context.get_admin_context()
+        instance = self._create_fake_instance({'user_data': 'fake'})
+
+        instances = self.compute_api.get_all(c,
+                columns=['display_name', 'host'])
+        self.assertEqual(len(instances), 1)
+        self.assertEqual(instances[0]['uuid'], instance['uuid'])
+        self.assertEqual(instances[0]['host'], instance['host'])
+        self.assertEqual(instances[0]['name'], instance['name'])
+        self.assertEqual(instances[0]['user_data'], None)
+
+        db.instance_destroy(c, instance['uuid'])
+
     def test_get_all_by_flavor(self):
         # Test searching instances by image.
 
@@ -6284,6 +6428,63 @@ class ComputeAPITestCase(BaseTestCase):
         self.assertEqual(refs[1]['display_name'], 'x-%s' % refs[1]['uuid'])
         self.assertEqual(refs[1]['hostname'], 'x-%s' % refs[1]['uuid'])
 
+    def test_create_multiple_instances_in_bulk(self):
+        self.flags(notify_on_state_change='vm_state',
+                   multi_instance_display_name_template='%(name)s-%(count)s')
+
+        def fake_instance_create(*args, **kwargs):
+            self.fail('Instances created one at a time')
+
+        self.stubs.Set(db, 'instance_create', fake_instance_create)
+        (refs, resv_id) = self.compute_api.create(self.context,
+                instance_types.get_default_instance_type(), None,
+                min_count=3, max_count=3, display_name='x')
+
+        self.assertEqual(['x-1', 'x-2', 'x-3'],
+                         [ref['hostname'] for ref in refs])
+        notified = [msg['payload']['instance_id']
+                    for msg in test_notifier.NOTIFICATIONS
+                    if msg['event_type'] == 'compute.instance.update']
+        self.assertEqual([ref['uuid'] for ref in refs], notified)
+        for ref in refs:
+            instance = db.instance_get_by_uuid(self.context, ref['uuid'])
+            self.assertEqual(resv_id, instance['reservation_id'])
+            self.assertEqual(vm_states.BUILDING, instance['vm_state'])
+            self.assertEqual(['default'], [group['name'] for group in
+                                           instance['security_groups']])
+
+    def test_create_multiple_instances_duplicate_hostnames(self):
+        self.flags(osapi_compute_unique_server_name_scope='project',
+                   multi_instance_display_name_template='%(name)s')
+        self.assertRaises(exception.InstanceExists, self.compute_api.create,
+                self.context, instance_types.get_default_instance_type(),
+                None, min_count=2, max_count=2, display_name='x')
+        self.assertEqual([], db.instance_get_all(self.context))
+
+    def test_block_device_mapping_values_for_create(self):
+        instance_type = {'swap': 1, 'ephemeral_gb': 2}
+        image = {'properties': {'mappings': [
+            {'virtual': 'swap', 'device': 'sdb1'},
+            {'virtual': 'ephemeral0', 'device': 'sdc1'}]}}
+        block_device_mapping = [
+            {'device_name': '/dev/sdb2', 'virtual_name': 'swap'},
+            {'device_name': '/dev/sdc1', 'snapshot_id': 'fake-snapshot'},
+            {'device_name': '/dev/sdd1', 'virtual_name': 'NoDevice'}]
+        instance = self._create_fake_instance()
+        self.compute_api._populate_instance_for_bdm(self.context, instance,
+                instance_type, image, block_device_mapping)
+        expected = [self._parse_db_block_device_mapping(bdm_ref)
+                    for bdm_ref in db.block_device_mapping_get_all_by_instance(
+                        self.context, instance['uuid'])]
+        self.assertEqual(3, len(expected))
+
+        values_for_create = \
+                self.compute_api._block_device_mapping_values_for_create(
+                        instance_type, image, block_device_mapping)
+        values = [self._parse_db_block_device_mapping(bdm)
+                  for bdm in values_for_create]
+        self.assertEqual(sorted(expected), sorted(values))
+
     def test_instance_architecture(self):
         # Test the instance architecture.
         i_ref = self._create_fake_instance()
@@ -7094,6 +7295,26 @@ class ComputeAPIAggrTestCase(BaseTestCase):
                         matchers.DictMatches({'availability_zone': 'fake_zone',
                         'foo_key2': 'foo_value2'}))
 
+    def test_aggregate_changes_update_scheduler(self):
+        # Ensure the schedulers are told about every aggregate change.
+        calls = []
+        self.stubs.Set(self.api.scheduler_rpcapi, 'update_aggregates',
+                       lambda context: calls.append(context))
+        values = _create_service_entries(self.context)
+        fake_zone = values.keys()[0]
+        fake_host = values[fake_zone][0]
+        aggr = self.api.create_aggregate(self.context, 'fake_aggregate',
+                                         fake_zone)
+        self.api.update_aggregate(self.context, aggr['id'],
+                                  {'name': 'new_fake_aggregate'})
+        self.api.update_aggregate_metadata(self.context, aggr['id'],
+                                           {'foo_key1': 'foo_value1'})
+        self.api.add_host_to_aggregate(self.context, aggr['id'], fake_host)
+        self.api.remove_host_from_aggregate(self.context, aggr['id'],
+                                            fake_host)
+        self.api.delete_aggregate(self.context, aggr['id'])
+        self.assertEqual([self.context] * 6, calls)
+
     def test_delete_aggregate(self):
         # Ensure we can delete an aggregate.
         aggr = self.api.create_aggregate(self.context, 'fake_aggregate',
@@ -7125,6 +7346,19 @@ class ComputeAPIAggrTestCase(BaseTestCase):
                                               aggr['id'], fake_host)
         self.assertEqual(len(aggr['hosts']), 1)
 
+    def test_add_host_to_aggregate_invalidates_conductor_cache(self):
+        values = _create_service_entries(self.context)
+        fake_zone = values.keys()[0]
+        fake_host = values[fake_zone][0]
+        aggr = self.api.create_aggregate(self.context,
+                                         'fake_aggregate', fake_zone)
+        self.mox.StubOutWithMock(self.api.conductor_rpcapi,
+                                 'cache_invalidate')
+        self.api.conductor_rpcapi.cache_invalidate(self.context,
+                                                   'aggregate_metadata')
+        self.mox.ReplayAll()
+        self.api.add_host_to_aggregate(self.context, aggr['id'], fake_host)
+
     def test_add_host_to_aggregate_multiple(self):
         # Ensure we can add multiple hosts to an aggregate.
         values = _create_service_entries(self.context)
@@ -262,6 +262,7 @@ class UnsupportedDriverTestCase(BaseTestCase):
         # disabled = no compute node stats
         self.assertTrue(self.tracker.disabled)
         self.assertEqual(None, self.tracker.compute_node)
+        self.assertEqual(None, self.tracker.get_resource_view())
 
     def test_disabled_claim(self):
         # basic claim:
@@ -462,6 +463,18 @@ class TrackerTestCase(BaseTrackerTestCase):
         self.assertFalse(self.tracker.disabled)
         self.assertEqual(0, self.tracker.compute_node['current_workload'])
 
+    def test_get_resource_view(self):
+        instance = self._fake_instance(memory_mb=3, root_gb=1, ephemeral_gb=1,
+                task_state=None)
+        self.tracker.instance_claim(self.context, instance, self.limits)
+
+        view = self.tracker.get_resource_view()
+        self.assertEqual(FAKE_VIRT_MEMORY_MB - 3, view['free_ram_mb'])
+        self.assertEqual(FAKE_VIRT_LOCAL_GB - 2, view['free_disk_gb'])
+        self.assertEqual(FAKE_VIRT_VCPUS, view['vcpus'])
+        statmap = dict((st['key'], st['value']) for st in view['stats'])
+        self.assertEqual(1, statmap['num_instances'])
+
 
 class InstanceClaimTestCase(BaseTrackerTestCase):
 
@@ -916,3 +929,73 @@ class OrphanTestCase(BaseTrackerTestCase):
         orphans = self.tracker._find_orphaned_instances()
 
         self.assertEqual(2, len(orphans))
+
+
+class BatchedUpdateTestCase(BaseTrackerTestCase):
+
+    def setUp(self):
+        super(BatchedUpdateTestCase, self).setUp()
+        self.writes = []
+        self.stubs.Set(db, 'compute_node_update',
+                self._fake_recording_compute_node_update)
+
+    def _fake_recording_compute_node_update(self, ctx, compute_node_id,
+            values, prune_stats=False):
+        self.writes.append(dict(values))
+        return self._fake_compute_node_update(ctx, compute_node_id, values,
+                                              prune_stats)
+
+    def test_claim_writes_changes_only(self):
+        instance = self._fake_instance(memory_mb=1, root_gb=1,
+                                       ephemeral_gb=0, vcpus=1)
+        self.tracker.instance_claim(self.context, instance, self.limits)
+
+        self.assertEqual(1, len(self.writes))
+        values = self.writes[0]
+        self.assertEqual(1, values['memory_mb_used'])
+        self.assertEqual(1, values['local_gb_used'])
+        self.assertFalse('memory_mb' in values)
+        self.assertFalse('cpu_info' in values)
+        self.assertEqual(1, values['stats']['num_instances'])
+
+    def test_unchanged_usage_not_written(self):
+        instance = self._fake_instance()
+        self.tracker.instance_claim(self.context, instance, self.limits)
+        del self.writes[:]
+
+        self.tracker.update_usage(self.context, instance)
+        self.assertEqual([], self.writes)
+
+    def test_delayed_claims_written_together(self):
+        self.flags(resource_tracker_update_delay=60)
+        for i in range(2):
+            instance = self._fake_instance(memory_mb=1, root_gb=1,
+                                           ephemeral_gb=0, vcpus=0)
+            self.tracker.instance_claim(self.context, instance, self.limits)
+        self.assertEqual([], self.writes)
+        self.assertNotEqual(None, self.tracker.pending_update)
+
+        self.tracker.flush()
+        self.assertEqual(1, len(self.writes))
+        self.assertEqual(2, self.writes[0]['memory_mb_used'])
+        self.assertEqual(None, self.tracker.pending_update)
+
+    def test_periodic_audit_interval(self):
+        self.flags(resource_tracker_audit_interval=600)
+        self.mox.StubOutWithMock(self.tracker, 'update_available_resource')
+        self.mox.StubOutWithMock(self.tracker, 'flush')
+        self.tracker.flush()
+        self.mox.ReplayAll()
+
+        self.tracker.periodic_update_available_resource(self.context)
+
+    def test_periodic_audit_due(self):
+        self.flags(resource_tracker_audit_interval=600)
+        timeutils.set_time_override(self.tracker.last_audit)
+        self.addCleanup(timeutils.clear_time_override)
+        timeutils.advance_time_seconds(601)
+        self.mox.StubOutWithMock(self.tracker, 'update_available_resource')
+        self.tracker.update_available_resource(self.context)
+        self.mox.ReplayAll()
+
+        self.tracker.periodic_update_available_resource(self.context)
@@ -97,6 +97,27 @@ class _BaseTestCase(object):
         self.assertEqual(instance['vm_state'], vm_states.STOPPED)
         self.assertEqual(new_inst['vm_state'], instance['vm_state'])
 
+    def test_instance_update_many(self):
+        instance1 = self._create_fake_instance()
+        instance2 = self._create_fake_instance()
+        updates = {instance1['uuid']: {'vm_state': vm_states.STOPPED},
+                   instance2['uuid']: {'vm_state': vm_states.STOPPED,
+                                       'expected_task_state': 'foo'}}
+        result = self.conductor.instance_update_many(self.context, updates)
+        self.assertEqual([instance1['uuid']],
+                         [instance['uuid'] for instance in result])
+        instance1 = db.instance_get_by_uuid(self.context, instance1['uuid'])
+        self.assertEqual(instance1['vm_state'], vm_states.STOPPED)
+        instance2 = db.instance_get_by_uuid(self.context, instance2['uuid'])
+        self.assertEqual(instance2['vm_state'], vm_states.ACTIVE)
+
+    def test_instance_update_many_invalid_key(self):
+        if self.db == None:
+            self.stub_out_client_exceptions()
+            self.assertRaises(KeyError,
+                              self.conductor.instance_update_many,
+                              self.context, {'any-uuid': {'foobar': 1}})
+
     def test_action_event_start(self):
         self.mox.StubOutWithMock(db, 'action_event_start')
         db.action_event_start(self.context, mox.IgnoreArg())
@@ -266,6 +287,23 @@ class _BaseTestCase(object):
         result = self.conductor.bw_usage_update(*update_args)
         self.assertEqual(result, 'foo')
 
+    def test_bw_usage_get_by_uuids(self):
+        self.mox.StubOutWithMock(db, 'bw_usage_get_by_uuids')
+        db.bw_usage_get_by_uuids(self.context, ['uuid1', 'uuid2'],
+                                 0).AndReturn(['foo'])
+        self.mox.ReplayAll()
+        result = self.conductor.bw_usage_get_by_uuids(self.context,
+                                                      ['uuid1', 'uuid2'], 0)
+        self.assertEqual(result, ['foo'])
+
+    def test_bw_usage_update_many(self):
+        self.mox.StubOutWithMock(db, 'bw_usage_update_many')
+        usages = [dict(uuid='uuid', mac='mac', start_period=0,
+                       bw_in=10, bw_out=20, last_ctr_in=5, last_ctr_out=10)]
+        db.bw_usage_update_many(self.context, usages, 20)
+        self.mox.ReplayAll()
+        self.conductor.bw_usage_update_many(self.context, usages, 20)
+
     def test_get_backdoor_port(self):
         backdoor_port = 59697
 
@@ -413,11 +451,11 @@ class _BaseTestCase(object):
 
     def test_compute_node_create(self):
         self.mox.StubOutWithMock(db, 'compute_node_create')
-        db.compute_node_create(self.context, 'fake-values').AndReturn(
+        values = {'service_id': 'fake-service-id'}
+        db.compute_node_create(self.context, values).AndReturn(
             'fake-result')
         self.mox.ReplayAll()
-        result = self.conductor.compute_node_create(self.context,
-                                                    'fake-values')
+        result = self.conductor.compute_node_create(self.context, values)
         self.assertEqual(result, 'fake-result')
 
     def test_compute_node_update(self):
@@ -775,6 +813,172 @@ class ConductorTestCase(_BaseTestCase, test.TestCase):
                                                        'event', ['args'])
 
 
+class ConductorCacheTestCase(test.TestCase):
+    """Conductor lookup cache tests."""
+    def setUp(self):
+        super(ConductorCacheTestCase, self).setUp()
+        self.flags(cache_ttl=60, group='conductor')
+        self.conductor = conductor_manager.ConductorManager()
+        self.context = FakeContext('fake-user', 'fake-project')
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+
+    def test_instance_type_get_cached(self):
+        self.mox.StubOutWithMock(db, 'instance_type_get')
+        db.instance_type_get(self.context, 1).AndReturn({'id': 1})
+        db.instance_type_get(self.context, 2).AndReturn({'id': 2})
+        self.mox.ReplayAll()
+        for i in xrange(3):
+            self.assertEqual({'id': 1},
+                             self.conductor.instance_type_get(self.context,
+                                                              1))
+        self.assertEqual({'id': 2},
+                         self.conductor.instance_type_get(self.context, 2))
+        stats = self.conductor.cache.stats()['instance_types']
+        self.assertEqual({'entries': 2, 'hits': 2, 'misses': 2}, stats)
+
+    def test_instance_type_get_cached_by_scope(self):
+        other_context = FakeContext('fake-user', 'other-project')
+        admin_context = FakeContext('admin', 'admin-project', is_admin=True)
+        other_admin_context = FakeContext('admin', 'other-project',
+                                          is_admin=True)
+        self.mox.StubOutWithMock(db, 'instance_type_get')
+        db.instance_type_get(self.context, 1).AndReturn({'id': 1})
+        db.instance_type_get(other_context, 1).AndReturn({'id': 1})
+        db.instance_type_get(admin_context, 1).AndReturn({'id': 1})
+        self.mox.ReplayAll()
+        for ctxt in (self.context, other_context, admin_context,
+                     other_admin_context, self.context):
+            self.conductor.instance_type_get(ctxt, 1)
+        stats = self.conductor.cache.stats()['instance_types']
+        self.assertEqual({'entries': 3, 'hits': 2, 'misses': 3}, stats)
+
+    def test_cached_value_copied(self):
+        self.mox.StubOutWithMock(db, 'instance_type_get')
+        db.instance_type_get(self.context, 1).AndReturn({'id': 1})
+        self.mox.ReplayAll()
+        self.conductor.instance_type_get(self.context, 1)['id'] = 'changed'
+        self.assertEqual({'id': 1},
+                         self.conductor.instance_type_get(self.context, 1))
+
+    def test_expired(self):
+        self.mox.StubOutWithMock(db, 'provider_fw_rule_get_all')
+        db.provider_fw_rule_get_all(self.context).AndReturn(['a'])
+        db.provider_fw_rule_get_all(self.context).AndReturn(['a', 'b'])
+        self.mox.ReplayAll()
+        self.assertEqual(['a'],
+                         self.conductor.provider_fw_rule_get_all(self.context))
+        timeutils.advance_time_seconds(59)
+        self.assertEqual(['a'],
+                         self.conductor.provider_fw_rule_get_all(self.context))
+        timeutils.advance_time_seconds(1)
+        self.assertEqual(['a', 'b'],
+                         self.conductor.provider_fw_rule_get_all(self.context))
+
+    def test_disabled(self):
+        self.conductor.cache.ttl = 0
+        self.mox.StubOutWithMock(db, 'agent_build_get_by_triple')
+        for i in xrange(2):
+            db.agent_build_get_by_triple(self.context, 'hv', 'os',
+                                         'arch').AndReturn(None)
+        self.mox.ReplayAll()
+        for i in xrange(2):
+            self.assertEqual(None, self.conductor.agent_build_get_by_triple(
+                self.context, 'hv', 'os', 'arch'))
+
+    def test_cache_invalidate_ids(self):
+        self.mox.StubOutWithMock(db,
+                                 'security_group_rule_get_by_security_group')
+        db.security_group_rule_get_by_security_group(
+            self.context, 1).AndReturn(['rule1'])
+        db.security_group_rule_get_by_security_group(
+            self.context, 2).AndReturn(['rule2'])
+        db.security_group_rule_get_by_security_group(
+            self.context, 1).AndReturn(['rule1', 'rule3'])
+        self.mox.ReplayAll()
+        get = self.conductor.security_group_rule_get_by_security_group
+        get(self.context, {'id': 1})
+        get(self.context, {'id': 2})
+        self.conductor.cache_invalidate(self.context,
+                                        'security_group_rules', [1])
+        self.assertEqual(['rule1', 'rule3'], get(self.context, {'id': 1}))
+        self.assertEqual(['rule2'], get(self.context, {'id': 2}))
+
+    def test_aggregate_write_invalidates(self):
+        self.mox.StubOutWithMock(db, 'aggregate_metadata_get_by_host')
+        self.mox.StubOutWithMock(db, 'aggregate_metadata_add')
+        db.aggregate_metadata_get_by_host(self.context, 'host',
+                                          'availability_zone').AndReturn({})
+        db.aggregate_metadata_add(mox.IgnoreArg(), 1, {'foo': 'bar'},
+                                  False).AndReturn({'foo': 'bar'})
+        db.aggregate_metadata_get_by_host(self.context, 'host',
+                'availability_zone').AndReturn({'availability_zone': 'az'})
+        self.mox.ReplayAll()
+        self.conductor.aggregate_metadata_get_by_host(self.context, 'host')
+        self.conductor.aggregate_metadata_add(self.context, {'id': 1},
+                                              {'foo': 'bar'})
+        self.assertEqual({'availability_zone': 'az'},
+                         self.conductor.aggregate_metadata_get_by_host(
+                             self.context, 'host'))
+
+    def test_aggregate_write_invalidates_everywhere(self):
+        self.mox.StubOutWithMock(db, 'aggregate_host_add')
+        self.mox.StubOutWithMock(self.conductor.conductor_rpcapi,
+                                 'cache_invalidate')
+        db.aggregate_host_add(mox.IgnoreArg(), 1, 'host').AndReturn({})
+        self.conductor.conductor_rpcapi.cache_invalidate(
+            self.context, 'aggregate_metadata')
+        self.mox.ReplayAll()
+        self.conductor.aggregate_host_add(self.context, {'id': 1}, 'host')
+
+    def test_service_update_invalidates_host(self):
+        self.mox.StubOutWithMock(db, 'service_get_by_compute_host')
+        self.mox.StubOutWithMock(db, 'service_get_all_by_host')
+        self.mox.StubOutWithMock(db, 'service_get_all_by_topic')
+        self.mox.StubOutWithMock(db, 'service_update')
+        db.service_get_by_compute_host(self.context, 'host1').AndReturn(
+            {'id': 1, 'host': 'host1'})
+        db.service_get_all_by_host(self.context, 'host2').AndReturn(
+            [{'id': 2, 'host': 'host2'}])
+        db.service_get_all_by_topic(self.context, 'compute').AndReturn(
+            [{'id': 1, 'host': 'host1'}, {'id': 2, 'host': 'host2'}])
+        db.service_update(self.context, 1, {'report_count': 1}).AndReturn(
+            {'id': 1, 'host': 'host1'})
+        db.service_get_by_compute_host(self.context, 'host1').AndReturn(
+            {'id': 1, 'host': 'host1', 'report_count': 1})
+        db.service_get_all_by_topic(self.context, 'compute').AndReturn(
+            [{'id': 1, 'host': 'host1', 'report_count': 1},
+             {'id': 2, 'host': 'host2'}])
+        self.mox.ReplayAll()
+        for i in xrange(2):
+            self.conductor.service_get_all_by(self.context, 'compute',
+                                              'host1')
+            self.conductor.service_get_all_by(self.context, host='host2')
+            self.conductor.service_get_all_by(self.context, 'compute')
+            if not i:
+                self.conductor.service_update(self.context,
+                                              {'id': 1, 'host': 'host1'},
+                                              {'report_count': 1})
+
+    def test_compute_node_update_invalidates_service(self):
+        self.mox.StubOutWithMock(db, 'service_get_by_compute_host')
+        self.mox.StubOutWithMock(db, 'compute_node_update')
+        service = {'id': 1, 'host': 'host1',
+                   'compute_node': [{'id': 5, 'service_id': 1}]}
+        db.service_get_by_compute_host(self.context, 'host1').AndReturn(
+            service)
+        db.compute_node_update(self.context, 5, {'vcpus_used': 1},
+                               False).AndReturn({})
+        db.service_get_by_compute_host(self.context, 'host1').AndReturn(
+            service)
+        self.mox.ReplayAll()
+        self.conductor.service_get_all_by(self.context, 'compute', 'host1')
+        self.conductor.compute_node_update(self.context,
+                                           {'id': 5, 'service_id': 1},
+                                           {'vcpus_used': 1})
+        self.conductor.service_get_all_by(self.context, 'compute', 'host1')
+
+
 class ConductorRPCAPITestCase(_BaseTestCase, test.TestCase):
     """Conductor RPC API Tests."""
     def setUp(self):
@@ -1097,6 +1301,17 @@ class ConductorAPITestCase(_BaseTestCase, test.TestCase):
         self.conductor.security_groups_trigger_handler(self.context,
                                                        'event', 'arg')
 
+    def test_cache_invalidate(self):
+        calls = []
+
+        def fake_cache_invalidate(context, region, ids=None):
+            calls.append((region, ids))
+
+        self.stubs.Set(self.conductor_manager, 'cache_invalidate',
+                       fake_cache_invalidate)
+        self.conductor.cache_invalidate(self.context, 'instance_types', [1])
+        self.assertIn(('instance_types', [1]), calls)
+
 
 class ConductorLocalAPITestCase(ConductorAPITestCase):
     """Conductor LocalAPI Tests."""
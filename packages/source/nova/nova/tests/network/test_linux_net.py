@@ -549,6 +549,97 @@ class LinuxNetworkTestCase(test.TestCase):
         ]
         self._test_dnsmasq_execute(expected)
 
+    def test_dnsmasq_execute_lease_listener(self):
+        self.flags(dhcp_lease_listener_interval=1)
+        network_ref = {'id': 'fake',
+                       'label': 'fake',
+                       'multi_host': False,
+                       'cidr': '10.0.0.0/24',
+                       'netmask': '255.255.255.0',
+                       'dhcp_start': '1.0.0.2',
+                       'dhcp_server': '10.0.0.1'}
+        executes = []
+        written = {}
+
+        def fake_execute(*args, **kwargs):
+            executes.append(args)
+            return "", ""
+
+        def fake_write_to_file(path, data):
+            written[path] = data
+
+        leases = '1362000000 DE:AD:BE:EF:00:00 192.168.0.100 instance00 *'
+        self.stubs.Set(linux_net, '_execute', fake_execute)
+        self.stubs.Set(linux_net, 'get_dhcp_leases', lambda *a: leases)
+        self.stubs.Set(linux_net, '_dhcp_leases', {})
+        self.stubs.Set(os, 'chmod', lambda *a, **kw: None)
+        self.stubs.Set(utils, 'delete_if_exists', lambda *a: None)
+        self.stubs.Set(linux_net, 'write_to_file', fake_write_to_file)
+        self.stubs.Set(linux_net, '_dnsmasq_pid_for', lambda *a, **kw: None)
+
+        linux_net.restart_dhcp(self.context, 'br100', network_ref)
+
+        leasefile = linux_net._dhcp_file('br100', 'leases')
+        self.assertEqual(leases, written[leasefile])
+        self.assertEqual({'br100': {'192.168.0.100': 'DE:AD:BE:EF:00:00'}},
+                         linux_net._dhcp_leases)
+        self.assertEqual(1, len(executes))
+        self.assertTrue('--dhcp-leasefile=%s' % leasefile in executes[0])
+        self.assertFalse('--dhcp-script=%s' % CONF.dhcpbridge in executes[0])
+        self.assertFalse('--leasefile-ro' in executes[0])
+
+    def test_get_dhcp_lease_changes(self):
+        self.stubs.Set(linux_net, '_dhcp_leases',
+                       {'eth0': {'192.168.0.100': 'DE:AD:BE:EF:00:00',
+                                 '192.168.0.101': 'DE:AD:BE:EF:00:02'},
+                        'eth1': {}})
+        with utils.tempdir() as tmpdir:
+            self.flags(networks_path=tmpdir)
+            linux_net.write_to_file(linux_net._dhcp_file('eth0', 'leases'),
+                '1362000000 DE:AD:BE:EF:00:00 192.168.0.100 instance00 *\n'
+                '1362000000 DE:AD:BE:EF:00:04 192.168.0.102 instance00 *\n'
+                'duid 00:01:00:01:18:a1:b2:c3:de:ad:be:ef:00:00\n')
+
+            self.assertEqual((['192.168.0.102'], ['192.168.0.101']),
+                             self.driver.get_dhcp_lease_changes())
+            self.assertEqual(([], []), self.driver.get_dhcp_lease_changes())
+
+    def test_add_and_remove_dhcp_host(self):
+        queried = []
+        written = []
+
+        def fake_get_associated(context, network_id, host=None, address=None):
+            queried.append(address)
+            return get_associated(context, network_id, host, address)
+
+        self.stubs.Set(db, 'network_get_associated_fixed_ips',
+                       fake_get_associated)
+        self.stubs.Set(linux_net, '_dhcp_hosts', {})
+        self.stubs.Set(linux_net, 'write_to_file',
+                       lambda path, data: written.append(data))
+        self.stubs.Set(linux_net, 'restart_dhcp', lambda *a: None)
+        all_hosts = self.driver.get_dhcp_hosts(self.context, networks[0])
+        del queried[:]
+
+        # NOTE: with the entries of the network not known yet, all of
+        #       them are looked up
+        self.driver.remove_dhcp_host(self.context, 'eth0', networks[0],
+                                     '192.168.1.101')
+        self.assertEqual([None], queried)
+        self.assertEqual(all_hosts, written[-1])
+
+        self.driver.remove_dhcp_host(self.context, 'eth0', networks[0],
+                                     '192.168.1.101')
+        self.assertEqual([None], queried)
+        self.assertFalse('192.168.1.101' in written[-1])
+        self.assertEqual(2, len(written[-1].splitlines()))
+
+        self.driver.add_dhcp_host(self.context, 'eth0', networks[0],
+                                  '192.168.1.101')
+        self.assertEqual([None, '192.168.1.101'], queried)
+        self.assertEqual(sorted(all_hosts.splitlines()),
+                         sorted(written[-1].splitlines()))
+
     def test_isolated_host(self):
         self.flags(fake_network=False,
                    share_dhcp_address=True)
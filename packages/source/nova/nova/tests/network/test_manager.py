@@ -564,6 +564,86 @@ class VlanNetworkTestCase(test.TestCase):
         network['vpn_private_address'] = '192.168.0.2'
         self.network.allocate_fixed_ip(self.context, FAKEUUID, network)
 
+    def test_associate_pool_fixed_ip_prefetch(self):
+        self.flags(fixed_ip_prefetch=2)
+        self.mox.StubOutWithMock(db, 'fixed_ip_get_free_by_network')
+        self.mox.StubOutWithMock(db, 'fixed_ip_associate_pool')
+
+        db.fixed_ip_get_free_by_network(mox.IgnoreArg(), 0, 2).AndReturn(
+                ['192.168.0.5', '192.168.0.6'])
+        # NOTE: another host took the first ip tried meanwhile
+        db.fixed_ip_associate_pool(mox.IgnoreArg(), 0, FAKEUUID,
+                                   address=mox.IgnoreArg()).AndRaise(
+                exception.NoMoreFixedIps())
+        db.fixed_ip_associate_pool(mox.IgnoreArg(), 0, FAKEUUID,
+                                   address=mox.IgnoreArg()).AndReturn(
+                '192.168.0.6')
+        # NOTE: with no free ip left to look up, the network is searched
+        db.fixed_ip_get_free_by_network(mox.IgnoreArg(), 0, 2).AndReturn([])
+        db.fixed_ip_associate_pool(mox.IgnoreArg(), 0,
+                                   FAKEUUID).AndReturn('192.168.0.7')
+        self.mox.ReplayAll()
+
+        self.assertEqual('192.168.0.6', self.network._associate_pool_fixed_ip(
+                self.context, 0, FAKEUUID))
+        self.assertEqual('192.168.0.7', self.network._associate_pool_fixed_ip(
+                self.context, 0, FAKEUUID))
+
+    def test_allocate_fixed_ip_updates_its_dhcp_host(self):
+        self.flags(fake_network=False, use_ipv6=False,
+                   fixed_range='192.168.0.0/24')
+        self.mox.StubOutWithMock(db, 'fixed_ip_associate_pool')
+        self.mox.StubOutWithMock(db, 'fixed_ip_update')
+        self.mox.StubOutWithMock(db,
+                              'virtual_interface_get_by_instance_and_network')
+        self.mox.StubOutWithMock(db, 'instance_get_by_uuid')
+        self.mox.StubOutWithMock(self.network, '_get_dhcp_ip')
+        self.mox.StubOutWithMock(self.network.l3driver, 'initialize_gateway')
+        self.mox.StubOutWithMock(self.network.driver, 'add_dhcp_host')
+
+        db.instance_get_by_uuid(mox.IgnoreArg(),
+                        mox.IgnoreArg()).AndReturn({'security_groups':
+                                                             [{'id': 0}]})
+        db.fixed_ip_associate_pool(mox.IgnoreArg(),
+                                   mox.IgnoreArg(),
+                                   mox.IgnoreArg()).AndReturn('192.168.0.1')
+        db.virtual_interface_get_by_instance_and_network(mox.IgnoreArg(),
+                mox.IgnoreArg(), mox.IgnoreArg()).AndReturn({'id': 0})
+        db.fixed_ip_update(mox.IgnoreArg(),
+                           mox.IgnoreArg(),
+                           mox.IgnoreArg())
+        db.instance_get_by_uuid(mox.IgnoreArg(),
+                    mox.IgnoreArg()).AndReturn({'display_name': HOST})
+        self.network._get_dhcp_ip(mox.IgnoreArg(),
+                                  mox.IgnoreArg()).AndReturn('192.168.0.1')
+        self.network.l3driver.initialize_gateway(mox.IgnoreArg())
+        self.network.driver.add_dhcp_host(mox.IgnoreArg(), mox.IgnoreArg(),
+                                          mox.IgnoreArg(), '192.168.0.1')
+        self.mox.ReplayAll()
+
+        network = dict(networks[0])
+        network['vpn_public_address'] = '192.168.0.2'
+        network['vpn_private_address'] = '192.168.0.2'
+        self.network.allocate_fixed_ip(self.context, FAKEUUID, network)
+
+    def test_handle_dhcp_lease_changes(self):
+        self.mox.StubOutWithMock(self.network.driver,
+                                 'get_dhcp_lease_changes')
+        self.mox.StubOutWithMock(self.network, 'lease_fixed_ip')
+        self.mox.StubOutWithMock(self.network, 'release_fixed_ip')
+
+        self.network.driver.get_dhcp_lease_changes().AndReturn(
+                (['192.168.0.100', '192.168.0.101'], ['192.168.0.102']))
+        # NOTE: an address that fails doesn't keep the others from being
+        #       handled
+        self.network.lease_fixed_ip(self.context, '192.168.0.100').AndRaise(
+                exception.FixedIpNotFoundForAddress(address='192.168.0.100'))
+        self.network.lease_fixed_ip(self.context, '192.168.0.101')
+        self.network.release_fixed_ip(self.context, '192.168.0.102')
+        self.mox.ReplayAll()
+
+        self.network._handle_dhcp_lease_changes(self.context)
+
     def test_create_networks_too_big(self):
         self.assertRaises(ValueError, self.network.create_networks, None,
                           num_networks=4094, vlan_start=1)
@@ -1121,7 +1201,7 @@ class VlanNetworkTestCase(test.TestCase):
         def network_get(_context, network_id, project_only="allow_none"):
             return networks[network_id]
 
-        def teardown_network_on_host(_context, network):
+        def teardown_network_on_host(_context, network, fixed_address=None):
             if network['id'] == 0:
                 raise test.TestingException()
 
@@ -0,0 +1,192 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the columnar scheduler filter and weigher engine.
+"""
+
+import testtools
+
+from nova.scheduler import columnar
+from nova.scheduler import filters
+from nova.scheduler import weights
+from nova import test
+from nova.tests.scheduler import fakes
+
+
+class PassOddHostsFilter(filters.BaseHostFilter):
+    def host_passes(self, host_state, filter_properties):
+        return int(host_state.host[4:]) % 2 == 1
+
+
+class NumInstancesWeigher(weights.BaseHostWeigher):
+    def _weigh_object(self, host_state, weight_properties):
+        return host_state.num_instances
+
+
+def _fake_hosts():
+    hosts = []
+    for i in xrange(12):
+        attrs = {'free_ram_mb': 512 * (i % 5) - 256,
+                 'total_usable_ram_mb': 2048,
+                 'free_disk_mb': 10240 * (i % 4),
+                 'total_usable_disk_gb': 30,
+                 'vcpus_total': 4 * (i % 3),
+                 'vcpus_used': 2 * i,
+                 'num_io_ops': i % 9,
+                 'num_instances': 5 * i}
+        hosts.append(fakes.FakeHostState('host%d' % i, 'node%d' % i, attrs))
+    return hosts
+
+
+@testtools.skipIf(columnar.numpy is None, 'NumPy is not installed')
+class ColumnarFiltersTestCase(test.TestCase):
+    """Test vectorized filters against their per-host versions."""
+
+    def setUp(self):
+        super(ColumnarFiltersTestCase, self).setUp()
+        self.flags(scheduler_use_columnar_engine=True)
+        self.filter_classes = dict((cls.__name__, cls)
+                                   for cls in filters.all_filters())
+        self.filter_properties = {'instance_type': {'memory_mb': 1024,
+                                                    'root_gb': 10,
+                                                    'ephemeral_gb': 5,
+                                                    'vcpus': 2}}
+
+    def _assert_same_as_host_passes(self, filter_name):
+        filt_cls = self.filter_classes[filter_name]
+        self.assertTrue(filt_cls.vectorized)
+
+        expected_hosts = _fake_hosts()
+        expected = [filt_cls().host_passes(host_state,
+                                           self.filter_properties)
+                    for host_state in expected_hosts]
+
+        hosts = _fake_hosts()
+        columns = columnar.HostColumns(hosts)
+        result = filt_cls().host_passes_columns(columns,
+                                                self.filter_properties)
+
+        self.assertEqual(expected, [bool(passes) for passes in result])
+        self.assertEqual([host_state.limits for host_state in expected_hosts
+                          if filt_cls().host_passes(host_state,
+                                                    self.filter_properties)],
+                         [host_state.limits for host_state in
+                          columns.select(result)])
+
+    def test_ram_filter(self):
+        self.flags(ram_allocation_ratio=1.0)
+        self._assert_same_as_host_passes('RamFilter')
+
+    def test_ram_filter_oversubscribe(self):
+        self.flags(ram_allocation_ratio=2.0)
+        self._assert_same_as_host_passes('RamFilter')
+
+    def test_core_filter(self):
+        self.flags(cpu_allocation_ratio=2.0)
+        self._assert_same_as_host_passes('CoreFilter')
+
+    def test_core_filter_no_instance_type(self):
+        self.filter_properties = {}
+        self._assert_same_as_host_passes('CoreFilter')
+
+    def test_disk_filter(self):
+        self.flags(disk_allocation_ratio=1.0)
+        self._assert_same_as_host_passes('DiskFilter')
+
+    def test_disk_filter_oversubscribe(self):
+        self.flags(disk_allocation_ratio=1.5)
+        self._assert_same_as_host_passes('DiskFilter')
+
+    def test_io_ops_filter(self):
+        self.flags(max_io_ops_per_host=4)
+        self._assert_same_as_host_passes('IoOpsFilter')
+
+    def test_num_instances_filter(self):
+        self.flags(max_instances_per_host=30)
+        self._assert_same_as_host_passes('NumInstancesFilter')
+
+    def test_filter_handler(self):
+        filter_classes = [self.filter_classes['RamFilter'],
+                          PassOddHostsFilter,
+                          self.filter_classes['NumInstancesFilter']]
+        handler = filters.HostFilterHandler()
+
+        self.flags(scheduler_use_columnar_engine=False)
+        expected = handler.get_filtered_objects(filter_classes,
+                _fake_hosts(), self.filter_properties)
+        self.flags(scheduler_use_columnar_engine=True)
+        result = handler.get_filtered_objects(filter_classes,
+                iter(_fake_hosts()), self.filter_properties)
+
+        self.assertEqual([host_state.host for host_state in expected],
+                         [host_state.host for host_state in result])
+
+    def test_filter_handler_only_runs_others_on_survivors(self):
+        seen = []
+
+        def fake_host_passes(_self, host_state, filter_properties):
+            seen.append(host_state.host)
+            return True
+
+        self.stubs.Set(PassOddHostsFilter, 'host_passes', fake_host_passes)
+        self.flags(max_instances_per_host=10)
+        filter_classes = [PassOddHostsFilter,
+                          self.filter_classes['NumInstancesFilter']]
+
+        result = filters.HostFilterHandler().get_filtered_objects(
+                filter_classes, _fake_hosts(), self.filter_properties)
+
+        self.assertEqual(['host0', 'host1'], seen)
+        self.assertEqual(['host0', 'host1'],
+                         [host_state.host for host_state in result])
+
+
+@testtools.skipIf(columnar.numpy is None, 'NumPy is not installed')
+class ColumnarWeightsTestCase(test.TestCase):
+    """Test vectorized weighers against their per-host versions."""
+
+    def setUp(self):
+        super(ColumnarWeightsTestCase, self).setUp()
+        self.handler = weights.HostWeightHandler()
+        self.weight_classes = self.handler.get_matching_classes(
+                ['nova.scheduler.weights.ram.RAMWeigher'])
+        self.weight_classes.append(NumInstancesWeigher)
+
+    def _get_weighed_hosts(self, use_columnar):
+        self.flags(scheduler_use_columnar_engine=use_columnar)
+        weighed_hosts = self.handler.get_weighed_objects(
+                self.weight_classes, _fake_hosts(), {})
+        return [(weighed_host.obj.host, weighed_host.weight)
+                for weighed_host in weighed_hosts]
+
+    def test_weigh(self):
+        self.assertEqual(self._get_weighed_hosts(False),
+                         self._get_weighed_hosts(True))
+
+    def test_weigh_with_multiplier(self):
+        self.flags(ram_weight_multiplier=-2.5)
+        self.assertEqual(self._get_weighed_hosts(False),
+                         self._get_weighed_hosts(True))
+
+
+class ColumnarEnabledTestCase(test.TestCase):
+
+    def test_disabled_by_default(self):
+        self.assertFalse(columnar.enabled())
+
+    def test_disabled_without_numpy(self):
+        self.flags(scheduler_use_columnar_engine=True)
+        self.stubs.Set(columnar, 'numpy', None)
+        self.assertFalse(columnar.enabled())
@@ -0,0 +1,103 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the static scheduler filter cache.
+"""
+
+from nova.openstack.common import timeutils
+from nova.scheduler import filter_cache
+from nova.scheduler import filters
+from nova import test
+from nova.tests.scheduler import fakes
+
+
+class FakeStaticFilter(filters.BaseHostFilter):
+    """Passes hosts whose 'arch' capability matches the request."""
+
+    static = True
+    calls = []
+
+    def static_key(self, filter_properties):
+        return filter_properties['arch']
+
+    def host_passes(self, host_state, filter_properties):
+        self.calls.append(host_state.host)
+        return host_state.capabilities.get('arch') == filter_properties['arch']
+
+
+def _fake_hosts():
+    return [fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                {'capabilities': {'arch': arch}})
+            for i, arch in enumerate(['x86_64', 'i686', 'x86_64'])]
+
+
+class StaticFilterCacheTestCase(test.TestCase):
+
+    def setUp(self):
+        super(StaticFilterCacheTestCase, self).setUp()
+        self.addCleanup(timeutils.clear_time_override)
+        timeutils.set_time_override()
+        self.cache = filter_cache.StaticFilterCache()
+        FakeStaticFilter.calls = []
+
+    def _filter(self, arch):
+        hosts = self.cache.filter_hosts([FakeStaticFilter], _fake_hosts(),
+                                        {'arch': arch})
+        return [host_state.host for host_state in hosts]
+
+    def test_filter_hosts(self):
+        self.assertEqual(['host0', 'host2'], self._filter('x86_64'))
+        self.assertEqual(['host0', 'host2'], self._filter('x86_64'))
+        self.assertEqual(['host0', 'host1', 'host2'], FakeStaticFilter.calls)
+        self.assertEqual(3, self.cache.hits)
+        self.assertEqual(3, self.cache.misses)
+
+    def test_filter_hosts_keyed_by_request(self):
+        self.assertEqual(['host0', 'host2'], self._filter('x86_64'))
+        self.assertEqual(['host1'], self._filter('i686'))
+        self.assertEqual(6, len(FakeStaticFilter.calls))
+
+    def test_invalidate_host(self):
+        self._filter('x86_64')
+        self.cache.invalidate_host(('host1', 'node1'))
+        self.assertEqual(['host0', 'host2'], self._filter('x86_64'))
+        self.assertEqual(['host0', 'host1', 'host2', 'host1'],
+                         FakeStaticFilter.calls)
+
+    def test_invalidate_all(self):
+        self._filter('x86_64')
+        self.cache.invalidate_all()
+        self._filter('x86_64')
+        self.assertEqual(6, len(FakeStaticFilter.calls))
+
+    def test_expire(self):
+        self.flags(scheduler_static_filter_cache_ttl=60)
+        self._filter('x86_64')
+        timeutils.advance_time_seconds(30)
+        self._filter('x86_64')
+        self.assertEqual(3, len(FakeStaticFilter.calls))
+        timeutils.advance_time_seconds(31)
+        self._filter('x86_64')
+        self.assertEqual(6, len(FakeStaticFilter.calls))
+
+    def test_static_filters(self):
+        static_filters = set(cls.__name__ for cls in filters.all_filters()
+                             if cls.static)
+        self.assertEqual(set(['AvailabilityZoneFilter',
+                              'ImagePropertiesFilter',
+                              'ComputeCapabilitiesFilter',
+                              'AggregateInstanceExtraSpecsFilter',
+                              'AggregateTypeAffinityFilter']),
+                         static_filters)
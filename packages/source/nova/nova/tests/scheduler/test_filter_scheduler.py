@@ -658,6 +658,61 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.assertEquals(50, hosts[0].weight)
 
+    def _schedule_many(self, batch, num_instances=100,
+                       filter_properties=None):
+        self.flags(scheduler_batch_placement=batch,
+                   scheduler_default_filters=['RamFilter', 'CoreFilter',
+                                              'DiskFilter'],
+                   scheduler_weight_classes=[
+                       'nova.scheduler.weights.ram.RAMWeigher'])
+        sched = fakes.FakeFilterScheduler()
+
+        host_states = []
+        for i in xrange(20):
+            host_states.append(fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                    {'free_ram_mb': 1024 * (i % 4 + 1),
+                     'total_usable_ram_mb': 1024 * (i % 4 + 1),
+                     'free_disk_mb': 102400, 'total_usable_disk_gb': 100,
+                     'vcpus_total': 4, 'vcpus_used': i % 3}))
+        self.stubs.Set(sched.host_manager, 'get_all_host_states',
+                       lambda context: iter(host_states))
+
+        instance_properties = {'project_id': 1, 'root_gb': 10,
+                               'ephemeral_gb': 0, 'memory_mb': 1024,
+                               'vcpus': 2, 'os_type': 'Linux'}
+        request_spec = {'num_instances': num_instances,
+                        'instance_type': instance_properties,
+                        'instance_properties': instance_properties}
+        hosts = sched._schedule(self.context, request_spec,
+                                filter_properties or {})
+        return [(host.obj.host, host.weight) for host in hosts]
+
+    def test_schedule_batch_placement_matches_loop(self):
+        self.flags(scheduler_host_subset_size=1)
+        expected = self._schedule_many(False)
+        self.assertEqual(expected, self._schedule_many(True))
+        # the hosts only have room for 70 instances with a 1.5 ram ratio
+        self.assertEqual(70, len(expected))
+
+    def test_schedule_batch_placement_host_subset(self):
+        self.flags(scheduler_host_subset_size=5)
+        self.assertEqual(len(self._schedule_many(False)),
+                         len(self._schedule_many(True)))
+
+    def test_schedule_batch_placement_not_used_for_groups(self):
+        self.stubs.Set(filter_scheduler.FilterScheduler, 'group_hosts',
+                       lambda *args: [])
+
+        def _fake_schedule_batch(*args):
+            self.fail('Batch placement used with a group hint')
+
+        self.stubs.Set(filter_scheduler.FilterScheduler, '_schedule_batch',
+                       _fake_schedule_batch)
+        filter_properties = {'scheduler_hints': {'group': 'cats'}}
+        hosts = self._schedule_many(True, num_instances=3,
+                                    filter_properties=filter_properties)
+        self.assertEqual(3, len(hosts))
+
     def test_select_hosts_happy_day(self):
         """select_hosts is basically a wrapper around the _select() method.
         Similar to the _select tests, this just does a happy path test to
@@ -264,6 +264,36 @@ class HostManagerTestCase(test.TestCase):
         self.assertEqual(host_states_map[('host4', 'node4')].free_disk_mb,
                          8388608)
 
+    def test_get_stats(self):
+        context = 'fake_context'
+
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        self.mox.ReplayAll()
+
+        self.host_manager.filter_classes = [FakeFilterClass1]
+
+        def fake_host_passes(self, host_state, filter_properties):
+            return host_state.host != 'host1'
+
+        self.stubs.Set(FakeFilterClass1, 'host_passes', fake_host_passes)
+        hosts = self.host_manager.get_all_host_states(context)
+        hosts = self.host_manager.get_filtered_hosts(hosts, {},
+                filter_class_names=['FakeFilterClass1'])
+        self.host_manager.get_weighed_hosts(hosts, {})
+
+        result = self.host_manager.get_stats(reset=True)
+        self.assertEqual(1, result['db']['compute_node_get_all']['calls'])
+        filter_stats = result['filters']['FakeFilterClass1']
+        self.assertEqual((1, 4, 3), (filter_stats['calls'],
+                                     filter_stats['hosts_in'],
+                                     filter_stats['hosts_out']))
+        self.assertEqual(3, result['weighers']['RAMWeigher']['hosts'])
+
+        result = self.host_manager.get_stats()
+        self.assertEqual(({}, {}, {}), (result['filters'],
+                                        result['weighers'], result['db']))
+
 
 class HostManagerChangedNodesTestCase(test.TestCase):
     """Test case for HostManager class."""
@@ -323,6 +353,203 @@ class HostManagerChangedNodesTestCase(test.TestCase):
         self.assertEqual(len(host_states_map), 0)
 
 
+class HostManagerCachedHostStatesTestCase(test.TestCase):
+    """Test case for HostManager with scheduler_cache_host_states."""
+
+    def setUp(self):
+        super(HostManagerCachedHostStatesTestCase, self).setUp()
+        self.flags(scheduler_cache_host_states=True,
+                   scheduler_host_state_resync_interval=60)
+        self.host_manager = host_manager.HostManager()
+        self.addCleanup(timeutils.clear_time_override)
+        timeutils.set_time_override()
+
+    def _compute_view(self, free_ram_mb, updated_at):
+        return dict(memory_mb=1024, free_ram_mb=free_ram_mb, local_gb=1024,
+                    local_gb_used=0, free_disk_gb=512,
+                    disk_available_least=512, vcpus=1, vcpus_used=1,
+                    updated_at=timeutils.strtime(updated_at),
+                    stats=[dict(key='num_instances', value='3')])
+
+    def test_get_all_host_states_uses_cache(self):
+        context = 'fake_context'
+
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        timeutils.advance_time_seconds(30)
+        host_states = list(self.host_manager.get_all_host_states(context))
+        self.assertEqual(len(host_states), 4)
+        self.assertEqual(self.host_manager.generation, 1)
+
+    def test_get_all_host_states_resync_after_interval(self):
+        context = 'fake_context'
+
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        running_nodes = [n for n in fakes.COMPUTE_NODES
+                         if n.get('hypervisor_hostname') != 'node4']
+        db.compute_node_get_all(context).AndReturn(running_nodes)
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        timeutils.advance_time_seconds(61)
+        self.host_manager.get_all_host_states(context)
+
+        host_states_map = self.host_manager.host_state_map
+        self.assertEqual(len(host_states_map), 3)
+        self.assertEqual(self.host_manager.generation, 2)
+        for host_state in host_states_map.values():
+            self.assertEqual(host_state.generation, 2)
+
+    def test_update_service_capabilities_updates_cached_state(self):
+        context = 'fake_context'
+
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        timeutils.advance_time_seconds(1)
+        capabs = dict(hypervisor_hostname='node1',
+                      compute_node=self._compute_view(
+                          100, timeutils.utcnow()))
+        self.host_manager.update_service_capabilities('compute', 'host1',
+                                                      capabs)
+        self.host_manager.get_all_host_states(context)
+
+        host_state = self.host_manager.host_state_map[('host1', 'node1')]
+        self.assertEqual(host_state.free_ram_mb, 100)
+        self.assertEqual(host_state.num_instances, 3)
+        self.assertEqual(host_state.service, fakes.COMPUTE_NODES[0]['service'])
+        self.assertFalse('compute_node' in host_state.capabilities)
+        self.assertFalse('compute_node' in
+                self.host_manager.service_states[('host1', 'node1')])
+
+    def test_update_service_capabilities_unknown_node_forces_resync(self):
+        context = 'fake_context'
+
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES[:1])
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        capabs = dict(hypervisor_hostname='node2',
+                      compute_node=self._compute_view(
+                          100, timeutils.utcnow()))
+        self.host_manager.update_service_capabilities('compute', 'host2',
+                                                      capabs)
+        self.host_manager.get_all_host_states(context)
+
+        self.assertEqual(len(self.host_manager.host_state_map), 4)
+
+    def test_update_service_capabilities_without_cache(self):
+        self.flags(scheduler_cache_host_states=False)
+        context = 'fake_context'
+
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES)
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        capabs = dict(hypervisor_hostname='node1',
+                      compute_node=self._compute_view(
+                          100, timeutils.utcnow()))
+        self.host_manager.update_service_capabilities('compute', 'host1',
+                                                      capabs)
+        self.host_manager.get_all_host_states(context)
+
+        host_state = self.host_manager.host_state_map[('host1', 'node1')]
+        self.assertEqual(host_state.free_ram_mb, 512)
+
+
+class FakeStaticFilter(filters.BaseHostFilter):
+    static = True
+
+    def static_key(self, filter_properties):
+        return None
+
+    def host_passes(self, host_state, filter_properties):
+        filter_properties['calls'].append(host_state.host)
+        return True
+
+
+class HostManagerStaticFilterCacheTestCase(test.TestCase):
+    """Test case for HostManager with scheduler_cache_static_filters."""
+
+    def setUp(self):
+        super(HostManagerStaticFilterCacheTestCase, self).setUp()
+        self.flags(scheduler_cache_static_filters=True)
+        self.host_manager = host_manager.HostManager()
+        self.host_manager.filter_classes = [FakeStaticFilter,
+                                            FakeFilterClass1]
+        self.fake_hosts = [host_manager.HostState('fake_host%s' % x,
+                'fake-node') for x in xrange(1, 3)]
+        self.calls = []
+
+    def _get_filtered_hosts(self):
+        self.host_manager.get_filtered_hosts(self.fake_hosts,
+                {'calls': self.calls},
+                filter_class_names=['FakeStaticFilter', 'FakeFilterClass1'])
+
+    def test_get_filtered_hosts(self):
+        self.mox.StubOutWithMock(self.host_manager.filter_handler,
+                                 'get_filtered_objects')
+        for i in xrange(2):
+            self.host_manager.filter_handler.get_filtered_objects(
+                    [FakeFilterClass1], self.fake_hosts,
+                    {'calls': self.calls}).AndReturn(self.fake_hosts)
+        self.mox.ReplayAll()
+
+        self._get_filtered_hosts()
+        self._get_filtered_hosts()
+        self.assertEqual(['fake_host1', 'fake_host2'], self.calls)
+
+    def test_changed_capabilities_invalidate_host(self):
+        capabs = dict(hypervisor_hostname='fake-node', arch='x86_64')
+        self.host_manager.update_service_capabilities('compute',
+                'fake_host1', capabs)
+        self._get_filtered_hosts()
+        self.host_manager.update_service_capabilities('compute',
+                'fake_host1', capabs)
+        self._get_filtered_hosts()
+        self.assertEqual(['fake_host1', 'fake_host2'], self.calls)
+
+        self.host_manager.update_service_capabilities('compute',
+                'fake_host1', dict(capabs, arch='i686'))
+        self._get_filtered_hosts()
+        self.assertEqual(['fake_host1', 'fake_host2', 'fake_host1'],
+                         self.calls)
+
+    def test_update_aggregates(self):
+        self._get_filtered_hosts()
+        self.host_manager.update_aggregates()
+        self._get_filtered_hosts()
+        self.assertEqual(['fake_host1', 'fake_host2'] * 2, self.calls)
+
+    def test_get_all_host_states_invalidates_new_and_dead_hosts(self):
+        context = 'fake_context'
+        self.mox.StubOutWithMock(db, 'compute_node_get_all')
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES[:1])
+        db.compute_node_get_all(context).AndReturn(fakes.COMPUTE_NODES[1:2])
+        self.mox.StubOutWithMock(self.host_manager.static_filter_cache,
+                                 'invalidate_host')
+        self.host_manager.static_filter_cache.invalidate_host(
+                ('host1', 'node1'))
+        self.host_manager.static_filter_cache.invalidate_host(
+                ('host2', 'node2'))
+        self.host_manager.static_filter_cache.invalidate_host(
+                ('host1', 'node1'))
+        self.mox.ReplayAll()
+
+        self.host_manager.get_all_host_states(context)
+        self.host_manager.get_all_host_states(context)
+
+
 class HostStateTestCase(test.TestCase):
     """Test case for HostState class."""
 
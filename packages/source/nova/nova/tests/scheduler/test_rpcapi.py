@@ -88,6 +88,14 @@ class SchedulerRpcAPITestCase(test.TestCase):
                 host='fake_host', capabilities='fake_capabilities',
                 version='2.4')
 
+    def test_update_aggregates(self):
+        self._test_scheduler_api('update_aggregates',
+                rpc_method='fanout_cast', version='2.7')
+
+    def test_get_scheduler_stats(self):
+        self._test_scheduler_api('get_scheduler_stats', rpc_method='call',
+                reset=True, version='2.8')
+
     def test_get_backdoor_port(self):
         self._test_scheduler_api('get_backdoor_port', rpc_method='call',
                                  host='fake_host', version='2.5')
@@ -117,6 +117,20 @@ class SchedulerManagerTestCase(test.TestCase):
                 service_name=service_name, host=host,
                 capabilities=[capab1, capab2, capab3])
 
+    def test_update_aggregates(self):
+        self.mox.StubOutWithMock(self.manager.driver, 'update_aggregates')
+        self.manager.driver.update_aggregates()
+        self.mox.ReplayAll()
+        self.manager.update_aggregates(self.context)
+
+    def test_get_scheduler_stats(self):
+        self.mox.StubOutWithMock(self.manager.driver, 'get_scheduler_stats')
+        self.manager.driver.get_scheduler_stats(reset=True).AndReturn(
+                'fake_stats')
+        self.mox.ReplayAll()
+        result = self.manager.get_scheduler_stats(self.context, reset=True)
+        self.assertEqual('fake_stats', result)
+
     def test_show_host_resources(self):
         host = 'fake_host'
 
@@ -17,6 +17,7 @@ Tests For Scheduler weights.
 """
 
 from nova import context
+from nova.scheduler import stats
 from nova.scheduler import weights
 from nova import test
 from nova.tests import matchers
@@ -88,6 +89,15 @@ class RamWeigherTestCase(test.TestCase):
         self.assertEqual(weighed_host.weight, 8192)
         self.assertEqual(weighed_host.obj.host, 'host4')
 
+    def test_stats(self):
+        hostinfo_list = list(self._get_all_hosts())
+        self.weight_handler.stats = stats.SchedulerStats()
+        self._get_weighed_host(hostinfo_list)
+        self._get_weighed_host(hostinfo_list)
+        entry = self.weight_handler.stats.weighers['RAMWeigher']
+        self.assertEqual(2, entry['calls'])
+        self.assertEqual(8, entry['hosts'])
+
     def test_ram_filter_multiplier1(self):
         self.flags(ram_weight_multiplier=-1.0)
         hostinfo_list = self._get_all_hosts()
@@ -114,6 +114,66 @@ class DbApiTestCase(DbTestCase):
 
         self.flags(osapi_compute_unique_server_name_scope=None)
 
+    def test_instance_create_bulk(self):
+        db.security_group_create(self.context,
+                                 {'name': 'web', 'project_id': 'fake'})
+        values_list = []
+        for i in xrange(3):
+            values_list.append({'project_id': self.project_id,
+                                'hostname': 'host-%d' % i,
+                                'not_a_column': 'ignored',
+                                'metadata': {'index': str(i)},
+                                'system_metadata': {'image_os': 'linux'},
+                                'info_cache': {'network_info': '[]'},
+                                'security_groups': ['default', 'web']})
+        bdms = [{'device_name': '/dev/vdb', 'virtual_name': 'ephemeral0',
+                 'volume_size': 1},
+                {'device_name': '/dev/vdc', 'snapshot_id': 'fake-snap',
+                 'delete_on_termination': False}]
+
+        instances = db.instance_create_bulk(self.context, values_list, bdms)
+
+        self.assertEqual(['host-0', 'host-1', 'host-2'],
+                         [instance['hostname'] for instance in instances])
+        for i, instance in enumerate(instances):
+            instance = db.instance_get_by_uuid(self.context, instance['uuid'])
+            self.assertEqual({'index': str(i)},
+                             utils.metadata_to_dict(instance['metadata']))
+            self.assertEqual({'image_os': 'linux'},
+                    utils.metadata_to_dict(instance['system_metadata']))
+            self.assertEqual('[]', instance['info_cache']['network_info'])
+            self.assertEqual(['default', 'web'],
+                             sorted(group['name'] for group in
+                                    instance['security_groups']))
+            instance_bdms = db.block_device_mapping_get_all_by_instance(
+                    self.context, instance['uuid'])
+            self.assertEqual(['/dev/vdb', '/dev/vdc'],
+                             sorted(bdm['device_name']
+                                    for bdm in instance_bdms))
+            db.get_ec2_instance_id_by_uuid(self.context, instance['uuid'])
+
+    def test_instance_create_bulk_unknown_security_group(self):
+        self.assertRaises(exception.SecurityGroupNotFoundForProject,
+                          db.instance_create_bulk, self.context,
+                          [{'project_id': self.project_id,
+                            'security_groups': ['missing']}])
+        self.assertEqual([], db.instance_get_all(
+                context.get_admin_context()))
+
+    def test_instance_create_bulk_duplicate_hostnames(self):
+        values_list = [{'project_id': self.project_id, 'hostname': 'Web'},
+                       {'project_id': self.project_id, 'hostname': 'web'}]
+        db.instance_create_bulk(self.context, values_list)
+
+        self.flags(osapi_compute_unique_server_name_scope='project')
+        values_list = [{'project_id': self.project_id, 'hostname': 'App'},
+                       {'project_id': self.project_id, 'hostname': 'app'}]
+        self.assertRaises(exception.InstanceExists,
+                          db.instance_create_bulk, self.context, values_list)
+        self.assertEqual(['Web', 'web'],
+                         sorted(instance['hostname'] for instance in
+                                db.instance_get_all(self.context)))
+
     def test_ec2_ids_not_found_are_printable(self):
         def check_exc_format(method):
             try:
@@ -199,6 +259,67 @@ class DbApiTestCase(DbTestCase):
         else:
             self.assertTrue(result[1]['deleted'])
 
+    def test_instance_get_all_by_filters_paginate_with_columns(self):
+        insts = [self.create_instances_with_args(display_name='test%d' % i)
+                 for i in xrange(3)]
+
+        result = db.instance_get_all_by_filters(self.context, {},
+                                                sort_dir='asc', limit=2,
+                                                columns=['display_name'])
+        self.assertEqual(['test0', 'test1'],
+                         [inst['display_name'] for inst in result])
+        result = db.instance_get_all_by_filters(self.context, {},
+                                                sort_dir='asc',
+                                                marker=insts[1]['uuid'],
+                                                columns=['display_name'])
+        self.assertEqual(['test2'], [inst['display_name'] for inst in result])
+        self.assertRaises(exception.MarkerNotFound,
+                          db.instance_get_all_by_filters,
+                          self.context, {}, marker=str(stdlib_uuid.uuid4()),
+                          columns=['display_name'])
+
+    def test_instance_get_all_by_filters_marker_in_other_project(self):
+        other_context = context.RequestContext(self.user_id, 'other')
+        other_inst = self.create_instances_with_args(context=other_context)
+        self.create_instances_with_args()
+        self.assertRaises(exception.MarkerNotFound,
+                          db.instance_get_all_by_filters,
+                          self.context, {}, marker=other_inst['uuid'])
+
+    def test_instance_get_all_by_filters_with_columns(self):
+        inst1 = self.create_instances_with_args(user_data='fake_user_data')
+        inst2 = self.create_instances_with_args()
+        self.create_metadata_for_instance(inst1['uuid'])
+        db.instance_info_cache_update(self.context, inst1['uuid'],
+                                      {'network_info': '[]'})
+        group = db.security_group_create(self.context,
+                                         {'name': 'fake_group',
+                                          'project_id': self.project_id})
+        db.instance_add_security_group(self.context, inst1['uuid'],
+                                       group['id'])
+        db.instance_destroy(self.context, inst2['uuid'])
+
+        expected = db.instance_get_all_by_filters(self.context, {},
+                                                  sort_dir='asc')
+        result = db.instance_get_all_by_filters(self.context, {},
+                                                sort_dir='asc',
+                                                columns=['host', 'vm_state'])
+
+        self.assertEqual(2, len(result))
+        for inst, expected_inst in zip(result, expected):
+            for key in ('id', 'uuid', 'deleted', 'host', 'vm_state', 'name'):
+                self.assertEqual(expected_inst[key], inst[key])
+            self.assertEqual(None, inst['user_data'])
+            for key in ('metadata', 'system_metadata', 'security_groups'):
+                self.assertEqual(
+                        [item['id'] for item in expected_inst[key]],
+                        [item['id'] for item in inst[key]])
+            self.assertEqual(expected_inst['info_cache']['network_info'],
+                             inst['info_cache']['network_info'])
+        self.assertEqual(['fake_group'],
+                         [sec_group['name'] for sec_group in
+                          result[0]['security_groups']])
+
     def test_instance_get_all_by_host_and_node_no_join(self):
         # Test that system metadata is not joined.
         sys_meta = {'foo': 'bar'}
@@ -488,6 +609,35 @@ class DbApiTestCase(DbTestCase):
         self.assertEquals("building", old_ref["vm_state"])
         self.assertEquals("needscoffee", new_ref["vm_state"])
 
+    def test_instance_update_many(self):
+        ctxt = context.get_admin_context()
+        instance1 = db.instance_create(ctxt, {'vm_state': 'building'})
+        instance2 = db.instance_create(ctxt, {'vm_state': 'building',
+                                              'task_state': 'spawning'})
+        missing_uuid = str(stdlib_uuid.uuid4())
+
+        updates = {instance1['uuid']: {'vm_state': 'active',
+                                       'expected_task_state': None},
+                   instance2['uuid']: {'vm_state': 'active',
+                                       'expected_task_state': None},
+                   missing_uuid: {'vm_state': 'active'}}
+        result = db.instance_update_many(ctxt, updates)
+
+        self.assertEqual(1, len(result))
+        old_ref, new_ref = result[0]
+        self.assertEqual(instance1['uuid'], new_ref['uuid'])
+        self.assertEqual('building', old_ref['vm_state'])
+        self.assertEqual('active', new_ref['vm_state'])
+        # The caller's values are left alone
+        self.assertIn('expected_task_state', updates[instance1['uuid']])
+        instance2 = db.instance_get_by_uuid(ctxt, instance2['uuid'])
+        self.assertEqual('building', instance2['vm_state'])
+
+    def test_instance_update_many_invalid_uuid(self):
+        ctxt = context.get_admin_context()
+        self.assertRaises(exception.InvalidUUID, db.instance_update_many,
+                          ctxt, {'not-a-uuid': {'vm_state': 'active'}})
+
     def _test_instance_update_updates_metadata(self, metadata_type):
         ctxt = context.get_admin_context()
 
@@ -978,6 +1128,10 @@ class DbApiTestCase(DbTestCase):
         self.assertEqual(record['vif_address'], vif['address'])
         data = db.network_get_associated_fixed_ips(ctxt, 1, 'nothing')
         self.assertEqual(len(data), 0)
+        data = db.network_get_associated_fixed_ips(ctxt, 1, address='baz')
+        self.assertEqual(len(data), 1)
+        data = db.network_get_associated_fixed_ips(ctxt, 1, address='qux')
+        self.assertEqual(len(data), 0)
 
     def test_network_get_all_by_host(self):
         ctxt = context.get_admin_context()
@@ -1149,6 +1303,37 @@ class DbApiTestCase(DbTestCase):
         _compare(bw_usages[2], expected_bw_usages[2])
         timeutils.clear_time_override()
 
+    def test_bw_usage_update_many(self):
+        ctxt = context.get_admin_context()
+        now = timeutils.utcnow()
+        start_period = now - datetime.timedelta(seconds=10)
+        refreshed = now - datetime.timedelta(seconds=5)
+
+        db.bw_usage_update(ctxt, 'fake_uuid1', 'fake_mac1', start_period,
+                           100, 200, 12345, 67890)
+        usages = [{'uuid': 'fake_uuid1', 'mac': 'fake_mac1',
+                   'start_period': start_period, 'bw_in': 150,
+                   'bw_out': 250, 'last_ctr_in': 12395,
+                   'last_ctr_out': 67940},
+                  {'uuid': 'fake_uuid1', 'mac': 'fake_mac2',
+                   'start_period': start_period, 'bw_in': 1, 'bw_out': 2,
+                   'last_ctr_in': 3, 'last_ctr_out': 4},
+                  {'uuid': 'fake_uuid2', 'mac': 'fake_mac3',
+                   'start_period': start_period, 'bw_in': 5, 'bw_out': 6,
+                   'last_ctr_in': 7, 'last_ctr_out': 8}]
+        db.bw_usage_update_many(ctxt, usages, last_refreshed=refreshed)
+
+        bw_usages = db.bw_usage_get_by_uuids(ctxt,
+                ['fake_uuid1', 'fake_uuid2'], start_period)
+        self.assertEqual(3, len(bw_usages))
+        bw_usages = dict(((bw_usage['uuid'], bw_usage['mac']), bw_usage)
+                         for bw_usage in bw_usages)
+        for usage in usages:
+            bw_usage = bw_usages[(usage['uuid'], usage['mac'])]
+            for key, value in usage.items():
+                self.assertEqual(value, bw_usage[key])
+            self.assertEqual(refreshed, bw_usage['last_refreshed'])
+
 
 def _get_fake_aggr_values():
     return {'name': 'fake_aggregate'}
@@ -2008,6 +2193,39 @@ class TestIpAllocation(test.TestCase):
         self.assertEqual(fixed_ip['instance_uuid'], self.instance['uuid'])
         self.assertEqual(fixed_ip['network_id'], self.network['id'])
 
+    def test_fixed_ip_get_free_by_network(self):
+        network_id = self.network['id']
+        self.create_fixed_ip(address='192.168.0.1', network_id=network_id,
+                             reserved=True)
+        self.create_fixed_ip(address='192.168.0.2', network_id=network_id,
+                             instance_uuid=self.instance['uuid'])
+        self.create_fixed_ip(address='192.168.0.3', network_id=network_id,
+                             host='host')
+        self.create_fixed_ip(address='192.168.0.4', network_id=network_id)
+        self.create_fixed_ip(address='192.168.0.5', network_id=network_id)
+        self.create_fixed_ip(address='192.168.0.6')
+
+        free = db.fixed_ip_get_free_by_network(self.ctxt, network_id, 5)
+        self.assertEqual(['192.168.0.4', '192.168.0.5'], sorted(free))
+        free = db.fixed_ip_get_free_by_network(self.ctxt, network_id, 1)
+        self.assertEqual(1, len(free))
+
+    def test_fixed_ip_associate_pool_address(self):
+        network_id = self.network['id']
+        self.create_fixed_ip(address='192.168.0.1', network_id=network_id)
+        self.create_fixed_ip(address='192.168.0.2', network_id=network_id)
+
+        address = db.fixed_ip_associate_pool(self.ctxt, network_id,
+                                             self.instance['uuid'],
+                                             address='192.168.0.2')
+        self.assertEqual('192.168.0.2', address)
+        fixed_ip = db.fixed_ip_get_by_address(self.ctxt, address)
+        self.assertEqual(fixed_ip['instance_uuid'], self.instance['uuid'])
+        self.assertRaises(exception.NoMoreFixedIps,
+                          db.fixed_ip_associate_pool,
+                          self.ctxt, network_id, self.instance['uuid'],
+                          address='192.168.0.2')
+
 
 class InstanceDestroyConstraints(test.TestCase):
 
@@ -123,3 +123,28 @@ class FiltersTestCase(test.TestCase):
                                                      filter_objs_initial,
                                                      filter_properties)
         self.assertEqual(result, filter_objs_last)
+
+    def test_get_filtered_objects_with_stats(self):
+        recorded = []
+
+        class FakeStats(object):
+            def add_filter(self, name, elapsed, objs_in, objs_out):
+                recorded.append((name, objs_in, objs_out))
+
+        def _fake_filter_one(self, obj, filter_properties):
+            return obj != 'obj2'
+
+        def _fake_base_loader_init(*args, **kwargs):
+            pass
+
+        self.stubs.Set(loadables.BaseLoader, '__init__',
+                       _fake_base_loader_init)
+        self.stubs.Set(Filter1, '_filter_one', _fake_filter_one)
+
+        filter_handler = filters.BaseFilterHandler(filters.BaseFilter)
+        filter_handler.stats = FakeStats()
+        result = filter_handler.get_filtered_objects([Filter1, Filter2],
+                                                     ['obj1', 'obj2', 'obj3'],
+                                                     'fake_filter_properties')
+        self.assertEqual(['obj1', 'obj3'], result)
+        self.assertEqual([('Filter1', 3, 2), ('Filter2', 2, 2)], recorded)
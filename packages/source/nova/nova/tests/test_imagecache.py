@@ -27,7 +27,9 @@ from oslo.config import cfg
 
 from nova.compute import vm_states
 from nova import conductor
+from nova import context
 from nova import db
+from nova import exception
 from nova.openstack.common import importutils
 from nova.openstack.common import log as logging
 from nova import test
@@ -279,6 +281,35 @@ class ImageCacheManagerTestCase(test.TestCase):
         self.assertEquals(inuse_images, [found])
         self.assertEquals(len(image_cache_manager.unexplained_images), 0)
 
+    def test_backing_file_cached(self):
+        lookups = []
+
+        def fake_get_disk_backing_file(path):
+            lookups.append(path)
+            return None
+
+        self.stubs.Set(virtutils, 'get_disk_backing_file',
+                       fake_get_disk_backing_file)
+
+        with utils.tempdir() as tmpdir:
+            disk_path = os.path.join(tmpdir, 'disk')
+            with open(disk_path, 'w') as f:
+                f.write('\x00' * 1024)
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            for i in range(2):
+                self.assertEqual(
+                    None, image_cache_manager._get_disk_backing_file(
+                        disk_path))
+            self.assertEqual([disk_path], lookups)
+
+            # A new file at the same path is looked up again
+            with open(disk_path + '.new', 'w') as f:
+                f.write('\x00' * 2048)
+            os.rename(disk_path + '.new', disk_path)
+            image_cache_manager._get_disk_backing_file(disk_path)
+            self.assertEqual([disk_path, disk_path], lookups)
+
     def test_find_base_file_nothing(self):
         self.stubs.Set(os.path, 'exists', lambda x: False)
 
@@ -392,6 +423,40 @@ class ImageCacheManagerTestCase(test.TestCase):
                 res = image_cache_manager._verify_checksum(img, fname)
                 self.assertTrue(res)
 
+    def test_verify_checksum_changed_only(self):
+        img = {'container_format': 'ami', 'id': '42'}
+
+        self.flags(checksum_base_images=True,
+                   checksum_changed_base_images_only=True,
+                   checksum_interval_seconds=0)
+
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            self.flags(image_info_filename_pattern=('$instances_path/'
+                                                    '%(image)s.info'))
+            fname, info_fname, testdata = self._make_checksum(tmpdir)
+            imagecache.write_stored_checksum(fname)
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            self.assertTrue(image_cache_manager._verify_checksum(img, fname))
+
+            # Not hashed again while unchanged
+            hashes = []
+            orig_hash_file = utils.hash_file
+
+            def fake_hash_file(f):
+                hashes.append(f.name)
+                return orig_hash_file(f)
+
+            self.stubs.Set(utils, 'hash_file', fake_hash_file)
+            self.assertTrue(image_cache_manager._verify_checksum(img, fname))
+            self.assertEqual([], hashes)
+
+            with open(fname, 'a') as f:
+                f.write('corrupt')
+            self.assertFalse(image_cache_manager._verify_checksum(img, fname))
+            self.assertEqual([fname], hashes)
+
     def test_verify_checksum_disabled(self):
         img = {'container_format': 'ami', 'id': '42'}
 
@@ -944,6 +1009,168 @@ class ImageCacheManagerTestCase(test.TestCase):
             self.assertTrue(os.path.exists(base_filename))
             self.assertTrue(os.path.exists(base_filename + '.info'))
 
+    def test_index_persisted(self):
+        self.stubs.Set(virtutils, 'chown', lambda x, y: None)
+
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir)
+            base_dir = os.path.join(tmpdir, '_base')
+            os.mkdir(base_dir)
+            hashed = hashlib.sha1('1').hexdigest()
+            open(os.path.join(base_dir, hashed), 'w').close()
+            open(os.path.join(base_dir, 'a' * 40), 'w').close()
+            all_instances = [{'image_ref': '1',
+                              'host': CONF.host,
+                              'name': 'instance-1',
+                              'uuid': '123',
+                              'vm_state': '',
+                              'task_state': ''}]
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.index['b' * 40] = {'last_used': 1}
+            image_cache_manager.verify_base_images(None, all_instances)
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager._load_index()
+            self.assertEqual([hashed], image_cache_manager.index.keys())
+            self.assertTrue(
+                image_cache_manager.index[hashed]['last_used'] > 0)
+
+    def test_prefetch_images(self):
+        fetched = []
+
+        def fake_fetch_image(context, target, image_id, user_id, project_id):
+            fetched.append(image_id)
+            f = open(target, 'w')
+            f.write('image')
+            f.close()
+
+        self.stubs.Set(virtutils, 'fetch_image', fake_fetch_image)
+        all_instances = [{'image_ref': '2'},
+                         {'image_ref': '3'},
+                         {'image_ref': '3'},
+                         {'image_ref': ''}]
+
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir,
+                       prefetch_images=['1', '4'],
+                       prefetch_popular_images=1)
+            base_dir = os.path.join(tmpdir, '_base')
+            os.mkdir(base_dir)
+            cached = os.path.join(base_dir, hashlib.sha1('4').hexdigest())
+            open(cached, 'w').close()
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.prefetch_images(
+                context.get_admin_context(), all_instances)
+            image_cache_manager.prefetch_pool.waitall()
+
+            self.assertEqual(['1', '3'], sorted(fetched))
+            self.assertTrue(os.path.exists(
+                os.path.join(base_dir, hashlib.sha1('1').hexdigest())))
+            self.assertEqual(set(), image_cache_manager.prefetching)
+
+    def test_prefetch_images_with_boot_context(self):
+        fetched = []
+
+        def fake_fetch_image(context, target, image_id, user_id, project_id):
+            fetched.append((image_id, context.auth_token))
+            if image_id == '3':
+                raise exception.ImageNotAuthorized(image_id=image_id)
+            if image_id == '4':
+                raise exception.ImageNotFound(image_id=image_id)
+            open(target, 'w').close()
+
+        self.stubs.Set(virtutils, 'fetch_image', fake_fetch_image)
+        admin_context = context.get_admin_context()
+
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir,
+                       auth_strategy='keystone',
+                       prefetch_images=['1', '2', '3', '4'])
+            image_cache_manager = imagecache.ImageCacheManager()
+
+            # The admin context has no token for glance.
+            image_cache_manager.prefetch_images(admin_context, [])
+            image_cache_manager.prefetch_pool.waitall()
+            self.assertEqual([], fetched)
+
+            image_cache_manager.record_boot(
+                context.RequestContext('user', 'project',
+                                       auth_token='token-1'), '1')
+            image_cache_manager.record_boot(
+                context.RequestContext('user', 'project',
+                                       auth_token='token-3'), '3')
+            image_cache_manager.record_boot(
+                context.RequestContext('user', 'project',
+                                       auth_token='token-4'), '4')
+            image_cache_manager.prefetch_images(admin_context, [])
+            image_cache_manager.prefetch_pool.waitall()
+            # Image 2 was not booted here, and the token of another
+            # image's boot may not be allowed to read it.
+            self.assertEqual([('1', 'token-1'), ('3', 'token-3'),
+                              ('4', 'token-4')], sorted(fetched))
+
+            # The contexts which failed are not used again.
+            self.assertEqual(['1'], image_cache_manager.boot_contexts.keys())
+
+    def test_verify_base_images_keeps_prefetched(self):
+        self.stubs.Set(virtutils, 'chown', lambda x, y: None)
+
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir,
+                       prefetch_images=['1'],
+                       remove_unused_base_images=True)
+            base_dir = os.path.join(tmpdir, '_base')
+            os.mkdir(base_dir)
+            base_file = os.path.join(base_dir, hashlib.sha1('1').hexdigest())
+            open(base_file, 'w').close()
+            old = time.time() - (25 * 3600)
+            os.utime(base_file, (old, old))
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.verify_base_images(None, [])
+
+            self.assertTrue(os.path.exists(base_file))
+            self.assertEqual([base_file],
+                             image_cache_manager.active_base_files)
+            self.assertEqual([], image_cache_manager.removable_base_files)
+
+    def test_verify_base_images_keeps_popular_prefetched(self):
+        self.stubs.Set(virtutils, 'chown', lambda x, y: None)
+        self.stubs.Set(virtutils, 'fetch_image',
+                       lambda context, target, *args: open(target, 'w'))
+
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir,
+                       prefetch_popular_images=1,
+                       remove_unused_base_images=True)
+            base_dir = os.path.join(tmpdir, '_base')
+            os.mkdir(base_dir)
+            base_file = os.path.join(base_dir, hashlib.sha1('2').hexdigest())
+            open(base_file, 'w').close()
+            old = time.time() - (25 * 3600)
+            os.utime(base_file, (old, old))
+
+            image_cache_manager = imagecache.ImageCacheManager()
+            image_cache_manager.prefetch_images(
+                context.get_admin_context(),
+                [{'image_ref': '2', 'host': 'otherhost'}])
+            image_cache_manager.verify_base_images(None, [])
+            self.assertTrue(os.path.exists(base_file))
+            self.assertEqual([base_file],
+                             image_cache_manager.active_base_files)
+
+            # Reaped once it is no longer popular.
+            image_cache_manager.prefetch_images(
+                context.get_admin_context(),
+                [{'image_ref': '3', 'host': 'otherhost'}])
+            image_cache_manager.prefetch_pool.waitall()
+            os.utime(base_file, (old, old))
+            image_cache_manager.verify_base_images(None, [])
+            self.assertEqual([base_file],
+                             image_cache_manager.removable_base_files)
+
     def test_compute_manager(self):
         was = {'called': False}
 
@@ -971,3 +1198,51 @@ class ImageCacheManagerTestCase(test.TestCase):
             compute.conductor_api = conductor.API()
             compute._run_image_cache_manager_pass(None)
             self.assertTrue(was['called'])
+
+    def test_compute_manager_prefetches_popular_elsewhere(self):
+        def fake_get_all(context, *args, **kwargs):
+            return [{'image_ref': '1',
+                     'host': CONF.host,
+                     'name': 'instance-1',
+                     'uuid': '123',
+                     'vm_state': '',
+                     'task_state': ''},
+                    {'image_ref': '2',
+                     'host': 'otherhost',
+                     'name': 'instance-2',
+                     'uuid': '456',
+                     'vm_state': '',
+                     'task_state': ''},
+                    {'image_ref': '2',
+                     'host': 'otherhost',
+                     'name': 'instance-3',
+                     'uuid': '789',
+                     'vm_state': '',
+                     'task_state': ''}]
+
+        fetched = []
+
+        def fake_fetch_image(context, target, image_id, user_id, project_id):
+            fetched.append(image_id)
+            open(target, 'w').close()
+
+        self.stubs.Set(virtutils, 'fetch_image', fake_fetch_image)
+
+        with utils.tempdir() as tmpdir:
+            self.flags(instances_path=tmpdir,
+                       prefetch_popular_images=1)
+            image_cache_manager = imagecache.ImageCacheManager()
+
+            self.stubs.Set(db, 'instance_get_all', fake_get_all)
+            compute = importutils.import_object(CONF.compute_manager)
+            self.flags(use_local=True, group='conductor')
+            compute.conductor_api = conductor.API()
+            self.stubs.Set(compute.driver, 'prefetch_images',
+                           image_cache_manager.prefetch_images)
+            compute._run_image_cache_manager_pass(
+                context.get_admin_context())
+            image_cache_manager.prefetch_pool.waitall()
+
+            # Image 2 is only used on another host, so it is not in the
+            # image cache of this one.
+            self.assertEqual(['2'], fetched)
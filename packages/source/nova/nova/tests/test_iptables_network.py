@@ -253,3 +253,63 @@ class IptablesManagerTestCase(test.TestCase):
                                                self.manager.ipv4['filter'],
                                                'filter')
         self.assertEqual(current_lines, new_lines)
+
+    def test_differential_apply(self):
+        self.flags(iptables_differential_apply=True, use_ipv6=False)
+        calls = []
+
+        def fake_execute(*cmd, **kwargs):
+            calls.append((cmd, kwargs.get('process_input')))
+            if cmd[0] == 'iptables-save':
+                return '\n'.join(self.sample_filter + self.sample_nat), ''
+            return '', ''
+
+        self.manager.execute = fake_execute
+        table = self.manager.ipv4['filter']
+
+        # The first apply has to be a full one.
+        self.manager.apply()
+        self.assertEqual(['iptables-save', 'iptables-restore'],
+                         [call[0][0] for call in calls])
+
+        # Only the chain which changed is rewritten.
+        del calls[:]
+        table.add_chain('inst-1')
+        table.add_rule('inst-1', '-s 10.0.0.1 -j ACCEPT')
+        table.add_rule('local', '-d 10.0.0.2 -j $inst-1')
+        self.manager.apply()
+        self.assertEqual(1, len(calls))
+        cmd, restore_input = calls[0]
+        self.assertEqual(('iptables-restore', '-c', '--noflush'), cmd)
+        self.assertEqual(['*filter',
+                          ':%s-inst-1 - [0:0]' % self.binary_name,
+                          ':%s-local - [0:0]' % self.binary_name,
+                          '[0:0] -A %s-inst-1 -s 10.0.0.1 -j ACCEPT' %
+                          self.binary_name,
+                          '[0:0] -A %s-local -d 10.0.0.2 -j %s-inst-1' %
+                          (self.binary_name, self.binary_name),
+                          'COMMIT', ''],
+                         restore_input.split('\n'))
+
+        # Nothing changed, nothing to do.
+        del calls[:]
+        self.manager.apply()
+        self.assertEqual([], calls)
+
+        # A removed chain is flushed and deleted.
+        table.remove_chain('inst-1')
+        self.manager.apply()
+        cmd, restore_input = calls[0]
+        self.assertEqual(['*filter',
+                          ':%s-inst-1 - [0:0]' % self.binary_name,
+                          ':%s-local - [0:0]' % self.binary_name,
+                          '-X %s-inst-1' % self.binary_name,
+                          'COMMIT', ''],
+                         restore_input.split('\n'))
+
+        # Changing an unwrapped chain needs a full apply.
+        del calls[:]
+        table.add_rule('FORWARD', '-j ACCEPT', wrap=False)
+        self.manager.apply()
+        self.assertEqual(['iptables-save', 'iptables-restore'],
+                         [call[0][0] for call in calls])
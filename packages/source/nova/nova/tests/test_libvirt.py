@@ -4083,6 +4083,107 @@ class IptablesFirewallTestCase(test.TestCase):
         self.fw.instances[instance_ref['id']] = instance_ref
         self.fw.do_refresh_security_group_rules("fake")
 
+    def _stub_security_groups(self, groups, rules):
+        self.rule_lookups = []
+        self.nw_info_lookups = []
+
+        def fake_get_by_instance(ctxt, instance):
+            return [{'id': group_id} for group_id in groups[instance['id']]]
+
+        def fake_rule_get(ctxt, security_group):
+            self.rule_lookups.append(security_group['id'])
+            return rules.get(security_group['id'], [])
+
+        def fake_get_nw_info(*args, **kwargs):
+            self.nw_info_lookups.append(args[-1]['id'])
+            return network_model
+
+        network_model = _fake_network_info(self.stubs, 1, spectacular=True)
+        _fake_stub_out_get_nw_info(self.stubs, fake_get_nw_info)
+        self.stubs.Set(self.fw._virtapi, 'security_group_get_by_instance',
+                       fake_get_by_instance)
+        self.stubs.Set(self.fw._virtapi,
+                       'security_group_rule_get_by_security_group',
+                       fake_rule_get)
+        self.stubs.Set(self.fw, '_inner_do_refresh_rules',
+                       lambda *args: None)
+        self.stubs.Set(self.fw, 'add_filters_for_instance',
+                       lambda *args: None)
+
+        network_info = network_model.legacy()
+        for instance_id in groups:
+            self.fw.prepare_instance_filter({'id': instance_id,
+                                             'uuid': 'fake-%s' % instance_id},
+                                            network_info)
+
+    def test_security_group_rules_cached(self):
+        tcp_rule = {'cidr': '10.0.0.0/8', 'protocol': 'tcp',
+                    'from_port': 22, 'to_port': 22, 'grantee_group': None}
+        self._stub_security_groups({1: [10], 2: [10], 3: [10, 20]},
+                                   {10: [tcp_rule], 20: [tcp_rule]})
+        self.assertEqual([10, 20], self.rule_lookups)
+
+        ipv4_rules, ipv6_rules = self.fw.instance_rules(
+            self.fw.instances[3], self.fw.network_infos[3])
+        self.assertEqual(2, ipv4_rules.count(
+            '-j ACCEPT -p tcp --dport 22 -s 10.0.0.0/8'))
+        self.assertEqual([10, 20], self.rule_lookups)
+
+        # Only the refreshed group is looked up again.
+        self.fw.do_refresh_security_group_rules(20)
+        self.assertEqual([10, 20, 20], self.rule_lookups)
+
+    def test_security_group_cache_purged(self):
+        self._stub_security_groups({1: [10], 2: [20]}, {})
+        del self.fw.instances[2]
+        self.fw.prepare_instance_filter(self.fw.instances[1],
+                                        self.fw.network_infos[1])
+        self.assertEqual([1], self.fw.instance_security_groups.keys())
+        self.assertEqual([10], self.fw.security_group_rules.keys())
+
+    def test_refresh_security_group_members(self):
+        grantee_group = {'id': 30, 'instances': [{'id': 5, 'uuid': 'fake-5'},
+                                                 {'id': 6, 'uuid': 'fake-6'}]}
+        group_rule = {'cidr': None, 'protocol': None,
+                      'grantee_group': grantee_group}
+        self._stub_security_groups({1: [10], 2: [10], 3: [20]},
+                                   {10: [group_rule]})
+        # One lookup per member of the grantee group, not per instance
+        # granted access.
+        self.assertEqual([5, 6], self.nw_info_lookups)
+
+        refreshed = []
+        self.stubs.Set(self.fw, '_inner_do_refresh_rules',
+                       lambda instance, *args: refreshed.append(
+                           instance['id']))
+        self.fw.do_refresh_security_group_members(10)
+        self.assertEqual([5, 6, 5, 6], self.nw_info_lookups)
+        self.assertEqual([1, 2], sorted(refreshed))
+
+    def test_refresh_instance_security_rules_drops_cache(self):
+        grantee_group = {'id': 30, 'instances': [{'id': 5, 'uuid': 'fake-5'}]}
+        group_rule = {'cidr': None, 'protocol': None,
+                      'grantee_group': grantee_group}
+        tcp_rule = {'cidr': '10.0.0.0/8', 'protocol': 'tcp',
+                    'from_port': 22, 'to_port': 22, 'grantee_group': None}
+        rules = {10: [group_rule], 20: []}
+        self._stub_security_groups({1: [10, 20], 2: [20]}, rules)
+        self.assertEqual([10, 20], self.rule_lookups)
+        self.assertEqual([5], self.nw_info_lookups)
+
+        # A rule added to a group of the instance, which is what
+        # trigger_rules_refresh asks compute hosts to refresh for.
+        rules[20] = [tcp_rule]
+        refreshed = []
+        self.stubs.Set(self.fw, '_inner_do_refresh_rules',
+                       lambda instance, ipv4_rules, ipv6_rules:
+                           refreshed.append(ipv4_rules))
+        self.fw.refresh_instance_security_rules(self.fw.instances[1])
+        self.assertEqual([10, 20, 10, 20], self.rule_lookups)
+        self.assertEqual([5, 5], self.nw_info_lookups)
+        self.assertTrue('-j ACCEPT -p tcp --dport 22 -s 10.0.0.0/8' in
+                        refreshed[0])
+
     def test_unfilter_instance_undefines_nwfilter(self):
         admin_ctxt = context.get_admin_context()
 
@@ -4691,6 +4792,29 @@ disk size: 4.4M''', ''))
         out = libvirt_utils.get_disk_backing_file('')
         self.assertEqual(out, 'c')
 
+    def test_get_qcow2_backing_file(self):
+        with utils.tempdir() as tmpdir:
+            path = os.path.join(tmpdir, 'disk')
+            backing_file = '/instances/_base/abc'
+            with open(path, 'wb') as f:
+                f.write('QFI\xfb\x00\x00\x00\x02'
+                        '\x00\x00\x00\x00\x00\x00\x00\x48'
+                        '\x00\x00\x00\x14')
+                f.write('\x00' * 52)
+                f.write(backing_file)
+            self.assertEqual(backing_file,
+                             libvirt_utils.get_qcow2_backing_file(path))
+
+            with open(path, 'wb') as f:
+                f.write('QFI\xfb\x00\x00\x00\x02')
+                f.write('\x00' * 64)
+            self.assertEqual(None, libvirt_utils.get_qcow2_backing_file(path))
+
+            with open(path, 'wb') as f:
+                f.write('\x00' * 1024)
+            self.assertRaises(ValueError,
+                              libvirt_utils.get_qcow2_backing_file, path)
+
 
 class LibvirtDriverTestCase(test.TestCase):
     """Test for nova.virt.libvirt.libvirt_driver.LibvirtDriver."""
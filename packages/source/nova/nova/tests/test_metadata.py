@@ -25,6 +25,8 @@ import hmac
 import json
 import re
 
+import eventlet
+
 try:
     import cPickle as pickle
 except ImportError:
@@ -43,6 +45,7 @@ from nova import db
 from nova.db.sqlalchemy import api
 from nova import exception
 from nova.network import api as network_api
+from nova.openstack.common import rpc
 from nova import test
 from nova.tests import fake_network
 from nova import utils
@@ -568,6 +571,150 @@ class MetadataHandlerTestCase(test.TestCase):
         self.assertEqual(response.status_int, 500)
 
 
+class MetadataCacheTestCase(test.TestCase):
+    """Test the caching of metadata and rendered responses."""
+
+    def setUp(self):
+        super(MetadataCacheTestCase, self).setUp()
+        fake_network.stub_out_nw_api_get_instance_nw_info(self.stubs,
+                                                          spectacular=True)
+        self.instance = copy.copy(INSTANCES[0])
+        self.instance['system_metadata'] = get_default_sys_meta()
+        self.flags(use_local=True, group='conductor')
+        self.mdinst = fake_InstanceMetadata(self.stubs, self.instance,
+            address=None, sgroups=None)
+        self.loads = []
+
+        def fake_get_metadata_by_address(conductor_api, address):
+            self.loads.append(address)
+            # Let concurrent requests run while this one is loading.
+            eventlet.sleep(0)
+            return self.mdinst
+
+        self.stubs.Set(base, 'get_metadata_by_address',
+                       fake_get_metadata_by_address)
+        self.app = handler.MetadataRequestHandler()
+
+    def _request(self, relpath, address="127.0.0.1"):
+        request = webob.Request.blank(relpath)
+        request.remote_addr = address
+        return request.get_response(self.app)
+
+    def test_lru_cache(self):
+        cache = handler.LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.set('c', 3)
+        self.assertEqual(None, cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+
+    def test_lru_cache_uses_compacted(self):
+        cache = handler.LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        for i in xrange(10):
+            self.assertEqual(1, cache.get('a'))
+        self.assertTrue(len(cache.uses) <= 4)
+        cache.set('c', 3)
+        self.assertEqual(None, cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+
+    def test_response_cached(self):
+        def fake_lookup(path):
+            self.fail('Cached response rendered again')
+
+        response = self._request("/2009-04-04/user-data")
+        self.assertEqual(USER_DATA_STRING, response.body)
+        self.stubs.Set(self.mdinst, 'lookup', fake_lookup)
+        response = self._request("/2009-04-04/user-data/")
+        self.assertEqual(USER_DATA_STRING, response.body)
+        self.assertEqual(['127.0.0.1'], self.loads)
+
+    def test_concurrent_misses_load_once(self):
+        pool = eventlet.GreenPool()
+        responses = pool.imap(self._request,
+                              ["/2009-04-04/meta-data/hostname"] * 5)
+        self.assertEqual([200] * 5,
+                         [response.status_int for response in responses])
+        self.assertEqual(['127.0.0.1'], self.loads)
+
+    def test_warm_cache(self):
+        def fake_get_metadata_by_instance_id(conductor_api, instance_id,
+                                             address):
+            self.assertEqual(self.instance['uuid'], instance_id)
+            return self.mdinst
+
+        self.stubs.Set(base, 'get_metadata_by_instance_id',
+                       fake_get_metadata_by_instance_id)
+        self.app._warm_cache(
+            {'event_type': 'compute.instance.create.end',
+             'payload': {'instance_id': self.instance['uuid'],
+                         'fixed_ips': [{'address': '10.0.0.2'}]}})
+
+        self.stubs.Set(self.mdinst, 'lookup', None)
+        response = self._request("/latest/user-data", address='10.0.0.2')
+        self.assertEqual(USER_DATA_STRING, response.body)
+        meta_data = self.app.get_metadata_by_remote_address('10.0.0.2')
+        self.assertEqual('10.0.0.2', meta_data.address)
+        self.assertEqual([], self.loads)
+
+    def test_warm_cache_quantum_proxy(self):
+        def fake_get_metadata_by_instance_id(conductor_api, instance_id,
+                                             address):
+            return self.mdinst
+
+        self.stubs.Set(base, 'get_metadata_by_instance_id',
+                       fake_get_metadata_by_instance_id)
+        self.flags(service_quantum_metadata_proxy=True)
+        self.app._warm_cache(
+            {'event_type': 'compute.instance.create.end',
+             'payload': {'instance_id': self.instance['uuid'],
+                         'fixed_ips': [{'address': '10.0.0.2'}]}})
+
+        meta_data = self.app.get_metadata_by_instance_id(
+            self.instance['uuid'], '10.0.0.2')
+        self.assertEqual('10.0.0.2', meta_data.address)
+        self.assertEqual(None, self.app._cache.get('metadata-10.0.0.2'))
+
+    def test_warm_cache_quantum_proxy_many_fixed_ips(self):
+        self.stubs.Set(base, 'get_metadata_by_instance_id',
+                       lambda *args: self.mdinst)
+        self.flags(service_quantum_metadata_proxy=True)
+        self.app._warm_cache(
+            {'event_type': 'compute.instance.create.end',
+             'payload': {'instance_id': self.instance['uuid'],
+                         'fixed_ips': [{'address': '10.0.0.2'},
+                                       {'address': '10.0.1.2'}]}})
+
+        self.assertEqual(None, self.app._cache.get(
+            'metadata-%s' % self.instance['uuid']))
+
+    def test_start_cache_warmer(self):
+        joined = []
+
+        class FakeConnection(object):
+            def join_consumer_pool(self, callback, pool_name, topic,
+                                   exchange_name):
+                joined.append((callback, pool_name, topic, exchange_name))
+
+            def consume_in_thread(self):
+                pass
+
+        connection = FakeConnection()
+        self.stubs.Set(rpc, 'create_connection', lambda new: connection)
+        self.flags(metadata_cache_warm=True)
+        response = self._request("/latest/user-data")
+        self.assertEqual(USER_DATA_STRING, response.body)
+        self.assertEqual([(self.app._warm_cache, 'nova-metadata-cache',
+                           'notifications.info', 'nova')], joined)
+        self.assertEqual(connection, self.app._warmer)
+
+        self._request("/latest/user-data")
+        self.assertEqual(1, len(joined))
+
+
 class MetadataPasswordTestCase(test.TestCase):
     def setUp(self):
         super(MetadataPasswordTestCase, self).setUp()
@@ -223,6 +223,32 @@ class NotificationsTestCase(test.TestCase):
         self.assertEquals(payload["display_name"], display_name)
         self.assertEquals(payload["hostname"], hostname)
 
+    def test_vm_updates_with_states(self):
+        instances = [self.instance,
+                     self._wrapped_create({'display_name': 'other'})]
+        calls = []
+        orig_bw_usage_get_by_uuids = db.bw_usage_get_by_uuids
+
+        def fake_bw_usage_get_by_uuids(context, uuids, start_period):
+            calls.append(uuids)
+            return orig_bw_usage_get_by_uuids(context, uuids, start_period)
+
+        self.stubs.Set(db, 'bw_usage_get_by_uuids',
+                       fake_bw_usage_get_by_uuids)
+        notifications.send_updates_with_states(self.context, instances,
+                None, vm_states.BUILDING, None, None)
+
+        self.assertEquals(1, len(calls))
+        self.assertEquals(2, len(test_notifier.NOTIFICATIONS))
+        for instance, notif in zip(instances, test_notifier.NOTIFICATIONS):
+            payload = notif["payload"]
+            self.assertEquals(instance["uuid"], payload["instance_id"])
+            self.assertEquals(instance["display_name"],
+                              payload["display_name"])
+            self.assertEquals(None, payload["old_state"])
+            self.assertEquals(vm_states.BUILDING, payload["state"])
+            self.assertEquals({}, payload["bandwidth"])
+
     def test_task_update_with_states(self):
         self.flags(notify_on_state_change="vm_and_task_state")
 
@@ -17,6 +17,7 @@
 
 import fixtures
 import imp
+import mox
 import os
 import StringIO
 import sys
@@ -422,3 +423,37 @@ class ServiceCommandsTestCase(test.TestCase):
     def test_service_disable_invalid_params(self):
         self.assertRaises(SystemExit,
                           self.commands.disable, 'nohost', 'noservice')
+
+
+class SchedulerCommandsTestCase(test.TestCase):
+    def setUp(self):
+        super(SchedulerCommandsTestCase, self).setUp()
+        self.commands = nova_manage.SchedulerCommands()
+
+    def test_stats(self):
+        fake_stats = {'since': '2013-01-01T00:00:00.000000',
+                      'filters': {'RamFilter': {'calls': 2, 'time': 0.5,
+                                                'hosts_in': 20,
+                                                'hosts_out': 15}},
+                      'weighers': {'RAMWeigher': {'calls': 2, 'time': 0.25,
+                                                  'hosts': 15}},
+                      'db': {'compute_node_get_all': {'calls': 1,
+                                                      'time': 0.125}}}
+        self.mox.StubOutWithMock(nova_manage.scheduler_rpcapi.SchedulerAPI,
+                                 'get_scheduler_stats')
+        nova_manage.scheduler_rpcapi.SchedulerAPI.get_scheduler_stats(
+                mox.IgnoreArg(), reset=True).AndReturn(fake_stats)
+        self.mox.ReplayAll()
+
+        output = StringIO.StringIO()
+        sys.stdout = output
+        self.commands.stats(reset=True)
+        sys.stdout = sys.__stdout__
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual(['RamFilter', '2', '0.500', '250.000', '20', '15'],
+                         lines[2].split())
+        self.assertEqual(['RAMWeigher', '2', '0.250', '125.000', '15'],
+                         lines[4].split())
+        self.assertEqual(['compute_node_get_all', '1', '0.125', '125.000'],
+                         lines[6].split())
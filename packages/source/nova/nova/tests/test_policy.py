@@ -206,3 +206,127 @@ class IsAdminCheckTestCase(test.TestCase):
 
         self.assertEqual(check('target', dict(is_admin=True)), False)
         self.assertEqual(check('target', dict(is_admin=False)), True)
+
+
+class CompiledPolicyTestCase(test.TestCase):
+    def setUp(self):
+        super(CompiledPolicyTestCase, self).setUp()
+        self.rules = common_policy.Rules(dict(
+            (k, common_policy.parse_rule(v)) for k, v in {
+                "default": "role:member",
+                "admin": "role:admin or is_admin:True",
+                "owner": "project_id:%(project_id)s",
+                "admin_or_owner": "rule:admin or rule:owner",
+                "nested": "(role:a and (role:b and role:c)) or rule:admin",
+                "not_admin": "not rule:admin",
+                "folded_and": "@ and rule:owner",
+                "folded_or": "rule:owner or @",
+                "denied": "! and rule:admin",
+                "missing": "rule:noexist",
+                "user": "user_id:fake",
+            }.items()), 'default')
+        self.compiled = common_policy.compile_rules(self.rules)
+        # The Check trees look rule references up in the rules set
+        common_policy.set_rules(self.rules)
+        self.addCleanup(common_policy.reset)
+
+    def _creds(self, **kwargs):
+        creds = {'user_id': 'fake', 'project_id': 'fake', 'roles': [],
+                 'is_admin': False}
+        creds.update(kwargs)
+        return creds
+
+    def test_same_results(self):
+        creds = [self._creds(),
+                 self._creds(roles=['ADMIN']),
+                 self._creds(roles=['a', 'b', 'c']),
+                 self._creds(is_admin=True, user_id='other'),
+                 self._creds(roles=['member'], project_id='other')]
+        targets = [{'project_id': 'fake'}, {'project_id': 'other'}]
+        for name in self.rules:
+            for cred in creds:
+                for target in targets:
+                    self.assertEqual(self.rules[name](target, cred),
+                                     self.compiled[name](target, cred),
+                                     name)
+
+    def test_constants_folded(self):
+        self.assertTrue(self.compiled['folded_or'] is common_policy._accept)
+        self.assertTrue(self.compiled['denied'] is common_policy._reject)
+
+    def test_missing_rule_uses_default(self):
+        self.assertTrue(self.compiled['noexist'] is self.compiled['default'])
+        self.assertTrue(self.compiled['missing']({}, self._creds(
+                roles=['member'])))
+
+    def test_rules_resolved_when_compiled(self):
+        # Rule references are looked up when compiling, not when checking
+        def fail_check(self, target, creds):
+            raise AssertionError(self.match)
+
+        self.stubs.Set(common_policy.RuleCheck, '__call__', fail_check)
+        self.assertTrue(common_policy.check('admin_or_owner',
+                                            {'project_id': 'fake'},
+                                            self._creds()))
+
+
+class ResultCacheTestCase(test.TestCase):
+    def setUp(self):
+        super(ResultCacheTestCase, self).setUp()
+        self.checked = []
+        test_case = self
+
+        class CountingCheck(common_policy.Check):
+            def __call__(self, target, creds):
+                test_case.checked.append(target)
+                return target.get('ok', False)
+
+        self.stubs.Set(common_policy, '_checks',
+                       dict(common_policy._checks, counting=CountingCheck))
+        self.policy.set_rules({"example:counted": "counting:x"})
+        self.context = context.RequestContext('fake', 'fake')
+        self.flags(policy_cache_results=True)
+
+    def test_disabled(self):
+        self.flags(policy_cache_results=False)
+        policy.enforce(self.context, 'example:counted', {'ok': True})
+        policy.enforce(self.context, 'example:counted', {'ok': True})
+        self.assertEqual(2, len(self.checked))
+
+    def test_result_remembered(self):
+        for i in range(3):
+            policy.enforce(self.context, 'example:counted', {'ok': True})
+        self.assertEqual(1, len(self.checked))
+
+    def test_false_result_remembered(self):
+        for i in range(2):
+            self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                              self.context, 'example:counted', {})
+        self.assertFalse(policy.enforce(self.context, 'example:counted', {},
+                                        do_raise=False))
+        self.assertEqual(1, len(self.checked))
+
+    def test_different_target_or_credentials(self):
+        policy.enforce(self.context, 'example:counted', {'ok': True})
+        policy.enforce(self.context, 'example:counted', {'ok': 1})
+        policy.enforce(self.context.elevated(), 'example:counted',
+                       {'ok': True})
+        self.assertEqual(3, len(self.checked))
+
+    def test_forgotten_when_credentials_change(self):
+        policy.enforce(self.context, 'example:counted', {'ok': True})
+        self.context.roles.append('admin')
+        policy.enforce(self.context, 'example:counted', {'ok': True})
+        self.assertEqual(2, len(self.checked))
+
+    def test_forgotten_when_rules_change(self):
+        policy.enforce(self.context, 'example:counted', {'ok': True})
+        self.policy.set_rules({"example:counted": "counting:x"})
+        policy.enforce(self.context, 'example:counted', {'ok': True})
+        self.assertEqual(2, len(self.checked))
+
+    def test_unhashable_target_not_remembered(self):
+        target = {'ok': True, 'model': object()}
+        policy.enforce(self.context, 'example:counted', target)
+        policy.enforce(self.context, 'example:counted', target)
+        self.assertEqual(2, len(self.checked))
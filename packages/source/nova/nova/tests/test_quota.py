@@ -1934,6 +1934,90 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
                 ])
 
 
+class CachedQuotaDriverTestCase(test.TestCase):
+    def setUp(self):
+        super(CachedQuotaDriverTestCase, self).setUp()
+
+        self.flags(quota_usage_reconcile_interval=0,
+                   memcached_servers=None)
+
+        self.in_use = dict(instances=2, cores=4, ram=1024)
+        self.sync_calls = 0
+
+        def sync(context, project_id, session):
+            self.sync_calls += 1
+            return self.in_use.copy()
+
+        self.resources = dict((name, quota.ReservableResource(name, sync))
+                              for name in ('instances', 'cores', 'ram'))
+        self.quotas = dict(instances=5, cores=10, ram=4096)
+        self.driver = quota.CachedQuotaDriver()
+        self.stubs.Set(self.driver, '_get_quotas',
+                       lambda *args, **kwargs: self.quotas)
+        self.context = FakeContext('test_project', 'test_class')
+
+    def _usages(self):
+        return dict((name, int(self.driver.mc.get(
+                    self.driver._usage_key('test_project', name))))
+                    for name in self.resources)
+
+    def test_reserve_commit(self):
+        reservations = self.driver.reserve(self.context, self.resources,
+                                           dict(instances=2, cores=-2))
+        self.assertEqual(1, len(reservations))
+        self.assertEqual(1, self.sync_calls)
+        self.assertEqual(dict(instances=4, cores=4, ram=1024),
+                         self._usages())
+
+        self.driver.commit(self.context, reservations)
+        self.assertEqual(dict(instances=4, cores=2, ram=1024),
+                         self._usages())
+        self.assertEqual(1, self.sync_calls)
+
+    def test_reserve_rollback(self):
+        reservations = self.driver.reserve(self.context, self.resources,
+                                           dict(instances=2, cores=-2))
+        self.driver.rollback(self.context, reservations)
+        self.assertEqual(dict(instances=2, cores=4, ram=1024),
+                         self._usages())
+
+    def test_reserve_over_quota(self):
+        self.driver.reserve(self.context, self.resources,
+                            dict(instances=2))
+        exc = self.assertRaises(exception.OverQuota, self.driver.reserve,
+                                self.context, self.resources,
+                                dict(instances=2, cores=4, ram=-1024))
+        self.assertEqual(['instances'], exc.kwargs['overs'])
+        self.assertEqual(dict(instances=dict(in_use=4, reserved=0),
+                              cores=dict(in_use=4, reserved=0),
+                              ram=dict(in_use=1024, reserved=0)),
+                         exc.kwargs['usages'])
+        # The increments are undone.
+        self.assertEqual(dict(instances=4, cores=4, ram=1024),
+                         self._usages())
+
+    def test_commit_unknown_reservation_uses_db(self):
+        self.mox.StubOutWithMock(db, 'reservation_commit')
+        db.reservation_commit(self.context, ['db-reservation'],
+                              project_id='test_project')
+        self.mox.ReplayAll()
+        self.driver.commit(self.context, ['db-reservation'],
+                           project_id='test_project')
+
+    def test_reconcile(self):
+        self.flags(quota_usage_reconcile_interval=60)
+        self.stubs.Set(self.driver, '_reconciler', 'started')
+        self.driver.reserve(self.context, self.resources, dict(instances=2))
+        self.in_use['instances'] = 3
+        self.driver.reconcile(self.context)
+        self.assertEqual(dict(instances=3, cores=4, ram=1024),
+                         self._usages())
+
+        # Only projects reserved for since the last run are looked at.
+        self.driver.reconcile(self.context)
+        self.assertEqual(2, self.sync_calls)
+
+
 class NoopQuotaDriverTestCase(test.TestCase):
     def setUp(self):
         super(NoopQuotaDriverTestCase, self).setUp()
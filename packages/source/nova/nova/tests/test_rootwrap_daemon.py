@@ -0,0 +1,98 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for nova-rootwrap-daemon and its client."""
+
+import os
+import sys
+
+import fixtures
+
+import nova
+from nova import exception
+from nova.openstack.common.rootwrap import daemon
+from nova import test
+from nova import utils
+
+
+DAEMON = os.path.join(os.path.dirname(os.path.dirname(nova.__file__)),
+                      'bin', 'nova-rootwrap-daemon')
+
+
+class RootwrapDaemonTestCase(test.TestCase):
+    def setUp(self):
+        super(RootwrapDaemonTestCase, self).setUp()
+        tempdir = self.useFixture(fixtures.TempDir()).path
+        filters_path = os.path.join(tempdir, 'rootwrap.d')
+        os.mkdir(filters_path)
+        with open(os.path.join(filters_path, 'test.filters'), 'w') as f:
+            f.write('[Filters]\n'
+                    'echo: CommandFilter, /bin/echo, root\n'
+                    'cat: CommandFilter, /bin/cat, root\n')
+        self.config = os.path.join(tempdir, 'rootwrap.conf')
+        with open(self.config, 'w') as f:
+            f.write('[DEFAULT]\n'
+                    'filters_path=%s\n'
+                    'exec_dirs=/bin,/usr/bin\n' % filters_path)
+
+        self.client = daemon.Client([sys.executable, DAEMON, self.config])
+        self.addCleanup(self.client.stop)
+
+    def test_execute(self):
+        self.assertEqual((0, 'foo bar\n', ''),
+                         self.client.execute(['echo', 'foo', 'bar']))
+
+    def test_execute_stdin(self):
+        self.assertEqual((0, '\x00\xff', ''),
+                         self.client.execute(['cat'], '\x00\xff'))
+
+    def test_connections_reused(self):
+        self.client.execute(['echo'])
+        self.client.execute(['echo'])
+        self.assertEqual(1, len(self.client.idle))
+
+    def test_unauthorized(self):
+        self.assertEqual((daemon.RC_UNAUTHORIZED, '',
+                          'nova-rootwrap: Unauthorized command: ls / '
+                          '(no filter matched)\n'),
+                         self.client.execute(['ls', '/']))
+
+    def test_wrong_key_rejected(self):
+        self.client.execute(['echo'])
+        self.client.authkey = 'x' * 64
+        self.client.idle = []
+        self.assertRaises(daemon.DaemonError, self.client.execute,
+                          ['echo'])
+
+    def test_restarted_when_exited(self):
+        self.client.execute(['echo'])
+        address = self.client.address
+        self.client.process.stdin.close()
+        self.client.process.wait()
+        self.assertEqual((0, 'foo\n', ''), self.client.execute(['echo',
+                                                                'foo']))
+        self.assertNotEqual(address, self.client.address)
+        self.assertFalse(os.path.exists(address))
+
+    def test_utils_execute(self):
+        self.flags(use_rootwrap_daemon=True)
+        self.stubs.Set(utils, '_ROOTWRAP_DAEMON', self.client)
+        self.stubs.Set(os, 'geteuid', lambda: 1000)
+        self.assertEqual(('foo\n', ''),
+                         utils.execute('echo', 'foo', run_as_root=True))
+        self.assertRaises(exception.ProcessExecutionError, utils.execute,
+                          'ls', '/', run_as_root=True)
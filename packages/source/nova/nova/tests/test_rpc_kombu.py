@@ -0,0 +1,96 @@
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the reuse of kombu channels and publishers."""
+
+from oslo.config import cfg
+
+from nova.openstack.common.rpc import impl_kombu
+from nova import test
+
+CONF = cfg.CONF
+
+
+class KombuChannelReuseTestCase(test.TestCase):
+
+    def setUp(self):
+        super(KombuChannelReuseTestCase, self).setUp()
+        self.flags(fake_rabbit=True, rabbit_reuse_channels=True)
+
+    def _connection(self):
+        connection = impl_kombu.Connection(CONF)
+        self.addCleanup(connection.close)
+        return connection
+
+    def test_publisher_reused(self):
+        connection = self._connection()
+        connection.topic_send('topic1', {'a': 1})
+        self.assertEqual(1, len(connection.publishers))
+        publisher = connection.publishers.values()[0]
+
+        connection.topic_send('topic1', {'a': 2})
+        self.assertEqual([publisher], connection.publishers.values())
+
+        connection.topic_send('topic2', {'a': 3})
+        self.assertEqual(2, len(connection.publishers))
+
+    def test_publisher_not_reused_when_disabled(self):
+        self.flags(rabbit_reuse_channels=False)
+        connection = self._connection()
+        connection.topic_send('topic1', {'a': 1})
+        connection.topic_send('topic1', {'a': 2})
+        self.assertEqual({}, connection.publishers)
+
+    def test_reconnect_drops_publishers(self):
+        connection = self._connection()
+        connection.topic_send('topic1', {'a': 1})
+        publisher = connection.publishers.values()[0]
+
+        connection.reconnect()
+        self.assertEqual({}, connection.publishers)
+
+        connection.topic_send('topic1', {'a': 2})
+        new_publisher = connection.publishers.values()[0]
+        self.assertFalse(new_publisher is publisher)
+        self.assertTrue(new_publisher.producer.channel is connection.channel)
+
+    def test_reset_keeps_publishing_channel(self):
+        connection = self._connection()
+        connection.topic_send('topic1', {'a': 1})
+        channel = connection.channel
+        publishers = dict(connection.publishers)
+
+        connection.reset()
+        self.assertTrue(connection.channel is channel)
+        self.assertEqual(publishers, connection.publishers)
+
+    def test_reset_replaces_consuming_channel(self):
+        connection = self._connection()
+        connection.declare_topic_consumer('topic1', lambda message: None)
+        connection.topic_send('topic1', {'a': 1})
+        channel = connection.channel
+
+        connection.reset()
+        self.assertFalse(connection.channel is channel)
+        self.assertEqual({}, connection.publishers)
+        self.assertEqual([], connection.consumers)
+
+    def test_reset_replaces_channel_when_disabled(self):
+        self.flags(rabbit_reuse_channels=False)
+        connection = self._connection()
+        channel = connection.channel
+
+        connection.reset()
+        self.assertFalse(connection.channel is channel)
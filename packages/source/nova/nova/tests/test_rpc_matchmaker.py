@@ -0,0 +1,70 @@
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the caching of matchmaker lookups."""
+
+import time
+
+from nova.openstack.common.rpc import matchmaker
+from nova import test
+
+
+class CountingExchange(matchmaker.Exchange):
+    def __init__(self):
+        super(CountingExchange, self).__init__()
+        self.lookups = 0
+
+    def run(self, key):
+        self.lookups += 1
+        return [(key + '.host1', 'host1')]
+
+
+class MatchMakerCacheTestCase(test.TestCase):
+
+    def setUp(self):
+        super(MatchMakerCacheTestCase, self).setUp()
+        self.exchange = CountingExchange()
+        self.matchmaker = matchmaker.MatchMakerBase()
+        self.matchmaker.add_binding(matchmaker.TopicBinding(), self.exchange)
+
+    def test_lookup_cached(self):
+        for i in range(3):
+            self.assertEqual([('compute.host1', 'host1')],
+                             self.matchmaker.queues('compute'))
+        self.assertEqual(1, self.exchange.lookups)
+
+    def test_cache_expires(self):
+        self.flags(matchmaker_cache_ttl=10)
+        now = time.time()
+        self.stubs.Set(time, 'time', lambda: now)
+        self.matchmaker.queues('compute')
+        now += 11
+        self.matchmaker.queues('compute')
+        self.assertEqual(2, self.exchange.lookups)
+
+    def test_cache_disabled(self):
+        self.flags(matchmaker_cache_ttl=0)
+        self.matchmaker.queues('compute')
+        self.matchmaker.queues('compute')
+        self.assertEqual(2, self.exchange.lookups)
+
+    def test_round_robin_not_cached(self):
+        ring = {'compute': ['host1', 'host2']}
+        mm = matchmaker.MatchMakerRing(ring)
+        self.assertEqual([('compute.host1', 'host1')], mm.queues('compute'))
+        self.assertEqual([('compute.host2', 'host2')], mm.queues('compute'))
+        self.assertEqual([('fanout~compute.host1', 'host1'),
+                          ('fanout~compute.host2', 'host2')],
+                         mm.queues('fanout~compute'))
@@ -0,0 +1,95 @@
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the rpc payload serializers and message envelope."""
+
+import datetime
+
+import netaddr
+from oslo.config import cfg
+import testtools
+
+from nova.openstack.common.rpc import amqp as rpc_amqp
+from nova.openstack.common.rpc import common as rpc_common
+from nova.openstack.common.rpc import serializer as rpc_serializer
+from nova import test
+
+CONF = cfg.CONF
+
+
+class RpcSerializerTestCase(test.TestCase):
+
+    def test_json_by_default(self):
+        self.assertEqual('json', rpc_serializer.get_serializer().name)
+        msg = {'method': 'foo', 'args': {'a': 1}}
+        self.assertEqual(msg, rpc_common.serialize_msg(msg))
+
+    def test_json_envelope(self):
+        msg = {'method': 'foo', 'args': {'a': 1}}
+        envelope = rpc_common.serialize_msg(msg, force_envelope=True)
+        self.assertEqual('2.0', envelope['oslo.version'])
+        self.assertFalse('oslo.serializer' in envelope)
+        self.assertEqual(msg, rpc_common.deserialize_msg(envelope))
+
+    def test_unavailable_serializer_falls_back_to_json(self):
+        self.flags(rpc_serializer='nosuchserializer')
+        self.assertEqual('json', rpc_serializer.get_serializer().name)
+
+    def test_unsupported_serializer(self):
+        envelope = {'oslo.version': '2.1',
+                    'oslo.serializer': 'nosuchserializer',
+                    'oslo.message': 'foo'}
+        self.assertRaises(rpc_common.UnsupportedRpcSerializer,
+                          rpc_common.deserialize_msg, envelope)
+
+    def test_unpack_context_keeps_serializer(self):
+        msg = {'method': 'foo', '_msg_id': 'id', '_serializer': 'msgpack'}
+        ctxt = rpc_amqp.unpack_context(CONF, msg)
+        self.assertEqual('msgpack', ctxt.serializer)
+        self.assertEqual('msgpack', ctxt.deepcopy().serializer)
+        self.assertEqual({'method': 'foo'}, msg)
+
+
+@testtools.skipIf(rpc_serializer.msgpack is None,
+                  'msgpack-python is not installed')
+class MsgpackSerializerTestCase(test.TestCase):
+
+    def setUp(self):
+        super(MsgpackSerializerTestCase, self).setUp()
+        self.flags(rpc_serializer='msgpack')
+
+    def test_envelope(self):
+        msg = {'method': 'foo', 'args': {'a': [1, 2.5, None, u'\xe9']}}
+        envelope = rpc_common.serialize_msg(msg)
+        self.assertEqual('2.1', envelope['oslo.version'])
+        self.assertEqual('msgpack', envelope['oslo.serializer'])
+        result = rpc_common.deserialize_msg(envelope)
+        # The receiver remembers the encoding to reply with it.
+        self.assertEqual('msgpack', result.pop('_serializer'))
+        self.assertEqual(msg, result)
+
+    def test_reply_uses_json_unless_told(self):
+        envelope = rpc_common.serialize_msg({'result': 1},
+                                            serializer='json')
+        self.assertEqual({'result': 1}, envelope)
+
+    def test_extension_types(self):
+        now = datetime.datetime(2013, 3, 1, 12, 30, 15, 123)
+        msg = {'created_at': now,
+               'hosts': set(['host1', 'host2']),
+               'address': netaddr.IPAddress('10.0.0.1'),
+               'cidr': netaddr.IPNetwork('10.0.0.0/24')}
+        serializer = rpc_serializer.get_serializer()
+        self.assertEqual(msg, serializer.loads(serializer.dumps(msg)))
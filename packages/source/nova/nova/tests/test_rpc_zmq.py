@@ -0,0 +1,116 @@
+# Copyright 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the batched receives of the ZeroMQ driver."""
+
+from oslo.config import cfg
+import testtools
+
+from nova.openstack.common.rpc import impl_zmq
+from nova import test
+
+CONF = cfg.CONF
+
+
+def _message(method, **kwargs):
+    ctx = impl_zmq.RpcContext(user_id='fake', project_id='fake')
+    msg = {'method': method, 'args': kwargs}
+    return ['0', 'fake_topic', 'cast',
+            impl_zmq._serialize([impl_zmq.RpcContext.marshal(ctx), msg])]
+
+
+class FakeProxy(object):
+    def __init__(self):
+        self.calls = []
+
+    def dispatch(self, ctx, version, method, **kwargs):
+        self.calls.append((method, kwargs))
+        if method == 'fail':
+            raise Exception('failed')
+
+
+@testtools.skipIf(impl_zmq.zmq is None, 'ZeroMQ is not installed')
+class ZmqBatchTestCase(test.TestCase):
+
+    def setUp(self):
+        super(ZmqBatchTestCase, self).setUp()
+        self.addCleanup(impl_zmq.cleanup)
+        addr = 'inproc://nova-test-rpc-zmq-batch'
+        self.outq = impl_zmq.ZmqSocket(addr, impl_zmq.zmq.PUSH, bind=True)
+        self.addCleanup(self.outq.close)
+        self.inq = impl_zmq.ZmqSocket(addr, impl_zmq.zmq.PULL, bind=False)
+        self.addCleanup(self.inq.close)
+
+    def _send(self, count):
+        for i in range(count):
+            self.outq.send(_message('echo', value=i))
+
+    def _values(self, batch):
+        return [impl_zmq._deserialize(data[3])[1]['args']['value']
+                for data in batch]
+
+    def test_recv_batch_smaller_than_size(self):
+        self._send(2)
+        self.assertEqual([0, 1], self._values(self.inq.recv_batch(3)))
+
+    def test_recv_batch_equal_to_size(self):
+        self._send(3)
+        self.assertEqual([0, 1, 2], self._values(self.inq.recv_batch(3)))
+
+    def test_recv_batch_larger_than_size(self):
+        self._send(5)
+        self.assertEqual([0, 1, 2], self._values(self.inq.recv_batch(3)))
+        self.assertEqual([3, 4], self._values(self.inq.recv_batch(3)))
+
+    def test_consume_dispatches_batch(self):
+        self.flags(rpc_zmq_batch_size=3)
+        reactor = impl_zmq.ZmqReactor(CONF)
+        proxy = FakeProxy()
+        reactor.proxies[self.inq] = proxy
+        self._send(4)
+
+        reactor.consume(self.inq)
+        reactor.pool.waitall()
+        self.assertEqual([0, 1, 2],
+                         [kwargs['value'] for method, kwargs in proxy.calls])
+
+        reactor.consume(self.inq)
+        reactor.pool.waitall()
+        self.assertEqual([0, 1, 2, 3],
+                         [kwargs['value'] for method, kwargs in proxy.calls])
+
+
+class ZmqReactorBatchTestCase(test.TestCase):
+
+    def test_batch_size(self):
+        self.flags(rpc_zmq_batch_size=10)
+        self.assertEqual(10, impl_zmq.ZmqReactor(CONF).batch_size)
+
+    def test_batch_size_at_least_one(self):
+        self.flags(rpc_zmq_batch_size=0)
+        self.assertEqual(1, impl_zmq.ZmqReactor(CONF).batch_size)
+
+    def test_process_batch_survives_failed_message(self):
+        reactor = impl_zmq.ZmqReactor(CONF)
+        proxy = FakeProxy()
+        batch = [_message('echo', value=0),
+                 _message('fail', value=1),
+                 ['0', 'fake_topic', 'bogus_envelope'],
+                 _message('echo', value=3)]
+
+        reactor._process_batch(proxy, batch)
+        self.assertEqual([('echo', {'value': 0}),
+                          ('fail', {'value': 1}),
+                          ('echo', {'value': 3})], proxy.calls)
@@ -171,6 +171,24 @@ class ServiceTestCase(test.TestCase):
                                'nova.tests.test_service.FakeManager')
         serv.start()
 
+    def test_prepare_workers(self):
+        self.mox.StubOutWithMock(service.db_session, 'get_engine')
+        engine = self.mox.CreateMockAnything()
+        self._service_start_mocks()
+        service.db_session.get_engine().AndReturn(engine)
+        engine.dispose()
+        self.mox.ReplayAll()
+
+        serv = service.Service(self.host,
+                               self.binary,
+                               self.topic,
+                               'nova.tests.test_service.FakeManager')
+        serv.prepare_workers()
+        self.assertEqual(1, serv.service_id)
+        # The workers use the service record looked up before forking
+        serv.start()
+        serv.stop()
+
 
 class TestWSGIService(test.TestCase):
 
@@ -49,6 +49,7 @@ from nova import exception
 from nova.openstack.common import excutils
 from nova.openstack.common import importutils
 from nova.openstack.common import log as logging
+from nova.openstack.common.rootwrap import daemon as rootwrap_daemon
 from nova.openstack.common.rpc import common as rpc_common
 from nova.openstack.common import timeutils
 
@@ -80,6 +81,11 @@ utils_opts = [
                default="/etc/nova/rootwrap.conf",
                help='Path to the rootwrap configuration file to use for '
                     'running commands as root'),
+    cfg.BoolOpt('use_rootwrap_daemon',
+                default=False,
+                help='Run the commands needing root through a '
+                     'nova-rootwrap-daemon started once with sudo, instead '
+                     'of starting sudo nova-rootwrap for each command'),
     cfg.StrOpt('tempdir',
                default=None,
                help='Explicitly specify the temporary working directory'),
@@ -155,6 +161,17 @@ def _subprocess_setup():
     signal.signal(signal.SIGPIPE, signal.SIG_DFL)
 
 
+_ROOTWRAP_DAEMON = None
+
+
+def _get_rootwrap_daemon():
+    global _ROOTWRAP_DAEMON
+    if _ROOTWRAP_DAEMON is None:
+        _ROOTWRAP_DAEMON = rootwrap_daemon.Client(
+            ['sudo', 'nova-rootwrap-daemon', CONF.rootwrap_config])
+    return _ROOTWRAP_DAEMON
+
+
 def execute(*cmd, **kwargs):
     """Helper method to execute command with optional retry.
 
@@ -172,7 +189,9 @@ def execute(*cmd, **kwargs):
                                before retrying.
     :param attempts:           How many times to retry cmd.
     :param run_as_root:        True | False. Defaults to False. If set to True,
-                               the command is run with rootwrap.
+                               the command is run with rootwrap, through
+                               nova-rootwrap-daemon if use_rootwrap_daemon
+                               is set.
 
     :raises exception.NovaException: on receiving unknown arguments
     :raises exception.ProcessExecutionError:
@@ -197,14 +216,37 @@ def execute(*cmd, **kwargs):
         raise exception.NovaException(_('Got unknown keyword args '
                                         'to utils.execute: %r') % kwargs)
 
+    daemon = None
     if run_as_root and os.geteuid() != 0:
-        cmd = ['sudo', 'nova-rootwrap', CONF.rootwrap_config] + list(cmd)
+        if CONF.use_rootwrap_daemon and not shell:
+            daemon = _get_rootwrap_daemon()
+        else:
+            cmd = ['sudo', 'nova-rootwrap', CONF.rootwrap_config] + list(cmd)
 
     cmd = map(str, cmd)
 
     while attempts > 0:
         attempts -= 1
         try:
+            if daemon is not None:
+                LOG.debug(_('Running cmd (rootwrap daemon): %s'),
+                          ' '.join(cmd))
+                try:
+                    _returncode, stdout, stderr = daemon.execute(
+                        cmd, process_input)
+                except rootwrap_daemon.DaemonError as exc:
+                    raise exception.ProcessExecutionError(
+                            description=unicode(exc), cmd=' '.join(cmd))
+                LOG.debug(_('Result was %s') % _returncode)
+                if (not ignore_exit_code and
+                    _returncode not in check_exit_code):
+                    raise exception.ProcessExecutionError(
+                            exit_code=_returncode,
+                            stdout=stdout,
+                            stderr=stderr,
+                            cmd=' '.join(cmd))
+                return stdout, stderr
+
             LOG.debug(_('Running cmd (subprocess): %s'), ' '.join(cmd))
             _PIPE = subprocess.PIPE  # pylint: disable=E1101
 
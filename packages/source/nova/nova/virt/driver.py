@@ -806,6 +806,15 @@ class ComputeDriver(object):
         """
         pass
 
+    def prefetch_images(self, context, all_instances):
+        """Fetch images into the driver's local image cache before an
+        instance needs them.
+
+        :param all_instances: the instances of the whole deployment, which
+            tell the images most likely to be booted next
+        """
+        pass
+
     def add_to_aggregate(self, context, aggregate, host, **kwargs):
         """Add a compute host to an aggregate."""
         #NOTE(jogo) Currently only used for XenAPI-Pool
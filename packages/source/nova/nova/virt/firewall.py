@@ -149,6 +149,15 @@ class IptablesFirewallDriver(FirewallDriver):
         self.network_infos = {}
         self.basically_filtered = False
 
+        # { instance id: [ids of its security groups] }
+        self.instance_security_groups = {}
+        # Rules of each security group, rendered once for all the
+        # instances in it:
+        # { security group id: (ipv4 rules, ipv6 rules, grantee ids) }
+        self.security_group_rules = {}
+        # { (grantee group id, ip version): [ips of its members] }
+        self.security_group_members = {}
+
         # Flags for DHCP request rule
         self.dhcp_create = False
         self.dhcp_created = False
@@ -190,6 +199,9 @@ class IptablesFirewallDriver(FirewallDriver):
 
         self.instances[instance['id']] = instance
         self.network_infos[instance['id']] = network_info
+        # Refreshes only reach the hosts with instances in a group, so
+        # forget what the instances gone from this host used.
+        self._purge_security_group_cache()
         ipv4_rules, ipv6_rules = self.instance_rules(instance, network_info)
         self.add_filters_for_instance(instance, ipv4_rules, ipv6_rules)
         LOG.debug(_('Filters added to instance'), instance=instance)
@@ -367,82 +379,142 @@ class IptablesFirewallDriver(FirewallDriver):
 
         security_groups = self._virtapi.security_group_get_by_instance(
             ctxt, instance)
+        self.instance_security_groups[instance['id']] = [
+            security_group['id'] for security_group in security_groups]
 
         # then, security group chains and rules
         for security_group in security_groups:
-            rules = self._virtapi.security_group_rule_get_by_security_group(
+            sg_ipv4_rules, sg_ipv6_rules = self._security_group_rules(
                 ctxt, security_group)
+            ipv4_rules += sg_ipv4_rules
+            ipv6_rules += sg_ipv6_rules
 
-            for rule in rules:
-                LOG.debug(_('Adding security group rule: %r'), rule,
-                          instance=instance)
+        LOG.debug('Using fw_rules: %r', (ipv4_rules, ipv6_rules),
+                  instance=instance)
 
-                if not rule['cidr']:
-                    version = 4
-                else:
-                    version = netutils.get_ip_version(rule['cidr'])
+        ipv4_rules += ['-j $sg-fallback']
+        ipv6_rules += ['-j $sg-fallback']
 
-                if version == 4:
-                    fw_rules = ipv4_rules
-                else:
-                    fw_rules = ipv6_rules
+        return ipv4_rules, ipv6_rules
 
-                protocol = rule['protocol']
+    def _security_group_rules(self, ctxt, security_group):
+        """Return the ipv4 and ipv6 rules of a security group, rendering
+        them unless they are cached.
+        """
+        cached = self.security_group_rules.get(security_group['id'])
+        if cached:
+            return cached[:2]
 
-                if protocol:
-                    protocol = rule['protocol'].lower()
+        ipv4_rules = []
+        ipv6_rules = []
+        grantee_ids = set()
+        rules = self._virtapi.security_group_rule_get_by_security_group(
+            ctxt, security_group)
 
-                if version == 6 and protocol == 'icmp':
-                    protocol = 'icmpv6'
+        for rule in rules:
+            LOG.debug(_('Adding security group rule: %r'), rule)
 
-                args = ['-j ACCEPT']
-                if protocol:
-                    args += ['-p', protocol]
+            if not rule['cidr']:
+                version = 4
+            else:
+                version = netutils.get_ip_version(rule['cidr'])
 
-                if protocol in ['udp', 'tcp']:
-                    args += self._build_tcp_udp_rule(rule, version)
-                elif protocol == 'icmp':
-                    args += self._build_icmp_rule(rule, version)
-                if rule['cidr']:
-                    LOG.debug('Using cidr %r', rule['cidr'], instance=instance)
-                    args += ['-s', rule['cidr']]
-                    fw_rules += [' '.join(args)]
-                else:
-                    if rule['grantee_group']:
-                        # FIXME(jkoelker) This needs to be ported up into
-                        #                 the compute manager which already
-                        #                 has access to a nw_api handle,
-                        #                 and should be the only one making
-                        #                 making rpc calls.
-                        nw_api = network.API()
-                        capi = conductor.API()
-                        for instance in rule['grantee_group']['instances']:
-                            nw_info = nw_api.get_instance_nw_info(
-                                ctxt,
-                                instance,
-                                conductor_api=capi)
-
-                            ips = [ip['address']
-                                for ip in nw_info.fixed_ips()
-                                    if ip['version'] == version]
-
-                            LOG.debug('ips: %r', ips, instance=instance)
-                            for ip in ips:
-                                subrule = args + ['-s %s' % ip]
-                                fw_rules += [' '.join(subrule)]
-
-                LOG.debug('Using fw_rules: %r', fw_rules, instance=instance)
+            if version == 4:
+                fw_rules = ipv4_rules
+            else:
+                fw_rules = ipv6_rules
 
-        ipv4_rules += ['-j $sg-fallback']
-        ipv6_rules += ['-j $sg-fallback']
+            protocol = rule['protocol']
+
+            if protocol:
+                protocol = rule['protocol'].lower()
+
+            if version == 6 and protocol == 'icmp':
+                protocol = 'icmpv6'
+
+            args = ['-j ACCEPT']
+            if protocol:
+                args += ['-p', protocol]
 
+            if protocol in ['udp', 'tcp']:
+                args += self._build_tcp_udp_rule(rule, version)
+            elif protocol == 'icmp':
+                args += self._build_icmp_rule(rule, version)
+            if rule['cidr']:
+                LOG.debug('Using cidr %r', rule['cidr'])
+                args += ['-s', rule['cidr']]
+                fw_rules += [' '.join(args)]
+            else:
+                if rule['grantee_group']:
+                    grantee_ids.add(rule['grantee_group']['id'])
+                    ips = self._security_group_member_ips(
+                        ctxt, rule['grantee_group'], version)
+                    for ip in ips:
+                        subrule = args + ['-s %s' % ip]
+                        fw_rules += [' '.join(subrule)]
+
+        self.security_group_rules[security_group['id']] = (
+            ipv4_rules, ipv6_rules, grantee_ids)
         return ipv4_rules, ipv6_rules
 
+    def _security_group_member_ips(self, ctxt, security_group, version):
+        """Return the fixed ips of a version of the instances in a security
+        group, looking them up unless they are cached.
+        """
+        key = (security_group['id'], version)
+        if key in self.security_group_members:
+            return self.security_group_members[key]
+
+        # FIXME(jkoelker) This needs to be ported up into
+        #                 the compute manager which already
+        #                 has access to a nw_api handle,
+        #                 and should be the only one making
+        #                 making rpc calls.
+        nw_api = network.API()
+        capi = conductor.API()
+        ips_v4 = []
+        ips_v6 = []
+        for instance in security_group['instances']:
+            nw_info = nw_api.get_instance_nw_info(ctxt, instance,
+                                                  conductor_api=capi)
+            for ip in nw_info.fixed_ips():
+                if ip['version'] == 4:
+                    ips_v4.append(ip['address'])
+                else:
+                    ips_v6.append(ip['address'])
+            LOG.debug('ips: %r', ips_v4 + ips_v6, instance=instance)
+
+        self.security_group_members[(security_group['id'], 4)] = ips_v4
+        self.security_group_members[(security_group['id'], 6)] = ips_v6
+        return self.security_group_members[key]
+
+    def _purge_security_group_cache(self):
+        """Forget the rules and members of the security groups which are
+        not used by any filtered instance.
+        """
+        used = set()
+        for instance_id in self.instances:
+            used.update(self.instance_security_groups.get(instance_id, []))
+        for instance_id in self.instance_security_groups.keys():
+            if instance_id not in self.instances:
+                del self.instance_security_groups[instance_id]
+
+        grantees = set()
+        for security_group_id in self.security_group_rules.keys():
+            if security_group_id in used:
+                grantees.update(
+                    self.security_group_rules[security_group_id][2])
+            else:
+                del self.security_group_rules[security_group_id]
+        for key in self.security_group_members.keys():
+            if key[0] not in grantees:
+                del self.security_group_members[key]
+
     def instance_filter_exists(self, instance, network_info):
         pass
 
     def refresh_security_group_members(self, security_group):
-        self.do_refresh_security_group_rules(security_group)
+        self.do_refresh_security_group_members(security_group)
         self.iptables.apply()
 
     def refresh_security_group_rules(self, security_group):
@@ -460,13 +532,55 @@ class IptablesFirewallDriver(FirewallDriver):
         self.add_filters_for_instance(instance, ipv4_rules, ipv6_rules)
 
     def do_refresh_security_group_rules(self, security_group):
+        self.security_group_rules.pop(security_group, None)
+
+        # This is also how instances are added to or removed from a
+        # group, so every instance is looked at.  Only the rules of the
+        # refreshed group are rendered again.
         for instance in self.instances.values():
             network_info = self.network_infos[instance['id']]
             ipv4_rules, ipv6_rules = self.instance_rules(instance,
                                                          network_info)
             self._inner_do_refresh_rules(instance, ipv4_rules, ipv6_rules)
 
+    def _forget_security_group(self, security_group_id):
+        """Drop the cached rules of a security group and the cached
+        members of the groups it grants access to.
+        """
+        cached = self.security_group_rules.pop(security_group_id, None)
+        if cached:
+            for grantee_id in cached[2]:
+                self.security_group_members.pop((grantee_id, 4), None)
+                self.security_group_members.pop((grantee_id, 6), None)
+
+    def do_refresh_security_group_members(self, security_group):
+        """Rebuild the chains of the instances in a group which grants
+        access to groups whose members changed.
+        """
+        self._forget_security_group(security_group)
+
+        for instance in self.instances.values():
+            if security_group not in self.instance_security_groups.get(
+                    instance['id'], []):
+                continue
+            network_info = self.network_infos[instance['id']]
+            ipv4_rules, ipv6_rules = self.instance_rules(instance,
+                                                         network_info)
+            self._inner_do_refresh_rules(instance, ipv4_rules, ipv6_rules)
+
     def do_refresh_instance_rules(self, instance):
+        # The API asks for this when the rules of one of the groups of
+        # the instance or the members of a group they grant access to
+        # change, without saying which, so none of them is trusted.
+        ctxt = context.get_admin_context()
+        security_group_ids = set(self.instance_security_groups.get(
+            instance['id'], []))
+        security_group_ids.update(
+            security_group['id'] for security_group in
+            self._virtapi.security_group_get_by_instance(ctxt, instance))
+        for security_group_id in security_group_ids:
+            self._forget_security_group(security_group_id)
+
         network_info = self.network_infos[instance['id']]
         ipv4_rules, ipv6_rules = self.instance_rules(instance, network_info)
         self._inner_do_refresh_rules(instance, ipv4_rules, ipv6_rules)
@@ -1508,6 +1508,7 @@ class LibvirtDriver(driver.ComputeDriver):
     # for xenapi(tr3buchet)
     def spawn(self, context, instance, image_meta, injected_files,
               admin_password, network_info=None, block_device_info=None):
+        self.image_cache_manager.record_boot(context, instance['image_ref'])
         disk_info = blockinfo.get_disk_info(CONF.libvirt_type,
                                             instance,
                                             block_device_info,
@@ -3412,6 +3413,10 @@ class LibvirtDriver(driver.ComputeDriver):
         """Manage the local cache of images."""
         self.image_cache_manager.verify_base_images(context, all_instances)
 
+    def prefetch_images(self, context, all_instances):
+        """Fetch the configured and popular images into the local cache."""
+        self.image_cache_manager.prefetch_images(context, all_instances)
+
     def _cleanup_remote_migration(self, dest, inst_base, inst_base_resize):
         """Used only for cleanup in case migrate_disk_and_power_off fails."""
         try:
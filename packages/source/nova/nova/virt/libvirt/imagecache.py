@@ -28,10 +28,12 @@ import os
 import re
 import time
 
+import eventlet
 from oslo.config import cfg
 
 from nova.compute import task_states
 from nova.compute import vm_states
+from nova import exception
 from nova.openstack.common import fileutils
 from nova.openstack.common import jsonutils
 from nova.openstack.common import lockutils
@@ -74,10 +76,36 @@ imagecache_opts = [
     cfg.IntOpt('checksum_interval_seconds',
                default=3600,
                help='How frequently to checksum base images'),
+    cfg.StrOpt('image_cache_index_path',
+               default='$instances_path/$base_dir_name/index-$host.json',
+               help='Where the image cache manager keeps what it learnt '
+                    'about base images between passes'),
+    cfg.BoolOpt('checksum_changed_base_images_only',
+                default=False,
+                help='Only checksum base images again once their size or '
+                     'modification time changed since they were last '
+                     'verified, rather than every checksum_interval_seconds'),
+    cfg.ListOpt('prefetch_images',
+                default=[],
+                help='Ids of images to keep in the image cache, fetching '
+                     'them before an instance needs them.  These are not '
+                     'removed when unused.  With the keystone auth '
+                     'strategy, an image is fetched with the token of the '
+                     'latest boot of an instance from it on the host, so '
+                     'it is not prefetched before that'),
+    cfg.IntOpt('prefetch_popular_images',
+               default=0,
+               help='Number of the images most used by the instances '
+                    'of the deployment to prefetch.  These are not removed '
+                    'when unused while they are among the most used'),
+    cfg.IntOpt('prefetch_concurrency',
+               default=2,
+               help='Number of images prefetched at the same time'),
     ]
 
 CONF = cfg.CONF
 CONF.register_opts(imagecache_opts)
+CONF.import_opt('auth_strategy', 'nova.api.auth')
 CONF.import_opt('host', 'nova.netconf')
 CONF.import_opt('instances_path', 'nova.compute.manager')
 
@@ -244,6 +272,23 @@ class ImageCacheManager(object):
         self.lock_path = os.path.join(CONF.instances_path, 'locks')
         self._reset_state()
 
+        # { base file name: {'size', 'mtime', 'verified', 'last_used'} },
+        # kept in image_cache_index_path
+        self.index = {}
+        self.index_loaded = False
+        # { instance disk path: ((st_dev, st_ino, st_size), backing file) }
+        self.backing_files = {}
+
+        self.prefetch_pool = eventlet.GreenPool(CONF.prefetch_concurrency)
+        self.prefetching = set()
+        # Ids of the images the last prefetch pass kept cached, which are
+        # not reaped while unused
+        self.prefetched_images = set()
+        # The periodic task's admin context has no token for glance, so
+        # images are prefetched with the context of their boot on this
+        # host: { image id: context of its latest boot }
+        self.boot_contexts = {}
+
     def _reset_state(self):
         """Reset state variables used for each pass."""
 
@@ -324,16 +369,47 @@ class ImageCacheManager(object):
                 self.image_popularity.setdefault(image_ref_str, 0)
                 self.image_popularity[image_ref_str] += 1
 
+    def _get_disk_backing_file(self, disk_path):
+        """Return the name of the backing file of an instance disk.
+
+        The backing file of a qcow2 disk is read from its header, the one of
+        a disk in another format is looked up once for each file.
+        """
+        try:
+            backing_file = virtutils.get_qcow2_backing_file(disk_path)
+        except (IOError, OSError, ValueError):
+            pass
+        else:
+            if backing_file:
+                backing_file = os.path.basename(backing_file)
+            return backing_file
+
+        try:
+            stat = os.stat(disk_path)
+        except OSError:
+            return virtutils.get_disk_backing_file(disk_path)
+
+        key = (stat.st_dev, stat.st_ino, stat.st_size)
+        cached = self.backing_files.get(disk_path)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        backing_file = virtutils.get_disk_backing_file(disk_path)
+        self.backing_files[disk_path] = (key, backing_file)
+        return backing_file
+
     def _list_backing_images(self):
         """List the backing images currently in use."""
         inuse_images = []
+        disk_paths = set()
         for ent in os.listdir(CONF.instances_path):
             if ent in self.instance_names:
                 LOG.debug(_('%s is a valid instance name'), ent)
                 disk_path = os.path.join(CONF.instances_path, ent, 'disk')
                 if os.path.exists(disk_path):
                     LOG.debug(_('%s has a disk file'), ent)
-                    backing_file = virtutils.get_disk_backing_file(disk_path)
+                    disk_paths.add(disk_path)
+                    backing_file = self._get_disk_backing_file(disk_path)
                     LOG.debug(_('Instance %(instance)s is backed by '
                                 '%(backing)s'),
                               {'instance': ent,
@@ -355,8 +431,59 @@ class ImageCacheManager(object):
                                          'backing': backing_file})
                             self.unexplained_images.remove(backing_path)
 
+        for disk_path in self.backing_files.keys():
+            if disk_path not in disk_paths:
+                del self.backing_files[disk_path]
+
         return inuse_images
 
+    def _load_index(self):
+        """Read the index of base images kept by the previous passes."""
+        index_path = CONF.image_cache_index_path
+        try:
+            with open(index_path, 'r') as f:
+                self.index = _read_possible_json(f.read(), index_path)
+        except IOError:
+            self.index = {}
+        self.index_loaded = True
+
+    def _save_index(self):
+        index_path = CONF.image_cache_index_path
+        try:
+            with open(index_path + '.tmp', 'w') as f:
+                f.write(jsonutils.dumps(self.index))
+            os.rename(index_path + '.tmp', index_path)
+        except (IOError, OSError), e:
+            LOG.warning(_('Failed to write image cache index %(index)s, '
+                          'error was %(error)s'),
+                        {'index': index_path,
+                         'error': e})
+
+    def _base_file_unchanged(self, base_file):
+        """Return True if a base file has the size and modification time
+        it had when its checksum was last verified.
+        """
+        entry = self.index.get(os.path.basename(base_file), {})
+        if not entry.get('verified'):
+            return False
+        stat = os.stat(base_file)
+        return (entry.get('size') == stat.st_size and
+                entry.get('mtime') == stat.st_mtime)
+
+    def _record_verified(self, base_file):
+        stat = os.stat(base_file)
+        entry = self.index.setdefault(os.path.basename(base_file), {})
+        entry.update({'size': stat.st_size,
+                      'mtime': stat.st_mtime,
+                      'verified': time.time()})
+
+    def _record_used(self, base_file):
+        entry = self.index.setdefault(os.path.basename(base_file), {})
+        entry['last_used'] = time.time()
+        if 'mtime' in entry:
+            # Touching the file is not a change of its contents.
+            entry['mtime'] = os.path.getmtime(base_file)
+
     def _find_base_file(self, base_dir, fingerprint):
         """Find the base file matching this fingerprint.
 
@@ -395,6 +522,10 @@ class ImageCacheManager(object):
         if not CONF.checksum_base_images:
             return None
 
+        if (CONF.checksum_changed_base_images_only and
+            self._base_file_unchanged(base_file)):
+            return True
+
         lock_name = 'hash-%s' % os.path.split(base_file)[-1]
 
         # Protect against other nova-computes performing checksums at the same
@@ -449,7 +580,13 @@ class ImageCacheManager(object):
 
                 return None
 
-        return inner_verify_checksum()
+        result = inner_verify_checksum()
+        if result:
+            self._record_verified(base_file)
+        else:
+            self.index.get(os.path.basename(base_file), {}).pop('verified',
+                                                               None)
+        return result
 
     def _remove_base_file(self, base_file):
         """Remove a single base file if it is old enough.
@@ -475,6 +612,7 @@ class ImageCacheManager(object):
             LOG.info(_('Removing base file: %s'), base_file)
             try:
                 os.remove(base_file)
+                self.index.pop(os.path.basename(base_file), None)
                 signature = get_info_filename(base_file)
                 if os.path.exists(signature):
                     os.remove(signature)
@@ -536,6 +674,14 @@ class ImageCacheManager(object):
         if image_bad:
             self.corrupt_base_files.append(base_file)
 
+        if not image_in_use and (img_id in CONF.prefetch_images or
+                                 img_id in self.prefetched_images):
+            image_in_use = True
+            LOG.info(_('image %(id)s at (%(base_file)s): prefetched'),
+                     {'id': img_id,
+                      'base_file': base_file})
+            self.active_base_files.append(base_file)
+
         if base_file:
             if not image_in_use:
                 LOG.debug(_('image %(id)s at (%(base_file)s): image is not in '
@@ -552,6 +698,7 @@ class ImageCacheManager(object):
                 if os.path.exists(base_file):
                     virtutils.chown(base_file, os.getuid())
                     os.utime(base_file, None)
+                    self._record_used(base_file)
 
     def verify_base_images(self, context, all_instances):
         """Verify that base images are in a reasonable state."""
@@ -574,11 +721,22 @@ class ImageCacheManager(object):
             return
 
         LOG.debug(_('Verify base images'))
+        if not self.index_loaded:
+            self._load_index()
         self._list_base_images(base_dir)
+        base_files = set(os.path.basename(base_file)
+                         for base_file in self.unexplained_images)
+        for ent in self.index.keys():
+            if ent not in base_files:
+                del self.index[ent]
         self._list_running_instances(context, all_instances)
 
-        # Determine what images are on disk because they're in use
-        for img in self.used_images:
+        # Determine what images are on disk because they're in use or
+        # prefetched
+        images = self.used_images.keys()
+        prefetched = set(CONF.prefetch_images) | self.prefetched_images
+        images += [img for img in prefetched if img not in self.used_images]
+        for img in images:
             fingerprint = hashlib.sha1(img).hexdigest()
             LOG.debug(_('Image id %(id)s yields fingerprint %(fingerprint)s'),
                       {'id': img,
@@ -617,5 +775,108 @@ class ImageCacheManager(object):
                 for base_file in self.removable_base_files:
                     self._remove_base_file(base_file)
 
+        self._save_index()
+
         # That's it
         LOG.debug(_('Verification complete'))
+
+    def _images_to_prefetch(self, all_instances):
+        """Return the ids of the configured images followed by those of the
+        ones most used by the instances of the deployment.
+        """
+        image_ids = list(CONF.prefetch_images)
+        if CONF.prefetch_popular_images > 0:
+            popularity = {}
+            for instance in all_instances:
+                if instance['image_ref']:
+                    popularity[instance['image_ref']] = popularity.get(
+                        instance['image_ref'], 0) + 1
+            popular = sorted(popularity, key=popularity.get, reverse=True)
+            for image_id in popular[:CONF.prefetch_popular_images]:
+                if image_id not in image_ids:
+                    image_ids.append(image_id)
+        return image_ids
+
+    def record_boot(self, context, image_id):
+        """Remember the context of a boot on this host to prefetch its
+        image with.
+        """
+        if context.auth_token and image_id:
+            self.boot_contexts[image_id] = context
+
+    def _prefetch_context(self, context, image_id):
+        """Return the context to fetch an image with, or None if there is
+        none glance would accept.
+
+        With the keystone auth strategy, that is the context of the latest
+        boot of the image on this host.  The context of another image's
+        boot could belong to a tenant the image is not shared with.
+        """
+        if CONF.auth_strategy != 'keystone':
+            return context
+        return self.boot_contexts.get(image_id)
+
+    def prefetch_images(self, context, all_instances):
+        """Start fetching the images to prefetch which are not in the
+        image cache yet, in the background.
+        """
+        base_dir = os.path.join(CONF.instances_path, CONF.base_dir_name)
+        image_ids = self._images_to_prefetch(all_instances)
+        self.prefetched_images = set(image_ids)
+        for image_id in self.boot_contexts.keys():
+            if image_id not in image_ids:
+                del self.boot_contexts[image_id]
+
+        unauthenticated = []
+        for image_id in image_ids:
+            fname = get_cache_fname({'image_id': image_id}, 'image_id')
+            base_file = os.path.join(base_dir, fname)
+            if image_id in self.prefetching or os.path.exists(base_file):
+                continue
+            fetch_context = self._prefetch_context(context, image_id)
+            if fetch_context is None:
+                unauthenticated.append(image_id)
+                continue
+
+            fileutils.ensure_tree(base_dir)
+            self.prefetching.add(image_id)
+            self.prefetch_pool.spawn_n(self._prefetch_image, fetch_context,
+                                       image_id, base_file)
+
+        if unauthenticated:
+            LOG.info(_('Not prefetching images %s: glance needs the token '
+                       'of a user, and no instance was booted from them on '
+                       'this host since it started'),
+                     ', '.join(unauthenticated))
+
+    def _prefetch_image(self, context, image_id, base_file):
+        """Fetch an image into the image cache.
+
+        Takes the lock that libvirt image backends take to fetch a base
+        image, so an instance needing this image waits for the prefetch
+        rather than fetching it again.
+        """
+        @lockutils.synchronized(os.path.basename(base_file), 'nova-',
+                                external=True, lock_path=self.lock_path)
+        def fetch_if_not_exists():
+            if not os.path.exists(base_file):
+                LOG.info(_('Prefetching image %(id)s to %(base_file)s'),
+                         {'id': image_id,
+                          'base_file': base_file})
+                virtutils.fetch_image(context, base_file, image_id,
+                                      context.user_id, context.project_id)
+
+        try:
+            fetch_if_not_exists()
+        except (exception.NotAuthorized, exception.ImageNotAuthorized,
+                exception.ImageNotFound) as e:
+            # Most likely the token of the boot expired, or the image was
+            # deleted; wait for a later boot of the image.
+            LOG.warn(_('Failed to prefetch image %(id)s: %(error)s'),
+                     {'id': image_id, 'error': e})
+            if self.boot_contexts.get(image_id) is context:
+                del self.boot_contexts[image_id]
+        except Exception:
+            LOG.exception(_('Failed to prefetch image %s'), image_id)
+        finally:
+            self.prefetching.discard(image_id)
@@ -22,6 +22,7 @@
 
 import errno
 import os
+import struct
 
 from lxml import etree
 from oslo.config import cfg
@@ -402,6 +403,27 @@ def get_disk_backing_file(path, basename=True):
     return backing_file
 
 
+def get_qcow2_backing_file(path):
+    """Get the backing file of a qcow2 image from its header
+
+    Cheaper than get_disk_backing_file(), which runs qemu-img.
+
+    :param path: Path to the disk image
+    :returns: the backing file named in the header, or None
+    :raises: ValueError if the image is not a qcow2 image
+    """
+    with open(path, 'rb') as f:
+        # magic, version, backing file offset and backing file size
+        header = f.read(20)
+        if len(header) < 20 or header[:4] != 'QFI\xfb':
+            raise ValueError(_('%s is not a qcow2 image') % path)
+        offset, size = struct.unpack('>QI', header[8:])
+        if not offset:
+            return None
+        f.seek(offset)
+        return f.read(size)
+
+
 def copy_image(src, dest, host=None):
     """Copy a disk image to an existing directory
 
@@ -17,6 +17,8 @@
 Pluggable Weighing support
 """
 
+import time
+
 from nova import loadables
 
 
@@ -56,6 +58,10 @@ class BaseWeigher(object):
 class BaseWeightHandler(loadables.BaseLoader):
     object_class = WeighedObject
 
+    # Set to an object with an add_weigher(name, elapsed, num_objs) method
+    # to record the time taken by each weigher.
+    stats = None
+
     def get_weighed_objects(self, weigher_classes, obj_list,
             weighing_properties):
         """Return a sorted (highest score first) list of WeighedObjects."""
@@ -65,7 +71,11 @@ class BaseWeightHandler(loadables.BaseLoader):
 
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
         for weigher_cls in weigher_classes:
+            start = time.time()
             weigher = weigher_cls()
             weigher.weigh_objects(weighed_objs, weighing_properties)
+            if self.stats is not None:
+                self.stats.add_weigher(weigher_cls.__name__,
+                                       time.time() - start, len(weighed_objs))
 
         return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
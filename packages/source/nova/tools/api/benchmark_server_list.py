@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+# Copyright 2013 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""benchmark_server_list.py - Measure streamed server list serialization.
+
+Builds --servers detailed server views, shaped like the ones the servers
+controller returns, and serializes them to JSON and to XML as a whole
+and chunk by chunk, the way responses of server lists of at least
+osapi_compute_list_stream_threshold servers are sent.  Each run happens
+in a child process of its own, which reports the time serializing took
+and how much its peak resident memory grew while serializing.
+
+Run like:
+
+    ./tools/api/benchmark_server_list.py --servers=50000
+"""
+
+import os
+import resource
+import sys
+import time
+
+from oslo.config import cfg
+
+possible_topdir = os.getcwd()
+if os.path.exists(os.path.join(possible_topdir, "nova", "__init__.py")):
+        sys.path.insert(0, possible_topdir)
+
+
+from nova.api.openstack.compute import servers
+from nova.api.openstack import wsgi
+
+benchmark_opts = [
+    cfg.IntOpt('servers',
+               default=50000,
+               help='Number of servers in the list'),
+    cfg.IntOpt('chunk_size',
+               default=100,
+               help='Servers serialized per chunk'),
+]
+
+CONF = cfg.CONF
+CONF.register_cli_opts(benchmark_opts)
+
+
+def make_server(i):
+    uuid = '%08x-0000-4000-8000-%012x' % (i, i)
+    href = 'http://localhost/v2/project/servers/%s' % uuid
+    return {
+        'id': uuid,
+        'name': 'server-%d' % i,
+        'status': 'ACTIVE',
+        'tenant_id': 'project',
+        'user_id': 'user',
+        'metadata': {'key%d' % i: 'value%d' % i},
+        'hostId': 'c5b8bd9e3b3f2a4e1d9fbcb4b2a8ee1f7a6d8c2f3e4b5a6978d1c2e3',
+        'image': {'id': '155d900f-4e14-4e4c-a73d-069cbf4541e6',
+                  'links': [{'rel': 'bookmark',
+                             'href': 'http://localhost/project/images/1'}]},
+        'flavor': {'id': '1',
+                   'links': [{'rel': 'bookmark',
+                              'href': 'http://localhost/project/flavors/1'}]},
+        'created': '2013-04-01T12:00:00Z',
+        'updated': '2013-04-01T12:00:00Z',
+        'addresses': {'private': [{'version': 4,
+                                   'addr': '10.0.%d.%d' % (i / 250 % 250,
+                                                           i % 250 + 2)}]},
+        'accessIPv4': '',
+        'accessIPv6': '',
+        'progress': 0,
+        'key_name': '',
+        'config_drive': '',
+        'links': [{'rel': 'self', 'href': href},
+                  {'rel': 'bookmark', 'href': href}],
+    }
+
+
+def serialize(kind, streamed):
+    if kind == 'json':
+        serializer = wsgi.JSONDictSerializer()
+    else:
+        serializer = servers.ServersTemplate()
+    obj = {'servers': [make_server(i) for i in xrange(CONF.servers)]}
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    size = 0
+    if streamed:
+        for chunk in serializer.serialize_chunks(obj, 'servers',
+                                                 CONF.chunk_size):
+            size += len(chunk)
+    else:
+        size = len(serializer.serialize(obj))
+    elapsed = time.time() - start
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, (after - before) / 1024.0, size
+
+
+def run(kind, streamed):
+    """Serialize in a child process, so peak memory is measured apart."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if not pid:
+        os.close(read_fd)
+        os.write(write_fd, '%f %f %d' % serialize(kind, streamed))
+        os._exit(0)
+    os.close(write_fd)
+    result = os.read(read_fd, 128)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    elapsed, peak_mb, size = result.split()
+    return float(elapsed), float(peak_mb), int(size)
+
+
+def main():
+    CONF(args=sys.argv[1:], project='nova')
+    print "%d servers, %d per chunk" % (CONF.servers, CONF.chunk_size)
+    for kind in ('json', 'xml'):
+        for streamed in (False, True):
+            elapsed, peak_mb, size = run(kind, streamed)
+            print ("    %-4s %-8s %7.2f sec, peak memory +%7.1f MB, "
+                   "%.1f MB sent" % (kind, streamed and 'streamed' or 'whole',
+                                     elapsed, peak_mb, size / 1048576.0))
+
+
+if __name__ == "__main__":
+    main()
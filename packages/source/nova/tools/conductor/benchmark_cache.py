@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+
+# Copyright 2013 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""benchmark_cache.py - Measure the conductor lookup cache.
+
+Creates a sqlite database in a temporary directory with a compute service
+per host, an availability zone aggregate, a security group with rules, a
+provider firewall rule and an agent build.  Then, for a number of periodic
+intervals, every host makes the lookups compute nodes make through the
+conductor, plus its service heartbeats, against a ConductorManager with
+conductor/cache_ttl 0 and then with --ttl.  Prints how many lookups per
+second the conductor answers and the database queries per second the
+lookups (the heartbeats left out) cost when every host makes them once
+per --interval seconds.  The clock of the cache is moved on by --interval
+seconds after each interval, so entries expire as they would.
+
+Run like:
+
+    ./tools/conductor/benchmark_cache.py --hosts=200 --intervals=5
+"""
+
+import gettext
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+gettext.install('nova', unicode=1)
+
+possible_topdir = os.getcwd()
+if os.path.exists(os.path.join(possible_topdir, "nova", "__init__.py")):
+        sys.path.insert(0, possible_topdir)
+
+
+from nova.conductor import manager as conductor_manager
+from nova import context
+from nova import db
+from nova.db import migration
+from nova.openstack.common import timeutils
+
+benchmark_opts = [
+    cfg.IntOpt('hosts',
+               default=200,
+               help='Number of compute hosts'),
+    cfg.IntOpt('intervals',
+               default=5,
+               help='Number of periodic intervals to run'),
+    cfg.IntOpt('interval',
+               default=60,
+               help='Seconds between the lookups of a host'),
+    cfg.IntOpt('heartbeats',
+               default=6,
+               help='Service heartbeats per host and interval'),
+    cfg.IntOpt('ttl',
+               default=60,
+               help='conductor/cache_ttl of the cached run'),
+]
+
+CONF = cfg.CONF
+CONF.register_cli_opts(benchmark_opts)
+CONF.import_opt('sql_connection',
+                'nova.openstack.common.db.sqlalchemy.session')
+
+
+class CountingDB(object):
+    """Counts the calls made to the DB API."""
+
+    def __init__(self, db_api):
+        self.db_api = db_api
+        self.calls = 0
+
+    def __getattr__(self, name):
+        func = getattr(self.db_api, name)
+
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return func(*args, **kwargs)
+        return counted
+
+
+def populate(ctxt):
+    services = []
+    for i in xrange(CONF.hosts):
+        service = db.service_create(ctxt, {'host': 'host%d' % i,
+                                           'binary': 'nova-compute',
+                                           'topic': 'compute',
+                                           'report_count': 0})
+        db.compute_node_create(ctxt, {'service_id': service['id'],
+                                      'vcpus': 16, 'memory_mb': 65536,
+                                      'local_gb': 1000, 'vcpus_used': 0,
+                                      'memory_mb_used': 0,
+                                      'local_gb_used': 0,
+                                      'hypervisor_type': 'QEMU',
+                                      'hypervisor_version': 1,
+                                      'hypervisor_hostname': 'host%d' % i,
+                                      'cpu_info': ''})
+        services.append(jsonify(service))
+    aggregate = db.aggregate_create(ctxt, {'name': 'az1'},
+                                    metadata={'availability_zone': 'az1'})
+    for i in xrange(0, CONF.hosts, 2):
+        db.aggregate_host_add(ctxt, aggregate['id'], 'host%d' % i)
+    group = db.security_group_create(ctxt, {'name': 'default',
+                                            'description': 'default',
+                                            'user_id': 'user',
+                                            'project_id': 'project'})
+    for port in (22, 80, 443):
+        db.security_group_rule_create(ctxt, {'parent_group_id': group['id'],
+                                             'protocol': 'tcp',
+                                             'from_port': port,
+                                             'to_port': port,
+                                             'cidr': '0.0.0.0/0'})
+    db.provider_fw_rule_create(ctxt, {'protocol': 'tcp', 'from_port': 25,
+                                      'to_port': 25, 'cidr': '0.0.0.0/0'})
+    db.agent_build_create(ctxt, {'hypervisor': 'xen', 'os': 'linux',
+                                 'architecture': 'x86_64', 'version': '1',
+                                 'url': 'http://example.com/agent',
+                                 'md5hash': 'abc'})
+    return services, {'id': group['id']}
+
+
+def jsonify(model):
+    return dict((key, value) for key, value in model.iteritems()
+                if isinstance(value, (int, long, basestring)))
+
+
+def run(ctxt, services, group):
+    manager = conductor_manager.ConductorManager()
+    counting_db = CountingDB(manager.db)
+    manager.db = counting_db
+    lookups = 0
+    queries = 0
+    elapsed = 0
+    timeutils.set_time_override()
+    for interval in xrange(CONF.intervals):
+        timeutils.advance_time_seconds(CONF.interval)
+        for service in services:
+            for i in xrange(CONF.heartbeats):
+                service['report_count'] += 1
+                manager.service_update(ctxt, service,
+                        {'report_count': service['report_count']})
+            calls = counting_db.calls
+            start = time.time()
+            manager.service_get_all_by(ctxt, 'compute', service['host'])
+            manager.aggregate_metadata_get_by_host(ctxt, service['host'])
+            for instance_type_id in xrange(1, 6):
+                manager.instance_type_get(ctxt, instance_type_id)
+            manager.security_group_rule_get_by_security_group(ctxt, group)
+            manager.provider_fw_rule_get_all(ctxt)
+            manager.agent_build_get_by_triple(ctxt, 'xen', 'linux',
+                                              'x86_64')
+            elapsed += time.time() - start
+            queries += counting_db.calls - calls
+            lookups += 10
+    timeutils.clear_time_override()
+    return (lookups / elapsed,
+            float(queries) / (CONF.intervals * CONF.interval), queries)
+
+
+def main():
+    CONF(args=sys.argv[1:], project='nova')
+    tempdir = tempfile.mkdtemp()
+    try:
+        CONF.set_override('sql_connection',
+                          'sqlite:///' + os.path.join(tempdir, 'nova.sqlite'))
+        migration.db_sync()
+        ctxt = context.get_admin_context()
+        services, group = populate(ctxt)
+
+        print ("%d hosts, %d intervals of %d seconds, %d heartbeats per "
+               "interval" % (CONF.hosts, CONF.intervals, CONF.interval,
+                             CONF.heartbeats))
+        for ttl in (0, CONF.ttl):
+            CONF.set_override('cache_ttl', ttl, group='conductor')
+            lookups_rate, queries_rate, queries = run(ctxt, services, group)
+            print ("    cache_ttl=%-4d %8.1f lookups/sec answered, "
+                   "%6.2f DB queries/sec (%d queries)" %
+                   (ttl, lookups_rate, queries_rate, queries))
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+# Copyright 2013 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""loadgen.py - Load a running nova-conductor like compute nodes do.
+
+Each of --hosts green threads plays a compute host and makes --rounds
+rounds of the read-only calls compute nodes make to the conductor: ping,
+service_get_all_by, instance_get_all_by_host, instance_type_get and
+provider_fw_rule_get_all.  Prints the calls per second the conductor(s)
+answered, the median and 99th percentile call latency and the number of
+calls that failed.
+
+The conductor has to be running already and reachable through the broker
+of the given configuration files; compare runs against nova-conductor
+with [conductor] workers unset and set to the number of CPUs.  A real
+broker is needed, kombu's in-memory transport doesn't cross processes.
+
+Run like:
+
+    ./tools/conductor/loadgen.py --config-file=/etc/nova/nova.conf \\
+        --hosts=100 --rounds=20
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import gettext
+import os
+import sys
+import time
+
+from oslo.config import cfg
+
+gettext.install('nova', unicode=1)
+
+possible_topdir = os.getcwd()
+if os.path.exists(os.path.join(possible_topdir, "nova", "__init__.py")):
+        sys.path.insert(0, possible_topdir)
+
+
+from nova.conductor import rpcapi as conductor_rpcapi
+from nova import context
+from nova.openstack.common import rpc
+
+loadgen_opts = [
+    cfg.IntOpt('hosts',
+               default=100,
+               help='Number of compute hosts to play'),
+    cfg.IntOpt('rounds',
+               default=20,
+               help='Rounds of calls made by each host'),
+    cfg.IntOpt('timeout',
+               default=60,
+               help='Seconds to wait for the reply to a call'),
+]
+
+CONF = cfg.CONF
+CONF.register_cli_opts(loadgen_opts)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    CONF(args=sys.argv[1:], project='nova')
+    CONF.set_override('rpc_response_timeout', CONF.timeout)
+
+    api = conductor_rpcapi.ConductorAPI()
+    ctxt = context.get_admin_context()
+    latencies = []
+    errors = []
+
+    def timed(func, *args):
+        start = time.time()
+        try:
+            func(ctxt, *args)
+        except Exception as exc:
+            errors.append(exc)
+            return
+        latencies.append(time.time() - start)
+
+    def play_host(host, rounds):
+        for i in xrange(rounds):
+            timed(api.ping, host)
+            timed(api.service_get_all_by, 'compute', host)
+            timed(api.instance_get_all_by_host, host)
+            timed(api.instance_type_get, 1)
+            timed(api.provider_fw_rule_get_all)
+
+    # Check the conductor is there and warm up the connection pool.
+    api.ping(ctxt, 'loadgen', timeout=CONF.timeout)
+
+    pool = eventlet.GreenPool(CONF.hosts)
+    start = time.time()
+    for i in xrange(CONF.hosts):
+        pool.spawn_n(play_host, 'loadgen%d' % i, CONF.rounds)
+    pool.waitall()
+    elapsed = time.time() - start
+
+    latencies.sort()
+    print "%d hosts, %d calls in %.2fs, %d failed" % (CONF.hosts,
+            len(latencies) + len(errors), elapsed, len(errors))
+    if latencies:
+        print "    %8.1f calls/sec  p50 %7.2f ms  p99 %7.2f ms" % (
+                len(latencies) / elapsed,
+                percentile(latencies, 0.50) * 1000,
+                percentile(latencies, 0.99) * 1000)
+    if errors:
+        print "    first failure: %s" % errors[0]
+    rpc.cleanup()
+
+
+if __name__ == "__main__":
+    main()
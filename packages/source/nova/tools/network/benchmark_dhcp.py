@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+
+# Copyright 2013 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""benchmark_dhcp.py - Measure fixed ip allocation and dnsmasq upkeep.
+
+Creates a sqlite database in a temporary directory with a network of
+--size fixed ips, --instances of which are allocated to instances, then
+times:
+
+ * updating the dnsmasq hosts file for one fixed ip allocated or
+   deallocated, with update_dhcp() and with add_dhcp_host() and
+   remove_dhcp_host().  dnsmasq itself is not run.
+ * allocating --repeat fixed ips from the network with fixed_ip_prefetch
+   0 and --prefetch.  sqlite doesn't lock rows, so this only shows what
+   prefetching costs; what it saves is network hosts waiting on the lock
+   of the same free ip in a database that does.
+ * starting a Python process which imports what nova-dhcpbridge imports,
+   which happens for every lease event without the lease listener, and a
+   check of the lease file of the network by the listener.
+
+Run like:
+
+    ./tools/network/benchmark_dhcp.py --size=4096 --instances=2000
+"""
+
+import gettext
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import netaddr
+from oslo.config import cfg
+
+gettext.install('nova', unicode=1)
+
+possible_topdir = os.getcwd()
+if os.path.exists(os.path.join(possible_topdir, "nova", "__init__.py")):
+        sys.path.insert(0, possible_topdir)
+
+
+from nova import context
+from nova import db
+from nova.db import migration
+from nova.network import linux_net
+from nova.network import manager as network_manager
+
+benchmark_opts = [
+    cfg.IntOpt('size',
+               default=4096,
+               help='Number of fixed ips in the network'),
+    cfg.IntOpt('instances',
+               default=2000,
+               help='Number of fixed ips allocated to instances'),
+    cfg.IntOpt('repeat',
+               default=50,
+               help='Number of changes to time'),
+    cfg.IntOpt('prefetch',
+               default=100,
+               help='fixed_ip_prefetch of the prefetching run'),
+]
+
+CONF = cfg.CONF
+CONF.register_cli_opts(benchmark_opts)
+CONF.import_opt('sql_connection',
+                'nova.openstack.common.db.sqlalchemy.session')
+
+
+def populate(ctxt):
+    prefixlen = 32 - len(bin(CONF.size - 1)[2:])
+    cidr = netaddr.IPNetwork('10.0.0.0/%d' % prefixlen)
+    network = db.network_create_safe(ctxt, {'cidr': str(cidr),
+                                            'label': 'bench',
+                                            'bridge': 'br100',
+                                            'multi_host': False,
+                                            'host': CONF.host})
+    addresses = [str(address) for address in cidr][2:CONF.size]
+    db.fixed_ip_bulk_create(ctxt, [{'network_id': network['id'],
+                                    'address': address}
+                                   for address in addresses])
+    for i in xrange(CONF.instances):
+        instance = db.instance_create(ctxt, {'hostname': 'server-%d' % i,
+                                             'host': CONF.host})
+        vif = db.virtual_interface_create(ctxt,
+                {'address': '02:16:3e:%02x:%02x:%02x' % (i >> 16,
+                                                         (i >> 8) & 255,
+                                                         i & 255),
+                 'instance_uuid': instance['uuid'],
+                 'network_id': network['id'],
+                 'uuid': instance['uuid']})
+        db.fixed_ip_update(ctxt, addresses[i],
+                           {'instance_uuid': instance['uuid'],
+                            'allocated': True,
+                            'virtual_interface_id': vif['id']})
+    return db.network_get(ctxt, network['id'])
+
+
+def time_hosts_file(ctxt, network, incremental):
+    address = db.network_get_associated_fixed_ips(ctxt,
+                                                  network['id'])[0]['address']
+    linux_net.update_dhcp(ctxt, 'br100', network)
+    start = time.time()
+    for i in xrange(CONF.repeat):
+        allocated = bool(i % 2)
+        db.fixed_ip_update(ctxt, address, {'allocated': allocated})
+        if not incremental:
+            linux_net.update_dhcp(ctxt, 'br100', network)
+        elif allocated:
+            linux_net.add_dhcp_host(ctxt, 'br100', network, address)
+        else:
+            linux_net.remove_dhcp_host(ctxt, 'br100', network, address)
+    return (time.time() - start) / CONF.repeat
+
+
+def time_allocation(ctxt, network, prefetch):
+    CONF.set_override('fixed_ip_prefetch', prefetch)
+    manager = network_manager.FlatDHCPManager(host=CONF.host)
+    instance = db.instance_create(ctxt, {'host': CONF.host})
+    addresses = []
+    start = time.time()
+    for i in xrange(CONF.repeat):
+        addresses.append(manager._associate_pool_fixed_ip(
+                ctxt, network['id'], instance['uuid']))
+    elapsed = time.time() - start
+    for address in addresses:
+        db.fixed_ip_disassociate(ctxt, address)
+    return elapsed / CONF.repeat
+
+
+def time_lease_events(ctxt, network):
+    cmd = [sys.executable, '-c',
+           'from nova import config, context, db; '
+           'from nova.network import rpcapi']
+    start = time.time()
+    for i in xrange(5):
+        subprocess.check_call(cmd)
+    fork = (time.time() - start) / 5
+
+    leases = [line.split() for line in
+              linux_net.get_dhcp_leases(ctxt, network).splitlines()]
+    leasefile = linux_net._dhcp_file('br100', 'leases')
+    linux_net._dhcp_leases['br100'] = {}
+    linux_net.get_dhcp_lease_changes()
+    start = time.time()
+    for i in xrange(CONF.repeat):
+        # NOTE: dnsmasq rewrites the whole file for every lease change
+        leases[i % len(leases)][0] = str(i)
+        linux_net.write_to_file(leasefile,
+                                '\n'.join(' '.join(lease)
+                                          for lease in leases))
+        linux_net.get_dhcp_lease_changes()
+    return fork, (time.time() - start) / CONF.repeat
+
+
+def main():
+    CONF(args=sys.argv[1:], project='nova')
+    tempdir = tempfile.mkdtemp()
+    try:
+        CONF.set_override('sql_connection',
+                          'sqlite:///' + os.path.join(tempdir, 'nova.sqlite'))
+        CONF.set_override('networks_path', tempdir)
+        CONF.set_override('lock_path', tempdir)
+        CONF.set_override('use_single_default_gateway', False)
+        migration.db_sync()
+        linux_net.restart_dhcp = lambda *args: None
+        ctxt = context.get_admin_context()
+        network = populate(ctxt)
+        # NOTE: every allocated fixed ip counts as leased
+        for data in db.network_get_associated_fixed_ips(ctxt, network['id']):
+            db.fixed_ip_update(ctxt, data['address'], {'leased': True})
+
+        print "%d fixed ips, %d allocated" % (CONF.size, CONF.instances)
+        print "  hosts file update per fixed ip"
+        for incremental in (False, True):
+            print "    %-12s %8.2f ms" % (
+                incremental and 'incremental' or 'full',
+                time_hosts_file(ctxt, network, incremental) * 1000)
+        print "  fixed ip allocation"
+        for prefetch in (0, CONF.prefetch):
+            print "    prefetch=%-4d %8.2f ms" % (
+                prefetch, time_allocation(ctxt, network, prefetch) * 1000)
+        fork, poll = time_lease_events(ctxt, network)
+        print "  lease event"
+        print "    %-12s %8.2f ms" % ('dhcpbridge', fork * 1000)
+        print "    %-12s %8.2f ms" % ('listener', poll * 1000)
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == "__main__":
+    main()
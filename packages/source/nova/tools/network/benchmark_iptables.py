@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+# Copyright 2013 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""benchmark_iptables.py - Time IptablesManager.apply() on a large ruleset.
+
+Fills the filter table with one chain per instance, like the libvirt
+firewall driver does, then times applying a change to the rules of one
+instance with the full and with the differential apply.  iptables-save and
+iptables-restore are replaced by a fake execute which keeps the restored
+ruleset in memory, so only nova's own processing is measured.
+
+Run like:
+
+    ./tools/network/benchmark_iptables.py --instances=200 --rules=50
+"""
+
+import gettext
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+gettext.install('nova', unicode=1)
+
+possible_topdir = os.getcwd()
+if os.path.exists(os.path.join(possible_topdir, "nova", "__init__.py")):
+        sys.path.insert(0, possible_topdir)
+
+
+from nova.network import linux_net
+
+benchmark_opts = [
+    cfg.IntOpt('instances',
+               default=200,
+               help='Number of instance chains'),
+    cfg.IntOpt('rules',
+               default=50,
+               help='Number of rules per instance chain'),
+    cfg.IntOpt('repeat',
+               default=10,
+               help='Number of changes to apply'),
+]
+
+CONF = cfg.CONF
+CONF.register_cli_opts(benchmark_opts)
+
+
+class FakeIptables(object):
+    def __init__(self):
+        self.saved = ''
+        self.restored_lines = 0
+
+    def execute(self, *cmd, **kwargs):
+        if cmd[0].endswith('-save'):
+            return self.saved, ''
+        lines = kwargs['process_input']
+        self.restored_lines += lines.count('\n')
+        if '--noflush' not in cmd:
+            self.saved = lines
+        return '', ''
+
+
+def instance_rules(i, generation=0):
+    return ['-s 10.%d.%d.0/24 -p tcp -m tcp --dport %d -j ACCEPT' %
+            (i // 256, i % 256, 1000 + generation * 100 + r)
+            for r in xrange(CONF.rules)]
+
+
+def run(differential):
+    CONF.set_override('iptables_differential_apply', differential)
+    fake = FakeIptables()
+    manager = linux_net.IptablesManager(execute=fake.execute)
+    table = manager.ipv4['filter']
+    for i in xrange(CONF.instances):
+        chain = 'inst-%d' % i
+        table.add_chain(chain)
+        table.add_rule('local', '-d 10.1.%d.%d -j $%s' %
+                       (i // 256, i % 256, chain))
+        for rule in instance_rules(i):
+            table.add_rule(chain, rule)
+    manager.apply()
+
+    fake.restored_lines = 0
+    start = time.time()
+    for generation in xrange(1, CONF.repeat + 1):
+        # A security group refresh of one instance.
+        chain = 'inst-%d' % (generation % CONF.instances)
+        table.empty_chain(chain)
+        for rule in instance_rules(generation % CONF.instances, generation):
+            table.add_rule(chain, rule)
+        manager.apply()
+    elapsed = time.time() - start
+    return elapsed / CONF.repeat, fake.restored_lines / CONF.repeat
+
+
+def main():
+    CONF(args=sys.argv[1:], project='nova')
+    CONF.set_override('use_ipv6', False)
+    lock_path = tempfile.mkdtemp()
+    CONF.set_override('lock_path', lock_path)
+
+    try:
+        print "%d instance chains of %d rules (%d rules)" % (
+            CONF.instances, CONF.rules, CONF.instances * CONF.rules)
+        times = {}
+        for differential in (False, True):
+            elapsed, lines = run(differential)
+            times[differential] = elapsed
+            print "    %-12s %9.2f ms per apply  %7d lines restored" % (
+                differential and 'differential' or 'full',
+                elapsed * 1000, lines)
+        print "    differential is %.1fx as fast" % (times[False] /
+                                                     times[True])
+    finally:
+        shutil.rmtree(lock_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+# Copyright 2013 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""benchmark_policy.py - Measure the cost of policy enforcement.
+
+Loads a policy file (etc/nova/policy.json by default) and checks every rule
+in it for a member and an admin context, first by walking the Check trees
+as parsed, then through the compiled rules, then through
+nova.policy.enforce() and finally through nova.policy.enforce() remembering
+the results per context.  Prints the average cost of a single check for
+each.
+
+Run like:
+
+    ./tools/policy/benchmark_policy.py --repeat=200
+"""
+
+import gettext
+import os
+import sys
+import time
+
+from oslo.config import cfg
+
+gettext.install('nova', unicode=1)
+
+possible_topdir = os.getcwd()
+if os.path.exists(os.path.join(possible_topdir, "nova", "__init__.py")):
+        sys.path.insert(0, possible_topdir)
+
+
+from nova import context
+from nova.openstack.common import policy as common_policy
+from nova import policy
+
+benchmark_opts = [
+    cfg.StrOpt('policy',
+               default='etc/nova/policy.json',
+               help='Policy file to load'),
+    cfg.IntOpt('repeat',
+               default=200,
+               help='Number of times to check every rule'),
+]
+
+CONF = cfg.CONF
+CONF.register_cli_opts(benchmark_opts)
+
+
+def timed(func, rules, contexts, target):
+    checks = 0
+    start = time.time()
+    for i in xrange(CONF.repeat):
+        for ctxt in contexts:
+            for rule in rules:
+                func(ctxt, rule, target)
+                checks += 1
+    return (time.time() - start) / checks
+
+
+def main():
+    CONF(args=sys.argv[1:], project='nova')
+    CONF.set_override('policy_file', os.path.abspath(CONF.policy))
+    policy.reset()
+    policy.init()
+
+    rules = common_policy._rules
+    names = sorted(rules)
+    contexts = [context.RequestContext('user', 'project', roles=['member']),
+                context.RequestContext('admin', 'project', roles=['admin'])]
+    creds = dict((id(ctxt), ctxt.to_dict()) for ctxt in contexts)
+    target = {'project_id': 'project', 'user_id': 'user'}
+
+    def tree(ctxt, rule, target):
+        rules[rule](target, creds[id(ctxt)])
+
+    compiled_rules = common_policy._compiled_rules
+
+    def compiled(ctxt, rule, target):
+        compiled_rules[rule](target, creds[id(ctxt)])
+
+    def enforce(ctxt, rule, target):
+        policy.enforce(ctxt, rule, target, do_raise=False)
+
+    print "%d rules from %s, 2 contexts, repeated %d times" % (
+        len(names), CONF.policy, CONF.repeat)
+    for label, func, cache_results in (
+            ('check trees', tree, False),
+            ('compiled rules', compiled, False),
+            ('enforce', enforce, False),
+            ('enforce with result cache', enforce, True)):
+        CONF.set_override('policy_cache_results', cache_results)
+        print "    %-26s %8.2f us/check" % (
+            label, timed(func, names, contexts, target) * 1000000)
+
+
+if __name__ == "__main__":
+    main()
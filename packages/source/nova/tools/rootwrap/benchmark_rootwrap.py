@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+# Copyright 2013 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""benchmark_rootwrap.py - Compare nova-rootwrap and nova-rootwrap-daemon.
+
+Runs /bin/true through bin/nova-rootwrap, started for each command, and
+then through bin/nova-rootwrap-daemon, started once, using a temporary
+rootwrap.conf and the filters in etc/nova/rootwrap.d.  Prints the number
+of commands per second of each.  With --sudo both are started with sudo,
+as nova does; otherwise they run as the current user, which only leaves
+out the cost of sudo itself.
+
+Run like:
+
+    ./tools/rootwrap/benchmark_rootwrap.py --commands=200
+"""
+
+import gettext
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+gettext.install('nova', unicode=1)
+
+possible_topdir = os.getcwd()
+if os.path.exists(os.path.join(possible_topdir, "nova", "__init__.py")):
+        sys.path.insert(0, possible_topdir)
+
+
+from nova.openstack.common.rootwrap import daemon
+
+benchmark_opts = [
+    cfg.IntOpt('commands',
+               default=200,
+               help='Number of commands to run each way'),
+    cfg.BoolOpt('sudo',
+                default=False,
+                help='Start nova-rootwrap and the daemon with sudo'),
+]
+
+CONF = cfg.CONF
+CONF.register_cli_opts(benchmark_opts)
+
+
+def main():
+    CONF(args=sys.argv[1:], project='nova')
+    topdir = os.getcwd()
+    tempdir = tempfile.mkdtemp()
+    try:
+        filters_path = os.path.join(tempdir, 'rootwrap.d')
+        shutil.copytree(os.path.join(topdir, 'etc', 'nova', 'rootwrap.d'),
+                        filters_path)
+        with open(os.path.join(filters_path, 'benchmark.filters'), 'w') as f:
+            f.write('[Filters]\ntrue: CommandFilter, /bin/true, root\n')
+        config = os.path.join(tempdir, 'rootwrap.conf')
+        with open(config, 'w') as f:
+            f.write('[DEFAULT]\nfilters_path=%s\n'
+                    'exec_dirs=/sbin,/usr/sbin,/bin,/usr/bin\n' %
+                    filters_path)
+
+        prefix = ['sudo'] if CONF.sudo else []
+        rootwrap = prefix + [sys.executable,
+                             os.path.join(topdir, 'bin', 'nova-rootwrap'),
+                             config]
+        start = time.time()
+        for i in xrange(CONF.commands):
+            subprocess.check_call(rootwrap + ['true'])
+        forked = CONF.commands / (time.time() - start)
+
+        client = daemon.Client(prefix + [
+            sys.executable,
+            os.path.join(topdir, 'bin', 'nova-rootwrap-daemon'),
+            config])
+        # Leave the start of the daemon out, it happens once.
+        client.execute(['true'])
+        start = time.time()
+        for i in xrange(CONF.commands):
+            assert client.execute(['true'])[0] == 0
+        daemonized = CONF.commands / (time.time() - start)
+        client.stop()
+
+        print "%d commands%s" % (CONF.commands,
+                                 ' with sudo' if CONF.sudo else '')
+        print "    nova-rootwrap         %8.1f commands/sec" % forked
+        print "    nova-rootwrap-daemon  %8.1f commands/sec" % daemonized
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == "__main__":
+    main()
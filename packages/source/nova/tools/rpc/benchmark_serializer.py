@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+# Copyright 2013 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""benchmark_serializer.py - Time the rpc payload serializers.
+
+Encodes and decodes realistic rpc payloads (a scheduler run_instance
+request_spec, a conductor instance_update reply and the instance list of a
+busy compute host) through rpc.common.serialize_msg() and deserialize_msg()
+with each available serializer.  The JSON case includes the
+jsonutils.to_primitive() call that rpc API clients make on their arguments,
+which msgpack does not need as it encodes datetimes itself.
+
+Run like:
+
+    ./tools/rpc/benchmark_serializer.py --instances=50 --repeat=200
+"""
+
+import datetime
+import gettext
+import os
+import sys
+import time
+import uuid
+
+from oslo.config import cfg
+
+gettext.install('nova', unicode=1)
+
+possible_topdir = os.getcwd()
+if os.path.exists(os.path.join(possible_topdir, "nova", "__init__.py")):
+        sys.path.insert(0, possible_topdir)
+
+
+from nova.openstack.common import jsonutils
+from nova.openstack.common.rpc import common as rpc_common
+from nova.openstack.common.rpc import serializer as rpc_serializer
+
+benchmark_opts = [
+    cfg.IntOpt('instances',
+               default=50,
+               help='Number of instances on the fake compute host'),
+    cfg.IntOpt('repeat',
+               default=200,
+               help='Number of encode and decode runs of each payload'),
+]
+
+CONF = cfg.CONF
+CONF.register_cli_opts(benchmark_opts)
+
+
+def fake_instance(i):
+    now = datetime.datetime.utcnow()
+    instance_uuid = str(uuid.uuid4())
+    network_info = [{'id': str(uuid.uuid4()),
+                     'address': 'fa:16:3e:00:00:%02x' % (i % 256),
+                     'network': {'id': str(uuid.uuid4()),
+                                 'bridge': 'br100',
+                                 'label': 'private',
+                                 'subnets': [{'cidr': '10.0.0.0/24',
+                                              'gateway': {'address':
+                                                          '10.0.0.1'},
+                                              'ips': [{'address':
+                                                       '10.0.0.%d' % (i % 250),
+                                                       'type': 'fixed',
+                                                       'floating_ips': []}],
+                                              'dns': [],
+                                              'routes': []}]}}]
+    system_metadata = [{'key': 'instance_type_%s' % key, 'value': value,
+                        'created_at': now, 'updated_at': None,
+                        'deleted_at': None, 'deleted': 0, 'id': j}
+                       for j, (key, value) in enumerate(
+                               [('memory_mb', '2048'), ('vcpus', '1'),
+                                ('root_gb', '20'), ('ephemeral_gb', '0'),
+                                ('flavorid', '2'), ('name', 'm1.small'),
+                                ('swap', '0'), ('rxtx_factor', '1.0'),
+                                ('vcpu_weight', None),
+                                ('image_base_image_ref', str(uuid.uuid4()))])]
+    return {'id': i, 'uuid': instance_uuid, 'created_at': now,
+            'updated_at': now, 'deleted_at': None, 'deleted': 0,
+            'launched_at': now, 'terminated_at': None,
+            'scheduled_at': now, 'user_id': 'fake-user',
+            'project_id': 'fake-project', 'image_ref': str(uuid.uuid4()),
+            'kernel_id': '', 'ramdisk_id': '', 'hostname': 'server-%d' % i,
+            'host': 'compute1', 'node': 'compute1', 'launched_on': 'compute1',
+            'memory_mb': 2048, 'vcpus': 1, 'root_gb': 20, 'ephemeral_gb': 0,
+            'instance_type_id': 5, 'vm_state': 'active', 'task_state': None,
+            'power_state': 1, 'display_name': 'server-%d' % i,
+            'display_description': None, 'key_name': 'default',
+            'key_data': 'ssh-rsa ' + 'A' * 380 + ' nova@compute1',
+            'availability_zone': 'nova', 'locked': False,
+            'os_type': 'linux', 'architecture': 'x86_64',
+            'vm_mode': None, 'root_device_name': '/dev/vda',
+            'default_ephemeral_device': None, 'default_swap_device': None,
+            'config_drive': '', 'access_ip_v4': None, 'access_ip_v6': None,
+            'auto_disk_config': False, 'progress': 0,
+            'reservation_id': 'r-%08x' % i, 'launch_index': 0,
+            'user_data': None, 'cell_name': None, 'shutdown_terminate': False,
+            'disable_terminate': False,
+            'metadata': [{'key': 'role', 'value': 'web', 'id': i}],
+            'system_metadata': system_metadata,
+            'info_cache': {'instance_uuid': instance_uuid,
+                           'network_info': jsonutils.dumps(network_info),
+                           'created_at': now, 'updated_at': now},
+            'security_groups': [{'id': 1, 'name': 'default',
+                                 'description': 'default',
+                                 'project_id': 'fake-project',
+                                 'created_at': now, 'updated_at': None,
+                                 'rules': []}]}
+
+
+def payloads(num_instances):
+    instance = fake_instance(0)
+    instance_type = {'id': 5, 'name': 'm1.small', 'memory_mb': 2048,
+                     'vcpus': 1, 'root_gb': 20, 'ephemeral_gb': 0,
+                     'flavorid': '2', 'swap': 0, 'rxtx_factor': 1.0,
+                     'vcpu_weight': None, 'disabled': False,
+                     'is_public': True, 'extra_specs': {}}
+    image = {'id': instance['image_ref'], 'name': 'cirros',
+             'status': 'active', 'size': 9761280, 'min_ram': 0,
+             'min_disk': 0, 'disk_format': 'qcow2',
+             'container_format': 'bare', 'created_at': instance['created_at'],
+             'properties': {'kernel_id': '', 'ramdisk_id': ''}}
+    request_spec = {'image': image, 'instance_type': instance_type,
+                    'instance_properties': instance,
+                    'instance_uuids': [str(uuid.uuid4()) for i in range(10)],
+                    'num_instances': 10, 'block_device_mapping': [],
+                    'security_group': ['default']}
+    return [('scheduler run_instance',
+             {'method': 'run_instance', 'version': '2.6',
+              'args': {'request_spec': request_spec,
+                       'filter_properties': {'scheduler_hints': {}},
+                       'admin_password': None, 'injected_files': [],
+                       'requested_networks': None, 'is_first_time': True}}),
+            ('conductor instance_update reply',
+             {'result': instance, 'failure': None}),
+            ('conductor instance_get_all_by_host reply',
+             {'result': [fake_instance(i) for i in xrange(num_instances)],
+              'failure': None})]
+
+
+def run(msg, serializer):
+    start = time.time()
+    for i in xrange(CONF.repeat):
+        if serializer == 'json':
+            raw_msg = jsonutils.to_primitive(msg)
+        else:
+            raw_msg = msg
+        envelope = rpc_common.serialize_msg(raw_msg, force_envelope=True,
+                                            serializer=serializer)
+        rpc_common.deserialize_msg(envelope)
+    elapsed = time.time() - start
+    return elapsed, len(envelope['oslo.message'])
+
+
+def main():
+    CONF(args=sys.argv[1:])
+    serializers = ['json']
+    if rpc_serializer.get_serializer('msgpack') is not None:
+        serializers.append('msgpack')
+    else:
+        print "msgpack-python is not installed, only timing json."
+
+    for name, msg in payloads(CONF.instances):
+        print "%s:" % name
+        times = {}
+        for serializer in serializers:
+            elapsed, size = run(msg, serializer)
+            times[serializer] = elapsed
+            print "    %-8s %8.3f ms per message  %8d bytes" % (serializer,
+                    elapsed * 1000 / CONF.repeat, size)
+        if 'msgpack' in times:
+            print "    msgpack is %.1fx as fast" % (times['json'] /
+                                                     times['msgpack'])
+
+
+if __name__ == "__main__":
+    main()
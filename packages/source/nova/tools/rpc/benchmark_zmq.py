@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+# Copyright 2013 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""benchmark_zmq.py - Measure impl_zmq cast throughput over ipc://.
+
+Binds a PUSH socket where nova-rpc-zmq-receiver would, in a temporary
+rpc_zmq_ipc_dir, and casts to an impl_zmq consumer connected to it.  Prints
+the number of casts per second the consumer received, decoded and
+dispatched.  Needs pyzmq.
+
+Run like:
+
+    ./tools/rpc/benchmark_zmq.py --casts=20000 --batch_size=16
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import gettext
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+gettext.install('nova', unicode=1)
+
+possible_topdir = os.getcwd()
+if os.path.exists(os.path.join(possible_topdir, "nova", "__init__.py")):
+        sys.path.insert(0, possible_topdir)
+
+
+from nova import context
+from nova.openstack.common.rpc import dispatcher as rpc_dispatcher
+from nova.openstack.common.rpc import impl_zmq
+
+benchmark_opts = [
+    cfg.IntOpt('casts',
+               default=20000,
+               help='Number of casts to send'),
+    cfg.IntOpt('payload_size',
+               default=1024,
+               help='Size in bytes of the string sent with each cast'),
+    cfg.IntOpt('batch_size',
+               default=1,
+               help='Set rpc_zmq_batch_size'),
+]
+
+CONF = cfg.CONF
+CONF.register_cli_opts(benchmark_opts)
+
+TOPIC = 'benchmark'
+
+
+class CountAPI(object):
+    RPC_API_VERSION = '1.0'
+
+    def __init__(self, expected):
+        self.received = 0
+        self.expected = expected
+        self.done = eventlet.event.Event()
+
+    def count(self, context, value):
+        self.received += 1
+        if self.received == self.expected:
+            self.done.send(time.time())
+
+
+def main():
+    CONF(args=sys.argv[1:], project='nova')
+    ipc_dir = tempfile.mkdtemp()
+    CONF.set_override('rpc_zmq_ipc_dir', ipc_dir)
+    CONF.set_override('rpc_zmq_batch_size', CONF.batch_size)
+    CONF.set_override('rpc_zmq_matchmaker',
+                      'nova.openstack.common.rpc.matchmaker.'
+                      'MatchMakerLocalhost')
+
+    try:
+        topic = '%s.%s' % (TOPIC, CONF.rpc_zmq_host)
+        client = impl_zmq.ZmqClient('ipc://%s/zmq_topic_%s' %
+                                    (ipc_dir, topic), bind=True)
+
+        api = CountAPI(CONF.casts)
+        conn = impl_zmq.create_connection(CONF)
+        conn.create_consumer(TOPIC, rpc_dispatcher.RpcDispatcher([api]))
+        conn.consume_in_thread()
+        # Give the consumer time to connect before sending.
+        eventlet.sleep(0.5)
+
+        mcontext = impl_zmq.RpcContext.marshal(context.get_admin_context())
+        msg = {'method': 'count', 'version': '1.0',
+               'args': {'value': 'x' * CONF.payload_size}}
+        start = time.time()
+        for i in xrange(CONF.casts):
+            client.cast(None, topic, [mcontext, msg], envelope=True)
+            if i % 100 == 0:
+                eventlet.sleep(0)
+        sent = time.time()
+        end = api.done.wait()
+
+        print "%d casts, rpc_zmq_batch_size %d" % (CONF.casts,
+                                                   CONF.rpc_zmq_batch_size)
+        print "    sent in %.2fs, %8.1f casts/sec received" % (
+            sent - start, CONF.casts / (end - start))
+        client.close()
+        conn.close()
+        impl_zmq.cleanup()
+    finally:
+        shutil.rmtree(ipc_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+# Copyright 2013 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""loadgen.py - Measure rpc call throughput and latency in one process.
+
+Starts an echo consumer on a topic and makes rpc.call()s to it from a
+number of green threads, then prints the calls per second and the median
+and 99th percentile call latency.  No broker is needed: --driver=kombu uses
+kombu's in-memory transport (fake_rabbit) and --driver=fake uses impl_fake,
+which is useful as a lower bound for the rpc layer's own overhead.
+
+Run like:
+
+    ./tools/rpc/loadgen.py --driver=kombu --calls=2000 --concurrency=20 \\
+        --single_reply_queue --reuse_channels
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import gettext
+import os
+import sys
+import time
+
+from oslo.config import cfg
+
+gettext.install('nova', unicode=1)
+
+possible_topdir = os.getcwd()
+if os.path.exists(os.path.join(possible_topdir, "nova", "__init__.py")):
+        sys.path.insert(0, possible_topdir)
+
+
+from nova import context
+from nova.openstack.common import rpc
+from nova.openstack.common.rpc import dispatcher as rpc_dispatcher
+
+loadgen_opts = [
+    cfg.StrOpt('driver',
+               default='kombu',
+               help='rpc driver to load: kombu or fake'),
+    cfg.IntOpt('calls',
+               default=2000,
+               help='Number of calls to make'),
+    cfg.IntOpt('concurrency',
+               default=20,
+               help='Number of green threads making calls'),
+    cfg.IntOpt('payload_size',
+               default=1024,
+               help='Size in bytes of the string echoed by each call'),
+    cfg.BoolOpt('single_reply_queue',
+                default=False,
+                help='Set amqp_rpc_single_reply_queue'),
+    cfg.BoolOpt('reuse_channels',
+                default=False,
+                help='Set rabbit_reuse_channels'),
+]
+
+CONF = cfg.CONF
+CONF.register_cli_opts(loadgen_opts)
+
+TOPIC = 'loadgen'
+
+
+class EchoAPI(object):
+    RPC_API_VERSION = '1.0'
+
+    def echo(self, context, value):
+        return value
+
+
+def start_server():
+    conn = rpc.create_connection(new=True)
+    dispatcher = rpc_dispatcher.RpcDispatcher([EchoAPI()])
+    conn.create_consumer(TOPIC, dispatcher, fanout=False)
+    conn.consume_in_thread()
+    return conn
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    CONF(args=sys.argv[1:], project='nova')
+    CONF.set_override('rpc_backend',
+                      'nova.openstack.common.rpc.impl_%s' % CONF.driver)
+    CONF.set_override('fake_rabbit', True)
+    CONF.import_opt('amqp_rpc_single_reply_queue',
+                    'nova.openstack.common.rpc.amqp')
+    CONF.set_override('amqp_rpc_single_reply_queue', CONF.single_reply_queue)
+    if CONF.driver == 'kombu':
+        CONF.import_opt('rabbit_reuse_channels',
+                        'nova.openstack.common.rpc.impl_kombu')
+        CONF.set_override('rabbit_reuse_channels', CONF.reuse_channels)
+
+    server = start_server()
+    ctxt = context.get_admin_context()
+    payload = 'x' * CONF.payload_size
+    msg = {'method': 'echo', 'version': '1.0', 'args': {'value': payload}}
+    latencies = []
+
+    def do_calls(count):
+        for i in xrange(count):
+            start = time.time()
+            result = rpc.call(ctxt, TOPIC, dict(msg))
+            latencies.append(time.time() - start)
+            assert result == payload
+
+    # Warm up the connection pool and the reply queue.
+    do_calls(CONF.concurrency)
+    del latencies[:]
+
+    pool = eventlet.GreenPool(CONF.concurrency)
+    per_thread = CONF.calls // CONF.concurrency
+    start = time.time()
+    for i in xrange(CONF.concurrency):
+        pool.spawn_n(do_calls, per_thread)
+    pool.waitall()
+    elapsed = time.time() - start
+
+    latencies.sort()
+    print "%s: %d calls from %d threads in %.2fs" % (CONF.driver,
+            len(latencies), CONF.concurrency, elapsed)
+    print "    %8.1f calls/sec  p50 %7.2f ms  p99 %7.2f ms" % (
+            len(latencies) / elapsed,
+            percentile(latencies, 0.50) * 1000,
+            percentile(latencies, 0.99) * 1000)
+    server.close()
+    rpc.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+# Copyright 2013 OpenStack Foundation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""benchmark.py - Time FilterScheduler host selection against a fake DB.
+
+The compute nodes are generated in memory and returned from a stubbed
+db.compute_node_get_all(), so no database or other services are needed.
+Each run schedules one multi-instance request through
+FilterScheduler._schedule() with the per-instance loop and with
+scheduler_batch_placement, and checks that both chose the same hosts.
+With --stats the time spent in each filter and weigher is shown as well.
+
+Run like:
+
+    ./tools/scheduler/benchmark.py --hosts=1000 --instances=500
+"""
+
+import gettext
+import os
+import sys
+import time
+
+from oslo.config import cfg
+
+gettext.install('nova', unicode=1)
+
+possible_topdir = os.getcwd()
+if os.path.exists(os.path.join(possible_topdir, "nova", "__init__.py")):
+        sys.path.insert(0, possible_topdir)
+
+
+from nova import context
+from nova import db
+from nova.openstack.common import timeutils
+from nova.scheduler import filter_scheduler
+
+benchmark_opts = [
+    cfg.IntOpt('hosts',
+               default=1000,
+               help='Number of fake compute nodes'),
+    cfg.IntOpt('instances',
+               default=500,
+               help='Number of instances in the request'),
+    cfg.IntOpt('repeat',
+               default=3,
+               help='Number of timed runs of each scheduling mode'),
+    cfg.ListOpt('filters',
+                default=['RetryFilter', 'RamFilter', 'CoreFilter',
+                         'DiskFilter', 'ComputeFilter',
+                         'ComputeCapabilitiesFilter',
+                         'ImagePropertiesFilter'],
+                help='Scheduler filters to use'),
+    cfg.BoolOpt('stats',
+                default=False,
+                help='Show the time spent in each filter and weigher'),
+]
+
+CONF = cfg.CONF
+CONF.register_cli_opts(benchmark_opts)
+CONF.import_opt('scheduler_default_filters', 'nova.scheduler.host_manager')
+
+
+def fake_compute_nodes(num_hosts):
+    """Return compute node records with a spread of free resources."""
+    now = timeutils.utcnow()
+    compute_nodes = []
+    for i in xrange(num_hosts):
+        memory_mb = 16384 * (i % 4 + 1)
+        local_gb = 500 * (i % 3 + 1)
+        service = dict(id=i, host='host%d' % i, topic='compute',
+                       disabled=False, updated_at=now, created_at=now)
+        compute_nodes.append(dict(id=i, service=service,
+                hypervisor_hostname='node%d' % i,
+                memory_mb=memory_mb, free_ram_mb=memory_mb - 512 * (i % 7),
+                local_gb=local_gb, local_gb_used=i % 50,
+                free_disk_gb=local_gb - i % 50, disk_available_least=None,
+                vcpus=16, vcpus_used=i % 9, stats=[], updated_at=None))
+    return compute_nodes
+
+
+def request_spec(num_instances):
+    instance_properties = {'project_id': 'fake', 'os_type': 'linux',
+                           'memory_mb': 2048, 'root_gb': 20,
+                           'ephemeral_gb': 0, 'vcpus': 1}
+    return {'num_instances': num_instances,
+            'instance_type': dict(instance_properties),
+            'instance_properties': instance_properties,
+            'image': {'properties': {}}}
+
+
+def run(ctxt, batch):
+    """Schedule one request, returning the elapsed time, chosen hosts and
+    the scheduler's filter and weigher timings.
+    """
+    CONF.set_override('scheduler_batch_placement', batch)
+    scheduler = filter_scheduler.FilterScheduler()
+    start = time.time()
+    weighed_hosts = scheduler._schedule(ctxt, request_spec(CONF.instances),
+                                        {})
+    elapsed = time.time() - start
+    return (elapsed,
+            [weighed_host.obj.host for weighed_host in weighed_hosts],
+            scheduler.get_scheduler_stats())
+
+
+def print_stats(stats):
+    for kind in ('filters', 'weighers', 'db'):
+        for name, entry in sorted(stats[kind].iteritems(),
+                                  key=lambda x: x[1]['time'], reverse=True):
+            print "    %-32s calls %6d  time %8.3fs" % (name,
+                    entry['calls'], entry['time']),
+            if 'hosts_in' in entry:
+                print " hosts in %8d  out %8d" % (entry['hosts_in'],
+                                                  entry['hosts_out']),
+            print
+
+
+def main():
+    CONF(args=sys.argv[1:])
+    CONF.set_override('scheduler_default_filters', CONF.filters)
+    CONF.set_override('scheduler_host_subset_size', 1)
+
+    compute_nodes = fake_compute_nodes(CONF.hosts)
+    db.compute_node_get_all = lambda ctxt: compute_nodes
+    ctxt = context.get_admin_context()
+
+    print "%d hosts, %d instances, filters: %s" % (CONF.hosts,
+            CONF.instances, ', '.join(CONF.filters))
+    results = {}
+    for mode, batch in (('loop', False), ('batch', True)):
+        times = []
+        for i in xrange(CONF.repeat):
+            elapsed, hosts, stats = run(ctxt, batch)
+            times.append(elapsed)
+        results[mode] = hosts
+        print "%-6s placed %4d  min %8.3fs  mean %8.3fs" % (mode,
+                len(hosts), min(times), sum(times) / len(times))
+        if CONF.stats:
+            print_stats(stats)
+
+    if results['loop'] == results['batch']:
+        print "Both modes chose the same hosts."
+    else:
+        print "The modes chose different hosts!"
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()